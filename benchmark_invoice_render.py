@@ -0,0 +1,248 @@
+"""
+Benchmark the invoice generators
+
+Renders synthetic invoices of 1, 10, 50 and 200 lines through every
+generator and template:
+
+    utils.invoice_generator     shop_bill, default, compact, detailed, excel
+    utils.pdf_invoice_generator shop_bill
+    utils.invoice_generator_new, utils.invoice_generator_updated  default
+
+and reports p50/p95 render time, the first (cold) render, peak RSS and
+output size. Each case runs in a fresh process, so the peak RSS is that
+case's alone (it is not available on Windows). With --cold the template
+cache is cleared before every render, which shows what compiling the
+template costs (the PDF generators' shop_bill, and parsing shop_bill.xlsx).
+
+Usage:
+    python benchmark_invoice_render.py [--repeat 20] [--lines 1 10] [--generator NAME]
+        [--template NAME] [--cold] [--json results.json] [--compare baseline.json]
+
+--json writes the results with the app, library and git versions, and
+--compare reports cases whose p50 got slower than a saved run by more than
+--threshold (10% by default), exiting with status 1 if any did.
+"""
+import argparse
+import contextlib
+import datetime
+import importlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+LINE_COUNTS = (1, 10, 50, 200)
+
+# (generator module, template, output file extension)
+CASES = [
+    ("invoice_generator", "shop_bill", "pdf"),
+    ("invoice_generator", "default", "pdf"),
+    ("invoice_generator", "compact", "pdf"),
+    ("invoice_generator", "detailed", "pdf"),
+    ("invoice_generator", "excel", "xlsx"),
+    ("pdf_invoice_generator", "shop_bill", "pdf"),
+    ("invoice_generator_new", "default", "pdf"),
+    ("invoice_generator_updated", "default", "pdf"),
+]
+
+def sample_invoice(lines):
+    """Invoice data with the given number of item lines"""
+    return {
+        "invoice_number": "25-26/AGT-001",
+        "date": "01/04/2025",
+        "time": "10:30 AM",
+        "store_info": {"name": "Agritech Products Shop", "address": "Main Road, Maharashtra",
+                       "phone": "+91 1234567890", "gstin": "27AABCU9603R1ZX"},
+        "customer": {"name": "Ramesh Patil", "phone": "9876543210", "address": "Wagholi, Pune"},
+        "items": [{"name": f"Item {i}", "hsn_code": "3808", "quantity": 2, "price": 118, "discount": 0,
+                   "total": 236, "manufacturer": "Agro Co", "unit": "kg", "batch_no": f"B{i}",
+                   "tax_percentage": 18} for i in range(1, lines + 1)],
+        "payment": {"subtotal": 236 * lines, "discount": 0, "cgst": 18 * lines, "sgst": 18 * lines,
+                    "total": 236 * lines, "method": "Cash"},
+    }
+
+def renderer(generator, template):
+    """A callable(invoice_data, save_path) for one case; it returns a falsy value on failure"""
+    module = importlib.import_module(f"utils.{generator}")
+    if generator != "invoice_generator":
+        return module.generate_invoice
+    if template == "excel":
+        return lambda invoice_data, save_path: module.generate_invoice(invoice_data, save_path, "excel")
+    return lambda invoice_data, save_path: module.generate_invoice(dict(invoice_data, template_type=template),
+                                                                  save_path)
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_case(generator, template, extension, lines, repeat=20, cold=False):
+    """
+    Render one invoice size through one generator and template
+
+    Returns:
+        dict: The case, first/p50/p95/mean render times in ms, peak RSS,
+        output size in bytes, and error (None if every render succeeded)
+    """
+    from utils.invoice_templates import clear_template_cache
+
+    result = {"generator": generator, "template": template, "lines": lines, "cold": cold, "error": None}
+    save_path = os.path.join(tempfile.mkdtemp(), f"benchmark_invoice.{extension}")
+    invoice_data = sample_invoice(lines)
+    timings = []
+    # The generators print diagnostics for every invoice, and tracebacks on failure
+    output = io.StringIO()
+    try:
+        render = renderer(generator, template)
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            for run in range(repeat + 1):
+                if cold:
+                    clear_template_cache()
+                start = time.perf_counter()
+                ok = render(invoice_data, save_path)
+                elapsed = time.perf_counter() - start
+                if not ok:
+                    errors = [line for line in output.getvalue().splitlines() if line.startswith("Error")]
+                    raise RuntimeError(errors[-1] if errors else "generator reported failure")
+                if run == 0:
+                    result["first_ms"] = round(elapsed * 1000, 2)
+                else:
+                    timings.append(elapsed * 1000)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+
+    result.update({
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "output_bytes": os.path.getsize(save_path),
+    })
+    return result
+
+def run_isolated(*args):
+    """run_case() in a fresh process, so its peak RSS is not inflated by earlier cases"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, *args).result()
+
+def environment():
+    """Versions recorded with a run, so results can be compared across releases"""
+    from utils.config import get_default_config
+    versions = {"app": get_default_config().get("version"), "python": platform.python_version()}
+    for package in ("reportlab", "openpyxl"):
+        try:
+            module = importlib.import_module(package)
+            versions[package] = getattr(module, "Version", None) or getattr(module, "__version__", None)
+        except ImportError:
+            versions[package] = None
+    try:
+        versions["git"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                         text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        versions["git"] = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+def case_key(result):
+    return (result["generator"], result["template"], result["lines"], result.get("cold", False))
+
+def compare_results(results, baseline, threshold=0.10):
+    """
+    Cases whose p50 is more than threshold slower than in a baseline run
+
+    Returns:
+        list: (result, baseline p50 in ms, ratio) for each regression
+    """
+    before = {case_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = before.get(case_key(result))
+        if not old or old.get("error") or result.get("error"):
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"] if old["p50_ms"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append((result, old["p50_ms"], ratio))
+    return regressions
+
+def format_row(result):
+    name = f"{result['generator']}/{result['template']}"
+    if result["error"]:
+        return f"{name:<38}{result['lines']:>6}  failed: {result['error']}"
+    rss = f"{result['peak_rss_mb']:.1f}" if result["peak_rss_mb"] is not None else "-"
+    return (f"{name:<38}{result['lines']:>6}{result['first_ms']:>10.2f}{result['p50_ms']:>10.2f}"
+            f"{result['p95_ms']:>10.2f}{rss:>10}{result['output_bytes'] / 1024:>10.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the invoice generators")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed renders per case (default: 20)")
+    parser.add_argument("--lines", type=int, nargs="+", default=list(LINE_COUNTS), help="Invoice sizes in lines")
+    parser.add_argument("--generator", action="append", help="Only this generator (may be repeated)")
+    parser.add_argument("--template", action="append", help="Only this template (may be repeated)")
+    parser.add_argument("--cold", action="store_true", help="Clear the template cache before every render")
+    parser.add_argument("--json", metavar="PATH", help="Write the results to this file")
+    parser.add_argument("--compare", metavar="PATH", help="Report regressions against a saved run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slow-down that counts as a regression")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    cases = [case for case in CASES
+             if (not args.generator or case[0] in args.generator)
+             and (not args.template or case[1] in args.template)]
+    if not cases:
+        parser.error("no generator/template matches")
+
+    print(f"Invoice render times over {args.repeat} runs{' with the template cache cleared' if args.cold else ''}")
+    print(f"{'Generator/template':<38}{'Lines':>6}{'First ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'RSS MB':>10}{'Size KB':>10}")
+    results = []
+    for generator, template, extension in cases:
+        for lines in args.lines:
+            result = run_isolated(generator, template, extension, lines, args.repeat, args.cold)
+            results.append(result)
+            print(format_row(result), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(environment(), repeat=args.repeat, results=results), f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    status = 1 if any(result["error"] for result in results) else 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        label = baseline.get("versions", {}).get("git") or args.compare
+        print(f"\n{len(regressions)} regression(s) against {label}")
+        for result, old_p50, ratio in regressions:
+            print(f"  {result['generator']}/{result['template']} {result['lines']} lines: "
+                  f"{old_p50:.2f} -> {result['p50_ms']:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
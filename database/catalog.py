@@ -0,0 +1,199 @@
+"""
+Product catalog cache for POS system
+Keeps the sales screen's product list and sellable stock in memory
+"""
+
+import threading
+
+from database.product_search import search_product_ids
+
+# Stock only counts while its batch is unexpired (or has no expiry date)
+SELLABLE_BATCH = "(b.expiry_date > date('now') OR b.expiry_date IS NULL)"
+
+CATALOG_QUERY = f"""
+    SELECT p.id, p.name, p.product_code, p.selling_price, p.tax_percentage,
+           p.hsn_code, COALESCE(SUM(b.quantity), 0)
+    FROM products p
+    LEFT JOIN batches b ON p.id = b.product_id AND {SELLABLE_BATCH}
+    {{where}}
+    GROUP BY p.id
+"""
+
+BARCODE_QUERY = """
+    SELECT pb.product_id, pb.barcode
+    FROM product_barcodes pb
+    JOIN products p ON p.id = pb.product_id
+    {where}
+"""
+
+def code_key(code):
+    """Normalise a product code or barcode for lookup"""
+    return (code or "").strip().upper()
+
+class CatalogCache:
+    """In-memory snapshot of every product and its sellable stock
+
+    The snapshot is loaded once with a single grouped query. After that,
+    sync() only reads inventory movements newer than the last one it saw
+    (sales, stock receipts) and products added since, so the sales screen
+    can redraw after a sale without scanning batches again. The snapshot is
+    reloaded when the date changes, because batches expire at midnight, and
+    after invalidate(). Changes that bypass inventory_movements (editing a
+    product, its barcodes or a batch by hand) must call invalidate().
+
+    Product codes and alternate barcodes are kept in a dict, so lookup()
+    resolves a scan without touching the database.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.products = {}
+        self.codes = {}
+        # Bumped whenever products are added, removed or renamed, i.e. whenever
+        # a list built from the cache needs rebuilding rather than patching
+        self.version = 0
+        self._order = None
+        self._loaded_on = None
+        self._last_movement_id = 0
+        self._last_product_id = 0
+        self._stale = set()
+        self._stale_all = True
+        self._lock = threading.RLock()
+
+    def invalidate(self, product_id=None):
+        """Reload one product, or the whole catalog, on the next sync()"""
+        with self._lock:
+            if product_id is None:
+                self._stale_all = True
+            else:
+                self._stale.add(int(product_id))
+
+    def sync(self):
+        """Bring the snapshot up to date and return the ids whose entry changed
+
+        Reads from one snapshot so the movement watermark matches the stock
+        that was read; a sale committing halfway through cannot be counted twice.
+        The snapshot takes no writer lock, so searching never waits for a write.
+        """
+        with self._lock, self.db.read_snapshot():
+            today, last_product_id, last_movement_id = self.db.fetchone("""
+                SELECT date('now'),
+                       (SELECT COALESCE(MAX(id), 0) FROM products),
+                       (SELECT COALESCE(MAX(id), 0) FROM inventory_movements)
+            """)
+
+            if self._stale_all or today != self._loaded_on:
+                self._reload(today, last_product_id, last_movement_id)
+                return set(self.products)
+
+            changed = set()
+            if last_product_id > self._last_product_id:
+                changed |= self._load(f"WHERE p.id > {int(self._last_product_id)}")
+            if self._stale:
+                stale = sorted(self._stale)
+                changed |= self._load(f"WHERE p.id IN ({', '.join(str(pid) for pid in stale)})")
+                # Products that no longer exist are dropped from the snapshot
+                for product_id in stale:
+                    if product_id not in changed and product_id in self.products:
+                        self._unindex(self.products.pop(product_id))
+                        changed.add(product_id)
+                        self.version += 1
+                self._stale.clear()
+
+            if last_movement_id > self._last_movement_id:
+                for product_id, delta in self.db.fetchall(f"""
+                    SELECT m.product_id, SUM(m.quantity)
+                    FROM inventory_movements m
+                    LEFT JOIN batches b ON b.id = m.batch_id
+                    WHERE m.id > ? AND m.id <= ? AND {SELLABLE_BATCH}
+                    GROUP BY m.product_id
+                """, (self._last_movement_id, last_movement_id)):
+                    entry = self.products.get(product_id)
+                    # Rows loaded above already include these movements
+                    if entry is None or product_id in changed or not delta:
+                        continue
+                    entry["stock"] += delta
+                    changed.add(product_id)
+
+            self._last_product_id = max(self._last_product_id, last_product_id)
+            self._last_movement_id = last_movement_id
+            return changed
+
+    def _reload(self, today, last_product_id, last_movement_id):
+        self.products = {}
+        self.codes = {}
+        self._stale.clear()
+        self._load("")
+        self._loaded_on = today
+        self._last_product_id = last_product_id
+        self._last_movement_id = last_movement_id
+        self._stale_all = False
+        self.version += 1
+
+    def _load(self, where):
+        """Load (or reload) product rows matching where; returns their ids"""
+        loaded = set()
+        for row in self.db.fetchall(CATALOG_QUERY.format(where=where)):
+            product_id, name, code, price, tax_rate, hsn_code, stock = row
+            previous = self.products.get(product_id)
+            if previous is None or previous["name"] != name:
+                self.version += 1
+            if previous is not None:
+                self._unindex(previous)
+            self.products[product_id] = {
+                "id": product_id,
+                "name": name,
+                "code": code or "",
+                "price": price,
+                "tax_rate": tax_rate,
+                "hsn_code": hsn_code or "",
+                "stock": stock,
+                "barcodes": [],
+            }
+            loaded.add(product_id)
+        
+        for product_id, barcode in self.db.fetchall(BARCODE_QUERY.format(where=where)):
+            if product_id in loaded:
+                self.products[product_id]["barcodes"].append(barcode)
+        for product_id in loaded:
+            self._index(self.products[product_id])
+        return loaded
+
+    def _index(self, entry):
+        # Alternate barcodes first, so a product's own code wins any clash
+        for code in entry["barcodes"] + [entry["code"]]:
+            if code_key(code):
+                self.codes[code_key(code)] = entry["id"]
+
+    def _unindex(self, entry):
+        for code in entry["barcodes"] + [entry["code"]]:
+            if self.codes.get(code_key(code)) == entry["id"]:
+                del self.codes[code_key(code)]
+
+    def lookup(self, code):
+        """Return the entry whose product code or barcode is code, or None"""
+        product_id = self.codes.get(code_key(code))
+        return self.products.get(product_id) if product_id is not None else None
+
+    def get(self, product_id):
+        """Return the cached entry for a product, or None"""
+        return self.products.get(int(product_id))
+
+    def stock(self, product_id):
+        """Sellable stock for a product, 0 if it is unknown"""
+        entry = self.get(product_id)
+        return entry["stock"] if entry else 0
+
+    def all(self):
+        """Every product, ordered by name"""
+        with self._lock:
+            if self._order is None or self._order[0] != self.version:
+                ids = sorted(self.products, key=lambda pid: (self.products[pid]["name"] or "", pid))
+                self._order = (self.version, ids)
+            return [self.products[pid] for pid in self._order[1]]
+
+    def search(self, term):
+        """Products matching term, best match first (see database.product_search)"""
+        if not term.strip():
+            return self.all()
+        return [self.products[pid] for pid in search_product_ids(self.db, term) if pid in self.products]
@@ -0,0 +1,125 @@
+"""
+Customer search for POS system
+One ranked lookup for the sales screen, the customer picker and customer management
+"""
+
+import re
+
+# Input that looks like (part of) a phone number
+PHONE_TERM = re.compile(r"^[\d\s()+.-]+$")
+
+# Fewer digits than this match too many numbers to be worth a phone lookup
+MIN_PHONE_DIGITS = 3
+
+# Length of the idx_customers_phone_suffix key
+SUFFIX_DIGITS = 4
+
+# customers.phone_digits keeps the last ten digits (see schema.phone_key_sql);
+# longer input carries a country code, shorter input is a partial number
+NATIONAL_DIGITS = 10
+
+# Trigram MATCH needs at least three characters
+MIN_FTS_TERM = 3
+
+DEFAULT_LIMIT = 50
+
+# Sorts after every digit and after any character a name can realistically hold,
+# so "term <= x < term + RANGE_END" is an indexable prefix match
+PHONE_RANGE_END = ":"
+NAME_RANGE_END = "\U0010ffff"
+
+def phone_digits(text):
+    """Digits of a phone number, as stored in customers.phone_digits"""
+    return re.sub(r"\D", "", text or "")[-NATIONAL_DIGITS:]
+
+def has_search_index(db):
+    """True if the database has the customers_fts index"""
+    return db.fetchone(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'customers_fts'"
+    )[0] > 0
+
+def _candidate_queries(db, term):
+    """Return (UNION ALL of (id, tier) selects, params) for a normalised term"""
+    digits = phone_digits(term)
+    if PHONE_TERM.match(term) and len(digits) >= MIN_PHONE_DIGITS:
+        parts = [
+            "SELECT id, 0 AS tier FROM customers WHERE phone_digits = :digits",
+            "SELECT id, 1 FROM customers WHERE phone_digits >= :digits AND phone_digits < :digits_end",
+        ]
+        if len(digits) >= SUFFIX_DIGITS:
+            # The index narrows to numbers sharing the last four digits; LIKE checks the rest
+            parts.append("SELECT id, 2 FROM customers "
+                         "WHERE substr(phone_digits, -4) = :suffix AND phone_digits LIKE :ends_with")
+        params = {"digits": digits, "digits_end": digits + PHONE_RANGE_END,
+                  "suffix": digits[-SUFFIX_DIGITS:], "ends_with": "%" + digits}
+        return parts, params
+
+    parts = [
+        "SELECT id, 0 AS tier FROM customers WHERE name_normalized = :term",
+        "SELECT id, 1 FROM customers WHERE name_normalized >= :term AND name_normalized < :term_end",
+    ]
+    if len(term) >= MIN_FTS_TERM and has_search_index(db):
+        parts.append("SELECT rowid, 2 FROM customers_fts WHERE customers_fts MATCH :phrase")
+    else:
+        parts.append("SELECT id, 2 FROM customers WHERE instr(name_normalized, :term) > 0 "
+                     "OR instr(LOWER(village), :term) > 0 OR instr(LOWER(address), :term) > 0 "
+                     "OR instr(phone_digits, :term) > 0")
+    params = {"term": term, "term_end": term + NAME_RANGE_END,
+              "phrase": '"' + term.replace('"', '""') + '"'}
+    return parts, params
+
+def search_customer_ids(db, term, limit=DEFAULT_LIMIT):
+    """
+    Return the ids of customers matching a search term, best match first
+
+    Digits (with optional spaces, dashes or a leading +) are looked up as a
+    phone number: exact, then numbers starting with them, then numbers ending
+    with them. Anything else matches names exactly, by prefix, then anywhere
+    in the name, village or address.
+
+    Args:
+        db: DBHandler instance
+        term: Text typed by the user
+        limit: Maximum number of ids to return
+
+    Returns:
+        list: Customer ids
+    """
+    term = " ".join(term.lower().split())
+    if not term:
+        return []
+
+    parts, params = _candidate_queries(db, term)
+    params["limit"] = limit
+    # Each candidate set is capped on its own, so a short, common term stops
+    # scanning as soon as it has enough rows
+    candidates = " UNION ALL ".join(f"SELECT * FROM ({part} LIMIT :limit)" for part in parts)
+    rows = db.fetchall(f"""
+        SELECT c.id
+        FROM (SELECT id, MIN(tier) AS tier FROM ({candidates}) GROUP BY id) m
+        JOIN customers c ON c.id = m.id
+        ORDER BY m.tier, c.name_normalized, c.id
+        LIMIT :limit
+    """, params)
+    return [row[0] for row in rows]
+
+def search_customers(db, term, columns="id, name, phone", limit=DEFAULT_LIMIT):
+    """
+    Search customers and return the requested columns, best match first
+
+    Args:
+        db: DBHandler instance
+        term: Text typed by the user
+        columns: SQL column list to return; the first column must be id
+        limit: Maximum number of rows to return
+
+    Returns:
+        list: Rows in rank order
+    """
+    customer_ids = search_customer_ids(db, term, limit)
+    if not customer_ids:
+        return []
+    placeholders = ", ".join(["?"] * len(customer_ids))
+    rows = {row[0]: row for row in db.fetchall(
+        f"SELECT {columns} FROM customers WHERE id IN ({placeholders})", customer_ids)}
+    return [rows[customer_id] for customer_id in customer_ids if customer_id in rows]
@@ -6,18 +6,166 @@ Manages SQLite connection and common operations
 import os
 import sqlite3
 import datetime
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
 from pathlib import Path
 from database.schema import DB_SCHEMA, INITIAL_DATA
+from database.migrations import run_migrations
+from database.profiler import QueryProfiler
+from database.catalog import CatalogCache
+from database.invoice_assembler import InvoiceAssembler
+
+# Connection profile applied to every connection the handler opens.
+# WAL lets report queries read while the cashier writes; NORMAL sync is
+# durable across application crashes and only fsyncs at checkpoints.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,        # Negative value is KiB, so ~16 MB of page cache
+    "mmap_size": 134217728,      # 128 MB of memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,        # Milliseconds to wait for a lock before failing
+}
+
+# Extra attempts for a write that still finds the database locked after busy_timeout
+LOCK_RETRIES = 3
+
+# Money is computed with Decimal but stored in REAL columns.
+# Registering the adapter once lets Decimal values be bound directly anywhere.
+sqlite3.register_adapter(Decimal, float)
+
+class ConnectionPool:
+    """Hands each thread its own connection to the same database
+    
+    sqlite3 connections must not be shared between threads, so the Tk thread,
+    report workers and the checkpoint thread each get a connection of their own,
+    opened lazily with the handler's PRAGMA profile.
+    """
+    
+    def __init__(self, connect):
+        self._connect = connect
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}
+        # Bumped by close_all() so threads notice their connection was closed
+        self._generation = 0
+    
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.generation = self._generation
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+        return conn
+    
+    def release(self):
+        """Close the calling thread's connection; call when a worker thread finishes"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if self._connections.get(threading.get_ident()) is conn:
+                del self._connections[threading.get_ident()]
+        conn.close()
+    
+    def close_all(self):
+        """Close every connection handed out so far"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._generation += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Error closing connection: {e}")
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._connections)
+
+class CheckpointScheduler(threading.Thread):
+    """Background thread that checkpoints the WAL while the shop is idle
+    
+    Uses its own pooled connection so a checkpoint never runs on the Tk thread.
+    PASSIVE checkpoints never wait on readers or writers, so a sale that
+    starts mid-checkpoint is not delayed.
+    """
+    
+    def __init__(self, db_handler, interval=60, idle_after=30):
+        super().__init__(name="wal-checkpoint", daemon=True)
+        self.db_handler = db_handler
+        self.interval = interval
+        self.idle_after = idle_after
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        pool = self.db_handler.pool
+        try:
+            while not self._stop_event.wait(self.interval):
+                if self.db_handler.seconds_since_last_write() < self.idle_after:
+                    continue
+                try:
+                    # Fetched each time, since a restore reopens every connection
+                    pool.connection().execute("PRAGMA wal_checkpoint(PASSIVE)")
+                except sqlite3.Error as e:
+                    print(f"Checkpoint error: {e}")
+        finally:
+            pool.release()
+    
+    def stop(self):
+        """Ask the thread to exit and wait for it"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=5)
 
 class DBHandler:
     """SQLite database handler class for POS system"""
     
-    def __init__(self, db_path="./pos_data.db"):
-        """Initialize database connection and setup if needed"""
+    def __init__(self, db_path="./pos_data.db", pragmas=None):
+        """Initialize database connection and setup if needed
+        
+        Args:
+            db_path: Path to the SQLite database file
+            pragmas: Optional overrides for DEFAULT_PRAGMAS
+        """
         self.db_path = db_path
         self.is_initialized = False
-        self.conn = None
-        self.cursor = None
+        
+        # Connection profile, defaults merged with any overrides
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        
+        # One connection per thread; cursor and transaction depth are per thread too
+        self.pool = ConnectionPool(self._connect)
+        self._local = threading.local()
+        
+        # Only one thread writes at a time, so workers queue here instead of
+        # failing with "database is locked"
+        self._write_lock = threading.RLock()
+        
+        # Monotonic time of the last commit, used to detect idle periods
+        self._last_write = time.monotonic()
+        self.checkpoint_scheduler = None
+        
+        # Generated INSERT/UPDATE statements keyed by (kind, table, columns)
+        self._sql_cache = {}
+        
+        # QueryProfiler while profiling is enabled, otherwise None
+        self.profiler = None
+        
+        # Product list for the sales screen, loaded on first sync()
+        self.catalog = CatalogCache(self)
+        
+        # Invoice data for printing, with a cached snapshot of the shop settings
+        self.invoice_assembler = InvoiceAssembler(self)
         
         # Create data directory if it doesn't exist
         os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
@@ -34,13 +182,6 @@ class DBHandler:
         """Create database and tables if they don't exist"""
         db_exists = os.path.exists(self.db_path)
         
-        # Connect to database
-        self.conn = sqlite3.connect(self.db_path)
-        # Enable foreign keys
-        self.conn.execute("PRAGMA foreign_keys = ON")
-        # Create cursor
-        self.cursor = self.conn.cursor()
-        
         # Create tables if database is new
         if not db_exists:
             for table_name, table_schema in DB_SCHEMA.items():
@@ -48,86 +189,243 @@ class DBHandler:
             
             # Insert initial data
             for table, rows in INITIAL_DATA.items():
-                for row in rows:
-                    placeholders = ", ".join(["?"] * len(row))
-                    columns = ", ".join(row.keys())
-                    sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-                    self.cursor.execute(sql, list(row.values()))
+                if rows:
+                    columns = tuple(rows[0].keys())
+                    self.cursor.executemany(self._insert_sql(table, columns),
+                                            [[row[col] for col in columns] for row in rows])
             
             # Commit changes
             self.conn.commit()
         
-        # Always check for schema updates needed - even for new databases
-        # This ensures any future schema changes are automatically applied
-        self._check_and_update_schema()
+        # Apply pending schema migrations - even for new databases, since
+        # DB_SCHEMA is the original layout and migrations bring it current
+        run_migrations(self)
+    
+    def _connect(self):
+        """Open a connection configured with the handler's PRAGMA profile"""
+        # The pool keeps each connection on its own thread; allowing other threads
+        # lets close_all() shut them down from the Tk thread
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Enable foreign keys
+        conn.execute("PRAGMA foreign_keys = ON")
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                print(f"Could not apply PRAGMA {name}: {e}")
+        return conn
+    
+    @property
+    def conn(self):
+        """The calling thread's connection"""
+        return self.pool.connection()
+    
+    @property
+    def cursor(self):
+        """The calling thread's cursor (description holds the last query's columns)"""
+        conn = self.pool.connection()
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None or cursor.connection is not conn:
+            cursor = conn.cursor()
+            self._local.cursor = cursor
+        return cursor
+    
+    @property
+    def _transaction_depth(self):
+        """Nesting depth of the calling thread's transaction() blocks; 0 means autocommit"""
+        return getattr(self._local, "depth", 0)
+    
+    @_transaction_depth.setter
+    def _transaction_depth(self, value):
+        self._local.depth = value
+    
+    def _retry_if_locked(self, func, *args):
+        """Call func, retrying a few times if the database is still locked
+        
+        busy_timeout already waits inside SQLite; this covers the rare case where
+        another process holds the lock for longer. Statements inside a transaction
+        are not retried, since the transaction as a whole must be redone.
+        """
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if ("locked" not in str(e) and "busy" not in str(e)) \
+                        or attempt == LOCK_RETRIES or self._transaction_depth:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
+    
+    def _profile(self, query, params, start, rows=None):
+        """Hand a finished statement to the profiler"""
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.profiler.record(query, params, elapsed_ms, rows, self.conn)
     
     def execute(self, query, params=None):
         """Execute a query with parameters"""
+        start = time.perf_counter()
+        cursor = self._execute(query, params)
+        if cursor and self.profiler:
+            self._profile(query, params, start, cursor.rowcount if cursor.rowcount >= 0 else None)
+        return cursor
+    
+    def _execute(self, query, params=None):
+        """Execute a query without profiling it"""
+        cursor = self.cursor
         try:
             if params:
-                self.cursor.execute(query, params)
+                cursor.execute(query, params)
             else:
-                self.cursor.execute(query)
-            return self.cursor
+                cursor.execute(query)
+            return cursor
         except sqlite3.Error as e:
             print(f"Database error: {e}")
+            # Inside a transaction the caller must see the failure so the whole unit rolls back
+            if self._transaction_depth:
+                raise
             return None
     
     def fetchone(self, query, params=None):
         """Execute query and fetch a single row"""
-        cursor = self.execute(query, params)
+        start = time.perf_counter()
+        cursor = self._execute(query, params)
         if cursor:
-            return cursor.fetchone()
+            row = cursor.fetchone()
+            if self.profiler:
+                self._profile(query, params, start, 0 if row is None else 1)
+            return row
         return None
     
     def fetchall(self, query, params=None):
         """Execute query and fetch all rows"""
-        cursor = self.execute(query, params)
+        start = time.perf_counter()
+        cursor = self._execute(query, params)
         if cursor:
-            return cursor.fetchall()
+            rows = cursor.fetchall()
+            if self.profiler:
+                self._profile(query, params, start, len(rows))
+            return rows
         return []
     
+    def _insert_sql(self, table, columns):
+        """Return the cached INSERT statement for a table and column tuple"""
+        key = ("insert", table, columns)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            placeholders = ", ".join(["?"] * len(columns))
+            sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+            self._sql_cache[key] = sql
+        return sql
+    
+    def _update_sql(self, table, columns, condition):
+        """Return the cached UPDATE statement for a table, column tuple and condition"""
+        key = ("update", table, columns, condition)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            set_clause = ", ".join([f"{col} = ?" for col in columns])
+            sql = f"UPDATE {table} SET {set_clause} WHERE {condition}"
+            self._sql_cache[key] = sql
+        return sql
+    
     def insert(self, table, data):
         """Insert a new row into the specified table"""
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["?"] * len(data))
-        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-        
-        # Convert decimal.Decimal values to float for SQLite compatibility
-        values = []
-        for value in data.values():
-            if hasattr(value, '__module__') and value.__module__ == 'decimal':
-                values.append(float(value))
-            else:
-                values.append(value)
+        query = self._insert_sql(table, tuple(data.keys()))
         
         try:
-            self.cursor.execute(query, values)
-            self.conn.commit()
-            return self.cursor.lastrowid
+            start = time.perf_counter()
+            with self._write_lock:
+                cursor = self.cursor
+                self._retry_if_locked(cursor.execute, query, list(data.values()))
+                self.commit()
+            if self.profiler:
+                self._profile(query, list(data.values()), start, cursor.rowcount)
+            return cursor.lastrowid
         except sqlite3.Error as e:
             print(f"Insert error: {e}")
+            if self._transaction_depth:
+                raise
             return None
     
+    def insert_many(self, table, rows):
+        """Insert many rows with one executemany call and a single commit
+        
+        Args:
+            table: Table name
+            rows: List of dicts; every row must have the same keys as the first
+            
+        Returns:
+            int: Number of rows inserted (0 on error)
+        """
+        if not rows:
+            return 0
+        columns = tuple(rows[0].keys())
+        query = self._insert_sql(table, columns)
+        
+        try:
+            start = time.perf_counter()
+            with self._write_lock:
+                cursor = self.cursor
+                self._retry_if_locked(cursor.executemany, query, [[row[col] for col in columns] for row in rows])
+                self.commit()
+            if self.profiler:
+                # The first row stands in for the batch when explaining it
+                self._profile(query, [rows[0][col] for col in columns], start, cursor.rowcount)
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Insert error: {e}")
+            if self._transaction_depth:
+                raise
+            return 0
+    
     def update(self, table, data, condition):
         """Update rows in the specified table"""
-        set_clause = ", ".join([f"{key} = ?" for key in data.keys()])
-        query = f"UPDATE {table} SET {set_clause} WHERE {condition}"
-        
-        # Convert decimal.Decimal values to float for SQLite compatibility
-        values = []
-        for value in data.values():
-            if hasattr(value, '__module__') and value.__module__ == 'decimal':
-                values.append(float(value))
-            else:
-                values.append(value)
+        query = self._update_sql(table, tuple(data.keys()), condition)
         
         try:
-            self.cursor.execute(query, values)
-            self.conn.commit()
-            return self.cursor.rowcount
+            start = time.perf_counter()
+            with self._write_lock:
+                cursor = self.cursor
+                self._retry_if_locked(cursor.execute, query, list(data.values()))
+                self.commit()
+            if self.profiler:
+                self._profile(query, list(data.values()), start, cursor.rowcount)
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Update error: {e}")
+            if self._transaction_depth:
+                raise
+            return 0
+    
+    def update_many(self, table, rows, key="id"):
+        """Update many rows by key with one executemany call and a single commit
+        
+        Args:
+            table: Table name
+            rows: List of dicts, each holding the key column plus the columns to set;
+                  every row must have the same keys as the first
+            key: Column that identifies the row to update
+            
+        Returns:
+            int: Number of rows updated (0 on error)
+        """
+        if not rows:
+            return 0
+        columns = tuple(col for col in rows[0].keys() if col != key)
+        query = self._update_sql(table, columns, f"{key} = ?")
+        
+        try:
+            start = time.perf_counter()
+            with self._write_lock:
+                cursor = self.cursor
+                self._retry_if_locked(cursor.executemany, query,
+                                      [[row[col] for col in columns] + [row[key]] for row in rows])
+                self.commit()
+            if self.profiler:
+                self._profile(query, [rows[0][col] for col in columns] + [rows[0][key]], start, cursor.rowcount)
+            return cursor.rowcount
         except sqlite3.Error as e:
             print(f"Update error: {e}")
+            if self._transaction_depth:
+                raise
             return 0
     
     def delete(self, table, condition):
@@ -135,32 +433,220 @@ class DBHandler:
         query = f"DELETE FROM {table} WHERE {condition}"
         
         try:
-            self.cursor.execute(query)
-            self.conn.commit()
-            return self.cursor.rowcount
+            start = time.perf_counter()
+            with self._write_lock:
+                cursor = self.cursor
+                self._retry_if_locked(cursor.execute, query)
+                self.commit()
+            if self.profiler:
+                self._profile(query, None, start, cursor.rowcount)
+            return cursor.rowcount
         except sqlite3.Error as e:
             print(f"Delete error: {e}")
+            if self._transaction_depth:
+                raise
             return 0
     
     def commit(self):
-        """Commit changes to the database"""
+        """Commit changes to the database
+        Inside a transaction() block this is a no-op; the outermost block commits once on exit
+        """
+        if self._transaction_depth:
+            return
         self.conn.commit()
+        self._last_write = time.monotonic()
     
     def begin(self):
         """Begin a transaction
         SQLite automatically begins a transaction when needed,
-        but we include this method for API completeness and to make code more readable
+        but we include this method for API completeness and to make code more readable.
+        Use transaction() when several writes must be committed together.
         """
         pass  # SQLite automatically starts a transaction when needed
     
+    @contextmanager
+    def transaction(self):
+        """Group the enclosed statements into one atomic commit
+        
+        The outermost block opens the transaction and commits once when it exits;
+        nested blocks become savepoints so they can fail without losing the outer work.
+        Any exception raised in the block rolls back to where the block started.
+        
+        Usage:
+            with db.transaction():
+                invoice_id = db.insert("invoices", {...})
+                db.insert("invoice_items", {...})
+        """
+        depth = self._transaction_depth
+        savepoint = f"pos_sp_{depth}"
+        conn = self.conn
+        
+        if depth == 0:
+            # The outermost block holds the writer lock until it commits or rolls back
+            self._write_lock.acquire()
+            try:
+                # Flush any implicit transaction left open by a bare execute()
+                if conn.in_transaction:
+                    conn.commit()
+                self._retry_if_locked(conn.execute, "BEGIN IMMEDIATE")
+            except BaseException:
+                self._write_lock.release()
+                raise
+        else:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if depth == 0:
+                try:
+                    conn.rollback()
+                finally:
+                    self._write_lock.release()
+            else:
+                conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            raise
+        else:
+            self._transaction_depth -= 1
+            if depth == 0:
+                try:
+                    conn.commit()
+                    self._last_write = time.monotonic()
+                finally:
+                    self._write_lock.release()
+            else:
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+    
+    @contextmanager
+    def read_snapshot(self):
+        """Read the enclosed queries from one consistent snapshot of the database
+        
+        Opens a deferred transaction on the calling thread's connection, so no
+        writer lock is taken and readers never queue behind writes; in WAL mode
+        every query in the block sees the database as of the first one.
+        Inside a transaction() block, or an implicit one, the open transaction
+        already gives that guarantee and is reused.
+        
+        Usage:
+            with db.read_snapshot():
+                stock = db.fetchall("SELECT ...")
+                last_id = db.fetchone("SELECT MAX(id) FROM ...")
+        """
+        conn = self.conn
+        if self._transaction_depth or conn.in_transaction:
+            yield self
+            return
+        
+        conn.execute("BEGIN")
+        try:
+            yield self
+        finally:
+            # Nothing was written, so ending the transaction just releases the snapshot
+            conn.rollback()
+    
+    def enable_profiling(self, slow_ms=50):
+        """Start recording statement timings
+        
+        Args:
+            slow_ms: Statements at least this slow get their EXPLAIN QUERY PLAN captured
+            
+        Returns:
+            QueryProfiler: The active profiler
+        """
+        if self.profiler is None:
+            self.profiler = QueryProfiler(slow_ms)
+        else:
+            self.profiler.slow_ms = slow_ms
+        return self.profiler
+    
+    def disable_profiling(self):
+        """Stop recording and return the profiler with what it collected"""
+        profiler, self.profiler = self.profiler, None
+        return profiler
+    
+    def action(self, name):
+        """Scope statements to a named UI action for the profiler; a no-op when profiling is off
+        
+        Usage:
+            with db.action("checkout"):
+                ...
+        """
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.action(name)
+    
+    def in_transaction(self):
+        """Return True while a transaction() block is open"""
+        return self._transaction_depth > 0
+    
     def rollback(self):
         """Rollback changes"""
         self.conn.rollback()
     
+    def seconds_since_last_write(self):
+        """Seconds elapsed since this handler last committed"""
+        return time.monotonic() - self._last_write
+    
+    def checkpoint(self, mode="PASSIVE"):
+        """Copy WAL content back into the main database file
+        
+        Args:
+            mode: PASSIVE, FULL, RESTART or TRUNCATE (TRUNCATE also empties the -wal file)
+            
+        Returns:
+            tuple: (busy, wal_frames, checkpointed_frames) or None on error
+        """
+        if mode.upper() not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+            raise ValueError(f"Unknown checkpoint mode: {mode}")
+        try:
+            return self.conn.execute(f"PRAGMA wal_checkpoint({mode.upper()})").fetchone()
+        except sqlite3.Error as e:
+            print(f"Checkpoint error: {e}")
+            return None
+    
+    def optimize(self):
+        """Let SQLite refresh planner statistics for tables whose shape changed"""
+        try:
+            self.conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            print(f"Optimize error: {e}")
+    
+    def start_checkpoint_scheduler(self, interval=60, idle_after=30):
+        """Start the background WAL checkpoint thread
+        
+        Args:
+            interval: Seconds between idle checks
+            idle_after: Seconds without a commit before the database counts as idle
+        """
+        if self.checkpoint_scheduler and self.checkpoint_scheduler.is_alive():
+            return self.checkpoint_scheduler
+        self.checkpoint_scheduler = CheckpointScheduler(self, interval, idle_after)
+        self.checkpoint_scheduler.start()
+        return self.checkpoint_scheduler
+    
+    def stop_checkpoint_scheduler(self):
+        """Stop the background WAL checkpoint thread if running"""
+        if self.checkpoint_scheduler:
+            self.checkpoint_scheduler.stop()
+            self.checkpoint_scheduler = None
+    
+    def release_connection(self):
+        """Close the calling thread's connection
+        
+        Worker threads should call this when they finish; the Tk thread's
+        connection is closed by close().
+        """
+        self._local.cursor = None
+        self.pool.release()
+    
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Close all database connections"""
+        self.stop_checkpoint_scheduler()
+        self._local.cursor = None
+        self.pool.close_all()
     
     def backup_database(self, backup_path):
         """Create a backup of the database"""
@@ -178,142 +664,32 @@ class DBHandler:
     def restore_database(self, backup_path):
         """Restore database from backup"""
         try:
+            # Keep the checkpoint thread running across the restore
+            scheduler = self.checkpoint_scheduler
+            
             # Close existing connection
             self.close()
             
             # Open backup database
             backup_conn = sqlite3.connect(backup_path)
             
-            # Connect to the target database
-            self.conn = sqlite3.connect(self.db_path)
-            
-            # Restore from backup
+            # Restore from backup into a fresh connection to the target database
             backup_conn.backup(self.conn)
             
             # Close backup connection
             backup_conn.close()
             
-            # Reinitialize cursor
-            self.cursor = self.conn.cursor()
+            self._transaction_depth = 0
+            
+            # Backups taken by older versions may need upgrading
+            run_migrations(self)
+            self.catalog.invalidate()
+            self.invoice_assembler.invalidate_settings()
+            
+            if scheduler:
+                self.start_checkpoint_scheduler(scheduler.interval, scheduler.idle_after)
             
             return True
         except sqlite3.Error as e:
             print(f"Restore error: {e}")
             return False
-            
-    def _check_and_update_schema(self):
-        """Check for required schema updates and apply them"""
-        try:
-            # Get the list of columns in the sales table
-            columns_info = self.fetchall("PRAGMA table_info(sales)")
-            column_names = [col[1] for col in columns_info]
-            
-            # Check if cgst, sgst columns exist in sales table
-            if 'cgst' not in column_names:
-                print("Adding cgst column to sales table...")
-                self.execute("ALTER TABLE sales ADD COLUMN cgst REAL DEFAULT 0")
-            
-            if 'sgst' not in column_names:
-                print("Adding sgst column to sales table...")
-                self.execute("ALTER TABLE sales ADD COLUMN sgst REAL DEFAULT 0")
-            
-            # Get the list of columns in the sale_items table
-            columns_info = self.fetchall("PRAGMA table_info(sale_items)")
-            column_constraints = {col[1]: col[3] for col in columns_info}  # col[3] is NOT NULL constraint (0 or 1)
-            
-            # Check if important tables exist
-            tables = self.fetchall("SELECT name FROM sqlite_master WHERE type='table'")
-            table_names = [table[0] for table in tables]
-            
-            # Check for suspended_bills table
-            if 'suspended_bills' not in table_names:
-                print("Creating suspended_bills table...")
-                self.execute("""
-                    CREATE TABLE suspended_bills (
-                        id INTEGER PRIMARY KEY,
-                        customer_id INTEGER NOT NULL,
-                        bill_data TEXT NOT NULL,
-                        discount REAL DEFAULT 0,
-                        discount_type TEXT DEFAULT 'amount',
-                        notes TEXT,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (customer_id) REFERENCES customers(id)
-                    )
-                """)
-            
-            # Check for categories table
-            if 'categories' not in table_names:
-                print("Creating categories table...")
-                self.execute(DB_SCHEMA["categories"])
-                # Insert initial data
-                if "categories" in INITIAL_DATA:
-                    for row in INITIAL_DATA["categories"]:
-                        placeholders = ", ".join(["?"] * len(row))
-                        columns = ", ".join(row.keys())
-                        sql = f"INSERT INTO categories ({columns}) VALUES ({placeholders})"
-                        self.execute(sql, list(row.values()))
-                    print("Added initial category data")
-            
-            # Check for hsn_codes table
-            if 'hsn_codes' not in table_names:
-                print("Creating hsn_codes table...")
-                self.execute(DB_SCHEMA["hsn_codes"])
-                # Insert initial data
-                if "hsn_codes" in INITIAL_DATA:
-                    for row in INITIAL_DATA["hsn_codes"]:
-                        placeholders = ", ".join(["?"] * len(row))
-                        columns = ", ".join(row.keys())
-                        sql = f"INSERT INTO hsn_codes ({columns}) VALUES ({placeholders})"
-                        self.execute(sql, list(row.values()))
-                    print("Added initial HSN codes data")
-            
-            # Fix tax_rate references in sale_items to be consistent with the rest of the app
-            # which uses tax_percentage naming convention
-            columns_info = self.fetchall("PRAGMA table_info(sale_items)")
-            column_names = [col[1] for col in columns_info]
-            
-            if 'tax_rate' in column_names and 'tax_percentage' not in column_names:
-                print("Updating sale_items table: renaming tax_rate to tax_percentage...")
-                # SQLite doesn't support direct column renaming, so we need to create a temporary table
-                self.execute("ALTER TABLE sale_items RENAME TO sale_items_old")
-                
-                # Create new table with correct column name
-                self.execute("""
-                    CREATE TABLE sale_items (
-                        id INTEGER PRIMARY KEY,
-                        sale_id INTEGER NOT NULL,
-                        product_id INTEGER,
-                        product_name TEXT NOT NULL,
-                        hsn_code TEXT,
-                        quantity INTEGER NOT NULL,
-                        price REAL NOT NULL,
-                        discount_percent REAL DEFAULT 0,
-                        tax_percentage REAL DEFAULT 0,
-                        tax_amount REAL DEFAULT 0,
-                        total REAL NOT NULL,
-                        FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE,
-                        FOREIGN KEY (product_id) REFERENCES products(id)
-                    )
-                """)
-                
-                # Copy data from old table to new table
-                self.execute("""
-                    INSERT INTO sale_items (id, sale_id, product_id, product_name, hsn_code, 
-                                            quantity, price, discount_percent, tax_percentage, 
-                                            tax_amount, total)
-                    SELECT id, sale_id, product_id, product_name, hsn_code, 
-                           quantity, price, discount_percent, tax_rate, 
-                           tax_amount, total
-                    FROM sale_items_old
-                """)
-                
-                # Drop old table
-                self.execute("DROP TABLE sale_items_old")
-                print("Successfully renamed tax_rate to tax_percentage in sale_items table")
-            
-            # Commit all schema changes
-            self.commit()
-            print("Schema update completed successfully")
-        except sqlite3.Error as e:
-            print(f"Schema update error: {e}")
-            self.rollback()
@@ -0,0 +1,210 @@
+"""
+Invoice data assembler for POS system
+Builds the payload the invoice generators print from a saved invoice
+"""
+
+import datetime
+import threading
+
+from utils.cart_calculator import CartCalculator, tax_breakdown
+
+HEADER_QUERY = """
+    SELECT i.invoice_number, i.invoice_date, i.subtotal, i.discount_amount, i.total_amount,
+           i.payment_method, i.payment_status, COALESCE(NULLIF(i.upi_reference, ''), i.credit_reference),
+           i.cash_amount, i.upi_amount, i.upi_reference, i.credit_amount,
+           c.name, c.phone, c.address, c.village, c.gstin, c.email
+    FROM invoices i
+    LEFT JOIN customers c ON c.id = i.customer_id
+    WHERE i.id = ?
+"""
+
+# The batch printed on a line is the one recorded on the line, else the first
+# batch checkout took stock from (its SALE movement), else the product's
+# earliest-expiring batch in stock
+ITEMS_QUERY = """
+    SELECT ii.id, ii.product_id, COALESCE(ii.product_name, p.name),
+           COALESCE(NULLIF(ii.hsn_code, ''), p.hsn_code),
+           ii.quantity, ii.price_per_unit, ii.discount_percentage,
+           ii.tax_percentage, ii.tax_amount, ii.total_price,
+           p.manufacturer, p.unit,
+           COALESCE(NULLIF(ii.batch_number, ''), b.batch_number), b.expiry_date
+    FROM invoice_items ii
+    LEFT JOIN products p ON p.id = ii.product_id
+    LEFT JOIN batches b ON b.id = COALESCE(
+        (SELECT id FROM batches
+         WHERE product_id = ii.product_id AND batch_number = NULLIF(ii.batch_number, '')
+         LIMIT 1),
+        (SELECT batch_id FROM inventory_movements
+         WHERE reference_id = ii.id AND movement_type = 'SALE'
+         ORDER BY id LIMIT 1),
+        (SELECT id FROM batches
+         WHERE product_id = ii.product_id AND quantity > 0
+         ORDER BY expiry_date LIMIT 1))
+    WHERE ii.invoice_id = ?
+    ORDER BY ii.id
+"""
+
+PAYMENTS_QUERY = """
+    SELECT amount, payment_method, payment_date, reference_number
+    FROM customer_payments
+    WHERE invoice_id = ?
+    ORDER BY payment_date, created_at
+"""
+
+# Only invoices with money still owed print their payment record
+OWING_STATUSES = ("UNPAID", "PARTIALLY_PAID")
+
+# Settings keys the invoice generators know by a shorter name
+STORE_INFO_KEYS = {
+    "name": "shop_name",
+    "address": "shop_address",
+    "phone": "shop_phone",
+    "gstin": "shop_gst",
+    "email": "shop_email",
+    "laid_no": "shop_laid_no",
+    "lcsd_no": "shop_lcsd_no",
+    "lfrd_no": "shop_lfrd_no",
+    "state_name": "state_name",
+    "state_code": "state_code",
+    "terms_conditions": "terms_conditions",
+}
+
+def format_invoice_date(value):
+    """(date, time) as printed on the invoice, e.g. ("01/04/2025", "10:30 AM")"""
+    try:
+        when = datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        when = datetime.datetime.now()
+    return when.strftime('%d/%m/%Y'), when.strftime('%I:%M %p')
+
+class InvoiceAssembler:
+    """Builds invoice data for a saved invoice in a fixed number of queries
+
+    One query reads the invoice with its customer and one reads its lines with
+    their product and batch details. Invoices that are still owed money need a
+    third, for the payments made so far. Shop settings come from a snapshot
+    loaded on first use; whatever saves shop settings must call
+    invalidate_settings().
+
+    The result is the dict utils.pdf_invoice_generator prints, so checkout,
+    sales history and bulk regeneration all print the same thing. It carries
+    the settings snapshot under "settings", which spares the generator from
+    reading them again.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._settings = None
+        self._lock = threading.Lock()
+
+    def invalidate_settings(self):
+        """Reload shop settings on the next assemble()"""
+        with self._lock:
+            self._settings = None
+
+    def settings(self):
+        """Snapshot of the settings table as a dict"""
+        with self._lock:
+            if self._settings is None:
+                self._settings = dict(self.db.fetchall("SELECT key, value FROM settings"))
+            return self._settings
+
+    def store_info(self):
+        """Shop details under the names the invoice generators use"""
+        settings = self.settings()
+        return {name: settings[key] for name, key in STORE_INFO_KEYS.items() if settings.get(key)}
+
+    def assemble(self, invoice_id):
+        """
+        Invoice data for one saved invoice
+
+        Args:
+            invoice_id: Invoice to assemble
+
+        Returns:
+            dict: Invoice data for the invoice generators
+
+        Raises:
+            LookupError: If the invoice does not exist or has no items
+        """
+        header = self.db.fetchone(HEADER_QUERY, (invoice_id,))
+        if not header:
+            raise LookupError(f"Invoice {invoice_id} not found")
+        (invoice_number, invoice_date, subtotal, discount, total, method, status, reference,
+         cash_amount, upi_amount, upi_reference, credit_amount,
+         name, phone, address, village, gstin, email) = header
+
+        rows = self.db.fetchall(ITEMS_QUERY, (invoice_id,))
+        if not rows:
+            raise LookupError(f"Invoice {invoice_number} has no items")
+
+        items = []
+        for (line_id, product_id, product_name, hsn_code, quantity, price, discount_percent,
+             tax_percentage, tax_amount, line_total, manufacturer, unit, batch_no, expiry) in rows:
+            items.append({
+                "product_id": product_id,
+                "name": product_name or "Unknown Product",
+                "hsn_code": hsn_code or "-",
+                "quantity": quantity or 0,
+                "price": price or 0,
+                "discount": discount_percent or 0,
+                "tax_percentage": tax_percentage or 0,
+                "tax_amount": tax_amount or 0,
+                "total": line_total or 0,
+                "manufacturer": manufacturer or "",
+                "unit": unit or "pc",
+                "batch_no": batch_no or "",
+                "expiry_date": expiry or "",
+            })
+
+        date, time = format_invoice_date(invoice_date)
+        payment = {
+            "subtotal": subtotal or 0,
+            "discount": discount or 0,
+            "total": total or 0,
+            "method": method or "CASH",
+            "status": status or "PAID",
+            "reference": reference or "",
+        }
+        # Split GST out of the saved lines the same way the cart did
+        calculator = CartCalculator()
+        calculator.reset((row[0], row[9], row[7]) for row in rows)
+        payment.update(tax_breakdown(calculator.totals(discount or 0)))
+
+        if payment["method"] == "SPLIT":
+            payment["split"] = {
+                "cash_amount": cash_amount or 0,
+                "upi_amount": upi_amount or 0,
+                "upi_reference": upi_reference or "",
+                "credit_amount": credit_amount or 0,
+            }
+        if payment["status"] in OWING_STATUSES:
+            payments = self.db.fetchall(PAYMENTS_QUERY, (invoice_id,))
+            if payments:
+                payment["payments"] = [{
+                    "amount": amount or 0,
+                    "method": payment_method or "Unknown",
+                    "date": payment_date or "Unknown date",
+                    "reference": reference_number or "",
+                    "time": "",
+                    "depositor": "Customer",
+                } for amount, payment_method, payment_date, reference_number in payments]
+
+        return {
+            "invoice_id": invoice_id,
+            "invoice_number": invoice_number,
+            "date": date,
+            "time": time,
+            "store_info": self.store_info(),
+            "settings": self.settings(),
+            "customer": {
+                "name": name or "Walk-in Customer",
+                "phone": phone or "",
+                "address": address or "",
+                "village": village or "",
+                "gstin": gstin or "",
+                "email": email or "",
+            },
+            "items": items,
+            "payment": payment,
+        }
@@ -0,0 +1,450 @@
+"""
+Versioned schema migrations for POS system
+Upgrades existing databases step by step, tracked with PRAGMA user_version
+"""
+
+import re
+import sqlite3
+
+from database.schema import (DB_SCHEMA, DB_INDEXES, INITIAL_DATA,
+                             PRODUCT_SEARCH_COLUMNS, PRODUCT_SEARCH_INDEX,
+                             CUSTOMER_SEARCH_INDEX, CUSTOMER_FTS_COLUMNS, CUSTOMER_FTS_INDEX)
+
+# Invoice numbers look like 24-25/AGT-001: financial year, store prefix, running number
+INVOICE_NUMBER_PATTERN = re.compile(r"^(\d{2}-\d{2})/(.+)-(\d+)$")
+
+def _table_names(db):
+    """Return the set of table names in the database"""
+    rows = db.fetchall("SELECT name FROM sqlite_master WHERE type='table'")
+    return {row[0] for row in rows}
+
+def _column_names(db, table):
+    """Return the list of column names of a table"""
+    return [col[1] for col in db.fetchall(f"PRAGMA table_info({table})")]
+
+def _add_column(db, table, column, definition):
+    """Add a column unless it already exists"""
+    if column not in _column_names(db, table):
+        print(f"Adding {column} column to {table} table...")
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _create_table(db, table, seed=True):
+    """Create a table from DB_SCHEMA unless it already exists, optionally with its initial data"""
+    if table in _table_names(db):
+        return
+    print(f"Creating {table} table...")
+    db.execute(DB_SCHEMA[table])
+    if seed and table in INITIAL_DATA:
+        db.insert_many(table, INITIAL_DATA[table])
+        print(f"Added initial {table} data")
+
+def migration_001_baseline(db):
+    """Schema fixes that were previously re-checked at every start"""
+    _add_column(db, "sales", "cgst", "REAL DEFAULT 0")
+    _add_column(db, "sales", "sgst", "REAL DEFAULT 0")
+
+    if "suspended_bills" not in _table_names(db):
+        print("Creating suspended_bills table...")
+        db.execute("""
+            CREATE TABLE suspended_bills (
+                id INTEGER PRIMARY KEY,
+                customer_id INTEGER NOT NULL,
+                bill_data TEXT NOT NULL,
+                discount REAL DEFAULT 0,
+                discount_type TEXT DEFAULT 'amount',
+                notes TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (customer_id) REFERENCES customers(id)
+            )
+        """)
+
+    _create_table(db, "categories")
+    _create_table(db, "hsn_codes")
+
+    # Checkout writes the HSN code on each invoice item
+    _add_column(db, "invoice_items", "hsn_code", "TEXT")
+
+    # The rest of the app uses tax_percentage; SQLite cannot rename columns in place
+    # on older versions, so rebuild sale_items with the new column name
+    column_names = _column_names(db, "sale_items")
+    if "tax_rate" in column_names and "tax_percentage" not in column_names:
+        print("Updating sale_items table: renaming tax_rate to tax_percentage...")
+        db.execute("ALTER TABLE sale_items RENAME TO sale_items_old")
+        db.execute("""
+            CREATE TABLE sale_items (
+                id INTEGER PRIMARY KEY,
+                sale_id INTEGER NOT NULL,
+                product_id INTEGER,
+                product_name TEXT NOT NULL,
+                hsn_code TEXT,
+                quantity INTEGER NOT NULL,
+                price REAL NOT NULL,
+                discount_percent REAL DEFAULT 0,
+                tax_percentage REAL DEFAULT 0,
+                tax_amount REAL DEFAULT 0,
+                total REAL NOT NULL,
+                FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE,
+                FOREIGN KEY (product_id) REFERENCES products(id)
+            )
+        """)
+        db.execute("""
+            INSERT INTO sale_items (id, sale_id, product_id, product_name, hsn_code,
+                                    quantity, price, discount_percent, tax_percentage,
+                                    tax_amount, total)
+            SELECT id, sale_id, product_id, product_name, hsn_code,
+                   quantity, price, discount_percent, tax_rate,
+                   tax_amount, total
+            FROM sale_items_old
+        """)
+        db.execute("DROP TABLE sale_items_old")
+
+def migration_002_payment_columns(db):
+    """Columns and tables the checkout and payment screens used to create on demand"""
+    # Split payments may leave part of the bill on credit
+    _add_column(db, "payment_splits", "credit_amount", "REAL DEFAULT 0")
+
+    # Method and reference chosen for a credit sale
+    _add_column(db, "invoices", "credit_payment_method", "TEXT")
+    _add_column(db, "invoices", "credit_reference", "TEXT")
+
+    # Older databases predate these tables
+    _create_table(db, "expenses", seed=False)
+    _create_table(db, "supplier_transactions", seed=False)
+    _create_table(db, "customer_payments", seed=False)
+    _add_column(db, "customer_payments", "depositor_name", "TEXT")
+    _add_column(db, "customer_payments", "created_at", "TEXT")
+
+def migration_003_report_indexes(db):
+    """Indexes for date-range reports, invoice lookups and FIFO batch selection"""
+    tables = _table_names(db)
+    for sql in DB_INDEXES.values():
+        # Very old databases may lack some tables; their indexes come with them later
+        table = sql.split(" ON ")[1].split("(")[0].strip()
+        if table in tables:
+            db.execute(sql)
+    # Give the planner statistics for the new indexes straight away
+    db.execute("ANALYZE")
+
+def migration_004_invoice_sequences(db):
+    """Per financial year invoice counters, seeded from the numbers already issued"""
+    _create_table(db, "invoice_sequences")
+
+    # Checkout used to take the highest number found in either table
+    last_numbers = {}
+    for table in ("sales", "invoices"):
+        for (invoice_number,) in db.fetchall(f"SELECT invoice_number FROM {table}"):
+            match = INVOICE_NUMBER_PATTERN.match(invoice_number or "")
+            if not match:
+                continue
+            key = (match.group(1), match.group(2))
+            last_numbers[key] = max(last_numbers.get(key, 0), int(match.group(3)))
+
+    for (fy, prefix), last_number in last_numbers.items():
+        db.execute("""
+            INSERT INTO invoice_sequences (fy, prefix, last_number) VALUES (?, ?, ?)
+            ON CONFLICT (fy, prefix) DO UPDATE SET last_number = MAX(last_number, excluded.last_number)
+        """, (fy, prefix, last_number))
+
+# Invoice items after the sales/invoices merge: product_id may be NULL for
+# quick-add items, and the columns only sale_items used to carry live here
+INVOICE_ITEMS_TABLE = """
+    CREATE TABLE invoice_items (
+        id INTEGER PRIMARY KEY,
+        invoice_id INTEGER NOT NULL,
+        product_id INTEGER,
+        product_name TEXT,
+        hsn_code TEXT,
+        batch_number TEXT,
+        quantity INTEGER NOT NULL,
+        price_per_unit REAL NOT NULL,
+        discount_percentage REAL DEFAULT 0,
+        tax_percentage REAL DEFAULT 0,
+        tax_amount REAL DEFAULT 0,
+        total_price REAL NOT NULL,
+        FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE,
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    )
+"""
+
+# Read-only views giving the old sales, sale_items and payment_splits shapes,
+# column for column, on top of invoices and invoice_items
+COMPATIBILITY_VIEWS = {
+    "sales": """
+        CREATE VIEW sales AS
+        SELECT id, customer_id, invoice_number, subtotal,
+               discount_amount AS discount, tax_amount AS tax, total_amount AS total,
+               payment_method AS payment_type,
+               COALESCE(NULLIF(upi_reference, ''), credit_reference) AS payment_reference,
+               invoice_date AS sale_date, NULL AS user_id,
+               tax_amount / 2 AS cgst, tax_amount / 2 AS sgst
+        FROM invoices
+    """,
+    "sale_items": """
+        CREATE VIEW sale_items AS
+        SELECT id, invoice_id AS sale_id, product_id, product_name, hsn_code, quantity,
+               price_per_unit AS price, discount_percentage AS discount_percent,
+               tax_percentage, tax_amount, total_price AS total
+        FROM invoice_items
+    """,
+    "payment_splits": """
+        CREATE VIEW payment_splits AS
+        SELECT id, id AS sale_id, cash_amount, upi_amount, upi_reference, credit_amount
+        FROM invoices
+        WHERE payment_method = 'SPLIT'
+    """,
+}
+
+def _remap_references(db, table, condition, mapping):
+    """Point table.reference_id rows matching condition from old ids to new ids in one statement"""
+    changed = [(old, new) for old, new in mapping.items() if old != new]
+    if not changed or table not in _table_names(db):
+        return
+    db.execute("CREATE TEMP TABLE id_map (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+    db.cursor.executemany("INSERT INTO id_map (old_id, new_id) VALUES (?, ?)", changed)
+    # A single UPDATE, so an id that is both an old and a new value is not mapped twice
+    db.execute(f"""
+        UPDATE {table}
+        SET reference_id = (SELECT new_id FROM id_map WHERE old_id = {table}.reference_id)
+        WHERE {condition} AND reference_id IN (SELECT old_id FROM id_map)
+    """)
+    db.execute("DROP TABLE temp.id_map")
+
+def _merge_sales_into_invoices(db):
+    """Copy sales missing from invoices, fill in item details and repoint references"""
+    invoice_ids = dict(db.fetchall("SELECT invoice_number, id FROM invoices"))
+    has_splits = "payment_splits" in _table_names(db)
+
+    sale_to_invoice = {}
+    for (sale_id, customer_id, invoice_number, subtotal, discount, tax, total,
+         payment_type, reference, sale_date) in db.fetchall("""
+            SELECT id, customer_id, invoice_number, subtotal, discount, tax, total,
+                   payment_type, payment_reference, sale_date
+            FROM sales ORDER BY id
+        """):
+        invoice_id = invoice_ids.get(invoice_number)
+        if invoice_id is None:
+            cash_amount = upi_amount = credit_amount = 0
+            if payment_type == "CASH":
+                cash_amount = total
+            elif payment_type == "UPI":
+                upi_amount = total
+            elif payment_type == "CREDIT":
+                credit_amount = total
+            elif payment_type == "SPLIT" and has_splits:
+                split = db.fetchone("""
+                    SELECT cash_amount, upi_amount, credit_amount FROM payment_splits WHERE sale_id = ?
+                """, (sale_id,))
+                if split:
+                    cash_amount, upi_amount, credit_amount = (value or 0 for value in split)
+
+            if payment_type == "CREDIT":
+                payment_status = "UNPAID"
+            elif credit_amount:
+                payment_status = "PARTIALLY_PAID"
+            else:
+                payment_status = "PAID"
+
+            invoice_id = db.insert("invoices", {
+                "invoice_number": invoice_number,
+                "customer_id": customer_id,
+                "subtotal": subtotal,
+                "discount_amount": discount or 0,
+                "tax_amount": tax or 0,
+                "total_amount": total,
+                "payment_method": payment_type,
+                "payment_status": payment_status,
+                "cash_amount": cash_amount,
+                "upi_amount": upi_amount,
+                "upi_reference": reference if payment_type in ("UPI", "SPLIT") else None,
+                "credit_amount": credit_amount,
+                "credit_reference": reference if payment_type == "CREDIT" else None,
+                "invoice_date": sale_date
+            })
+        sale_to_invoice[sale_id] = invoice_id
+
+    # Pair each sale item with the invoice item written for it, matching on product
+    # and quantity; sale items without a partner (quick-add items) are copied over
+    unmatched = {}
+    for item_id, invoice_id, product_id, quantity in db.fetchall(
+            "SELECT id, invoice_id, product_id, quantity FROM invoice_items ORDER BY id"):
+        unmatched.setdefault(invoice_id, []).append((item_id, product_id, quantity))
+
+    item_map = {}
+    for (sale_item_id, sale_id, product_id, product_name, hsn_code, quantity, price,
+         discount, tax_percentage, tax_amount, total) in db.fetchall("""
+            SELECT id, sale_id, product_id, product_name, hsn_code, quantity, price,
+                   discount_percent, tax_percentage, tax_amount, total
+            FROM sale_items ORDER BY id
+        """):
+        invoice_id = sale_to_invoice.get(sale_id)
+        if invoice_id is None:
+            continue
+        candidates = unmatched.get(invoice_id, [])
+        match = next((c for c in candidates if c[1] == product_id and c[2] == quantity), None)
+        if match:
+            candidates.remove(match)
+            db.execute("""
+                UPDATE invoice_items
+                SET product_name = ?, hsn_code = COALESCE(NULLIF(hsn_code, ''), ?), tax_amount = ?
+                WHERE id = ?
+            """, (product_name, hsn_code, tax_amount or 0, match[0]))
+            item_map[sale_item_id] = match[0]
+        else:
+            item_map[sale_item_id] = db.insert("invoice_items", {
+                "invoice_id": invoice_id,
+                "product_id": product_id,
+                "product_name": product_name,
+                "hsn_code": hsn_code,
+                "quantity": quantity,
+                "price_per_unit": price,
+                "discount_percentage": discount or 0,
+                "tax_percentage": tax_percentage or 0,
+                "tax_amount": tax_amount or 0,
+                "total_price": total
+            })
+
+    # Checkout referenced the sale and sale item ids; point at the invoice rows instead
+    _remap_references(db, "customer_transactions", "transaction_type = 'CREDIT_SALE'", sale_to_invoice)
+    _remap_references(db, "inventory_movements", "movement_type = 'SALE'", item_map)
+
+def migration_005_single_invoice_model(db):
+    """Make invoices/invoice_items the only sale record; sales and friends become views"""
+    # Older invoices tables may predate some columns the merge and the views use
+    for column, definition in (("discount_amount", "REAL DEFAULT 0"), ("tax_amount", "REAL DEFAULT 0"),
+                               ("payment_method", "TEXT"), ("payment_status", "TEXT DEFAULT 'PAID'"),
+                               ("cash_amount", "REAL DEFAULT 0"), ("upi_amount", "REAL DEFAULT 0"),
+                               ("upi_reference", "TEXT"), ("credit_amount", "REAL DEFAULT 0"),
+                               ("file_path", "TEXT"), ("notes", "TEXT")):
+        _add_column(db, "invoices", column, definition)
+
+    # Rebuild invoice_items with a nullable product_id and the sale_items-only columns
+    print("Rebuilding invoice_items table...")
+    old_columns = _column_names(db, "invoice_items")
+    db.execute("ALTER TABLE invoice_items RENAME TO invoice_items_old")
+    db.execute(INVOICE_ITEMS_TABLE)
+    columns = ", ".join(col for col in _column_names(db, "invoice_items") if col in old_columns)
+    db.execute(f"INSERT INTO invoice_items ({columns}) SELECT {columns} FROM invoice_items_old")
+    db.execute("DROP TABLE invoice_items_old")
+    db.execute(DB_INDEXES["idx_invoice_items_invoice"])
+    db.execute("""
+        UPDATE invoice_items
+        SET product_name = (SELECT name FROM products WHERE products.id = invoice_items.product_id)
+        WHERE product_name IS NULL
+    """)
+
+    tables = _table_names(db)
+    if "sales" in tables and "sale_items" in tables:
+        print("Merging sales into invoices...")
+        _merge_sales_into_invoices(db)
+
+    # Items only ever written to invoice_items had no tax amount; derive it the
+    # way invoice regeneration used to
+    db.execute("""
+        UPDATE invoice_items SET tax_amount = ROUND(total_price * tax_percentage / 100, 2)
+        WHERE COALESCE(tax_amount, 0) = 0 AND tax_percentage > 0
+    """)
+
+    # Children before parents, so dropping never trips a foreign key
+    for table in ("payment_splits", "sale_items", "sales"):
+        if table in _table_names(db):
+            db.execute(f"DROP TABLE {table}")
+    for view, sql in COMPATIBILITY_VIEWS.items():
+        db.execute(f"DROP VIEW IF EXISTS {view}")
+        db.execute(sql)
+
+def fts5_trigram_supported(db):
+    """True if this SQLite build can create the products_fts index"""
+    # The trigram tokenizer arrived in SQLite 3.34
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    return bool(db.fetchone("SELECT sqlite_compileoption_used('ENABLE_FTS5')")[0])
+
+def migration_006_product_search(db):
+    """FTS5 trigram index over products, kept in sync by triggers"""
+    if "products_fts" in _table_names(db):
+        return
+    # Search reads every one of these columns, so very old tables need them all
+    for column in PRODUCT_SEARCH_COLUMNS:
+        _add_column(db, "products", column, "TEXT")
+    if not fts5_trigram_supported(db):
+        # database.product_search falls back to a table scan without the index
+        print("SQLite has no FTS5 trigram support; product search will not be indexed")
+        return
+    print("Building product search index...")
+    for sql in PRODUCT_SEARCH_INDEX:
+        db.execute(sql)
+
+def migration_007_product_barcodes(db):
+    """Alternate barcodes per product, resolved by the sales screen's scan input"""
+    _create_table(db, "product_barcodes")
+    db.execute(DB_INDEXES["idx_product_barcodes_product"])
+
+def migration_008_customer_search(db):
+    """Normalised name and phone columns, their indexes and an FTS5 index for customer lookup"""
+    _create_table(db, "customers")
+    _add_column(db, "customers", "name_normalized", "TEXT")
+    _add_column(db, "customers", "phone_digits", "TEXT")
+    for column in CUSTOMER_FTS_COLUMNS:
+        _add_column(db, "customers", column, "TEXT")
+    for sql in CUSTOMER_SEARCH_INDEX:
+        db.execute(sql)
+
+    if "customers_fts" in _table_names(db) or not fts5_trigram_supported(db):
+        return
+    print("Building customer search index...")
+    for sql in CUSTOMER_FTS_INDEX:
+        db.execute(sql)
+
+def migration_009_movement_reference_index(db):
+    """Index inventory movements by the invoice line they belong to, for printing its batch"""
+    _create_table(db, "inventory_movements")
+    db.execute(DB_INDEXES["idx_inventory_movements_reference"])
+
+# Ordered list of (version, description, function).
+# Append new steps with the next number; never renumber or edit a released step.
+MIGRATIONS = [
+    (1, "baseline schema fixes", migration_001_baseline),
+    (2, "payment columns and tables", migration_002_payment_columns),
+    (3, "report and lookup indexes", migration_003_report_indexes),
+    (4, "invoice number sequences", migration_004_invoice_sequences),
+    (5, "single invoice model", migration_005_single_invoice_model),
+    (6, "product search index", migration_006_product_search),
+    (7, "product barcodes", migration_007_product_barcodes),
+    (8, "customer search index", migration_008_customer_search),
+    (9, "inventory movement reference index", migration_009_movement_reference_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(db):
+    """Return the schema version recorded in the database"""
+    row = db.fetchone("PRAGMA user_version")
+    return row[0] if row else 0
+
+def run_migrations(db):
+    """
+    Apply every migration newer than the database's user_version
+
+    All pending steps and the version bump run in one transaction, so a
+    failure leaves the database exactly as it was.
+
+    Args:
+        db: DBHandler instance
+
+    Returns:
+        int: Schema version after migrating
+    """
+    current = get_schema_version(db)
+    pending = [step for step in MIGRATIONS if step[0] > current]
+    if not pending:
+        return current
+
+    with db.transaction():
+        for version, description, migrate in pending:
+            print(f"Applying schema migration {version}: {description}")
+            migrate(db)
+        # PRAGMA does not accept bound parameters
+        db.execute(f"PRAGMA user_version = {int(pending[-1][0])}")
+
+    print(f"Database schema upgraded from version {current} to {pending[-1][0]}")
+    return pending[-1][0]
@@ -0,0 +1,80 @@
+"""
+Product search for POS system
+Ranked search over products, served by the products_fts index when it exists
+"""
+
+from database.schema import PRODUCT_SEARCH_COLUMNS
+
+# Trigram MATCH needs at least three characters; shorter terms use the scan
+MIN_FTS_TERM = 3
+
+# Search-as-you-type never needs more rows than a list can usefully show
+DEFAULT_LIMIT = 500
+
+# Exact code (or name) first, then codes and names starting with the term,
+# then everything else that merely contains it
+RANK_SQL = """
+    CASE WHEN LOWER(p.product_code) = ?1 OR LOWER(p.name) = ?1 THEN 0
+         WHEN instr(LOWER(p.product_code), ?1) = 1 OR instr(LOWER(p.name), ?1) = 1 THEN 1
+         ELSE 2 END
+"""
+
+# bm25 weights in PRODUCT_SEARCH_COLUMNS order: a hit in the name or code
+# counts for more than one in the description, manufacturer, category or vendor
+COLUMN_WEIGHTS = {"name": 10.0, "product_code": 10.0, "description": 2.0}
+
+FTS_QUERY = f"""
+    SELECT p.id
+    FROM products_fts f
+    JOIN products p ON p.id = f.rowid
+    WHERE products_fts MATCH ?2
+    ORDER BY {RANK_SQL},
+             bm25(products_fts, {", ".join(str(COLUMN_WEIGHTS.get(col, 1.0)) for col in PRODUCT_SEARCH_COLUMNS)}),
+             p.name
+    LIMIT ?3
+"""
+
+SCAN_QUERY = f"""
+    SELECT p.id
+    FROM products p
+    WHERE {" OR ".join(f"instr(LOWER(p.{col}), ?1) > 0" for col in PRODUCT_SEARCH_COLUMNS)}
+    ORDER BY {RANK_SQL}, p.name
+    LIMIT ?3
+"""
+
+def has_search_index(db):
+    """True if the database has the products_fts index"""
+    return db.fetchone(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    )[0] > 0
+
+def fts_phrase(term):
+    """Quote a search term as a single FTS5 phrase, so its punctuation is not syntax"""
+    return '"' + term.replace('"', '""') + '"'
+
+def search_product_ids(db, term, limit=DEFAULT_LIMIT):
+    """
+    Return the ids of products matching a search term, best match first
+
+    Matches the term anywhere in the name, code, description, manufacturer,
+    category or vendor, case-insensitively. Uses the FTS5 index when the
+    database has one and the term is long enough, otherwise a table scan
+    with the same ranking.
+
+    Args:
+        db: DBHandler instance
+        term: Text typed by the user
+        limit: Maximum number of ids to return
+
+    Returns:
+        list: Product ids, ranked exact code > prefix > substring
+    """
+    term = term.strip().lower()
+    if not term:
+        return []
+
+    if len(term) >= MIN_FTS_TERM and has_search_index(db):
+        rows = db.fetchall(FTS_QUERY, (term, fts_phrase(term), limit))
+    else:
+        rows = db.fetchall(SCAN_QUERY, (term, None, limit))
+    return [row[0] for row in rows]
@@ -0,0 +1,178 @@
+"""
+Query profiler for POS system
+Opt-in timing of DBHandler statements, grouped by the UI action that ran them
+"""
+
+import re
+import json
+import time
+import datetime
+import functools
+import threading
+from contextlib import contextmanager
+
+# Statements worth asking the planner about; PRAGMA, BEGIN etc. are skipped
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+def normalize_sql(query):
+    """Collapse whitespace so the same statement always gets the same key"""
+    return re.sub(r"\s+", " ", query).strip()
+
+def param_shape(params):
+    """Describe the parameters by type only, e.g. "(int, str)", never by value"""
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+class QueryProfiler:
+    """Collects per-statement timings and per-action statement counts
+
+    Statements are keyed by their normalized SQL text. Any statement slower
+    than slow_ms has its EXPLAIN QUERY PLAN captured once. Actions are named
+    scopes (checkout, load_tax_report, ...) that count the statements run
+    inside them, which makes N+1 query patterns stand out.
+    """
+
+    def __init__(self, slow_ms=50):
+        self.slow_ms = slow_ms
+        self.started = datetime.datetime.now()
+        self.statements = {}
+        self.actions = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _action_stack(self):
+        stack = getattr(self._local, "actions", None)
+        if stack is None:
+            stack = self._local.actions = []
+        return stack
+
+    @contextmanager
+    def action(self, name):
+        """Attribute every statement run inside the block to the named action"""
+        stack = self._action_stack()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                stats = self._action_stats(name)
+                stats["runs"] += 1
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def _action_stats(self, name):
+        stats = self.actions.get(name)
+        if stats is None:
+            stats = self.actions[name] = {
+                "runs": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "statements": 0, "db_ms": 0.0, "by_sql": {}
+            }
+        return stats
+
+    def record(self, query, params, elapsed_ms, rows=None, conn=None):
+        """Record one statement
+
+        Args:
+            query: SQL text as executed
+            params: Bound parameters (only their types are kept)
+            elapsed_ms: Execution time including fetching rows
+            rows: Number of rows returned, if known
+            conn: Connection to run EXPLAIN QUERY PLAN on for slow statements
+        """
+        sql = normalize_sql(query)
+        plan = None
+
+        with self._lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = {
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                    "param_shapes": [], "slow_count": 0, "plan": None
+                }
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if rows is not None:
+                stats["rows"] += rows
+            shape = param_shape(params)
+            if shape not in stats["param_shapes"]:
+                stats["param_shapes"].append(shape)
+
+            is_slow = elapsed_ms >= self.slow_ms
+            if is_slow:
+                stats["slow_count"] += 1
+            need_plan = is_slow and stats["plan"] is None and conn is not None \
+                and sql.upper().startswith(EXPLAINABLE)
+
+            # Count the statement against every enclosing action
+            for name in set(self._action_stack()):
+                action_stats = self._action_stats(name)
+                action_stats["statements"] += 1
+                action_stats["db_ms"] += elapsed_ms
+                action_stats["by_sql"][sql] = action_stats["by_sql"].get(sql, 0) + 1
+
+        if need_plan:
+            plan = self._explain(conn, query, params)
+            with self._lock:
+                stats["plan"] = plan
+
+    def _explain(self, conn, query, params):
+        """Return the query plan as a list of detail strings"""
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+            return [row[-1] for row in rows]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+
+    def report(self):
+        """Return the collected data as a JSON-serialisable dict, slowest statements first"""
+        with self._lock:
+            statements = [
+                dict(sql=sql, avg_ms=stats["total_ms"] / stats["count"], **stats)
+                for sql, stats in self.statements.items()
+            ]
+            actions = {
+                name: dict(stats, by_sql=dict(sorted(stats["by_sql"].items(),
+                                                     key=lambda item: -item[1])))
+                for name, stats in self.actions.items()
+            }
+        statements.sort(key=lambda stats: -stats["total_ms"])
+        return {
+            "started": self.started.strftime("%Y-%m-%d %H:%M:%S"),
+            "generated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "slow_ms": self.slow_ms,
+            "statements": statements,
+            "actions": actions,
+        }
+
+    def dump(self, path):
+        """Write report() to a JSON file"""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def reset(self):
+        """Discard everything collected so far"""
+        with self._lock:
+            self.statements.clear()
+            self.actions.clear()
+            self.started = datetime.datetime.now()
+
+def profiled(name):
+    """Decorator for frame methods: run the method as a named profiler action
+
+    The frame must reach the database through self.controller.db.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.controller.db.action(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
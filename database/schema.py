@@ -276,9 +276,155 @@ DB_SCHEMA = {
             FOREIGN KEY (customer_id) REFERENCES customers(id),
             FOREIGN KEY (invoice_id) REFERENCES invoices(id)
         )
+    """,
+    
+    "invoice_sequences": """
+        CREATE TABLE invoice_sequences (
+            fy TEXT NOT NULL,
+            prefix TEXT NOT NULL,
+            last_number INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (fy, prefix)
+        )
+    """,
+    
+    "product_barcodes": """
+        CREATE TABLE product_barcodes (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            barcode TEXT UNIQUE NOT NULL,
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+        )
     """
 }
 
+# Secondary indexes, created by the schema migrations.
+# Date-range reports rely on these together with the bare-column range
+# predicates built by utils.helpers.date_range_clause.
+DB_INDEXES = {
+    "idx_invoices_date": "CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)",
+    "idx_invoices_customer_date": "CREATE INDEX IF NOT EXISTS idx_invoices_customer_date ON invoices(customer_id, invoice_date)",
+    "idx_invoice_items_invoice": "CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items(invoice_id)",
+    "idx_sale_items_sale": "CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id)",
+    "idx_batches_product_expiry": "CREATE INDEX IF NOT EXISTS idx_batches_product_expiry ON batches(product_id, expiry_date)",
+    "idx_inventory_movements_product_date": "CREATE INDEX IF NOT EXISTS idx_inventory_movements_product_date ON inventory_movements(product_id, movement_date)",
+    "idx_customer_payments_invoice": "CREATE INDEX IF NOT EXISTS idx_customer_payments_invoice ON customer_payments(invoice_id)",
+    "idx_expenses_date": "CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(expense_date)",
+    "idx_customer_transactions_customer_date": "CREATE INDEX IF NOT EXISTS idx_customer_transactions_customer_date ON customer_transactions(customer_id, transaction_date)",
+    "idx_supplier_transactions_vendor_date": "CREATE INDEX IF NOT EXISTS idx_supplier_transactions_vendor_date ON supplier_transactions(vendor_id, transaction_date)",
+    "idx_product_barcodes_product": "CREATE INDEX IF NOT EXISTS idx_product_barcodes_product ON product_barcodes(product_id)",
+    "idx_inventory_movements_reference": "CREATE INDEX IF NOT EXISTS idx_inventory_movements_reference ON inventory_movements(reference_id)"
+}
+
+# Full-text index over products for search-as-you-type, created by schema
+# migration 6 when SQLite has FTS5. The trigram tokenizer matches any
+# substring of three or more characters, like the LIKE '%term%' it replaces.
+# External content keeps a single copy of the text; the triggers keep it in sync.
+PRODUCT_SEARCH_COLUMNS = ("name", "product_code", "description", "manufacturer", "category", "vendor")
+
+PRODUCT_SEARCH_INDEX = [
+    f"""
+        CREATE VIRTUAL TABLE products_fts USING fts5(
+            {", ".join(PRODUCT_SEARCH_COLUMNS)},
+            content='products', content_rowid='id', tokenize='trigram'
+        )
+    """,
+    f"""
+        CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, {", ".join(PRODUCT_SEARCH_COLUMNS)})
+            VALUES (new.id, {", ".join("new." + col for col in PRODUCT_SEARCH_COLUMNS)});
+        END
+    """,
+    f"""
+        CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {", ".join(PRODUCT_SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {", ".join("old." + col for col in PRODUCT_SEARCH_COLUMNS)});
+        END
+    """,
+    f"""
+        CREATE TRIGGER products_fts_update AFTER UPDATE OF id, {", ".join(PRODUCT_SEARCH_COLUMNS)} ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {", ".join(PRODUCT_SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {", ".join("old." + col for col in PRODUCT_SEARCH_COLUMNS)});
+            INSERT INTO products_fts(rowid, {", ".join(PRODUCT_SEARCH_COLUMNS)})
+            VALUES (new.id, {", ".join("new." + col for col in PRODUCT_SEARCH_COLUMNS)});
+        END
+    """,
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+def phone_key_sql(expr):
+    """SQL expression for the search key of a phone number: its last ten digits
+
+    Ten digits is a full Indian mobile number, so "+91 98765 43210" and
+    "98765-43210" get the same key and a number typed from its first digit
+    finds both.
+    """
+    for char in (" ", "-", "+", "(", ")", "."):
+        expr = f"REPLACE({expr}, '{char}', '')"
+    return f"substr({expr}, -10)"
+
+# Customer lookup, created by schema migration 8. Triggers keep the normalised
+# columns current, so indexes can serve exact, prefix and phone-suffix lookups.
+CUSTOMER_SEARCH_INDEX = [
+    f"""
+        CREATE TRIGGER IF NOT EXISTS customers_normalize_insert AFTER INSERT ON customers BEGIN
+            UPDATE customers
+            SET name_normalized = LOWER(TRIM(new.name)),
+                phone_digits = {phone_key_sql("COALESCE(new.phone, '')")}
+            WHERE id = new.id;
+        END
+    """,
+    f"""
+        CREATE TRIGGER IF NOT EXISTS customers_normalize_update AFTER UPDATE OF name, phone ON customers BEGIN
+            UPDATE customers
+            SET name_normalized = LOWER(TRIM(new.name)),
+                phone_digits = {phone_key_sql("COALESCE(new.phone, '')")}
+            WHERE id = new.id;
+        END
+    """,
+    f"""
+        UPDATE customers
+        SET name_normalized = LOWER(TRIM(name)),
+            phone_digits = {phone_key_sql("COALESCE(phone, '')")}
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_customers_name_normalized ON customers(name_normalized)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_phone_digits ON customers(phone_digits)",
+    # Lets the last four digits of a number find the customer without a scan
+    "CREATE INDEX IF NOT EXISTS idx_customers_phone_suffix ON customers(substr(phone_digits, -4))",
+]
+
+# Substring search over names and places, like PRODUCT_SEARCH_INDEX
+CUSTOMER_FTS_COLUMNS = ("name", "village", "address")
+
+CUSTOMER_FTS_INDEX = [
+    f"""
+        CREATE VIRTUAL TABLE customers_fts USING fts5(
+            {", ".join(CUSTOMER_FTS_COLUMNS)},
+            content='customers', content_rowid='id', tokenize='trigram'
+        )
+    """,
+    f"""
+        CREATE TRIGGER customers_fts_insert AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts(rowid, {", ".join(CUSTOMER_FTS_COLUMNS)})
+            VALUES (new.id, {", ".join("new." + col for col in CUSTOMER_FTS_COLUMNS)});
+        END
+    """,
+    f"""
+        CREATE TRIGGER customers_fts_delete AFTER DELETE ON customers BEGIN
+            INSERT INTO customers_fts(customers_fts, rowid, {", ".join(CUSTOMER_FTS_COLUMNS)})
+            VALUES ('delete', old.id, {", ".join("old." + col for col in CUSTOMER_FTS_COLUMNS)});
+        END
+    """,
+    f"""
+        CREATE TRIGGER customers_fts_update AFTER UPDATE OF id, {", ".join(CUSTOMER_FTS_COLUMNS)} ON customers BEGIN
+            INSERT INTO customers_fts(customers_fts, rowid, {", ".join(CUSTOMER_FTS_COLUMNS)})
+            VALUES ('delete', old.id, {", ".join("old." + col for col in CUSTOMER_FTS_COLUMNS)});
+            INSERT INTO customers_fts(rowid, {", ".join(CUSTOMER_FTS_COLUMNS)})
+            VALUES (new.id, {", ".join("new." + col for col in CUSTOMER_FTS_COLUMNS)});
+        END
+    """,
+    "INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')",
+]
+
 # Initial data to populate the database
 INITIAL_DATA = {
     "settings": [
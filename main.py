@@ -3,8 +3,10 @@
 Agritech Point of Sale System - Main Application Entry
 """
 
+import multiprocessing
 import os
 import sys
+import threading
 import tkinter as tk
 from tkinter import messagebox, PhotoImage
 
@@ -17,6 +19,7 @@ from database.db_handler import DBHandler
 from ui.login import AutoLoginFrame
 from ui.dashboard import Dashboard
 from utils.config import load_config, save_config
+from utils.invoice_cache import configure_output_cache
 from assets.styles import COLORS, FONTS, STYLES, set_theme
 
 class POSApplication(tk.Tk):
@@ -25,16 +28,34 @@ class POSApplication(tk.Tk):
     def __init__(self):
         super().__init__()
         
-        # Initialize database
-        self.db = DBHandler()
+        # Load configuration
+        self.config = load_config()
+        
+        # Initialize database with the configured connection profile
+        self.db = DBHandler(pragmas=self.config.get('db_pragmas'))
         if not self.db.is_initialized:
             messagebox.showerror("Database Error", 
                                  "Failed to initialize database. Please check permissions and disk space.")
             self.destroy()
             sys.exit(1)
-            
-        # Load configuration
-        self.config = load_config()
+        
+        # Opt-in query profiling, written out as JSON when the application exits
+        if self.config.get('db_profiling'):
+            self.db.enable_profiling(slow_ms=self.config.get('db_slow_query_ms', 50))
+        
+        # Checkpoint the WAL in the background whenever the till goes quiet
+        self.db.start_checkpoint_scheduler(
+            interval=self.config.get('db_checkpoint_interval', 60),
+            idle_after=self.config.get('db_checkpoint_idle_after', 30)
+        )
+        
+        # Tidy the invoice store in the background: file legacy invoices into
+        # month folders and pack months that have closed
+        if self.config.get('invoice_pack_closed_months', True):
+            threading.Thread(target=self.pack_invoices, name="invoice-pack", daemon=True).start()
+        
+        # Size cap of the rendered invoice cache; 0 turns it off
+        configure_output_cache(max_bytes=int(self.config.get('invoice_cache_mb', 100)) * 1024 * 1024)
         
         # Apply theme based on configuration
         theme = self.config.get('app_theme', 'light')
@@ -79,6 +100,21 @@ class POSApplication(tk.Tk):
         self.frames["dashboard"] = dashboard
         dashboard.grid(row=0, column=0, sticky="nsew")
         
+    def pack_invoices(self):
+        """Shard legacy invoice files and pack closed months; runs on a background thread"""
+        from utils.invoice_store import invoice_store
+        try:
+            store = invoice_store()
+            moved = store.shard_existing(self.db)
+            summary = store.pack_closed_months(keep_months=self.config.get('invoice_pack_keep_months', 1))
+            if moved or summary["files"]:
+                print(f"Invoice store: moved {moved} files, packed {summary['files']} files "
+                      f"from {len(summary['months'])} months")
+        except Exception as e:
+            print(f"Error packing invoices: {e}")
+        finally:
+            self.db.release_connection()
+        
     def show_frame(self, frame_name):
         """Raise the specified frame to the top"""
         frame = self.frames.get(frame_name)
@@ -97,6 +133,22 @@ class POSApplication(tk.Tk):
         if messagebox.askyesno("Exit", "Are you sure you want to exit?"):
             # Save any pending configuration changes
             save_config(self.config)
+            # Write the query profile before the connections go away
+            if self.db.profiler:
+                try:
+                    path = self.db.profiler.dump(self.config.get('db_profile_path', 'query_profile.json'))
+                    print(f"Query profile written to {path}")
+                except Exception as e:
+                    print(f"Error writing query profile: {e}")
+            # Let queued invoices finish rendering and record their files
+            # before the connections go away
+            dashboard = self.frames.get("dashboard")
+            for frame in getattr(dashboard, "frames", {}).values():
+                if hasattr(frame, "invoice_queue"):
+                    frame.invoice_queue.stop()
+            # Refresh planner statistics and fold the WAL back into the main file
+            self.db.optimize()
+            self.db.checkpoint("TRUNCATE")
             # Close database connection
             self.db.close()
             # Destroy the tkinter root
@@ -251,6 +303,8 @@ class POSApplication(tk.Tk):
             shortcut_desc.pack(side=tk.LEFT, padx=10, pady=3, fill=tk.X, expand=True)
 
 if __name__ == "__main__":
+    # Bulk invoice regeneration starts worker processes; needed for the Windows build
+    multiprocessing.freeze_support()
     app = POSApplication()
     # Set window to start centered
     window_width = app.winfo_width()
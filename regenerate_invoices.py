@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Regenerate missing invoice PDFs from the command line
+
+Examples:
+    python regenerate_invoices.py --all
+    python regenerate_invoices.py --from 01-04-2024 --to 31-03-2025 --workers 4
+    python regenerate_invoices.py --from 01-04-2025 --to 30-04-2025 --excel april.xlsx
+    python regenerate_invoices.py --from 01-04-2025 --to 30-04-2025 --pdf april.pdf --split-pages 200
+    python regenerate_invoices.py --pack
+
+Invoices whose file is still on disk are skipped, so an interrupted run can
+be started again and carries on where it stopped. With --excel, every
+invoice in the range is exported to one workbook instead (or to one file
+each in a directory, with --separate), or with --pdf, merged into one PDF
+(split into several files of about N pages with --split-pages N). --pack
+moves old invoice files into their month folders and packs every month
+before the current one into a zip archive (see utils.invoice_store).
+"""
+import argparse
+import sys
+
+from database.db_handler import DBHandler
+from utils.config import load_config
+from utils.helpers import parse_date
+from utils.invoice_cache import configure_output_cache
+from utils.invoice_regen import INVOICES_DIR, export_excel, export_pdf, format_summary, regenerate_missing
+from utils.invoice_store import invoice_store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate missing invoice PDFs")
+    parser.add_argument("--from", dest="start_date", help="First invoice date, DD-MM-YYYY")
+    parser.add_argument("--to", dest="end_date", help="Last invoice date, DD-MM-YYYY (default: same as --from)")
+    parser.add_argument("--all", action="store_true", help="Every invoice whose file is missing")
+    parser.add_argument("--workers", type=int, help="Number of processes (default: one per CPU core)")
+    parser.add_argument("--db", default="./pos_data.db", help="Database file")
+    parser.add_argument("--dir", default=INVOICES_DIR, help="Directory for the regenerated PDFs")
+    parser.add_argument("--excel", metavar="PATH", help="Export the invoices to this Excel workbook instead")
+    parser.add_argument("--separate", action="store_true", help="With --excel, PATH is a directory for one file per invoice")
+    parser.add_argument("--pdf", metavar="PATH", help="Merge the invoices into this PDF instead")
+    parser.add_argument("--split-pages", type=int, metavar="N", help="With --pdf, start a new file every N pages")
+    parser.add_argument("--pack", action="store_true", help="Pack closed months of invoice files into zip archives")
+    args = parser.parse_args(argv)
+    if args.excel and args.pdf:
+        parser.error("give only one of --excel and --pdf")
+    if args.split_pages is not None and args.split_pages < 1:
+        parser.error("--split-pages must be at least 1")
+
+    start_date = end_date = None
+    if not args.all and not args.pack:
+        if not args.start_date:
+            parser.error("give a date range with --from/--to, or --all")
+        start_date = parse_date(args.start_date)
+        end_date = parse_date(args.end_date) if args.end_date else start_date
+        if not start_date or not end_date or end_date < start_date:
+            parser.error("dates must be DD-MM-YYYY and --to must not be before --from")
+
+    # Regenerated invoices go through the output cache sized in pos_config.json
+    configure_output_cache(max_bytes=int(load_config().get('invoice_cache_mb', 100)) * 1024 * 1024)
+
+    db = DBHandler(args.db)
+    if not db.is_initialized:
+        print(f"Could not open database {args.db}")
+        return 1
+
+    if args.pack:
+        try:
+            store = invoice_store(args.dir)
+            moved = store.shard_existing(db)
+            summary = store.pack_closed_months()
+        finally:
+            db.close()
+        print(f"Moved {moved} invoice files into month folders")
+        print(f"Packed {summary['files']} files from {len(summary['months'])} months")
+        for month in summary["months"]:
+            print(f"  {month}")
+        return 0
+
+    if args.excel or args.pdf:
+        try:
+            if args.pdf:
+                summary = export_pdf(db, start_date, end_date, args.pdf, args.split_pages)
+            else:
+                summary = export_excel(db, start_date, end_date, args.excel, one_workbook=not args.separate)
+        finally:
+            db.close()
+        print(f"Exported {summary['exported']} of {summary['selected']} invoices to {', '.join(summary['paths']) or args.pdf or args.excel}")
+        for invoice_id, invoice_number, error in summary["failed"]:
+            print(f"  {invoice_number or invoice_id}: {error}")
+        return 1 if summary["failed"] or not summary["paths"] else 0
+
+    def progress(done, total):
+        if total:
+            print(f"\rRegenerated {done} of {total} missing invoices", end="", flush=True)
+
+    try:
+        summary = regenerate_missing(db, start_date, end_date, workers=args.workers,
+                                     invoices_dir=args.dir, progress=progress)
+    finally:
+        db.close()
+
+    print()
+    print(format_summary(summary))
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Test the running cart totals used by the sales screen and checkout
+"""
+import time
+from decimal import Decimal
+
+from utils.cart_calculator import CartCalculator, split_inclusive, tax_breakdown
+
+def per_line_totals(lines, discount):
+    """The old update_totals loop: split every line after its share of the discount"""
+    subtotal = sum(total for total, _ in lines)
+    ratio = 1 - discount / subtotal
+    taxable = tax = Decimal('0')
+    for total, rate in lines:
+        line_taxable, line_tax = split_inclusive(total * ratio, rate)
+        taxable += line_taxable
+        tax += line_tax
+    return taxable, tax
+
+def test_inclusive_split():
+    """Prices include GST, so the tax comes out of the total rather than on top of it"""
+    cart = CartCalculator()
+    cart.set_line(1, Decimal('118'), 18)
+    cart.set_line(2, Decimal('112'), 12)
+
+    totals = cart.totals()
+
+    assert totals["subtotal"] == totals["total"] == Decimal('230')
+    assert totals["taxable"] == Decimal('200') and totals["tax"] == Decimal('30')
+    assert totals["cgst"] == totals["sgst"] == Decimal('15')
+    assert [(group["rate"], group["taxable"]) for group in totals["by_rate"]] == [(12, 100), (18, 100)]
+    print("✓ GST split out of inclusive totals per rate")
+
+def test_add_edit_remove():
+    """Edits and removals keep the per-rate aggregates in step with the lines"""
+    cart = CartCalculator()
+    cart.set_line(1, Decimal('100'), 18)
+    cart.set_line(2, Decimal('50'), 5)
+    cart.set_line(1, Decimal('236'), 18)
+    assert cart.subtotal == Decimal('286') and len(cart) == 2
+
+    cart.set_line(2, Decimal('50'), 18)
+    assert list(cart.groups) == [18]
+    cart.remove_line(2)
+    cart.remove_line(99)
+    assert cart.subtotal == Decimal('236') and cart.groups == {18: (Decimal('236'), 1)}
+
+    cart.remove_line(1)
+    assert cart.subtotal == 0 and not cart.groups
+    assert cart.totals()["tax"] == 0
+    print("✓ Lines added, edited and removed")
+
+def test_discount():
+    """Amount and percentage discounts are capped, and bad input counts as none"""
+    cart = CartCalculator()
+    cart.set_line(1, Decimal('118'), 18)
+    cart.set_line(2, Decimal('105'), 5)
+
+    assert cart.totals("23", "amount")["total"] == Decimal('200')
+    assert cart.totals("10", "percentage")["discount"] == Decimal('22.3')
+    assert cart.totals("1000", "amount")["total"] == 0
+    assert cart.totals("12.", "amount")["discount"] == Decimal('12')
+    assert cart.totals("abc", "amount")["discount"] == 0
+    assert cart.totals("", "percentage")["discount"] == 0
+
+    totals = cart.totals("10.50", "amount")
+    taxable, tax = per_line_totals([(Decimal('118'), 18), (Decimal('105'), 5)], Decimal('10.50'))
+    assert abs(totals["taxable"] - taxable) < Decimal('0.000001')
+    assert abs(totals["tax"] - tax) < Decimal('0.000001')
+
+    amount, line_taxable, line_tax = cart.line_split(1, totals)
+    assert amount == Decimal('118') * totals["discount_ratio"]
+    assert line_taxable + line_tax == amount
+    print("✓ Cart discount shared across rates like the per-line split")
+
+def test_rounding_and_breakdown():
+    """The payable total is rounded to the rupee and the invoice gets the same split"""
+    cart = CartCalculator()
+    cart.set_line(1, Decimal('99.60'), 18)
+
+    totals = cart.totals()
+    assert totals["rounded"] == Decimal('100')
+    assert totals["rounding_adjustment"] == Decimal('0.40')
+
+    breakdown = tax_breakdown(totals)
+    assert breakdown["cgst_rate"] == breakdown["sgst_rate"] == 9.0
+    assert abs(breakdown["taxable_value"] - 84.41) < 0.01
+    assert len(breakdown["tax_rates"]) == 1
+
+    cart.set_line(2, Decimal('10'), 5)
+    assert "cgst_rate" not in tax_breakdown(cart.totals())
+    print("✓ Rounding and invoice tax breakdown")
+
+def test_long_bill_timing():
+    """Re-totalling a 500-line bill per discount keystroke does not depend on its length"""
+    cart = CartCalculator()
+    cart.reset((line_id, Decimal('118.50') * (line_id % 7 + 1), (5, 12, 18)[line_id % 3])
+               for line_id in range(500))
+
+    start = time.perf_counter()
+    for text in ("1", "12", "12.", "12.5", "12.50"):
+        cart.totals(text, "amount")
+    elapsed = (time.perf_counter() - start) / 5
+
+    assert len(cart.groups) == 3
+    assert elapsed < 0.005, f"totals took {elapsed * 1000:.2f} ms"
+    print(f"✓ 500-line bill re-totalled in {elapsed * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    test_inclusive_split()
+    test_add_edit_remove()
+    test_discount()
+    test_rounding_and_breakdown()
+    test_long_bill_timing()
+    print("\nAll cart calculator tests passed!")
@@ -0,0 +1,164 @@
+"""
+Test the in-memory product catalog used by the sales screen
+"""
+import os
+import tempfile
+import threading
+
+from database.db_handler import DBHandler
+
+def make_db():
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_catalog.db"))
+    db.execute("DELETE FROM products")
+    db.commit()
+    return db
+
+def add_product(db, name, code, stock=0, expiry_date=None, price=100):
+    product_id = db.insert("products", {"name": name, "product_code": code, "wholesale_price": price / 2,
+                                        "selling_price": price, "hsn_code": "3808", "tax_percentage": 12})
+    batch_id = None
+    if stock:
+        batch_id = db.insert("batches", {"product_id": product_id, "batch_number": f"{code}-B1",
+                                         "quantity": stock, "expiry_date": expiry_date, "cost_price": 1})
+    return product_id, batch_id
+
+def sell(db, product_id, batch_id, quantity):
+    """Record a sale the way checkout does: batch update plus a SALE movement"""
+    with db.transaction():
+        db.execute("UPDATE batches SET quantity = quantity - ? WHERE id = ?", (quantity, batch_id))
+        db.insert("inventory_movements", {"product_id": product_id, "batch_id": batch_id,
+                                          "quantity": -quantity, "movement_type": "SALE", "reference_id": 1})
+
+def test_snapshot():
+    """The first sync loads every product with its sellable stock"""
+    db = make_db()
+    seeds, _ = add_product(db, "Seeds", "S1", stock=10)
+    add_product(db, "Expired", "E1", stock=5, expiry_date="2000-01-01")
+    add_product(db, "Neem oil", "N1")
+    
+    db.catalog.sync()
+    
+    assert [entry["name"] for entry in db.catalog.all()] == ["Expired", "Neem oil", "Seeds"]
+    assert db.catalog.get(seeds)["stock"] == 10
+    assert db.catalog.get(seeds)["tax_rate"] == 12 and db.catalog.get(seeds)["hsn_code"] == "3808"
+    assert db.catalog.stock(db.catalog.search("expired")[0]["id"]) == 0
+    assert [entry["code"] for entry in db.catalog.search("n1")] == ["N1"]
+    print("✓ Catalog snapshot loaded")
+    db.close()
+
+def test_sale_applies_delta():
+    """After a sale only the movement is read and only that product changes"""
+    db = make_db()
+    seeds, batch_id = add_product(db, "Seeds", "S1", stock=10)
+    other, _ = add_product(db, "Urea", "U1", stock=3)
+    db.catalog.sync()
+    version = db.catalog.version
+    
+    sell(db, seeds, batch_id, 4)
+    db.enable_profiling(slow_ms=1000)
+    changed = db.catalog.sync()
+    
+    assert changed == {seeds}
+    assert db.catalog.stock(seeds) == 6 and db.catalog.stock(other) == 3
+    assert db.catalog.version == version, "a stock change must not force a rebuild"
+    assert not any("GROUP BY p.id" in stats["sql"] for stats in db.profiler.report()["statements"])
+    assert db.catalog.sync() == set()
+    print("✓ Sale applied as a stock delta")
+    db.close()
+
+def test_new_products_and_invalidate():
+    """New products are picked up; edits made outside movements need invalidate()"""
+    db = make_db()
+    seeds, batch_id = add_product(db, "Seeds", "S1", stock=10)
+    db.catalog.sync()
+    
+    # A new product and a receipt for it in the same sync are not counted twice
+    urea, urea_batch = add_product(db, "Urea", "U1", stock=5)
+    db.insert("inventory_movements", {"product_id": urea, "batch_id": urea_batch, "quantity": 5,
+                                      "movement_type": "RECEIPT", "reference_id": urea_batch})
+    assert urea in db.catalog.sync()
+    assert db.catalog.stock(urea) == 5
+    
+    db.update("products", {"name": "Hybrid seeds", "selling_price": 120}, f"id = {seeds}")
+    db.update("batches", {"quantity": 7}, f"id = {batch_id}")
+    version = db.catalog.version
+    db.catalog.invalidate(seeds)
+    assert db.catalog.sync() == {seeds}
+    assert db.catalog.get(seeds)["name"] == "Hybrid seeds" and db.catalog.stock(seeds) == 7
+    assert db.catalog.version > version
+    
+    db.delete("inventory_movements", f"product_id = {urea}")
+    db.delete("batches", f"id = {urea_batch}")
+    db.delete("products", f"id = {urea}")
+    db.catalog.invalidate(urea)
+    db.catalog.sync()
+    assert db.catalog.get(urea) is None
+    assert [entry["name"] for entry in db.catalog.all()] == ["Hybrid seeds"]
+    print("✓ New, edited and deleted products handled")
+    db.close()
+
+def test_code_lookup():
+    """Product codes and alternate barcodes resolve without a query"""
+    db = make_db()
+    seeds, _ = add_product(db, "Seeds", "SEED001", stock=10)
+    db.insert("product_barcodes", {"product_id": seeds, "barcode": "8901234567890"})
+    db.catalog.sync()
+    
+    db.enable_profiling(slow_ms=1000)
+    assert db.catalog.lookup("SEED001")["id"] == seeds
+    assert db.catalog.lookup(" seed001 ")["id"] == seeds
+    assert db.catalog.lookup("8901234567890")["id"] == seeds
+    assert db.catalog.lookup("UNKNOWN") is None
+    assert db.profiler.report()["statements"] == []
+    
+    # A new code replaces the old one once the product is reloaded
+    db.update("products", {"product_code": "SEED002"}, f"id = {seeds}")
+    db.catalog.invalidate(seeds)
+    db.catalog.sync()
+    assert db.catalog.lookup("SEED001") is None and db.catalog.lookup("SEED002")["id"] == seeds
+    assert db.catalog.lookup("8901234567890")["id"] == seeds
+    print("✓ Codes and barcodes resolved from memory")
+    db.close()
+
+def test_sync_does_not_wait_for_writers():
+    """Syncing reads a snapshot, so it runs while another thread holds a write transaction"""
+    db = make_db()
+    seeds, batch_id = add_product(db, "Seeds", "S1", stock=10)
+    db.catalog.sync()
+    
+    writing, done = threading.Event(), threading.Event()
+    def writer():
+        with db.transaction():
+            db.execute("UPDATE batches SET quantity = 4 WHERE id = ?", (batch_id,))
+            writing.set()
+            done.wait(5)
+        db.release_connection()
+    thread = threading.Thread(target=writer)
+    thread.start()
+    writing.wait(5)
+    
+    db.catalog.invalidate(seeds)
+    result = []
+    def search():
+        result.append(db.catalog.sync())
+        db.release_connection()
+    sync = threading.Thread(target=search)
+    sync.start()
+    sync.join(2)
+    assert result == [{seeds}] and db.catalog.get(seeds)["stock"] == 10
+    print("✓ Sync reads committed stock without waiting for the writer")
+    
+    done.set()
+    thread.join()
+    db.catalog.invalidate(seeds)
+    db.catalog.sync()
+    assert db.catalog.get(seeds)["stock"] == 4
+    db.close()
+
+if __name__ == "__main__":
+    test_snapshot()
+    test_sale_applies_delta()
+    test_new_products_and_invalidate()
+    test_code_lookup()
+    test_sync_does_not_wait_for_writers()
+    print("\nAll catalog cache tests passed!")
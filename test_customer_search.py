@@ -0,0 +1,95 @@
+"""
+Test the customer search engine behind the sales and customer screens
+"""
+import os
+import tempfile
+import time
+
+from database.db_handler import DBHandler
+from database.customer_search import search_customer_ids, search_customers
+
+def make_db():
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_customers.db"))
+    # Keep only the walk-in customer from the seed data
+    db.execute("DELETE FROM customers WHERE id > 1")
+    db.commit()
+    return db
+
+def add_customer(db, name, phone="", **extra):
+    return db.insert("customers", dict(name=name, phone=phone, **extra))
+
+def test_normalized_columns():
+    """Triggers keep name_normalized and phone_digits current"""
+    db = make_db()
+    customer_id = add_customer(db, "  Ramesh Patil ", "+91 98765-43210")
+    assert db.fetchone("SELECT name_normalized, phone_digits FROM customers WHERE id = ?",
+                       (customer_id,)) == ("ramesh patil", "9876543210")
+    
+    db.update("customers", {"phone": "(0253) 261 234"}, f"id = {customer_id}")
+    assert db.fetchone("SELECT phone_digits FROM customers WHERE id = ?", (customer_id,))[0] == "0253261234"
+    print("✓ Normalised columns maintained by triggers")
+    db.close()
+
+def test_phone_lookup():
+    """Exact number first, then numbers starting with, then ending with the digits"""
+    db = make_db()
+    exact = add_customer(db, "Exact", "9876543210")
+    prefixed = add_customer(db, "Partial", "43219")
+    country = add_customer(db, "Country code", "+91 98765 43210")
+    suffix = add_customer(db, "Suffix", "9123443210")
+    
+    assert search_customer_ids(db, "9876543210") == [country, exact]
+    assert search_customer_ids(db, "+91 98765 43210") == [country, exact]
+    assert search_customer_ids(db, "98765") == [country, exact]
+    assert search_customer_ids(db, "4321") == [prefixed]
+    assert search_customer_ids(db, "43210") == [country, exact, suffix]
+    print("✓ Phone numbers matched exact > prefix > suffix")
+    db.close()
+
+def test_name_lookup():
+    """Exact name, then prefix, then substring of name, village or address"""
+    db = make_db()
+    substring = add_customer(db, "Sita Ram", village="Nashik")
+    prefix = add_customer(db, "Ramesh Patil")
+    exact = add_customer(db, "Ram")
+    place = add_customer(db, "Gopal", address="Ramnagar road")
+    
+    assert search_customer_ids(db, "RAM") == [exact, prefix, place, substring]
+    assert search_customer_ids(db, "nashik") == [substring]
+    assert search_customer_ids(db, "ra")[:2] == [exact, prefix]
+    assert search_customer_ids(db, "  ") == []
+    assert search_customers(db, "ramesh", "id, name") == [(prefix, "Ramesh Patil")]
+    
+    # Without the FTS index the same matches come from a scan
+    db.execute("DROP TABLE customers_fts")
+    for trigger in ("customers_fts_insert", "customers_fts_delete", "customers_fts_update"):
+        db.execute(f"DROP TRIGGER {trigger}")
+    db.commit()
+    assert search_customer_ids(db, "RAM") == [exact, prefix, place, substring]
+    print("✓ Names matched exact > prefix > substring")
+    db.close()
+
+def test_large_customer_base():
+    """Phone lookups stay instant with 50k customers"""
+    db = make_db()
+    with db.transaction():
+        db.insert_many("customers", [
+            {"name": f"Customer {i}", "phone": f"+91 9{i:09d}", "village": "Nashik"} for i in range(50000)
+        ])
+    
+    for term in ("9000012345", "90000123", "2345", "customer 4", "nashik"):
+        search_customer_ids(db, term)
+        start = time.perf_counter()
+        for _ in range(10):
+            ids = search_customer_ids(db, term)
+        elapsed_ms = (time.perf_counter() - start) * 100
+        assert ids and elapsed_ms < 50
+        print(f"✓ '{term}': {len(ids)} results in {elapsed_ms:.2f} ms")
+    db.close()
+
+if __name__ == "__main__":
+    test_normalized_columns()
+    test_phone_lookup()
+    test_name_lookup()
+    test_large_customer_base()
+    print("\nAll customer search tests passed!")
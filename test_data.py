@@ -388,7 +388,8 @@ def add_expense_data():
     # Generate expenses for the last 90 days
     today = datetime.date.today()
     
-    # Insert 20 test expenses
+    # Build 20 test expenses, then insert them in one batch
+    expenses = []
     for i in range(20):
         # Random date within last 90 days
         expense_date = today - datetime.timedelta(days=random.randint(0, 90))
@@ -425,23 +426,26 @@ def add_expense_data():
         
         description = random.choice(descriptions.get(category, ["General expense"]))
         
-        try:
-            cursor.execute(
-                """
-                INSERT INTO expenses
-                (expense_date, category, amount, description)
-                VALUES (?, ?, ?, ?)
-                """,
-                (
-                    expense_date.strftime('%Y-%m-%d'),
-                    category,
-                    amount,
-                    description
-                )
-            )
+        expenses.append((
+            expense_date.strftime('%Y-%m-%d'),
+            category,
+            amount,
+            description
+        ))
+    
+    try:
+        cursor.executemany(
+            """
+            INSERT INTO expenses
+            (expense_date, category, amount, description)
+            VALUES (?, ?, ?, ?)
+            """,
+            expenses
+        )
+        for expense_date, category, amount, description in expenses:
             print(f"Added {category} expense of ₹{amount:.2f} on {expense_date}")
-        except Exception as e:
-            print(f"Error adding expense: {e}")
+    except Exception as e:
+        print(f"Error adding expenses: {e}")
     
     conn.commit()
 
@@ -0,0 +1,83 @@
+"""
+Test the bulk insert/update API and Decimal handling of DBHandler
+"""
+import os
+import tempfile
+from decimal import Decimal
+
+from database.db_handler import DBHandler
+
+def make_db():
+    return DBHandler(os.path.join(tempfile.mkdtemp(), "test_bulk.db"))
+
+def test_insert_many():
+    """insert_many writes every row with one commit"""
+    db = make_db()
+    rows = [{"expense_date": "2025-04-01", "category": "Rent", "amount": 100 + i, "description": f"E{i}"}
+            for i in range(500)]
+    
+    assert db.insert_many("expenses", rows) == 500
+    assert db.fetchone("SELECT COUNT(*), SUM(amount) FROM expenses") == (500, sum(100 + i for i in range(500)))
+    assert db.insert_many("expenses", []) == 0
+    print("✓ insert_many inserted 500 rows")
+    db.close()
+
+def test_update_many():
+    """update_many updates each row by its key"""
+    db = make_db()
+    db.insert_many("expenses", [{"expense_date": "2025-04-01", "category": "Rent", "amount": 1}] * 3)
+    ids = [row[0] for row in db.fetchall("SELECT id FROM expenses ORDER BY id")]
+    
+    updated = db.update_many("expenses", [{"id": expense_id, "amount": expense_id * 10} for expense_id in ids])
+    
+    assert updated == 3
+    assert db.fetchall("SELECT id, amount FROM expenses ORDER BY id") == [(i, i * 10) for i in ids]
+    print("✓ update_many updated rows by key")
+    db.close()
+
+def test_bulk_insert_rolls_back_in_transaction():
+    """A failing batch inside a transaction leaves no rows behind"""
+    db = make_db()
+    rows = [{"expense_date": "2025-04-01", "category": "Rent", "amount": 1},
+            {"expense_date": "2025-04-01", "category": "Rent", "amount": None}]
+    
+    try:
+        with db.transaction():
+            db.insert_many("expenses", rows)
+        assert False, "NOT NULL violation should propagate"
+    except Exception:
+        pass
+    
+    assert db.fetchone("SELECT COUNT(*) FROM expenses")[0] == 0
+    print("✓ Failed batch rolled back")
+    db.close()
+
+def test_decimal_values_bind_directly():
+    """Decimal values are stored as REAL through the registered adapter"""
+    db = make_db()
+    db.insert("expenses", {"expense_date": "2025-04-01", "category": "Rent", "amount": Decimal("1234.50")})
+    db.execute("UPDATE expenses SET amount = amount + ?", (Decimal("0.25"),))
+    
+    assert db.fetchone("SELECT amount, typeof(amount) FROM expenses") == (1234.75, "real")
+    print("✓ Decimal stored as REAL")
+    db.close()
+
+def test_statement_cache():
+    """Generated SQL is built once per table and column set"""
+    db = make_db()
+    cached = len(db._sql_cache)
+    for i in range(10):
+        db.insert("expenses", {"expense_date": "2025-04-01", "category": "Rent", "amount": i})
+    db.insert("expenses", {"expense_date": "2025-04-01", "category": "Rent", "amount": 1, "description": "x"})
+    
+    assert len(db._sql_cache) == cached + 2
+    print("✓ SQL cached per column set")
+    db.close()
+
+if __name__ == "__main__":
+    test_insert_many()
+    test_update_many()
+    test_bulk_insert_rolls_back_in_transaction()
+    test_decimal_values_bind_directly()
+    test_statement_cache()
+    print("\nTests completed")
@@ -0,0 +1,88 @@
+"""
+Test the per-thread connection pool and the single-writer lock
+"""
+import os
+import tempfile
+import threading
+
+from database.db_handler import DBHandler
+
+def make_db():
+    return DBHandler(os.path.join(tempfile.mkdtemp(), "test_pool.db"))
+
+def test_each_thread_gets_its_own_connection():
+    """Worker threads get their own connection with the same PRAGMA profile"""
+    db = make_db()
+    main_conn = db.conn
+    result = {}
+    
+    def worker():
+        result["conn"] = db.conn
+        result["journal_mode"] = db.fetchone("PRAGMA journal_mode")[0]
+        result["count"] = db.fetchone("SELECT COUNT(*) FROM settings")[0]
+        db.release_connection()
+    
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    
+    assert result["conn"] is not main_conn
+    assert result["journal_mode"] == "wal"
+    assert result["count"] > 0
+    assert db.conn is main_conn
+    print("✓ Worker thread used its own connection")
+    db.close()
+
+def test_concurrent_writers_do_not_lock():
+    """Transactions from many threads are serialised instead of failing"""
+    db = make_db()
+    errors = []
+    
+    def worker(n):
+        try:
+            for i in range(25):
+                with db.transaction():
+                    db.insert("expenses", {"expense_date": "2025-04-01", "category": f"T{n}", "amount": i})
+                db.insert("expenses", {"expense_date": "2025-04-02", "category": f"T{n}", "amount": i})
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.release_connection()
+    
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert not errors, errors
+    assert db.fetchone("SELECT COUNT(*) FROM expenses")[0] == 6 * 25 * 2
+    print("✓ 300 writes from 6 threads, no lock errors")
+    db.close()
+
+def test_close_reaches_worker_connections():
+    """close() closes connections opened by other threads"""
+    db = make_db()
+    opened = threading.Event()
+    done = threading.Event()
+    
+    def worker():
+        db.fetchone("SELECT 1")
+        opened.set()
+        done.wait(5)
+    
+    t = threading.Thread(target=worker)
+    t.start()
+    opened.wait(5)
+    assert len(db.pool) == 2
+    db.close()
+    assert len(db.pool) == 0
+    done.set()
+    t.join()
+    print("✓ close() released every pooled connection")
+
+if __name__ == "__main__":
+    test_each_thread_gets_its_own_connection()
+    test_concurrent_writers_do_not_lock()
+    test_close_reaches_worker_connections()
+    print("\nTests completed")
@@ -0,0 +1,64 @@
+"""
+Test the DBHandler connection profile and WAL checkpointing.
+"""
+import os
+import tempfile
+
+from database.db_handler import DBHandler
+
+def test_wal_profile_applied():
+    """New connections use WAL with the tuned PRAGMA profile"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_profile.db"))
+    
+    assert db.fetchone("PRAGMA journal_mode")[0] == "wal"
+    assert db.fetchone("PRAGMA synchronous")[0] == 1  # NORMAL
+    assert db.fetchone("PRAGMA temp_store")[0] == 2  # MEMORY
+    assert db.fetchone("PRAGMA busy_timeout")[0] == 5000
+    print("✓ WAL profile applied")
+    db.close()
+
+def test_pragma_overrides():
+    """Overrides replace individual profile entries"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_profile.db"),
+                   pragmas={"synchronous": "FULL", "busy_timeout": 1000})
+    
+    assert db.fetchone("PRAGMA synchronous")[0] == 2  # FULL
+    assert db.fetchone("PRAGMA busy_timeout")[0] == 1000
+    assert db.fetchone("PRAGMA journal_mode")[0] == "wal"
+    print("✓ PRAGMA overrides applied")
+    db.close()
+
+def test_reader_does_not_block_writer():
+    """An open read transaction on one connection does not block a commit on another"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_profile.db"))
+    reader = DBHandler(db.db_path, pragmas={"busy_timeout": 0})
+    
+    reader.conn.execute("BEGIN")
+    reader.conn.execute("SELECT COUNT(*) FROM products").fetchone()
+    
+    with db.transaction():
+        db.insert("expenses", {"expense_date": "2025-04-01", "category": "Test", "amount": 1})
+    
+    reader.conn.rollback()
+    print("✓ Writer committed while a reader was open")
+    reader.close()
+    db.close()
+
+def test_truncate_checkpoint():
+    """A TRUNCATE checkpoint empties the WAL file"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_profile.db"))
+    db.insert("expenses", {"expense_date": "2025-04-01", "category": "Test", "amount": 1})
+    
+    busy, wal_frames, checkpointed = db.checkpoint("TRUNCATE")
+    assert busy == 0
+    assert os.path.getsize(db.db_path + "-wal") == 0
+    db.optimize()
+    print("✓ WAL truncated at checkpoint")
+    db.close()
+
+if __name__ == "__main__":
+    test_wal_profile_applied()
+    test_pragma_overrides()
+    test_reader_does_not_block_writer()
+    test_truncate_checkpoint()
+    print("\nTests completed")
@@ -0,0 +1,71 @@
+"""
+Test DBHandler.transaction() commit and rollback behaviour.
+"""
+import os
+import tempfile
+
+from database.db_handler import DBHandler
+
+def open_test_db():
+    """Create a fresh database in a temporary directory"""
+    tmp_dir = tempfile.mkdtemp()
+    return DBHandler(os.path.join(tmp_dir, "test_transaction.db"))
+
+def count_expenses(db):
+    return db.fetchone("SELECT COUNT(*) FROM expenses")[0]
+
+def test_transaction_commits_once():
+    """Rows written inside a transaction only become visible to other connections on exit"""
+    db = open_test_db()
+    other = DBHandler(db.db_path)
+
+    with db.transaction():
+        for i in range(5):
+            db.insert("expenses", {"expense_date": "2025-04-01", "category": "Test", "amount": i})
+        # Nothing committed yet, so a second connection sees no rows
+        assert count_expenses(other) == 0
+
+    assert count_expenses(other) == 5
+    print("✓ Transaction committed all rows at once")
+    other.close()
+    db.close()
+
+def test_transaction_rollback_on_error():
+    """A failing statement inside the block undoes every earlier write"""
+    db = open_test_db()
+
+    try:
+        with db.transaction():
+            db.insert("expenses", {"expense_date": "2025-04-01", "category": "Test", "amount": 10})
+            db.insert("expenses", {"expense_date": None, "category": "Test", "amount": 20})  # NOT NULL violation
+    except Exception as e:
+        print(f"✓ Error surfaced inside transaction: {e}")
+
+    assert count_expenses(db) == 0
+    assert not db.in_transaction()
+    print("✓ Rollback removed the partial rows")
+    db.close()
+
+def test_nested_savepoint():
+    """A failing nested block is rolled back without losing the outer work"""
+    db = open_test_db()
+
+    with db.transaction():
+        db.insert("expenses", {"expense_date": "2025-04-01", "category": "Outer", "amount": 1})
+        try:
+            with db.transaction():
+                db.insert("expenses", {"expense_date": "2025-04-01", "category": "Inner", "amount": 2})
+                raise ValueError("abort inner block")
+        except ValueError:
+            pass
+
+    categories = [row[0] for row in db.fetchall("SELECT category FROM expenses")]
+    assert categories == ["Outer"]
+    print("✓ Nested savepoint rolled back independently")
+    db.close()
+
+if __name__ == "__main__":
+    test_transaction_commits_once()
+    test_transaction_rollback_on_error()
+    test_nested_savepoint()
+    print("\nTests completed")
@@ -0,0 +1,70 @@
+"""
+Test the cached Excel invoice template and batch Excel export
+"""
+import io
+import os
+import tempfile
+
+import openpyxl
+
+from utils.invoice_generator import excel_template, generate_excel_invoice, generate_excel_invoices
+from utils.invoice_templates import clear_template_cache
+
+def sample_invoice(number=1, lines=2):
+    return {
+        "invoice_number": f"25-26/AGT-00{number}",
+        "date": "01-04-2025",
+        "time": "10:00",
+        "store_info": {"name": "Agritech"},
+        "customer": {"name": f"Customer {number}", "phone": "9876543210"},
+        "items": [{"name": f"Item {i}", "hsn_code": "3808", "quantity": 2, "price": 118, "total": 236}
+                  for i in range(1, lines + 1)],
+        "payment": {"subtotal": 236 * lines, "cgst": 18 * lines, "sgst": 18 * lines, "total": 236 * lines},
+    }
+
+def sheet_values(sheet):
+    return {cell.coordinate: cell.value for row in sheet.iter_rows() for cell in row if cell.value is not None}
+
+def load(data):
+    return openpyxl.load_workbook(io.BytesIO(data)).active
+
+def test_template_parsed_once():
+    """The template is parsed on first use and every invoice gets a clean copy of it"""
+    clear_template_cache()
+    template = excel_template()
+    assert excel_template() is template
+    assert "B3" in template.placeholders["shop"] and "L12" in template.placeholders["customer"]
+
+    long_bill = load(generate_excel_invoice(sample_invoice(1, lines=12)))
+    short_bill = load(generate_excel_invoice(sample_invoice(2, lines=1)))
+    assert excel_template() is template
+
+    assert long_bill["B3"].value == short_bill["B3"].value == "Agritech"
+    assert (long_bill["L12"].value, short_bill["L12"].value) == ("25-26/AGT-001", "25-26/AGT-002")
+    assert long_bill["B19"].value == "Item 3"
+    assert short_bill["B19"].value != "Item 3"  # nothing left over from the longer invoice
+    print("✓ Excel template parsed once and cloned per invoice")
+
+def test_batch_export():
+    """A batch goes to one sheet per invoice, or one file each, matching single invoices"""
+    invoices = [sample_invoice(number) for number in (1, 2, 3)]
+    out_dir = tempfile.mkdtemp()
+    single = [sheet_values(load(generate_excel_invoice(invoice))) for invoice in invoices]
+
+    workbook_path = os.path.join(out_dir, "april.xlsx")
+    assert generate_excel_invoices(invoices, workbook_path) == [workbook_path]
+    workbook = openpyxl.load_workbook(workbook_path)
+    assert workbook.sheetnames == ["25-26-AGT-001", "25-26-AGT-002", "25-26-AGT-003"]
+    assert [sheet_values(sheet) for sheet in workbook.worksheets] == single
+    assert workbook.worksheets[0].merged_cells.ranges == load(generate_excel_invoice(invoices[0])).merged_cells.ranges
+
+    paths = generate_excel_invoices(invoices, os.path.join(out_dir, "separate"), one_workbook=False)
+    assert [os.path.basename(path) for path in paths] == ["25-26-AGT-001.xlsx", "25-26-AGT-002.xlsx",
+                                                          "25-26-AGT-003.xlsx"]
+    assert [sheet_values(openpyxl.load_workbook(path).active) for path in paths] == single
+    print("✓ Batch export to one workbook or separate files")
+
+if __name__ == "__main__":
+    test_template_parsed_once()
+    test_batch_export()
+    print("\nAll Excel template tests passed!")
@@ -0,0 +1,136 @@
+"""
+Test the invoice data assembler shared by checkout and sales history
+"""
+import os
+import tempfile
+
+from database.db_handler import DBHandler
+from utils.pdf_invoice_generator import generate_invoice
+
+def make_db():
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_invoice_assembler.db"))
+    db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('shop_name', 'Agritech Krishi Kendra')")
+    db.commit()
+    return db
+
+def add_invoice(db, number, lines=3, **invoice):
+    """An invoice sold the way checkout records it: lines, batch deductions and SALE movements"""
+    customer_id = db.insert("customers", {"name": "Ramesh Patil", "phone": "9876543210",
+                                          "address": "Main Road", "village": "Wagholi"})
+    invoice_id = db.insert("invoices", dict({"invoice_number": f"25-26/AGT-00{number}", "customer_id": customer_id,
+                                             "subtotal": 236 * lines, "discount_amount": 0,
+                                             "total_amount": 236 * lines, "payment_method": "CASH",
+                                             "payment_status": "PAID",
+                                             "invoice_date": "2025-04-01 15:30:00"}, **invoice))
+    for line in range(lines):
+        product_id = db.insert("products", {"name": f"Product {line}", "product_code": f"P{number}-{line}",
+                                            "hsn_code": "3808", "wholesale_price": 90, "selling_price": 118,
+                                            "tax_percentage": 18, "manufacturer": "Agro Co", "unit": "kg"})
+        db.insert("batches", {"product_id": product_id, "batch_number": f"OLD{line}", "quantity": 5,
+                              "expiry_date": "2025-06-30", "cost_price": 1})
+        sold = db.insert("batches", {"product_id": product_id, "batch_number": f"B{line}", "quantity": 0,
+                                     "expiry_date": "2026-03-31", "cost_price": 1})
+        item_id = db.insert("invoice_items", {"invoice_id": invoice_id, "product_id": product_id,
+                                              "product_name": f"Product {line}", "hsn_code": "",
+                                              "batch_number": "", "quantity": 2, "price_per_unit": 118,
+                                              "tax_percentage": 18, "tax_amount": 36, "total_price": 236})
+        db.insert("inventory_movements", {"product_id": product_id, "batch_id": sold, "quantity": -2,
+                                          "movement_type": "SALE", "reference_id": item_id})
+    return invoice_id
+
+def statements(profiler, action):
+    return profiler.actions[action]["statements"]
+
+def test_payload():
+    """The payload has the customer, the sold batch and the GST split in the generator's shape"""
+    db = make_db()
+    invoice_id = add_invoice(db, 1, payment_method="SPLIT", cash_amount=300, upi_amount=408,
+                             upi_reference="UPI42")
+
+    invoice_data = db.invoice_assembler.assemble(invoice_id)
+
+    assert invoice_data["invoice_number"] == "25-26/AGT-001"
+    assert (invoice_data["date"], invoice_data["time"]) == ("01/04/2025", "03:30 PM")
+    assert invoice_data["customer"]["name"] == "Ramesh Patil" and invoice_data["customer"]["village"] == "Wagholi"
+    assert invoice_data["store_info"]["name"] == "Agritech Krishi Kendra"
+    assert invoice_data["settings"]["shop_name"] == "Agritech Krishi Kendra"
+
+    item = invoice_data["items"][0]
+    assert item["hsn_code"] == "3808" and item["manufacturer"] == "Agro Co" and item["unit"] == "kg"
+    assert (item["batch_no"], item["expiry_date"]) == ("B0", "2026-03-31")
+
+    payment = invoice_data["payment"]
+    assert payment["method"] == "SPLIT" and payment["split"]["upi_reference"] == "UPI42"
+    assert payment["cgst"] == payment["sgst"] == 54 and payment["taxable_value"] == 600
+    assert payment["cgst_rate"] == 9 and "payments" not in payment
+    print("✓ Invoice payload assembled")
+
+    out_path = os.path.join(tempfile.mkdtemp(), "invoice.pdf")
+    assert generate_invoice(invoice_data, out_path) and os.path.getsize(out_path) > 0
+    print("✓ Assembled invoice renders")
+    db.close()
+
+def test_constant_query_count():
+    """Two queries per invoice whatever its size, plus one for payments when money is owed"""
+    db = make_db()
+    small = add_invoice(db, 1, lines=1)
+    large = add_invoice(db, 2, lines=40)
+    owing = add_invoice(db, 3, lines=2, payment_method="CREDIT", payment_status="PARTIALLY_PAID")
+    db.insert("customer_payments", {"customer_id": 1, "invoice_id": owing, "amount": 100,
+                                    "payment_method": "UPI", "payment_date": "2025-04-02"})
+    profiler = db.enable_profiling()
+
+    with db.action("first"):
+        db.invoice_assembler.assemble(small)
+    with db.action("small"):
+        db.invoice_assembler.assemble(small)
+    with db.action("large"):
+        assert len(db.invoice_assembler.assemble(large)["items"]) == 40
+    with db.action("owing"):
+        payments = db.invoice_assembler.assemble(owing)["payment"]["payments"]
+
+    assert statements(profiler, "first") == 3  # settings snapshot loaded once
+    assert statements(profiler, "small") == statements(profiler, "large") == 2
+    assert statements(profiler, "owing") == 3
+    assert [(payment["amount"], payment["method"]) for payment in payments] == [(100, "UPI")]
+    print("✓ Query count does not grow with the number of lines")
+
+    db.execute("UPDATE settings SET value = 'Krishi Seva Kendra' WHERE key = 'shop_name'")
+    db.commit()
+    assert db.invoice_assembler.assemble(small)["store_info"]["name"] == "Agritech Krishi Kendra"
+    db.invoice_assembler.invalidate_settings()
+    assert db.invoice_assembler.assemble(small)["store_info"]["name"] == "Krishi Seva Kendra"
+    print("✓ Settings snapshot reloaded after invalidate_settings()")
+    
+    # Restoring a backup brings its own settings
+    backup_path = os.path.join(tempfile.mkdtemp(), "backup.db")
+    assert db.backup_database(backup_path)
+    db.execute("UPDATE settings SET value = 'Kisan Agro Centre' WHERE key = 'shop_name'")
+    db.commit()
+    db.invoice_assembler.invalidate_settings()
+    assert db.invoice_assembler.settings()["shop_name"] == "Kisan Agro Centre"
+    assert db.restore_database(backup_path)
+    assert db.invoice_assembler.assemble(small)["store_info"]["name"] == "Krishi Seva Kendra"
+    print("✓ Settings snapshot reloaded after a restore")
+    db.close()
+
+def test_missing_invoice():
+    """Unknown invoices and invoices without lines raise LookupError"""
+    db = make_db()
+    empty = db.insert("invoices", {"invoice_number": "25-26/AGT-002", "customer_id": 1,
+                                   "subtotal": 0, "total_amount": 0, "invoice_date": "2025-04-01 10:00:00"})
+    for invoice_id in (empty, empty + 1):
+        try:
+            db.invoice_assembler.assemble(invoice_id)
+        except LookupError:
+            pass
+        else:
+            raise AssertionError(f"invoice {invoice_id} assembled")
+    print("✓ Missing invoices rejected")
+    db.close()
+
+if __name__ == "__main__":
+    test_payload()
+    test_constant_query_count()
+    test_missing_invoice()
+    print("\nAll invoice assembler tests passed!")
@@ -0,0 +1,36 @@
+"""
+Test the invoice generator benchmark harness
+"""
+from benchmark_invoice_render import compare_results, percentile, run_case
+
+def test_run_case():
+    """A case reports latency percentiles and output size; a broken generator reports its error"""
+    result = run_case("pdf_invoice_generator", "shop_bill", "pdf", 2, repeat=3)
+    assert result["error"] is None
+    assert 0 < result["p50_ms"] <= result["p95_ms"] and result["output_bytes"] > 0
+    assert (result["generator"], result["template"], result["lines"]) == ("pdf_invoice_generator", "shop_bill", 2)
+    print("✓ Benchmark case timed")
+
+    result = run_case("invoice_generator", "letterhead", "pdf", 1, repeat=1)
+    assert result["error"] is None  # unknown templates fall back to shop_bill
+    result = run_case("invoice_generator_missing", "default", "pdf", 1, repeat=1)
+    assert "invoice_generator_missing" in result["error"] and "p50_ms" not in result
+    print("✓ Failed case reported")
+
+def test_compare():
+    """Only cases slower than the threshold count as regressions"""
+    assert percentile([5, 1, 4, 2, 3], 0.5) == 3 and percentile([5, 1, 4, 2, 3], 0.95) == 5
+
+    def case(lines, p50):
+        return {"generator": "pdf_invoice_generator", "template": "shop_bill", "lines": lines, "cold": False,
+                "error": None, "p50_ms": p50}
+
+    baseline = {"results": [case(1, 10.0), case(10, 20.0)]}
+    (regressed, old_p50, ratio), = compare_results([case(1, 10.5), case(10, 30.0), case(50, 90.0)], baseline)
+    assert regressed["lines"] == 10 and old_p50 == 20.0 and ratio == 1.5
+    print("✓ Regressions found against a baseline run")
+
+if __name__ == "__main__":
+    test_run_case()
+    test_compare()
+    print("\nAll invoice benchmark tests passed!")
@@ -0,0 +1,115 @@
+"""
+Test the rendered invoice cache keyed by invoice data hash
+"""
+import copy
+import os
+import tempfile
+import time
+
+from utils.invoice_cache import InvoiceOutputCache, configure_output_cache, output_cache, payload_key
+from utils.pdf_invoice_generator import SHOP_BILL_VERSION, generate_invoice
+
+def sample_invoice():
+    """Invoice data as database.invoice_assembler builds it, settings snapshot included"""
+    return {
+        "invoice_number": "25-26/AGT-001",
+        "date": "01/04/2025",
+        "time": "10:30 AM",
+        "customer": {"name": "Ramesh Patil", "phone": "9876543210", "address": "Main Road", "village": "Wagholi"},
+        "items": [{"name": f"Product {i}", "hsn_code": "3808", "quantity": 2, "price": 118, "discount": 0,
+                   "total": 236, "manufacturer": "Agro Co", "unit": "kg", "batch_no": f"B{i}",
+                   "expiry_date": "2026-03-31", "tax_percentage": 18} for i in range(3)],
+        "payment": {"subtotal": 708, "discount": 0, "cgst": 54, "sgst": 54, "total": 708, "method": "CASH"},
+        "settings": {"shop_name": "Agritech Krishi Kendra", "shop_address": "Main Road, Pune"},
+    }
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+def test_payload_key():
+    """The key ignores dict order and changes with the invoice, the shop settings or the template version"""
+    invoice_data = sample_invoice()
+    key = payload_key(invoice_data, "shop_bill", 1)
+    reordered = dict(reversed(list(invoice_data.items())))
+    assert payload_key(reordered, "shop_bill", 1) == key
+
+    edited = copy.deepcopy(invoice_data)
+    edited["items"][1]["quantity"] = 3
+    renamed = copy.deepcopy(invoice_data)
+    renamed["settings"]["shop_name"] = "Agritech Agro Kendra"
+    keys = {key, payload_key(edited, "shop_bill", 1), payload_key(renamed, "shop_bill", 1),
+            payload_key(invoice_data, "shop_bill", 2)}
+    assert len(keys) == 4
+    print("✓ Key follows the invoice data and template version")
+
+def test_reprint_from_cache():
+    """A second render of the same invoice is copied from the cache; an edited one is rendered"""
+    cache = configure_output_cache(tempfile.mkdtemp(), 10 * 1024 * 1024)
+    try:
+        out_dir = tempfile.mkdtemp()
+        first, second = os.path.join(out_dir, "first.pdf"), os.path.join(out_dir, "second.pdf")
+        assert generate_invoice(sample_invoice(), first)
+        assert (cache.hits, cache.misses) == (0, 1)
+        assert generate_invoice(sample_invoice(), second)
+        assert cache.hits == 1
+        with open(first, "rb") as a, open(second, "rb") as b:
+            assert a.read() == b.read()
+        print("✓ Reprint served from the cache")
+
+        edited = sample_invoice()
+        edited["payment"]["discount"] = 10
+        assert generate_invoice(edited, second) and (cache.hits, cache.misses) == (1, 2)
+        assert payload_key(edited, "pdf_invoice_generator.shop_bill", SHOP_BILL_VERSION) != \
+            payload_key(sample_invoice(), "pdf_invoice_generator.shop_bill", SHOP_BILL_VERSION)
+        print("✓ Edited invoice rendered again")
+
+        # Without a settings snapshot the generator reads the database, so nothing is cached
+        legacy = sample_invoice()
+        del legacy["settings"]
+        legacy["store_info"] = {"name": "Agritech Krishi Kendra"}
+        generate_invoice(legacy, second)
+        assert (cache.hits, cache.misses) == (1, 2)
+        print("✓ Invoices without a settings snapshot bypass the cache")
+
+        assert configure_output_cache(max_bytes=0) is None and output_cache() is None
+        assert generate_invoice(sample_invoice(), second)
+        print("✓ Cache can be turned off")
+    finally:
+        configure_output_cache()
+
+def test_lru_eviction():
+    """Least recently used files are evicted first once the cache is over its size"""
+    directory = tempfile.mkdtemp()
+    source = tempfile.mkdtemp()
+    cache = InvoiceOutputCache(directory, max_bytes=250)
+    keys = [payload_key({"n": n}, "test", 1) for n in range(3)]
+    cache.store(keys[0], write(os.path.join(source, "0.pdf"), 100))
+    cache.store(keys[1], write(os.path.join(source, "1.pdf"), 100))
+    assert cache.fetch(keys[0], os.path.join(source, "out.pdf"))
+    cache.store(keys[2], write(os.path.join(source, "2.pdf"), 100))
+
+    assert cache.size == 200
+    assert cache.fetch(keys[0], os.path.join(source, "out.pdf"))
+    assert not cache.fetch(keys[1], os.path.join(source, "out.pdf"))
+    print("✓ Least recently used entry evicted")
+
+    # Another process picks up the order from the files' modification times
+    time.sleep(0.01)
+    cache.fetch(keys[2], os.path.join(source, "out.pdf"))
+    reopened = InvoiceOutputCache(directory, max_bytes=250)
+    reopened.store(payload_key({"n": 3}, "test", 1), write(os.path.join(source, "3.pdf"), 100))
+    assert not reopened.fetch(keys[0], os.path.join(source, "out.pdf"))
+    assert reopened.fetch(keys[2], os.path.join(source, "out.pdf"))
+    print("✓ Use order survives a restart")
+
+    reopened.clear()
+    assert reopened.size == 0 and not os.path.exists(directory)
+    print("✓ Cache cleared")
+
+if __name__ == "__main__":
+    test_payload_key()
+    test_reprint_from_cache()
+    test_lru_eviction()
+    print("\nAll invoice cache tests passed!")
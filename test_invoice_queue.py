@@ -0,0 +1,108 @@
+"""
+Test the background invoice render queue used after checkout
+"""
+import os
+import tempfile
+import threading
+import time
+
+from database.db_handler import DBHandler
+from utils.invoice_queue import InvoiceRenderQueue
+
+def make_db():
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_invoice_queue.db"))
+    invoice_ids = [db.insert("invoices", {"invoice_number": f"25-26/AGT-00{n}", "customer_id": 1,
+                                          "subtotal": 100, "total_amount": 100})
+                   for n in (1, 2)]
+    return db, invoice_ids
+
+def wait_for(render_queue, count, timeout=5):
+    """Poll like the sales screen's after() loop until count jobs have finished"""
+    finished = 0
+    deadline = time.time() + timeout
+    while finished < count and time.time() < deadline:
+        finished += render_queue.poll()
+        time.sleep(0.01)
+    return finished
+
+def test_renders_off_thread():
+    """submit() returns at once; the file path is stored and reported through poll()"""
+    db, (invoice_id, _) = make_db()
+    out_dir = tempfile.mkdtemp()
+    release = threading.Event()
+    render_threads = []
+
+    def render(db, invoice_id):
+        release.wait(5)
+        render_threads.append(threading.current_thread().name)
+        number = db.fetchone("SELECT invoice_number FROM invoices WHERE id = ?", (invoice_id,))[0]
+        path = os.path.join(out_dir, number.replace("/", "-") + ".pdf")
+        with open(path, "w") as f:
+            f.write(number)
+        return path
+
+    render_queue = InvoiceRenderQueue(db, {"pdf": render})
+    results = []
+    start = time.perf_counter()
+    render_queue.submit(invoice_id, "pdf", lambda *result: results.append(result))
+    assert time.perf_counter() - start < 0.05
+    assert render_queue.pending == 1 and render_queue.poll() == 0
+
+    release.set()
+    assert wait_for(render_queue, 1) == 1
+    (done_id, path, error), = results
+    assert done_id == invoice_id and error is None and os.path.isfile(path)
+    assert render_threads[0] != threading.current_thread().name
+    assert db.fetchone("SELECT file_path FROM invoices WHERE id = ?", (invoice_id,))[0] == path
+    assert render_queue.pending == 0
+    render_queue.stop()
+    print("✓ Invoice rendered on a worker and file_path stored")
+    db.close()
+
+def test_failures_reported():
+    """A failing render reports its error and leaves file_path alone"""
+    db, (broken_id, good_id) = make_db()
+
+    def render(db, invoice_id):
+        if invoice_id == broken_id:
+            raise RuntimeError("PDF invoice generation failed")
+        return f"invoices/{invoice_id}.pdf"
+
+    render_queue = InvoiceRenderQueue(db, {"pdf": render}, workers=2)
+    results = {}
+    for invoice_id in (broken_id, good_id):
+        render_queue.submit(invoice_id, on_done=lambda invoice_id, path, error: results.update({invoice_id: (path, error)}))
+    assert wait_for(render_queue, 2) == 2
+
+    assert results[broken_id][0] is None and isinstance(results[broken_id][1], RuntimeError)
+    assert results[good_id] == (f"invoices/{good_id}.pdf", None)
+    assert db.fetchone("SELECT file_path FROM invoices WHERE id = ?", (broken_id,))[0] is None
+
+    try:
+        render_queue.submit(good_id, "letterhead")
+        assert False, "unknown template accepted"
+    except ValueError:
+        pass
+    render_queue.stop()
+    print("✓ Render failures reported without touching the invoice")
+    db.close()
+
+def test_store_only_named_templates():
+    """Only templates named in store replace invoices.file_path"""
+    db, (invoice_id, _) = make_db()
+    render_queue = InvoiceRenderQueue(db, {"pdf": lambda db, invoice_id: "invoices/1.pdf",
+                                           "receipt": lambda db, invoice_id: "receipts/1.txt"},
+                                      store=["pdf"])
+    render_queue.submit(invoice_id, "pdf")
+    render_queue.submit(invoice_id, "receipt")
+    assert wait_for(render_queue, 2) == 2
+    assert db.fetchone("SELECT file_path FROM invoices WHERE id = ?", (invoice_id,))[0] == "invoices/1.pdf"
+    render_queue.stop()
+    print("✓ Receipt kept out of file_path")
+    db.close()
+
+if __name__ == "__main__":
+    test_renders_off_thread()
+    test_failures_reported()
+    test_store_only_named_templates()
+    print("\nAll invoice queue tests passed!")
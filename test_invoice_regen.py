@@ -0,0 +1,140 @@
+"""
+Test bulk regeneration of missing invoice files
+"""
+import os
+import re
+import tempfile
+
+import openpyxl
+
+from database.db_handler import DBHandler
+from utils.invoice_cache import configure_output_cache
+from utils.invoice_regen import export_excel, export_pdf, regenerate_missing, select_invoices
+
+def make_db():
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_invoice_regen.db"))
+    invoice_ids = []
+    for day in (1, 2, 3):
+        invoice_id = db.insert("invoices", {"invoice_number": f"24-25/AGT-00{day}", "customer_id": 1,
+                                            "subtotal": 236, "total_amount": 236, "payment_method": "CASH",
+                                            "invoice_date": f"2024-04-0{day} 10:00:00"})
+        db.insert("invoice_items", {"invoice_id": invoice_id, "product_name": "Urea 45kg", "hsn_code": "3102",
+                                    "quantity": 2, "price_per_unit": 118, "tax_percentage": 18,
+                                    "total_price": 236})
+        invoice_ids.append(invoice_id)
+    # An invoice without items cannot be rebuilt
+    invoice_ids.append(db.insert("invoices", {"invoice_number": "24-25/AGT-004", "customer_id": 1,
+                                              "subtotal": 0, "total_amount": 0,
+                                              "invoice_date": "2024-04-04 10:00:00"}))
+    return db, invoice_ids
+
+def test_date_range_selection():
+    """A range covers whole days; no start date selects every invoice"""
+    db, invoice_ids = make_db()
+    assert [row[0] for row in select_invoices(db, "2024-04-02", "2024-04-03")] == invoice_ids[1:3]
+    assert [row[0] for row in select_invoices(db, "2024-04-01")] == invoice_ids[:1]
+    assert len(select_invoices(db)) == 4
+    print("✓ Invoices selected by date range")
+    db.close()
+
+def test_regenerates_missing_and_resumes():
+    """Missing files are rebuilt in parallel; a second run skips them"""
+    db, invoice_ids = make_db()
+    out_dir = tempfile.mkdtemp()
+    progress = []
+
+    summary = regenerate_missing(db, "2024-04-01", "2024-04-03", workers=2, invoices_dir=out_dir,
+                                 progress=lambda done, total: progress.append((done, total)))
+
+    assert summary["selected"] == 3 and summary["skipped"] == 0
+    assert summary["regenerated"] == 3 and not summary["failed"] and not summary["cancelled"]
+    assert progress[0] == (0, 3) and progress[-1] == (3, 3)
+    for invoice_id in invoice_ids[:3]:
+        file_path = db.fetchone("SELECT file_path FROM invoices WHERE id = ?", (invoice_id,))[0]
+        assert file_path.startswith(out_dir) and os.path.getsize(file_path) > 0
+    assert not [name for _, _, names in os.walk(out_dir) for name in names if name.endswith(".part")]
+    assert os.path.dirname(file_path) == os.path.join(out_dir, "24-25", "2024-04")
+    print("✓ Missing invoices regenerated on a process pool")
+
+    # Lose one file, as after a partial restore, then run over everything
+    lost = db.fetchone("SELECT file_path FROM invoices WHERE id = ?", (invoice_ids[1],))[0]
+    os.remove(lost)
+    summary = regenerate_missing(db, workers=2, invoices_dir=out_dir)
+
+    assert summary["selected"] == 4 and summary["skipped"] == 2
+    assert summary["regenerated"] == 1 and os.path.isfile(lost)
+    (failed_id, failed_number, _), = summary["failed"]
+    assert failed_id == invoice_ids[3] and failed_number == "24-25/AGT-004"
+    print("✓ Present files skipped and failures reported")
+    db.close()
+
+def test_workers_use_the_configured_cache():
+    """Pool workers write to the parent's output cache, and skip it when it is turned off"""
+    def cached_files(directory):
+        return [name for _, _, names in os.walk(directory) for name in names]
+
+    try:
+        db, _ = make_db()
+        cache_dir = tempfile.mkdtemp()
+        configure_output_cache(cache_dir, 10 * 1024 * 1024)
+        assert regenerate_missing(db, "2024-04-01", "2024-04-03", workers=2,
+                                  invoices_dir=tempfile.mkdtemp())["regenerated"] == 3
+        assert len(cached_files(cache_dir)) == 3
+        db.close()
+
+        db, _ = make_db()
+        configure_output_cache(cache_dir, 0)
+        assert regenerate_missing(db, "2024-04-01", "2024-04-03", workers=2,
+                                  invoices_dir=tempfile.mkdtemp())["regenerated"] == 3
+        print("✓ Workers follow the configured output cache")
+        db.close()
+    finally:
+        configure_output_cache()
+
+def test_export_excel():
+    """A date range exports to one workbook; invoices without items are reported"""
+    db, invoice_ids = make_db()
+    out_path = os.path.join(tempfile.mkdtemp(), "april.xlsx")
+
+    summary = export_excel(db, "2024-04-02", "2024-04-04", out_path)
+
+    assert summary["selected"] == 3 and summary["exported"] == 2 and summary["paths"] == [out_path]
+    (failed_id, failed_number, _), = summary["failed"]
+    assert failed_id == invoice_ids[3] and failed_number == "24-25/AGT-004"
+    assert openpyxl.load_workbook(out_path).sheetnames == ["24-25-AGT-002", "24-25-AGT-003"]
+    print("✓ Invoices for a date range exported to Excel")
+    db.close()
+
+def page_count(path):
+    with open(path, "rb") as f:
+        return len(re.findall(rb"/Type /Page\b(?!s)", f.read()))
+
+def test_export_pdf():
+    """A date range merges into one PDF, a page per invoice, or splits into parts"""
+    db, invoice_ids = make_db()
+    out_dir = tempfile.mkdtemp()
+    out_path = os.path.join(out_dir, "april.pdf")
+
+    summary = export_pdf(db, "2024-04-01", "2024-04-04", out_path)
+
+    assert summary["selected"] == 4 and summary["exported"] == 3 and summary["paths"] == [out_path]
+    (failed_id, _, _), = summary["failed"]
+    assert failed_id == invoice_ids[3]
+    assert page_count(out_path) == 3
+    print("✓ Invoices for a date range merged into one PDF")
+
+    summary = export_pdf(db, save_path=out_path, split_pages=2)
+    assert [os.path.basename(path) for path in summary["paths"]] == ["april-001.pdf", "april-002.pdf"]
+    assert [page_count(path) for path in summary["paths"]] == [2, 1]
+    assert export_pdf(db, save_path=out_path, split_pages=5)["paths"] == [out_path]
+    assert not [name for name in os.listdir(out_dir) if name.endswith(".part")]
+    print("✓ Merged PDF split every N pages")
+    db.close()
+
+if __name__ == "__main__":
+    test_date_range_selection()
+    test_regenerates_missing_and_resumes()
+    test_workers_use_the_configured_cache()
+    test_export_excel()
+    test_export_pdf()
+    print("\nAll invoice regeneration tests passed!")
@@ -0,0 +1,92 @@
+"""
+Test the per financial year invoice number sequences
+"""
+import os
+import datetime
+import tempfile
+import threading
+
+from database.db_handler import DBHandler
+from utils.helpers import financial_year, next_invoice_number
+
+def test_financial_year():
+    """Financial year starts on April 1st"""
+    assert financial_year(datetime.date(2024, 4, 1)) == "24-25"
+    assert financial_year(datetime.date(2025, 3, 31)) == "24-25"
+    assert financial_year(datetime.datetime(2099, 12, 1, 10, 30)) == "99-00"
+    print("✓ Financial year labels correct")
+
+def test_sequence_increments_and_rolls_back():
+    """Numbers increase per prefix and a rolled back sale gives its number back"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_sequences.db"))
+    day = datetime.date(2024, 6, 1)
+    
+    with db.transaction():
+        assert next_invoice_number(db, "AGT", day) == "24-25/AGT-001"
+    with db.transaction():
+        assert next_invoice_number(db, "AGT", day) == "24-25/AGT-002"
+        assert next_invoice_number(db, "SHOP", day) == "24-25/SHOP-001"
+    
+    try:
+        with db.transaction():
+            next_invoice_number(db, "AGT", day)
+            raise RuntimeError("sale failed")
+    except RuntimeError:
+        pass
+    
+    with db.transaction():
+        assert next_invoice_number(db, "AGT", day) == "24-25/AGT-003"
+        # A new financial year starts again from 1
+        assert next_invoice_number(db, "AGT", datetime.date(2025, 4, 1)) == "25-26/AGT-001"
+    print("✓ Sequences increment and roll back with the sale")
+    db.close()
+
+def test_backfill_from_existing_invoices():
+    """Upgrading continues numbering after the highest invoice already issued"""
+    db_path = os.path.join(tempfile.mkdtemp(), "test_sequences.db")
+    db = DBHandler(db_path)
+    db.insert("sales", {"customer_id": 1, "invoice_number": "24-25/AGT-007", "subtotal": 10, "total": 10})
+    db.insert("invoices", {"invoice_number": "24-25/AGT-012", "customer_id": 1, "subtotal": 10, "total_amount": 10})
+    db.insert("invoices", {"invoice_number": "INV-LEGACY", "customer_id": 1, "subtotal": 10, "total_amount": 10})
+    db.execute("DROP TABLE invoice_sequences")
+    db.execute("PRAGMA user_version = 3")
+    db.commit()
+    db.close()
+    
+    db = DBHandler(db_path)
+    with db.transaction():
+        assert next_invoice_number(db, "AGT", datetime.date(2024, 6, 1)) == "24-25/AGT-013"
+    print("✓ Backfill continues after the highest existing number")
+    db.close()
+
+def test_concurrent_checkouts_get_unique_numbers():
+    """Separate connections never receive the same invoice number"""
+    db_path = os.path.join(tempfile.mkdtemp(), "test_sequences.db")
+    DBHandler(db_path).close()
+    numbers = []
+    lock = threading.Lock()
+    
+    def checkout():
+        db = DBHandler(db_path)
+        for _ in range(20):
+            with db.transaction():
+                number = next_invoice_number(db, "AGT", datetime.date(2024, 6, 1))
+            with lock:
+                numbers.append(number)
+        db.close()
+    
+    threads = [threading.Thread(target=checkout) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert len(numbers) == 80 and len(set(numbers)) == 80
+    print("✓ 80 concurrent checkouts received unique numbers")
+
+if __name__ == "__main__":
+    test_financial_year()
+    test_sequence_increments_and_rolls_back()
+    test_backfill_from_existing_invoices()
+    test_concurrent_checkouts_get_unique_numbers()
+    print("\nTests completed")
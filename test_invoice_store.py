@@ -0,0 +1,130 @@
+"""
+Test the sharded invoice file store and its monthly packs
+"""
+import datetime
+import os
+import tempfile
+import zipfile
+
+from database.db_handler import DBHandler
+from utils.invoice_regen import file_missing
+from utils.invoice_store import PACK_INDEX, InvoiceStore, invoice_month, invoice_store
+
+def make_store():
+    return InvoiceStore(os.path.join(tempfile.mkdtemp(), "invoices"), cache_dir=tempfile.mkdtemp())
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def test_month_folders():
+    """Invoices are filed by financial year and month, whatever the date format"""
+    assert invoice_month("2025-03-31 18:00:00") == ("24-25", "2025-03")
+    assert invoice_month("01/04/2025") == ("25-26", "2025-04")
+    assert invoice_month(datetime.date(2024, 12, 5)) == ("24-25", "2024-12")
+    assert invoice_month("not a date") == invoice_month(datetime.date.today())
+
+    store = make_store()
+    path = store.path_for("AGT_24-25-AGT-001.pdf", "15/02/2025")
+    assert path == os.path.join(store.root, "24-25", "2025-02", "AGT_24-25-AGT-001.pdf")
+    assert os.path.isdir(os.path.dirname(path))
+    print("✓ Invoice files sharded by financial year and month")
+
+def test_pack_and_locate():
+    """Closed months are zipped with an index and read back through the cache"""
+    store = make_store()
+    february = [write(store.path_for(f"AGT-{n}.pdf", "2025-02-10"), b"%PDF february " + bytes([n]))
+                for n in range(3)]
+    current = write(store.path_for("AGT-9.pdf", "2025-04-02"), b"%PDF april")
+
+    summary = store.pack_closed_months(today=datetime.date(2025, 4, 20))
+
+    assert summary == {"months": ["24-25/2025-02"], "files": 3}
+    assert not os.path.exists(os.path.dirname(february[0])) and os.path.isfile(current)
+    with zipfile.ZipFile(os.path.join(store.root, "24-25", "2025-02.zip")) as pack:
+        assert sorted(pack.namelist()) == ["AGT-0.pdf", "AGT-1.pdf", "AGT-2.pdf", PACK_INDEX]
+    print("✓ Closed month packed, current month left open")
+
+    assert store.exists(february[1]) and not store.exists(february[1].replace("AGT-1", "AGT-7"))
+    extracted = store.locate(february[1])
+    assert extracted.startswith(store.cache_dir)
+    with open(extracted, "rb") as f:
+        assert f.read() == b"%PDF february \x01"
+    assert store.locate(february[1]) == extracted
+    assert store.locate(current) == current
+    print("✓ Packed invoice extracted on demand")
+
+    # An invoice regenerated into a packed month joins the existing pack
+    late = write(store.path_for("AGT-5.pdf", "2025-02-28"), b"%PDF late")
+    assert store.pack_closed_months(today=datetime.date(2025, 4, 20))["files"] == 1
+    assert store.exists(late) and store.exists(february[0])
+    assert store.pack_index(os.path.join(store.root, "24-25", "2025-02.zip"))["AGT-5.pdf"] == 9
+    print("✓ Late invoices merged into an existing pack")
+
+def test_file_rewritten_while_packing():
+    """A file written again while its month is packed stays in the folder for the next run"""
+    store = make_store()
+    first = write(store.path_for("AGT-1.pdf", "2025-02-10"), b"%PDF old")
+    second = write(store.path_for("AGT-2.pdf", "2025-02-10"), b"%PDF other")
+    version = store._version
+
+    def rewrite_after_stat(path):
+        result = version(path)
+        if path == first:
+            write(first, b"%PDF regenerated")  # a regeneration lands after the stat
+        return result
+    store._version = rewrite_after_stat
+    store.pack_month("24-25", "2025-02")
+    del store._version
+
+    assert os.path.isfile(first) and not os.path.exists(second)
+    with open(store.locate(first), "rb") as f:
+        assert f.read() == b"%PDF regenerated"
+    store.pack_month("24-25", "2025-02")
+    assert not os.path.exists(first)
+    with open(store.locate(first), "rb") as f:
+        assert f.read() == b"%PDF regenerated"
+    print("✓ Files changed during packing kept and packed next time")
+
+def test_legacy_files_and_regeneration():
+    """Flat legacy files move into month folders; packed invoices are not regenerated"""
+    root = os.path.join(tempfile.mkdtemp(), "invoices")
+    os.makedirs(root)
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_invoice_store.db"))
+    legacy = write(os.path.join(root, "AGT_24-25-AGT-001.pdf"), b"%PDF legacy")
+    invoice_id = db.insert("invoices", {"invoice_number": "24-25/AGT-001", "customer_id": 1, "subtotal": 1,
+                                        "total_amount": 1, "invoice_date": "2024-05-06 10:00:00",
+                                        "file_path": legacy})
+    store = invoice_store(root)
+
+    assert store.shard_existing(db) == 1
+    file_path = db.fetchone("SELECT file_path FROM invoices WHERE id = ?", (invoice_id,))[0]
+    assert file_path == os.path.join(root, "24-25", "2024-05", "AGT_24-25-AGT-001.pdf")
+    assert os.path.isfile(file_path) and not os.path.exists(legacy)
+    print("✓ Legacy invoice files moved into month folders")
+
+    # A run stopped after moving a file but before writing its row is repaired
+    legacy = write(os.path.join(root, "AGT_24-25-AGT-003.pdf"), b"%PDF legacy")
+    moved_id = db.insert("invoices", {"invoice_number": "24-25/AGT-003", "customer_id": 1, "subtotal": 1,
+                                      "total_amount": 1, "invoice_date": "2024-05-07 10:00:00",
+                                      "file_path": legacy})
+    os.replace(legacy, store.path_for("AGT_24-25-AGT-003.pdf", "2024-05-07"))
+    assert store.shard_existing(db) == 1
+    file_path_3 = db.fetchone("SELECT file_path FROM invoices WHERE id = ?", (moved_id,))[0]
+    assert file_path_3 == os.path.join(root, "24-25", "2024-05", "AGT_24-25-AGT-003.pdf")
+    assert store.shard_existing(db) == 0
+    print("✓ Rows of files moved by an interrupted run repaired")
+
+    store.pack_closed_months(today=datetime.date(2025, 1, 1))
+    assert not os.path.isfile(file_path) and not file_missing(file_path, root)
+    assert file_missing(file_path.replace("001", "002"), root) and file_missing(None, root)
+    print("✓ Packed invoices count as present")
+    db.close()
+
+if __name__ == "__main__":
+    test_month_folders()
+    test_pack_and_locate()
+    test_file_rewritten_while_packing()
+    test_legacy_files_and_regeneration()
+    print("\nAll invoice store tests passed!")
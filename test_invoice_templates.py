@@ -0,0 +1,66 @@
+"""
+Test the compiled invoice template cache used by the ReportLab generators
+"""
+import io
+
+from reportlab import rl_config
+
+from utils import invoice_generator
+from utils.invoice_templates import clear_template_cache, compiled_template
+
+def sample_invoice(lines=2, **store_info):
+    return {
+        "invoice_number": "25-26/AGT-001",
+        "date": "01-04-2025",
+        "time": "10:00",
+        "store_info": store_info,
+        "customer": {"name": "Ramesh Patil", "phone": "9876543210"},
+        "items": [{"name": f"Item {i}", "hsn_code": "3808", "quantity": 2, "price": 118, "total": 236}
+                  for i in range(1, lines + 1)],
+        "payment": {"subtotal": 236 * lines, "cgst": 18 * lines, "sgst": 18 * lines, "total": 236 * lines},
+    }
+
+def render(invoice_data):
+    return invoice_generator.generate_shop_bill_template(invoice_data, io.BytesIO())
+
+def test_compiled_once_per_settings_version():
+    """The template is reused until the shop settings change"""
+    clear_template_cache()
+    compiled = []
+
+    def compile(store_info):
+        compiled.append(store_info)
+        return object()
+
+    first = compiled_template("test", {"shop_name": "Agritech"}, compile)
+    assert compiled_template("test", {"shop_name": "Agritech"}, compile) is first
+    assert len(compiled) == 1
+
+    second = compiled_template("test", {"shop_name": "Agritech", "shop_phone": "020 123456"}, compile)
+    assert second is not first and len(compiled) == 2
+    assert compiled_template("other", {"shop_name": "Agritech"}, compile) is not first
+    clear_template_cache()
+    assert compiled_template("test", {"shop_name": "Agritech", "shop_phone": "020 123456"}, compile) is not second
+    print("✓ Templates compiled once per settings version")
+
+def test_cached_render_matches_fresh_render():
+    """Reusing the compiled template gives the same PDF as compiling it again"""
+    invariant = rl_config.invariant
+    rl_config.invariant = 1  # fixed timestamps and document ids
+    try:
+        clear_template_cache()
+        fresh = render(sample_invoice(3, name="Agritech"))
+        render(sample_invoice(40, name="Agritech"))
+        cached = render(sample_invoice(3, name="Agritech"))
+        assert isinstance(fresh, bytes) and fresh == cached
+
+        renamed = render(sample_invoice(3, name="Krishi Kendra"))
+        assert renamed != cached
+    finally:
+        rl_config.invariant = invariant
+    print("✓ Cached template renders the same PDF and follows shop changes")
+
+if __name__ == "__main__":
+    test_compiled_once_per_settings_version()
+    test_cached_render_matches_fresh_render()
+    print("\nAll invoice template tests passed!")
@@ -0,0 +1,88 @@
+"""
+Test the versioned schema migration runner.
+"""
+import os
+import sqlite3
+import tempfile
+
+from database.db_handler import DBHandler
+from database.migrations import SCHEMA_VERSION, fts5_trigram_supported, get_schema_version, run_migrations
+
+def column_names(db, table):
+    return [col[1] for col in db.fetchall(f"PRAGMA table_info({table})")]
+
+def test_new_database_is_current():
+    """A freshly created database ends up at the latest schema version"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_migrations.db"))
+    
+    assert get_schema_version(db) == SCHEMA_VERSION
+    assert "tax_percentage" in column_names(db, "sale_items")
+    assert "credit_amount" in column_names(db, "payment_splits")
+    assert "credit_payment_method" in column_names(db, "invoices")
+    assert "hsn_code" in column_names(db, "invoice_items")
+    print(f"✓ New database at schema version {SCHEMA_VERSION}")
+    db.close()
+
+def test_legacy_database_upgraded():
+    """A database from before migrations is upgraded and keeps its rows"""
+    db_path = os.path.join(tempfile.mkdtemp(), "test_legacy.db")
+    
+    # Old layout: sale_items.tax_rate, no credit columns, no customer_payments
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE settings (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, value TEXT);
+        CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+        CREATE TABLE sales (id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL, invoice_number TEXT UNIQUE NOT NULL,
+                            subtotal REAL NOT NULL, discount REAL DEFAULT 0, tax REAL DEFAULT 0, total REAL NOT NULL,
+                            payment_type TEXT NOT NULL, payment_reference TEXT, sale_date TIMESTAMP, user_id INTEGER);
+        CREATE TABLE sale_items (id INTEGER PRIMARY KEY, sale_id INTEGER NOT NULL, product_id INTEGER,
+                                 product_name TEXT NOT NULL, hsn_code TEXT, quantity INTEGER NOT NULL, price REAL NOT NULL,
+                                 discount_percent REAL DEFAULT 0, tax_rate REAL DEFAULT 0, tax_amount REAL DEFAULT 0,
+                                 total REAL NOT NULL);
+        CREATE TABLE payment_splits (id INTEGER PRIMARY KEY, sale_id INTEGER NOT NULL, cash_amount REAL DEFAULT 0,
+                                     upi_amount REAL DEFAULT 0, upi_reference TEXT);
+        CREATE TABLE invoices (id INTEGER PRIMARY KEY, invoice_number TEXT UNIQUE NOT NULL, customer_id INTEGER,
+                               subtotal REAL NOT NULL, total_amount REAL NOT NULL, invoice_date TIMESTAMP);
+        CREATE TABLE invoice_items (id INTEGER PRIMARY KEY, invoice_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+                                    quantity INTEGER NOT NULL, price_per_unit REAL NOT NULL, total_price REAL NOT NULL);
+        INSERT INTO products (id, name) VALUES (1, 'Urea');
+        INSERT INTO sales (id, customer_id, invoice_number, subtotal, total, payment_type)
+            VALUES (1, 1, '24-25/AGT-001', 100, 100, 'CASH');
+        INSERT INTO sale_items (sale_id, product_name, quantity, price, tax_rate, total)
+            VALUES (1, 'Urea', 2, 50, 5, 100);
+    """)
+    conn.commit()
+    conn.close()
+    
+    db = DBHandler(db_path)
+    assert db.is_initialized
+    assert get_schema_version(db) == SCHEMA_VERSION
+    assert db.fetchone("SELECT tax_percentage FROM sale_items")[0] == 5
+    assert "customer_payments" in [r[0] for r in db.fetchall("SELECT name FROM sqlite_master WHERE type='table'")]
+    assert "cgst" in column_names(db, "sales")
+    print("✓ Legacy database upgraded with data preserved")
+    
+    # The sale now lives in invoices only; sales and sale_items are views over it
+    views = [r[0] for r in db.fetchall("SELECT name FROM sqlite_master WHERE type='view'")]
+    assert {"sales", "sale_items", "payment_splits"} <= set(views)
+    invoice = db.fetchone("SELECT id, total_amount, payment_method FROM invoices WHERE invoice_number = '24-25/AGT-001'")
+    assert invoice[1:] == (100, "CASH")
+    assert db.fetchone("SELECT product_name, quantity, tax_percentage FROM invoice_items WHERE invoice_id = ?",
+                       (invoice[0],)) == ("Urea", 2, 5)
+    assert db.fetchone("SELECT id, total FROM sales")[0] == invoice[0]
+    print("✓ Sales merged into invoices")
+    
+    # Existing products are indexed for search
+    if fts5_trigram_supported(db):
+        assert db.fetchall("SELECT rowid FROM products_fts WHERE products_fts MATCH 'urea'") == [(1,)]
+        print("✓ Products indexed for search")
+    
+    # Running again is a no-op
+    assert run_migrations(db) == SCHEMA_VERSION
+    print("✓ Second run applied nothing")
+    db.close()
+
+if __name__ == "__main__":
+    test_new_database_is_current()
+    test_legacy_database_upgraded()
+    print("\nTests completed")
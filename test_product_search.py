@@ -0,0 +1,106 @@
+"""
+Test ranked product search and the products_fts index
+"""
+import os
+import tempfile
+import time
+
+from database.db_handler import DBHandler
+from database.product_search import search_product_ids, has_search_index
+
+def make_db():
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_search.db"))
+    db.execute("DELETE FROM products")
+    db.commit()
+    return db
+
+def add_product(db, name, code, **extra):
+    return db.insert("products", dict(name=name, product_code=code, wholesale_price=1, selling_price=2, **extra))
+
+def drop_search_index(db):
+    for trigger in ("products_fts_insert", "products_fts_delete", "products_fts_update"):
+        db.execute(f"DROP TRIGGER {trigger}")
+    db.execute("DROP TABLE products_fts")
+    db.commit()
+
+def test_ranking():
+    """Exact code beats prefix, prefix beats substring"""
+    db = make_db()
+    assert has_search_index(db)
+    substring = add_product(db, "Organic UREA blend", "FERT010")
+    prefix = add_product(db, "Urea granules", "FERT002")
+    exact = add_product(db, "Nitrogen mix", "UREA")
+    other = add_product(db, "Neem oil", "PEST001", manufacturer="Urea Works")
+    add_product(db, "Seeds", "SEED001")
+    
+    assert search_product_ids(db, "urea") == [exact, prefix, substring, other]
+    assert search_product_ids(db, "  Urea  ", limit=2) == [exact, prefix]
+    assert search_product_ids(db, "") == []
+    print("✓ Results ranked exact > prefix > substring")
+    db.close()
+
+def test_index_follows_products():
+    """Triggers keep the index in step with inserts, updates and deletes"""
+    db = make_db()
+    product_id = add_product(db, "Mancozeb 75% WP", "FUNG001", category="Fungicide")
+    
+    assert search_product_ids(db, "gicid") == [product_id]
+    assert search_product_ids(db, '75% "wp') == []
+    assert search_product_ids(db, "75% wp") == [product_id]
+    
+    db.update("products", {"name": "Copper oxychloride"}, f"id = {product_id}")
+    assert search_product_ids(db, "mancozeb") == []
+    assert search_product_ids(db, "oxychlor") == [product_id]
+    
+    db.update("products", {"selling_price": 5}, f"id = {product_id}")
+    assert search_product_ids(db, "oxychlor") == [product_id]
+    
+    db.delete("products", f"id = {product_id}")
+    assert search_product_ids(db, "oxychlor") == []
+    print("✓ Index kept in sync by triggers")
+    db.close()
+
+def test_short_terms_and_fallback():
+    """Short terms and databases without the index use the LIKE-style scan"""
+    db = make_db()
+    seeds = add_product(db, "Seeds", "S1")
+    urea = add_product(db, "Urea", "U1", vendor="Krishi Traders")
+    
+    assert search_product_ids(db, "u1") == [urea]
+    
+    drop_search_index(db)
+    assert not has_search_index(db)
+    assert search_product_ids(db, "krishi") == [urea]
+    assert search_product_ids(db, "s") == [seeds, urea]
+    print("✓ Scan fallback returns the same matches")
+    db.close()
+
+def test_large_catalog():
+    """Search-as-you-type stays fast on a 50k product catalog"""
+    db = make_db()
+    words = ["Seed", "Urea", "Neem", "Potash", "Sulphur", "Zinc", "Humic", "Mulch"]
+    with db.transaction():
+        db.insert_many("products", [
+            {"name": f"{words[i % 8]} {words[i // 8 % 8]} grade {i}", "product_code": f"P{i:06d}",
+             "description": "Agricultural input", "wholesale_price": 1, "selling_price": 2}
+            for i in range(50000)
+        ])
+    
+    for term in ("p012345", "potash zinc", "grade 4999"):
+        search_product_ids(db, term)
+        start = time.perf_counter()
+        for _ in range(10):
+            ids = search_product_ids(db, term)
+        elapsed_ms = (time.perf_counter() - start) * 100
+        assert ids and elapsed_ms < 100
+        print(f"✓ '{term}': {len(ids)} results in {elapsed_ms:.2f} ms")
+    
+    assert search_product_ids(db, "P012345")[0] == db.fetchone("SELECT id FROM products WHERE product_code = 'P012345'")[0]
+    db.close()
+
+if __name__ == "__main__":
+    test_ranking()
+    test_index_follows_products()
+    test_short_terms_and_fallback()
+    test_large_catalog()
+    print("\nAll product search tests passed!")
@@ -0,0 +1,74 @@
+"""
+Test the opt-in query profiler of DBHandler
+"""
+import os
+import json
+import tempfile
+
+from database.db_handler import DBHandler
+
+def make_db():
+    return DBHandler(os.path.join(tempfile.mkdtemp(), "test_profiler.db"))
+
+def test_disabled_by_default():
+    """Nothing is recorded unless profiling is enabled, and action() is a no-op"""
+    db = make_db()
+    assert db.profiler is None
+    with db.action("checkout"):
+        db.fetchall("SELECT * FROM settings")
+    assert db.profiler is None
+    print("✓ Profiling is opt-in")
+    db.close()
+
+def test_statements_and_actions():
+    """Statements are timed and counted per action, exposing N+1 loops"""
+    db = make_db()
+    profiler = db.enable_profiling(slow_ms=10000)
+    
+    with db.action("open_customer_list"):
+        customers = db.fetchall("SELECT id FROM customers")
+        for (customer_id,) in customers:
+            db.fetchone("SELECT name FROM customers WHERE id = ?", (customer_id,))
+    db.insert("expenses", {"expense_date": "2025-04-01", "category": "Rent", "amount": 1})
+    
+    report = profiler.report()
+    by_sql = {stats["sql"]: stats for stats in report["statements"]}
+    lookup = by_sql["SELECT name FROM customers WHERE id = ?"]
+    assert lookup["count"] == len(customers)
+    assert lookup["rows"] == len(customers)
+    assert lookup["param_shapes"] == ["(int)"]
+    assert lookup["plan"] is None
+    
+    action = report["actions"]["open_customer_list"]
+    assert action["runs"] == 1
+    assert action["statements"] == len(customers) + 1
+    assert action["by_sql"]["SELECT name FROM customers WHERE id = ?"] == len(customers)
+    assert any(sql.startswith("INSERT INTO expenses") for sql in by_sql)
+    print(f"✓ {action['statements']} statements counted for open_customer_list")
+    db.close()
+
+def test_slow_query_plan_and_dump():
+    """Slow statements get their query plan captured and the report dumps as JSON"""
+    db = make_db()
+    profiler = db.enable_profiling(slow_ms=0)
+    db.fetchall("SELECT * FROM invoices WHERE invoice_date >= ? AND invoice_date < ?",
+                ("2025-04-01", "2025-05-01"))
+    
+    path = profiler.dump(os.path.join(tempfile.mkdtemp(), "profile.json"))
+    with open(path) as f:
+        report = json.load(f)
+    
+    stats = [s for s in report["statements"] if s["sql"].startswith("SELECT * FROM invoices")][0]
+    assert stats["slow_count"] == 1
+    assert any("idx_invoices_date" in detail for detail in stats["plan"]), stats["plan"]
+    
+    assert db.disable_profiling() is profiler
+    assert db.profiler is None
+    print(f"✓ Plan captured: {stats['plan']}")
+    db.close()
+
+if __name__ == "__main__":
+    test_disabled_by_default()
+    test_statements_and_actions()
+    test_slow_query_plan_and_dump()
+    print("\nTests completed")
@@ -0,0 +1,84 @@
+"""
+Test the text and ESC/POS receipt renderer
+"""
+import os
+import tempfile
+import time
+
+from utils.receipt_renderer import (ESC_FEED_CUT, ESC_INIT, invoice_outputs, receipt_path, render_escpos,
+                                    render_text, write_receipt)
+
+def sample_invoice():
+    return {
+        "invoice_number": "25-26/AGT-007",
+        "date": "01/04/2025",
+        "time": "03:30 PM",
+        "store_info": {"name": "Agritech Krishi Kendra", "address": "Main Road, Wagholi", "gstin": "27AABCU9603R1ZX"},
+        "customer": {"name": "Ramesh Patil", "phone": "9876543210"},
+        "items": [
+            {"name": "Neem Oil Pesticide 1 Litre Concentrate", "hsn_code": "3808", "batch_no": "B12",
+             "quantity": 2, "price": 118, "discount": 0, "total": 236},
+            {"name": "Urea", "hsn_code": "3102", "quantity": 1.5, "price": 105, "discount": 5, "total": 149.63},
+        ],
+        "payment": {"subtotal": 385.63, "discount": 0, "total": 385.63, "method": "SPLIT", "status": "PAID",
+                    "taxable_value": 343.75, "cgst": 20.94, "sgst": 20.94,
+                    "tax_rates": [{"rate": 18, "taxable": 200, "cgst": 18, "sgst": 18},
+                                  {"rate": 5, "taxable": 143.75, "cgst": 2.94, "sgst": 2.94}],
+                    "split": {"cash_amount": 185.63, "upi_amount": 200, "upi_reference": "UPI42", "credit_amount": 0}},
+    }
+
+def test_text_receipt():
+    """The text receipt has the items, GST breakup, amount in words and payment split"""
+    text = render_text(sample_invoice())
+    lines = text.splitlines()
+
+    assert lines[0].strip() == "Agritech Krishi Kendra"
+    assert "25-26/AGT-007" in text and "01/04/2025 03:30 PM" in text
+    assert "Neem Oil" in text and "Batch B12" in text and "Disc 5%" in text
+    assert any(line.startswith("18%") and line.endswith("18.00") for line in lines)
+    assert any(line.startswith("5%") and line.endswith("2.94") for line in lines)
+    assert "Three Hundred and Eighty Five Rupees" in text
+    assert "UPI ref: UPI42" in text
+    assert max(len(line) for line in lines) <= 48
+    assert max(len(line) for line in render_text(sample_invoice(), 32).splitlines()) <= 32
+    print("✓ Text receipt rendered within the paper width")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        render_text(sample_invoice())
+    assert (time.perf_counter() - start) / 100 < 0.005
+    print("✓ Receipt renders in well under a PDF's time")
+
+def test_escpos_receipt():
+    """The ESC/POS stream initialises the printer, carries the text and ends with a cut"""
+    data = render_escpos(sample_invoice())
+    assert data.startswith(ESC_INIT) and data.endswith(ESC_FEED_CUT)
+    assert b"25-26/AGT-007" in data and b"\x1d!\x11Agritech Krishi Kendra\n\x1d!\x00" in data
+    print("✓ ESC/POS receipt framed for the printer")
+
+def test_write_receipt():
+    """Receipts land in the spool folder under the invoice number"""
+    spool_dir = os.path.join(tempfile.mkdtemp(), "receipts")
+    path = receipt_path("25-26/AGT-007", spool_dir, "escpos")
+    assert os.path.basename(path) == "25-26-AGT-007.bin"
+    assert write_receipt(sample_invoice(), path, "escpos") == path
+    with open(path, "rb") as f:
+        assert f.read() == render_escpos(sample_invoice())
+    assert os.listdir(spool_dir) == ["25-26-AGT-007.bin"]
+    print("✓ Receipt written to the spool folder")
+
+def test_invoice_outputs():
+    """Each payment type prints a PDF, a receipt or both"""
+    config = {"invoice_output": {"CASH": "receipt", "UPI": "both"}}
+    assert invoice_outputs(config, "CASH") == ["receipt"]
+    assert invoice_outputs(config, "UPI") == ["pdf", "receipt"]
+    assert invoice_outputs(config, "CREDIT") == ["pdf"]
+    assert invoice_outputs({}, "SPLIT") == ["pdf"]
+    print("✓ Checkout outputs chosen per payment type")
+
+if __name__ == "__main__":
+    test_text_receipt()
+    test_escpos_receipt()
+    test_write_receipt()
+    test_invoice_outputs()
+    print("\nAll receipt renderer tests passed!")
@@ -0,0 +1,57 @@
+"""
+Test the report indexes and the sargable date range predicate.
+"""
+import os
+import datetime
+import tempfile
+
+from database.db_handler import DBHandler
+from utils.helpers import date_range_clause
+
+def test_date_range_clause():
+    """The predicate is half-open and covers the whole last day"""
+    clause, params = date_range_clause("i.invoice_date", datetime.date(2025, 3, 1), "2025-03-31")
+    
+    assert clause == "i.invoice_date >= ? AND i.invoice_date < ?"
+    assert params == ["2025-03-01", "2025-04-01"]
+    
+    # A single day defaults the end to the start
+    assert date_range_clause("invoice_date", "2024-12-31")[1] == ["2024-12-31", "2025-01-01"]
+    print("✓ Half-open date range built correctly")
+
+def test_range_matches_date_between():
+    """The new predicate selects exactly the rows DATE() BETWEEN did"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_indexes.db"))
+    
+    timestamps = ["2025-03-31 23:59:59", "2025-04-01 00:00:00", "2025-04-15 12:30:00",
+                  "2025-04-30 23:59:59", "2025-05-01 00:00:00"]
+    for i, ts in enumerate(timestamps):
+        db.insert("invoices", {"invoice_number": f"T-{i}", "customer_id": 1, "subtotal": 10,
+                               "total_amount": 10, "invoice_date": ts})
+    
+    old = db.fetchall("SELECT id FROM invoices WHERE DATE(invoice_date) BETWEEN ? AND ? ORDER BY id",
+                      ("2025-04-01", "2025-04-30"))
+    clause, params = date_range_clause("invoice_date", "2025-04-01", "2025-04-30")
+    new = db.fetchall(f"SELECT id FROM invoices WHERE {clause} ORDER BY id", params)
+    
+    assert old == new and len(new) == 3
+    print("✓ Same rows as DATE() BETWEEN")
+    db.close()
+
+def test_report_query_uses_index():
+    """Date-range report queries search the invoice_date index instead of scanning"""
+    db = DBHandler(os.path.join(tempfile.mkdtemp(), "test_indexes.db"))
+    
+    clause, params = date_range_clause("invoice_date", "2025-04-01", "2025-04-30")
+    plan = db.fetchall(f"EXPLAIN QUERY PLAN SELECT SUM(total_amount) FROM invoices WHERE {clause}", params)
+    details = " ".join(row[-1] for row in plan)
+    
+    assert "idx_invoices_date" in details, details
+    print(f"✓ Query plan: {details}")
+    db.close()
+
+if __name__ == "__main__":
+    test_date_range_clause()
+    test_range_matches_date_between()
+    test_report_query_uses_index()
+    print("\nTests completed")
@@ -11,7 +11,8 @@ import traceback
 from decimal import Decimal
 
 from assets.styles import COLORS, FONTS, STYLES
-from utils.helpers import format_currency, parse_currency
+from database.profiler import profiled
+from utils.helpers import format_currency, parse_currency, date_range_clause
 from utils.export import export_to_excel
 
 class AccountingFrame(tk.Frame):
@@ -332,6 +333,7 @@ class AccountingFrame(tk.Frame):
         # Default fallback
         return today - datetime.timedelta(days=30), today
     
+    @profiled("load_profit_loss")
     def load_profit_loss(self):
         """Load and display profit & loss report with enhanced visual elements"""
         # Get date range
@@ -369,18 +371,20 @@ class AccountingFrame(tk.Frame):
         date_label.pack(pady=(0, 20))
         
         # Get revenue data
-        revenue_query = """
+        date_clause, date_params = date_range_clause("invoice_date", start_date, end_date)
+        revenue_query = f"""
             SELECT 
                 SUM(total_amount) as total_revenue,
                 SUM(discount_amount) as total_discount,
                 SUM(tax_amount) as total_tax
             FROM invoices
-            WHERE DATE(invoice_date) BETWEEN ? AND ?
+            WHERE {date_clause}
         """
-        revenue_data = self.controller.db.fetchone(revenue_query, (start_date_str, end_date_str))
+        revenue_data = self.controller.db.fetchone(revenue_query, date_params)
         
         # Get cost of goods sold
-        cogs_query = """
+        date_clause, date_params = date_range_clause("i.invoice_date", start_date, end_date)
+        cogs_query = f"""
             SELECT 
                 SUM(ii.quantity * p.wholesale_price) as total_cogs
             FROM 
@@ -390,18 +394,19 @@ class AccountingFrame(tk.Frame):
             JOIN 
                 products p ON ii.product_id = p.id
             WHERE 
-                DATE(i.invoice_date) BETWEEN ? AND ?
+                {date_clause}
         """
-        cogs_data = self.controller.db.fetchone(cogs_query, (start_date_str, end_date_str))
+        cogs_data = self.controller.db.fetchone(cogs_query, date_params)
         
         # Get expense data
-        expense_query = """
+        date_clause, date_params = date_range_clause("expense_date", start_date, end_date)
+        expense_query = f"""
             SELECT 
                 SUM(amount) as total_expenses
             FROM expenses
-            WHERE DATE(expense_date) BETWEEN ? AND ?
+            WHERE {date_clause}
         """
-        expense_data = self.controller.db.fetchone(expense_query, (start_date_str, end_date_str))
+        expense_data = self.controller.db.fetchone(expense_query, date_params)
         
         # Extract values (handle None values)
         total_revenue = revenue_data[0] if revenue_data and revenue_data[0] else 0
@@ -842,6 +847,7 @@ class AccountingFrame(tk.Frame):
         # Default fallback
         return today - datetime.timedelta(days=30), today
     
+    @profiled("load_cash_flow")
     def load_cash_flow(self):
         """Load and display cash flow report"""
         # Get date range
@@ -872,27 +878,29 @@ class AccountingFrame(tk.Frame):
         date_label.pack(pady=(0, 20))
         
         # Get cash inflow data
-        cash_inflow_query = """
+        date_clause, date_params = date_range_clause("invoice_date", start_date, end_date)
+        cash_inflow_query = f"""
             SELECT 
                 SUM(cash_amount) as cash_sales,
                 SUM(upi_amount) as upi_sales,
                 COUNT(*) as num_transactions
             FROM invoices
             WHERE 
-                DATE(invoice_date) BETWEEN ? AND ? AND
+                {date_clause} AND
                 payment_status = 'PAID'
         """
-        cash_inflow_data = self.controller.db.fetchone(cash_inflow_query, (start_date_str, end_date_str))
+        cash_inflow_data = self.controller.db.fetchone(cash_inflow_query, date_params)
         
         # Get cash outflow data
-        cash_outflow_query = """
+        date_clause, date_params = date_range_clause("expense_date", start_date, end_date)
+        cash_outflow_query = f"""
             SELECT 
                 SUM(amount) as total_expenses,
                 COUNT(*) as num_expenses
             FROM expenses
-            WHERE DATE(expense_date) BETWEEN ? AND ?
+            WHERE {date_clause}
         """
-        cash_outflow_data = self.controller.db.fetchone(cash_outflow_query, (start_date_str, end_date_str))
+        cash_outflow_data = self.controller.db.fetchone(cash_outflow_query, date_params)
         
         # Extract values (handle None values)
         cash_sales = cash_inflow_data[0] if cash_inflow_data and cash_inflow_data[0] else 0
@@ -1335,6 +1343,7 @@ class AccountingFrame(tk.Frame):
         
         return categories
     
+    @profiled("load_expenses")
     def load_expenses(self):
         """Load expenses into the treeview"""
         # Clear existing items
@@ -1567,26 +1576,6 @@ class AccountingFrame(tk.Frame):
                 "description": description
             }
             
-            # Check if expenses table exists
-            try:
-                check_table = self.controller.db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='expenses'")
-                if not check_table.fetchone():
-                    # Create the table if it doesn't exist
-                    self.controller.db.execute("""
-                        CREATE TABLE IF NOT EXISTS expenses (
-                            id INTEGER PRIMARY KEY,
-                            expense_date DATE NOT NULL,
-                            category TEXT NOT NULL,
-                            amount REAL NOT NULL,
-                            description TEXT,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                        )
-                    """)
-                    self.controller.db.commit()
-            except Exception as e:
-                print(f"Error checking/creating expenses table: {e}")
-                # Continue with insert attempt
-            
             # Perform database operation in a try-except block
             try:
                 if self.current_expense_id is None:
@@ -2056,6 +2045,7 @@ class AccountingFrame(tk.Frame):
                 self.entity_dropdown["values"] = ["No vendors available"]
                 self.entity_dropdown.current(0)
     
+    @profiled("load_ledger")
     def load_ledger(self):
         """Load ledger for selected entity"""
         entity = self.entity_var.get()
@@ -2114,7 +2104,7 @@ class AccountingFrame(tk.Frame):
                 invoices 
             WHERE 
                 customer_id = ? AND 
-                DATE(invoice_date) < ? AND
+                invoice_date < ? AND
                 credit_amount > 0
         """
         opening_balance_data = self.controller.db.fetchone(opening_balance_query, (customer_id, start_date))
@@ -2131,44 +2121,10 @@ class AccountingFrame(tk.Frame):
         ))
         
         # Get ledger transactions
-        transactions_query = """
-            SELECT 
-                DATE(invoice_date) as date,
-                invoice_number as reference,
-                CASE 
-                    WHEN payment_status = 'PAID' THEN 'Payment received'
-                    ELSE 'Invoice generated' 
-                END as description,
-                0 as debit,
-                credit_amount as credit
-            FROM 
-                invoices 
-            WHERE 
-                customer_id = ? AND 
-                DATE(invoice_date) BETWEEN ? AND ? AND
-                credit_amount > 0
-            
-            UNION ALL
-            
-            -- Add payments made by customer
-            SELECT 
-                DATE(transaction_date) as date,
-                reference_id as reference,
-                'Payment received' as description,
-                amount as debit,
-                0 as credit
-            FROM 
-                credit_payments
-            WHERE 
-                customer_id = ? AND 
-                DATE(transaction_date) BETWEEN ? AND ?
-            
-            ORDER BY 
-                date, reference
-        """
-        
         # Improved transactions query to handle both credit invoices and credit payments
-        transactions_query = """
+        invoice_clause, invoice_params = date_range_clause("invoice_date", start_date, end_date)
+        payment_clause, payment_params = date_range_clause("ct.transaction_date", start_date, end_date)
+        transactions_query = f"""
             -- Get credit sales from invoices (both full credit and split payment with credit)
             SELECT 
                 DATE(invoice_date) as date,
@@ -2183,7 +2139,7 @@ class AccountingFrame(tk.Frame):
                 invoices 
             WHERE 
                 customer_id = ? AND 
-                DATE(invoice_date) BETWEEN ? AND ? AND
+                {invoice_clause} AND
                 credit_amount > 0
                 
             UNION ALL
@@ -2200,13 +2156,13 @@ class AccountingFrame(tk.Frame):
             WHERE 
                 ct.customer_id = ? AND 
                 ct.transaction_type = 'CREDIT_PAYMENT' AND
-                DATE(ct.transaction_date) BETWEEN ? AND ?
+                {payment_clause}
                 
             ORDER BY 
                 date, reference
         """
         
-        transactions = self.controller.db.fetchall(transactions_query, (customer_id, start_date, end_date, customer_id, start_date, end_date))
+        transactions = self.controller.db.fetchall(transactions_query, [customer_id, *invoice_params, customer_id, *payment_params])
         
         # Initialize running balance and totals
         balance = opening_balance
@@ -2293,13 +2249,14 @@ class AccountingFrame(tk.Frame):
                     supplier_transactions 
                 WHERE 
                     vendor_id = ? AND 
-                    DATE(transaction_date) < ?
+                    transaction_date < ?
             """
             opening_balance_data = self.controller.db.fetchone(opening_balance_query, (vendor_id, start_date))
             opening_balance = opening_balance_data[0] if opening_balance_data and opening_balance_data[0] is not None else 0
             
             # Get transactions within date range
-            transactions_query = """
+            date_clause, date_params = date_range_clause("transaction_date", start_date, end_date)
+            transactions_query = f"""
                 SELECT 
                     transaction_date,
                     reference_no,
@@ -2310,11 +2267,11 @@ class AccountingFrame(tk.Frame):
                     supplier_transactions 
                 WHERE 
                     vendor_id = ? AND 
-                    DATE(transaction_date) BETWEEN ? AND ?
+                    {date_clause}
                 ORDER BY 
                     transaction_date, id
             """
-            transactions = self.controller.db.fetchall(transactions_query, (vendor_id, start_date, end_date))
+            transactions = self.controller.db.fetchall(transactions_query, [vendor_id, *date_params])
         else:
             # Create entry points for recording supplier transactions
             opening_balance = 0
@@ -6,6 +6,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
 from assets.styles import COLORS, FONTS, STYLES
+from database.customer_search import search_customers
+from utils.helpers import Debouncer
 
 class CustomerManagementFrame(tk.Frame):
     """Customer management frame for adding, editing, and viewing customers"""
@@ -52,7 +54,9 @@ class CustomerManagementFrame(tk.Frame):
         search_label.pack(side=tk.LEFT, padx=(0, 10))
         
         self.search_var = tk.StringVar()
-        self.search_var.trace("w", lambda name, index, mode: self.search_customers())
+        # Search once typing pauses rather than on every keystroke
+        self.customer_search = Debouncer(self, self.search_customers)
+        self.search_var.trace("w", lambda name, index, mode: self.customer_search.schedule())
         
         search_entry = tk.Entry(search_frame, 
                                textvariable=self.search_var,
@@ -221,17 +225,10 @@ class CustomerManagementFrame(tk.Frame):
             self.load_customers()
             return
         
-        # Get filtered customers
-        query = """
-            SELECT id, name, phone, address, credit_limit, created_at, updated_at
-            FROM customers
-            WHERE LOWER(name) LIKE ? OR 
-                  LOWER(phone) LIKE ? OR
-                  LOWER(address) LIKE ?
-            ORDER BY name
-        """
-        search_pattern = f"%{search_term}%"
-        customers = self.controller.db.fetchall(query, (search_pattern, search_pattern, search_pattern))
+        # Get filtered customers, best matches first
+        customers = search_customers(self.controller.db, search_term,
+                                     "id, name, phone, address, credit_limit, created_at, updated_at",
+                                     limit=500)
         
         # Insert into treeview
         for customer in customers:
@@ -1205,48 +1202,6 @@ class CustomerManagementFrame(tk.Frame):
         
         payments_tree.pack(fill=tk.BOTH, expand=True)
         
-        # Check if customer_payments table exists and create it if it doesn't
-        try:
-            table_check = self.controller.db.fetchone(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='customer_payments'"
-            )
-                
-            if not table_check:
-                # Create customer_payments table if it doesn't exist
-                self.controller.db.execute("""
-                    CREATE TABLE IF NOT EXISTS customer_payments (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        customer_id INTEGER,
-                        invoice_id INTEGER,
-                        amount REAL,
-                        payment_method TEXT,
-                        reference_number TEXT,
-                        depositor_name TEXT,
-                        payment_date TEXT,
-                        notes TEXT,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (customer_id) REFERENCES customers (id),
-                        FOREIGN KEY (invoice_id) REFERENCES invoices (id)
-                    )
-                """)
-                self.controller.db.commit()
-                
-                # Display message for new payment system
-                message_frame = tk.Frame(parent, bg=COLORS["bg_primary"], padx=20, pady=20)
-                message_frame.pack(fill=tk.BOTH, expand=True)
-                
-                message = tk.Label(message_frame, 
-                                text="Payment tracking system has been activated. No payment history available yet.",
-                                font=FONTS["regular"],
-                                bg=COLORS["bg_primary"],
-                                fg=COLORS["text_secondary"],
-                                wraplength=500,
-                                justify=tk.CENTER)
-                message.pack(pady=50)
-                return
-        except Exception as e:
-            print(f"Error checking/creating customer_payments table: {str(e)}")
-            
         # Get payment history from customer_payments table
         # Initialize payments list as empty to avoid "possibly unbound" warning
         payments = []
@@ -1875,29 +1830,6 @@ class CustomerManagementFrame(tk.Frame):
                     # Update invoice table
                     updated = self.controller.db.update("invoices", invoice_data, f"id = {invoice_id}")
                     
-                    # Check if customer_payments table exists
-                    table_check = self.controller.db.fetchone(
-                        "SELECT name FROM sqlite_master WHERE type='table' AND name='customer_payments'"
-                    )
-                    
-                    if not table_check:
-                        # Create customer_payments table if it doesn't exist
-                        self.controller.db.execute("""
-                            CREATE TABLE IF NOT EXISTS customer_payments (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                customer_id INTEGER,
-                                invoice_id INTEGER,
-                                amount REAL,
-                                payment_method TEXT,
-                                reference_number TEXT,
-                                payment_date TEXT,
-                                notes TEXT,
-                                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                                FOREIGN KEY (customer_id) REFERENCES customers (id),
-                                FOREIGN KEY (invoice_id) REFERENCES invoices (id)
-                            )
-                        """)
-                    
                     # Record payment in customer_payments table
                     payment_data = {
                         "customer_id": customer_id,
@@ -9,6 +9,7 @@ from decimal import Decimal, InvalidOperation
 import re
 import random
 from assets.styles import COLORS, FONTS, STYLES
+from database.product_search import search_product_ids
 from utils.helpers import make_button_keyboard_navigable
 
 class InventoryManagementFrame(tk.Frame):
@@ -1098,6 +1099,9 @@ class InventoryManagementFrame(tk.Frame):
             updated = self.controller.db.update("batches", batch_data, f"id = {batch_id}")
 
             if updated:
+                # Manual edits bypass inventory_movements, so reload this product's stock
+                self.controller.db.catalog.invalidate(batch[columns.index("product_id")])
+
                 # Add transaction record if quantity changed
                 if old_quantity != quantity:
                     # Difference in quantity
@@ -1159,6 +1163,7 @@ class InventoryManagementFrame(tk.Frame):
         deleted = self.controller.db.delete("batches", f"id = {batch_id}")
 
         if deleted:
+            self.controller.db.catalog.invalidate()
             messagebox.showinfo("Success", "Batch deleted successfully!")
             # Refresh data
             self.load_batches()
@@ -2143,24 +2148,24 @@ class InventoryManagementFrame(tk.Frame):
             self.load_products()
             return
         
-        # Get filtered products
-        query = """
+        # Ranked matches from the product search index, then their details
+        product_ids = search_product_ids(self.controller.db, search_term)
+        if not product_ids:
+            return
+        placeholders = ", ".join(["?"] * len(product_ids))
+        query = f"""
             SELECT id, product_code, name, vendor, hsn_code, 
                    wholesale_price, selling_price, tax_percentage, category,
                    manufacturer, unit
             FROM products
-            WHERE LOWER(name) LIKE ? OR 
-                  LOWER(product_code) LIKE ? OR
-                  LOWER(vendor) LIKE ? OR
-                  LOWER(manufacturer) LIKE ?
-            ORDER BY name
+            WHERE id IN ({placeholders})
         """
-        search_pattern = f"%{search_term}%"
-        products = self.controller.db.fetchall(query, (search_pattern, search_pattern, search_pattern))
+        products = {row[0]: row for row in self.controller.db.fetchall(query, product_ids)}
         
-        # Insert into treeview
-        for product in products:
-            self.product_tree.insert("", "end", values=product)
+        # Insert into treeview in rank order
+        for product_id in product_ids:
+            if product_id in products:
+                self.product_tree.insert("", "end", values=products[product_id])
     
     def show_context_menu(self, event):
         """Show context menu for product treeview"""
@@ -2805,6 +2810,7 @@ class InventoryManagementFrame(tk.Frame):
                 # Update product
                 product_id = entry_vars["id"].get()
                 self.controller.db.update("products", product_data, f"id = {product_id}")
+                self.controller.db.catalog.invalidate(product_id)
                 
                 # Close dialog
                 product_dialog.destroy()
@@ -2875,6 +2881,7 @@ class InventoryManagementFrame(tk.Frame):
             
             # Commit transaction
             self.controller.db.commit()
+            self.controller.db.catalog.invalidate(product_id)
             
             messagebox.showinfo("Success", f"{product_name} has been deleted.")
             
@@ -3011,35 +3018,40 @@ class InventoryManagementFrame(tk.Frame):
                 "batch_number": batch_number,
                 "manufacturing_date": manufacturing_date,
                 "expiry_date": expiry_date,
-                "purchase_date": datetime.datetime.now().strftime("%Y-%m-%d"),
-                "purchase_price": purchase_price
+                "purchase_date": datetime.datetime.now().strftime("%Y-%m-%d")
             }
             
             try:
-                # Begin transaction
-                self.controller.db.begin()
-                
-                # Insert into batches table first (this is what the UI uses to display inventory)
-                batch_data = {
-                    "product_id": product_id,
-                    "quantity": quantity,
-                    "batch_number": batch_number,
-                    "manufacturing_date": manufacturing_date,
-                    "expiry_date": expiry_date,
-                    "purchase_date": datetime.datetime.now().strftime("%Y-%m-%d"),
-                    "cost_price": purchase_price if purchase_price is not None else 0.0
-                }
-                print(f"Adding batch data: {batch_data}")
-                batch_id = self.controller.db.insert("batches", batch_data)
-                print(f"Successfully added batch with ID: {batch_id}")
-                
-                # Also add to inventory table for backward compatibility
-                print(f"Adding inventory data: {inventory_data}")
-                inventory_id = self.controller.db.insert("inventory", inventory_data)
-                print(f"Successfully added inventory with ID: {inventory_id}")
-                
-                # Commit transaction
-                self.controller.db.commit()
+                # Batch and legacy inventory rows commit together
+                with self.controller.db.transaction():
+                    # Insert into batches table first (this is what the UI uses to display inventory)
+                    batch_data = {
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "batch_number": batch_number,
+                        "manufacturing_date": manufacturing_date,
+                        "expiry_date": expiry_date,
+                        "purchase_date": datetime.datetime.now().strftime("%Y-%m-%d"),
+                        "cost_price": purchase_price if purchase_price is not None else 0.0
+                    }
+                    print(f"Adding batch data: {batch_data}")
+                    batch_id = self.controller.db.insert("batches", batch_data)
+                    print(f"Successfully added batch with ID: {batch_id}")
+                    
+                    # Record the receipt so the sales screen's catalog picks up the new stock
+                    self.controller.db.insert("inventory_movements", {
+                        "product_id": product_id,
+                        "batch_id": batch_id,
+                        "quantity": quantity,
+                        "movement_type": "RECEIPT",
+                        "reference_id": batch_id,
+                        "movement_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    })
+                    
+                    # Also add to inventory table for backward compatibility
+                    print(f"Adding inventory data: {inventory_data}")
+                    inventory_id = self.controller.db.insert("inventory", inventory_data)
+                    print(f"Successfully added inventory with ID: {inventory_id}")
                 
                 # Close dialog
                 stock_dialog.destroy()
@@ -3050,8 +3062,7 @@ class InventoryManagementFrame(tk.Frame):
                 self.load_batches(show_all=True)
                 
             except Exception as e:
-                # Rollback in case of error
-                self.controller.db.rollback()
+                # transaction() has already rolled back the batch insert
                 print(f"Error adding stock: {e}")
                 messagebox.showerror("Error", f"Failed to add stock: {e}")
         
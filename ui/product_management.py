@@ -1057,8 +1057,8 @@ class ProductManagementFrame(tk.Frame):
                                  f"This will also delete all inventory records for this product."):
             return
         
-        # Check if product is referenced in any sale_items
-        sale_items = self.controller.db.fetchall("SELECT id FROM sale_items WHERE product_id = ?", (product_id,))
+        # Check if product is referenced in any invoice items
+        sale_items = self.controller.db.fetchall("SELECT id FROM invoice_items WHERE product_id = ?", (product_id,))
         if sale_items:
             if not messagebox.askyesno("Warning", 
                                     f"'{product_name}' has been used in {len(sale_items)} sales.\n\n"
@@ -1066,9 +1066,9 @@ class ProductManagementFrame(tk.Frame):
                                     f"Do you still want to proceed?"):
                 return
             
-            # If user confirms, update sale_items to set product_id to NULL
+            # If user confirms, unlink the invoice items; they keep the product name
             try:
-                self.controller.db.execute("UPDATE sale_items SET product_id = NULL WHERE product_id = ?", 
+                self.controller.db.execute("UPDATE invoice_items SET product_id = NULL WHERE product_id = ?", 
                                           (product_id,))
                 self.controller.db.commit()
             except Exception as e:
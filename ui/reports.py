@@ -20,7 +20,9 @@ except ImportError:
     print("WARNING: Matplotlib not available. Charts will be disabled.")
 
 from assets.styles import COLORS, FONTS, STYLES
+from database.profiler import profiled
 from utils.export import export_to_excel
+from utils.helpers import date_range_clause
 
 class ReportsFrame(tk.Frame):
     """Reports frame for viewing sales analytics and generating reports"""
@@ -267,21 +269,19 @@ class ReportsFrame(tk.Frame):
         # Default fallback
         return today - datetime.timedelta(days=30), today
     
+    @profiled("load_sales_summary")
     def load_sales_summary(self):
         """Load and display sales summary data"""
         # Get date range
         start_date, end_date = self.get_date_range()
         
-        # Format dates for SQL query
-        start_date_str = start_date.strftime("%Y-%m-%d")
-        end_date_str = end_date.strftime("%Y-%m-%d")
-        
         # Clear existing charts
         for widget in self.sales_summary_charts_frame.winfo_children():
             widget.destroy()
         
         # Get sales data
-        query = """
+        date_clause, date_params = date_range_clause("invoice_date", start_date, end_date)
+        query = f"""
             SELECT 
                 DATE(invoice_date) as sale_date,
                 COUNT(*) as num_invoices,
@@ -289,11 +289,11 @@ class ReportsFrame(tk.Frame):
                 SUM(discount_amount) as total_discount,
                 SUM(tax_amount) as total_tax
             FROM invoices
-            WHERE DATE(invoice_date) BETWEEN ? AND ?
+            WHERE {date_clause}
             GROUP BY DATE(invoice_date)
             ORDER BY sale_date
         """
-        sales_data = self.controller.db.fetchall(query, (start_date_str, end_date_str))
+        sales_data = self.controller.db.fetchall(query, date_params)
         
         if not sales_data:
             # No data for selected range
@@ -721,15 +721,12 @@ class ReportsFrame(tk.Frame):
         # Default fallback
         return today - datetime.timedelta(days=30), today
     
+    @profiled("load_sales_by_product")
     def load_sales_by_product(self):
         """Load and display sales by product data"""
         # Get date range
         start_date, end_date = self.get_product_date_range()
         
-        # Format dates for SQL query
-        start_date_str = start_date.strftime("%Y-%m-%d")
-        end_date_str = end_date.strftime("%Y-%m-%d")
-        
         # Clear existing content
         for widget in self.product_sales_frame.winfo_children():
             widget.destroy()
@@ -747,6 +744,7 @@ class ReportsFrame(tk.Frame):
             sort_clause = "ORDER BY product_name ASC"
         
         # Query for product sales
+        date_clause, date_params = date_range_clause("i.invoice_date", start_date, end_date)
         query = f"""
             SELECT 
                 p.id as product_id,
@@ -758,12 +756,12 @@ class ReportsFrame(tk.Frame):
             FROM invoice_items ii
             JOIN invoices i ON ii.invoice_id = i.id
             LEFT JOIN products p ON ii.product_id = p.id
-            WHERE DATE(i.invoice_date) BETWEEN ? AND ?
+            WHERE {date_clause}
             GROUP BY p.id, p.name, p.category
             {sort_clause}
         """
         
-        product_sales = self.controller.db.fetchall(query, (start_date_str, end_date_str))
+        product_sales = self.controller.db.fetchall(query, date_params)
         
         if not product_sales:
             # No data for selected range
@@ -965,6 +963,7 @@ class ReportsFrame(tk.Frame):
         # Load initial data
         self.load_payment_methods()
     
+    @profiled("load_payment_methods")
     def load_payment_methods(self):
         """Load and display payment methods data"""
         try:
@@ -981,27 +980,24 @@ class ReportsFrame(tk.Frame):
             messagebox.showerror("Date Error", "Please enter valid dates in YYYY-MM-DD format.")
             return
         
-        # Format dates for SQL query
-        start_date_str = start_date.strftime("%Y-%m-%d")
-        end_date_str = end_date.strftime("%Y-%m-%d")
-        
         # Clear existing content
         for widget in self.payment_results_frame.winfo_children():
             widget.destroy()
         
         # Query for payment method summary
-        query = """
+        date_clause, date_params = date_range_clause("invoice_date", start_date, end_date)
+        query = f"""
             SELECT 
                 payment_method,
                 COUNT(*) as num_invoices,
                 SUM(total_amount) as total_amount
             FROM invoices
-            WHERE DATE(invoice_date) BETWEEN ? AND ?
+            WHERE {date_clause}
             GROUP BY payment_method
             ORDER BY total_amount DESC
         """
         
-        payment_data = self.controller.db.fetchall(query, (start_date_str, end_date_str))
+        payment_data = self.controller.db.fetchall(query, date_params)
         
         if not payment_data:
             # No data for selected range
@@ -1018,16 +1014,16 @@ class ReportsFrame(tk.Frame):
         self.payment_df = pd.DataFrame(payment_data, columns=columns)
         
         # Calculate cash/upi/credit breakdown
-        query_breakdown = """
+        query_breakdown = f"""
             SELECT 
                 SUM(cash_amount) as total_cash,
                 SUM(upi_amount) as total_upi,
                 SUM(credit_amount) as total_credit
             FROM invoices
-            WHERE DATE(invoice_date) BETWEEN ? AND ?
+            WHERE {date_clause}
         """
         
-        breakdown_data = self.controller.db.fetchone(query_breakdown, (start_date_str, end_date_str))
+        breakdown_data = self.controller.db.fetchone(query_breakdown, date_params)
         
         # Create two-column layout
         results_container = tk.Frame(self.payment_results_frame, bg=COLORS["bg_white"])
@@ -1316,6 +1312,7 @@ class ReportsFrame(tk.Frame):
         # Load initial data
         self.load_tax_report()
     
+    @profiled("load_tax_report")
     def load_tax_report(self):
         """Load and display tax report data with CGST/SGST breakup"""
         try:
@@ -1332,16 +1329,13 @@ class ReportsFrame(tk.Frame):
             messagebox.showerror("Date Error", "Please enter valid dates in YYYY-MM-DD format.")
             return
         
-        # Format dates for SQL query
-        start_date_str = start_date.strftime("%Y-%m-%d")
-        end_date_str = end_date.strftime("%Y-%m-%d")
-        
         # Clear existing content
         for widget in self.tax_results_frame.winfo_children():
             widget.destroy()
         
         # Query for tax data by tax percentage with HSN/SAC code and detailed info
-        query = """
+        date_clause, date_params = date_range_clause("i.invoice_date", start_date, end_date)
+        query = f"""
             SELECT 
                 ii.tax_percentage,
                 p.hsn_code as hsn_code,
@@ -1353,17 +1347,17 @@ class ReportsFrame(tk.Frame):
             FROM invoice_items ii
             JOIN invoices i ON ii.invoice_id = i.id
             JOIN products p ON ii.product_id = p.id
-            WHERE DATE(i.invoice_date) BETWEEN ? AND ?
+            WHERE {date_clause}
             GROUP BY ii.tax_percentage, p.hsn_code
             ORDER BY ii.tax_percentage, p.hsn_code
         """
         
         try:
-            tax_data = self.controller.db.fetchall(query, (start_date_str, end_date_str))
+            tax_data = self.controller.db.fetchall(query, date_params)
         except Exception as e:
             # If HSN code column doesn't exist in products table, use simpler query
             print(f"HSN code query failed: {e}")
-            query = """
+            query = f"""
                 SELECT 
                     ii.tax_percentage,
                     '' as hsn_code,
@@ -1374,11 +1368,11 @@ class ReportsFrame(tk.Frame):
                     SUM(ii.total_price * (ii.tax_percentage / 100)) as total_tax
                 FROM invoice_items ii
                 JOIN invoices i ON ii.invoice_id = i.id
-                WHERE DATE(i.invoice_date) BETWEEN ? AND ?
+                WHERE {date_clause}
                 GROUP BY ii.tax_percentage
                 ORDER BY ii.tax_percentage
             """
-            tax_data = self.controller.db.fetchall(query, (start_date_str, end_date_str))
+            tax_data = self.controller.db.fetchall(query, date_params)
         
         if not tax_data:
             # No data for selected range
@@ -1480,11 +1474,12 @@ class ReportsFrame(tk.Frame):
         summary_frame.pack(fill=tk.X, padx=10, pady=10)
         
         # Calculate some metrics for summary
-        invoice_count_query = """
+        date_clause, date_params = date_range_clause("invoice_date", start_date, end_date)
+        invoice_count_query = f"""
             SELECT COUNT(*) FROM invoices
-            WHERE DATE(invoice_date) BETWEEN ? AND ?
+            WHERE {date_clause}
         """
-        invoice_count = self.controller.db.fetchone(invoice_count_query, (start_date_str, end_date_str))[0]
+        invoice_count = self.controller.db.fetchone(invoice_count_query, date_params)[0]
         
         # Summary info with CGST/SGST breakdown
         summary_info = [
@@ -1759,6 +1754,7 @@ class ReportsFrame(tk.Frame):
         # Update dropdown values
         self.category_combo["values"] = category_list
     
+    @profiled("load_inventory_report")
     def load_inventory_report(self):
         """Load and display inventory report data"""
         # Get filter values
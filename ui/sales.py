@@ -6,13 +6,24 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import datetime
 import re
-import os
 import decimal
 from decimal import Decimal, InvalidOperation
 
 from assets.styles import COLORS, FONTS, STYLES
-from utils.helpers import format_currency, parse_currency
+from database.customer_search import search_customers
+from database.profiler import profiled
+from utils.cart_calculator import CartCalculator
+from utils.helpers import format_currency, parse_currency, next_invoice_number, Debouncer
+from utils.invoice_queue import InvoiceRenderQueue, open_file
+from utils.invoice_store import invoice_store
 from utils.pdf_invoice_generator import generate_invoice
+from utils.receipt_renderer import RECEIPT_WIDTH, RECEIPTS_DIR, invoice_outputs, receipt_path, write_receipt
+
+# Scanner input with an optional quantity prefix, e.g. "3*FERT001"
+SCAN_PATTERN = re.compile(r"^([1-9]\d*)\s*\*\s*(\S.*)$")
+
+# How often the sales screen checks for finished invoice renders
+INVOICE_POLL_MS = 200
 
 class SalesFrame(tk.Frame):
     """Sales frame for processing transactions"""
@@ -25,9 +36,23 @@ class SalesFrame(tk.Frame):
         self.cart_items = []
         self.next_item_id = 1
         
+        # Running totals for the cart, updated line by line
+        self.cart_totals = CartCalculator()
+        
+        # Invoices render on a worker thread so the next bill can start at once;
+        # only the PDF is kept as the invoice's file
+        self.invoice_queue = InvoiceRenderQueue(
+            controller.db, {"pdf": self._render_invoice, "receipt": self._render_receipt}, store=["pdf"])
+        self._invoice_poll = None
+        self.last_invoice_path = None
+        
         # Track temporarily reserved inventory from cart
         self.reserved_inventory = {}
         
+        # What the product list currently shows, so load_products can patch it in place
+        self._products_view = None
+        self._shown_reserved = {}
+        
         # Current customer
         self.current_customer = {
             "id": 1,  # Default to Walk-in Customer
@@ -100,33 +125,19 @@ class SalesFrame(tk.Frame):
         shortcut_label.pack(anchor="w")
         
     def load_customers_for_dropdown(self):
-        """Load customer list for dropdown"""
-        db = self.controller.db
-        query = """
-            SELECT id, name, phone FROM customers
-            ORDER BY name
-            LIMIT 100
-        """
-        customers = db.fetchall(query)
-        
-        # Format customer list for combobox
-        customer_list = ["Walk-in Customer"]
+        """Reset the customer dropdown to Walk-in; other customers come from search"""
         self.customer_data = {0: {"id": 1, "name": "Walk-in Customer", "phone": ""}}
         
-        for customer in customers:
-            display_text = f"{customer[1]} ({customer[2] if customer[2] else 'No phone'})"
-            customer_list.append(display_text)
-            self.customer_data[len(customer_list)-1] = {"id": customer[0], "name": customer[1], "phone": customer[2] or ""}
-        
-        # Store full customer list for reference
-        self.full_customer_list = customer_list.copy()
-        
-        # Update combobox values - don't show all initially, just Walk-in
+        # Don't list customers up front, just Walk-in
         # This is to avoid overwhelming dropdown and focus user on search
         self.customer_combo['values'] = ["Walk-in Customer"]
     
     def filter_customers(self, event):
-        """Filter customers based on input in combobox"""
+        """Filter customers based on input in combobox
+        
+        Runs through self.customer_search, i.e. once typing pauses, and looks
+        up whatever the combobox holds at that moment.
+        """
         try:
             # Store cursor position
             cursor_pos = self.customer_combo.index(tk.INSERT)
@@ -136,18 +147,8 @@ class SalesFrame(tk.Frame):
             if not search_term or search_term == "search customer":
                 return
                 
-            # Get all customers matching the search term
-            db = self.controller.db
-            query = """
-                SELECT id, name, phone FROM customers
-                WHERE LOWER(name) LIKE ? OR LOWER(phone) LIKE ?
-                ORDER BY name
-                LIMIT 50
-            """
-            
-            # Use % for wildcard search
-            search_pattern = f"%{search_term}%"
-            customers = db.fetchall(query, (search_pattern, search_pattern))
+            # Best matches first: phone numbers resolve through their indexes
+            customers = search_customers(self.controller.db, search_term, "id, name, phone", limit=50)
             
             # Format customer list for combobox
             customer_list = ["Walk-in Customer"]
@@ -158,6 +159,10 @@ class SalesFrame(tk.Frame):
                 customer_list.append(display_text)
                 self.customer_data[len(customer_list)-1] = {"id": customer[0], "name": customer[1], "phone": customer[2] or ""}
             
+            # Nothing to redraw if the matches did not change
+            if tuple(customer_list) == tuple(self.customer_combo['values']):
+                return
+            
             # Update combobox values without changing current entry text
             current_text = self.customer_var.get()
             self.customer_combo['values'] = customer_list
@@ -259,7 +264,8 @@ class SalesFrame(tk.Frame):
         # Bind events for dropdown with placeholder behavior
         self.customer_combo.bind("<FocusIn>", on_combo_focusin)
         self.customer_combo.bind("<FocusOut>", on_combo_focusout)
-        self.customer_combo.bind("<KeyRelease>", self.filter_customers)
+        self.customer_search = Debouncer(self, self.filter_customers)
+        self.customer_combo.bind("<KeyRelease>", self.customer_search.schedule)
         self.customer_combo.bind("<<ComboboxSelected>>", self.on_customer_selected)
         
         # Load initial customer list
@@ -577,9 +583,57 @@ class SalesFrame(tk.Frame):
                             cursor="hand2",
                             command=lambda: self.process_payment("SPLIT"))
         split_btn.pack(side=tk.LEFT, padx=5)
+        
+        # Last invoice: rendered in the background after checkout
+        invoice_frame = tk.Frame(parent, bg=COLORS["bg_primary"])
+        invoice_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+        
+        self.open_invoice_btn = tk.Button(invoice_frame,
+                                        text="Open Invoice",
+                                        font=FONTS["regular"],
+                                        state=tk.DISABLED,
+                                        cursor="hand2",
+                                        command=self.open_last_invoice)
+        self.open_invoice_btn.pack(side=tk.RIGHT, padx=5)
+        
+        self.invoice_status = tk.Label(invoice_frame,
+                                     text="",
+                                     font=FONTS["small"],
+                                     bg=COLORS["bg_primary"],
+                                     fg=COLORS["text_secondary"],
+                                     anchor="w")
+        self.invoice_status.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
     
     def setup_product_panel(self, parent):
         """Setup the product search panel"""
+        # Scan section: a barcode scanner types the code and presses Enter
+        scan_frame = tk.Frame(parent, bg=COLORS["bg_secondary"], padx=10, pady=5)
+        scan_frame.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        scan_label = tk.Label(scan_frame, 
+                            text="Scan / Code:",
+                            font=FONTS["regular_bold"],
+                            bg=COLORS["bg_secondary"],
+                            fg=COLORS["text_primary"])
+        scan_label.pack(side=tk.LEFT, pady=5)
+        
+        self.scan_var = tk.StringVar()
+        self.scan_entry = tk.Entry(scan_frame, 
+                                 textvariable=self.scan_var,
+                                 font=FONTS["regular"],
+                                 width=25)
+        self.scan_entry.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=(10, 0), pady=5)
+        self.scan_entry.bind("<Return>", self.scan_to_cart)
+        
+        # Result of the last scan, so the cashier never has to dismiss a dialog
+        self.scan_status = tk.Label(parent, 
+                                  text="",
+                                  font=FONTS["regular"],
+                                  bg=COLORS["bg_secondary"],
+                                  fg=COLORS["text_secondary"],
+                                  anchor="w")
+        self.scan_status.pack(fill=tk.X, padx=15)
+        
         # Product search section
         search_frame = tk.Frame(parent, bg=COLORS["bg_secondary"], padx=10, pady=5)
         search_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -709,76 +763,127 @@ class SalesFrame(tk.Frame):
         return hsn_codes
     
     def load_products(self):
-        """Load products from database into treeview"""
-        # Clear existing items
-        for item in self.products_tree.get_children():
-            self.products_tree.delete(item)
-            
-        # Get products from database
-        db = self.controller.db
-        products = db.fetchall("""
-            SELECT p.id, p.name, p.selling_price, COALESCE(SUM(b.quantity), 0) as stock
-            FROM products p
-            LEFT JOIN batches b ON p.id = b.product_id AND (b.expiry_date > date('now') OR b.expiry_date IS NULL)
-            GROUP BY p.id, p.name, p.selling_price
-            ORDER BY p.name
-        """)
-        
-        # Insert products into treeview, subtracting reserved quantities
-        for product in products:
-            product_id, name, price, stock = product
-            
-            # Subtract reserved quantity if this product is in cart
-            reserved_qty = self.reserved_inventory.get(product_id, 0)
-            available_stock = max(0, stock - reserved_qty)
-            
-            # Format price with Rupee symbol
-            formatted_price = format_currency(price)
-            
-            # Insert into treeview with adjusted stock
-            self.products_tree.insert("", "end", values=(product_id, name, formatted_price, available_stock))
-            
-            # Debug log for visibility
-            if reserved_qty > 0:
-                print(f"DEBUG: Product {product_id} '{name}' has {stock} in inventory, {reserved_qty} reserved, {available_stock} available")
+        """Load products from the catalog cache into treeview
+        
+        Only rows whose stock or reservation changed are redrawn; the whole list
+        is rebuilt when products were added, removed or renamed.
+        """
+        catalog = self.controller.db.catalog
+        changed = catalog.sync()
+        
+        if self._products_view != ("all", catalog.version):
+            self._fill_products_tree(catalog.all())
+            self._products_view = ("all", catalog.version)
+            return
+        
+        self._refresh_product_rows(changed)
+    
+    def _refresh_product_rows(self, changed=()):
+        """Redraw the given product rows and any whose cart reservation changed"""
+        catalog = self.controller.db.catalog
+        reserved = {int(pid): qty for pid, qty in self.reserved_inventory.items() if pid}
+        changed = set(changed) | {pid for pid in set(reserved) | set(self._shown_reserved)
+                                  if reserved.get(pid) != self._shown_reserved.get(pid)}
+        self._shown_reserved = reserved
+        
+        for product_id in changed:
+            entry = catalog.get(product_id)
+            if entry and self.products_tree.exists(str(product_id)):
+                self.products_tree.item(str(product_id), values=self._product_row(entry))
+    
+    def _fill_products_tree(self, entries):
+        """Replace the product list with the given catalog entries"""
+        self.products_tree.delete(*self.products_tree.get_children())
+        for entry in entries:
+            self.products_tree.insert("", "end", iid=str(entry["id"]), values=self._product_row(entry))
+        self._shown_reserved = {int(pid): qty for pid, qty in self.reserved_inventory.items() if pid}
+    
+    def _product_row(self, entry):
+        """Treeview values for a catalog entry, less any quantity reserved by the cart"""
+        product_id = entry["id"]
+        reserved_qty = self.reserved_inventory.get(product_id, self.reserved_inventory.get(str(product_id), 0))
+        available_stock = max(0, entry["stock"] - reserved_qty)
+        return (product_id, entry["name"], format_currency(entry["price"]), available_stock)
     
     def search_products(self):
         """Search products based on search term"""
         search_term = self.search_var.get().strip()
-        
-        # Clear existing items
-        for item in self.products_tree.get_children():
-            self.products_tree.delete(item)
             
         # If search term is empty, load all products
         if not search_term:
             self.load_products()
             return
             
-        # Get products from database that match search term
-        db = self.controller.db
-        products = db.fetchall("""
-            SELECT p.id, p.name, p.selling_price, COALESCE(SUM(b.quantity), 0) as stock
-            FROM products p
-            LEFT JOIN batches b ON p.id = b.product_id AND (b.expiry_date > date('now') OR b.expiry_date IS NULL)
-            WHERE p.name LIKE ? OR p.product_code LIKE ? OR p.description LIKE ?
-            GROUP BY p.id, p.name, p.selling_price
-            ORDER BY p.name
-        """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-        
-        # Insert matching products into treeview, accounting for reserved inventory
-        for product in products:
-            product_id, name, price, stock = product
-            
-            # Subtract reserved quantity if this product is in cart
-            reserved_qty = self.reserved_inventory.get(product_id, 0)
-            available_stock = max(0, stock - reserved_qty)
-            
-            # Format price with Rupee symbol
-            formatted_price = format_currency(price)
-            
-            # Insert into treeview with adjusted stock
-            self.products_tree.insert("", "end", values=(product_id, name, formatted_price, available_stock))
+        # Match name, code or description against the cached catalog
+        catalog = self.controller.db.catalog
+        catalog.sync()
+        self._fill_products_tree(catalog.search(search_term))
+        self._products_view = ("search", search_term, catalog.version)
+    
+    def scan_to_cart(self, event=None):
+        """Add one unit of the scanned product to the cart, without a dialog
+        
+        The code is resolved through the catalog cache's code map, so a scan
+        runs no query. A quantity prefix such as 3*FERT001 adds three units.
+        Scanning a product already in the cart increments that line.
+        """
+        text = self.scan_var.get().strip()
+        self.scan_var.set("")
+        if not text:
+            return "break"
+        
+        quantity = 1
+        match = SCAN_PATTERN.match(text)
+        if match:
+            quantity, text = int(match.group(1)), match.group(2).strip()
+        
+        entry = self.controller.db.catalog.lookup(text)
+        if entry is None:
+            self._show_scan_status(f"Unknown code: {text}", error=True)
+            return "break"
+        
+        product_id = entry["id"]
+        reserved_qty = self.reserved_inventory.get(product_id, 0)
+        available_stock = max(0, entry["stock"] - reserved_qty)
+        if quantity > available_stock:
+            self._show_scan_status(f"{entry['name']}: only {available_stock} available", error=True)
+            return "break"
+        
+        existing_item = next((item for item in self.cart_items if item["product_id"] == product_id), None)
+        if existing_item:
+            # Keep the line's price and discount, as the add-to-cart dialog does
+            existing_item["quantity"] += quantity
+            discount_factor = Decimal('1') - (Decimal(str(existing_item["discount"])) / Decimal('100'))
+            existing_item["total"] = (Decimal(str(existing_item["price"])) *
+                                      Decimal(str(existing_item["quantity"])) * discount_factor)
+            line_item = existing_item
+        else:
+            line_item = {
+                "id": self.next_item_id,
+                "product_id": product_id,
+                "name": entry["name"],
+                "price": entry["price"],
+                "quantity": quantity,
+                "discount": 0,
+                "total": Decimal(str(entry["price"])) * Decimal(str(quantity)),
+                "hsn_code": entry["hsn_code"],
+                "tax_percentage": entry["tax_rate"] or 18  # Default 18% GST if not set
+            }
+            self.cart_items.append(line_item)
+            self.next_item_id += 1
+        
+        self.reserved_inventory[product_id] = reserved_qty + quantity
+        
+        self.update_cart_line(line_item)
+        self._refresh_product_rows()
+        self._show_scan_status(f"{entry['name']} × {line_item['quantity']}")
+        return "break"
+    
+    def _show_scan_status(self, message, error=False):
+        """Show the result of a scan under the scan input; errors also ring the bell"""
+        self.scan_status.config(text=message, fg=COLORS["danger"] if error else COLORS["text_secondary"])
+        if error:
+            self.bell()
     
     def add_to_cart(self, event=None):
         """Add selected product to cart"""
@@ -802,18 +907,15 @@ class SalesFrame(tk.Frame):
         product_price = parse_currency(product_values[2])
         available_stock = int(product_values[3])
         
-        # Get additional product details from database
-        db = self.controller.db
-        product_details = db.fetchone("""
-            SELECT hsn_code, tax_percentage
-            FROM products
-            WHERE id = ?
-        """, (product_id,))
+        # Get additional product details from the catalog cache
+        catalog = self.controller.db.catalog
+        catalog.sync()
+        product_details = catalog.get(product_id)
         
         # Set default values if not found
         if product_details:
-            hsn_code = product_details[0] or ""
-            tax_percentage = product_details[1] or 18  # Default 18% GST if not set
+            hsn_code = product_details["hsn_code"]
+            tax_percentage = product_details["tax_rate"] or 18  # Default 18% GST if not set
         else:
             hsn_code = ""
             tax_percentage = 18  # Default 18% GST
@@ -848,16 +950,8 @@ class SalesFrame(tk.Frame):
                text=product_name,
                font=FONTS["subheading"]).pack(pady=(0, 10))
         
-        # Get real-time available quantity from database (accounting for any current reservations)
-        db_stock = db.fetchone("""
-            SELECT COALESCE(SUM(b.quantity), 0) as stock
-            FROM products p
-            LEFT JOIN batches b ON p.id = b.product_id AND (b.expiry_date > date('now') OR b.expiry_date IS NULL)
-            WHERE p.id = ?
-            GROUP BY p.id
-        """, (product_id,))
-        
-        actual_stock = db_stock[0] if db_stock else 0
+        # Available quantity from the catalog, which sync() just brought up to date
+        actual_stock = catalog.stock(product_id)
         reserved_qty = self.reserved_inventory.get(product_id, 0)
         real_available_stock = max(0, actual_stock - reserved_qty)
         
@@ -949,16 +1043,9 @@ class SalesFrame(tk.Frame):
                                          "Quantity must be greater than zero!")
                     return
                 
-                # Get the most current available stock again
-                db_stock = db.fetchone("""
-                    SELECT COALESCE(SUM(b.quantity), 0) as stock
-                    FROM products p
-                    LEFT JOIN batches b ON p.id = b.product_id AND (b.expiry_date > date('now') OR b.expiry_date IS NULL)
-                    WHERE p.id = ?
-                    GROUP BY p.id
-                """, (product_id,))
-                
-                actual_stock = db_stock[0] if db_stock else 0
+                # Pick up any sale or stock receipt made while the dialog was open
+                catalog.sync()
+                actual_stock = catalog.stock(product_id)
                 reserved_qty = self.reserved_inventory.get(product_id, 0)
                 real_available_stock = max(0, actual_stock - reserved_qty)
                 
@@ -993,6 +1080,7 @@ class SalesFrame(tk.Frame):
                     new_total = Decimal(str(product_price)) * Decimal(str(new_quantity)) * discount_factor
                     existing_item["quantity"] = new_quantity
                     existing_item["total"] = new_total
+                    line_item = existing_item
                     print(f"DEBUG: Updated existing cart item. New quantity: {new_quantity}")
                     
                     # Update reserved inventory
@@ -1002,7 +1090,7 @@ class SalesFrame(tk.Frame):
                         self.reserved_inventory[product_id] += quantity
                 else:
                     # Add as new item to cart
-                    self.cart_items.append({
+                    line_item = {
                         "id": self.next_item_id,
                         "product_id": product_id,
                         "name": product_name,
@@ -1012,7 +1100,8 @@ class SalesFrame(tk.Frame):
                         "total": total,
                         "hsn_code": hsn_code,
                         "tax_percentage": tax_percentage
-                    })
+                    }
+                    self.cart_items.append(line_item)
                     
                     # Increment next item ID
                     self.next_item_id += 1
@@ -1030,7 +1119,7 @@ class SalesFrame(tk.Frame):
                 item_added[0] = True
                 
                 # Update cart display
-                self.update_cart()
+                self.update_cart_line(line_item)
                 
                 # Refresh product list to display updated stock
                 self.load_products()
@@ -1244,7 +1333,7 @@ class SalesFrame(tk.Frame):
                 total = Decimal(str(price)) * Decimal(str(quantity)) * discount_factor
                 
                 # Add to cart
-                self.cart_items.append({
+                line_item = {
                     "id": self.next_item_id,
                     "product_id": None,  # None for custom items
                     "name": name,
@@ -1254,13 +1343,14 @@ class SalesFrame(tk.Frame):
                     "total": total,
                     "hsn_code": hsn_code,
                     "tax_percentage": float(tax_var.get())
-                })
+                }
+                self.cart_items.append(line_item)
                 
                 # Increment next item ID
                 self.next_item_id += 1
                 
                 # Update cart display
-                self.update_cart()
+                self.update_cart_line(line_item)
                 
                 # Close dialog
                 dialog.destroy()
@@ -1294,122 +1384,90 @@ class SalesFrame(tk.Frame):
         dialog.wait_window()
     
     def update_cart(self):
-        """Update cart display and totals"""
+        """Rebuild the cart display and totals from self.cart_items
+        
+        Use update_cart_line() or remove_cart_line() when a single line changes;
+        this full rebuild is for replacing or clearing the whole cart.
+        """
+        self.cart_totals.reset((item["id"], item["total"], item.get("tax_percentage"))
+                               for item in self.cart_items)
+        
         # Clear existing items in cart treeview
-        for item in self.cart_tree.get_children():
-            self.cart_tree.delete(item)
+        self.cart_tree.delete(*self.cart_tree.get_children())
             
-        # Add cart items to treeview
+        # Add cart items to treeview, keyed by cart item id
         for item in self.cart_items:
-            # Format price and total with Rupee symbol
-            formatted_price = format_currency(item["price"])
-            formatted_total = format_currency(item["total"])
-            
-            # Insert into treeview
-            self.cart_tree.insert("", "end", values=(
-                item["id"],
-                item["name"],
-                formatted_price,
-                item["quantity"],
-                item["discount"],
-                formatted_total
-            ))
+            self.cart_tree.insert("", "end", iid=str(item["id"]), values=self._cart_row(item))
             
         # Update totals
         self.update_totals()
     
+    def update_cart_line(self, item):
+        """Show an added or edited cart item and re-total, leaving other rows alone"""
+        self.cart_totals.set_line(item["id"], item["total"], item.get("tax_percentage"))
+        iid = str(item["id"])
+        if self.cart_tree.exists(iid):
+            self.cart_tree.item(iid, values=self._cart_row(item))
+        else:
+            self.cart_tree.insert("", "end", iid=iid, values=self._cart_row(item))
+        self.update_totals()
+    
+    def remove_cart_line(self, cart_item_id):
+        """Remove a cart item from the cart, its row and the totals"""
+        self.cart_items = [item for item in self.cart_items if item["id"] != cart_item_id]
+        self.cart_totals.remove_line(cart_item_id)
+        if self.cart_tree.exists(str(cart_item_id)):
+            self.cart_tree.delete(str(cart_item_id))
+        self.update_totals()
+    
+    def _cart_row(self, item):
+        """Treeview values for a cart item"""
+        return (
+            item["id"],
+            item["name"],
+            format_currency(item["price"]),
+            item["quantity"],
+            item["discount"],
+            format_currency(item["total"])
+        )
+    
     def update_totals(self):
-        """Calculate and update cart totals"""
-        # Calculate subtotal
-        subtotal = sum(item["total"] for item in self.cart_items)
-        
-        # Apply any additional discount - using Decimal for consistent math
-        try:
-            discount_value = Decimal(str(self.discount_var.get() or '0'))
-            discount_type = self.discount_type_var.get()
-            
-            if discount_type == "amount":
-                # Fixed amount discount
-                discount_amount = discount_value
-            else:
-                # Percentage discount
-                discount_amount = subtotal * discount_value / Decimal('100')
-                
-            # Ensure discount doesn't exceed subtotal
-            if discount_amount > subtotal:
-                discount_amount = subtotal
-            
-            # Calculate final subtotal after discount
-            final_subtotal = subtotal - discount_amount
-            
-        except (ValueError, InvalidOperation):
-            # Invalid discount value, treat as zero
-            discount_amount = Decimal('0')
-            final_subtotal = subtotal
-        
-        # Calculate tax based on individual item tax rates with INCLUSIVE tax approach
-        tax_amount = Decimal('0')
-        taxable_value = Decimal('0')
+        """Calculate and update cart totals
         
-        # First calculate proportion of each item after cart-level discount
-        if final_subtotal > Decimal('0'):
-            discount_ratio = Decimal('1') - (Decimal(str(discount_amount)) / Decimal(str(subtotal))) if subtotal > Decimal('0') else Decimal('1')
-            
-            # Calculate tax for each item based on its individual tax rate (now defaulting to 18%)
-            for item in self.cart_items:
-                # Get item's tax rate (default to 18% if not specified)
-                item_tax_percentage = Decimal(str(item.get("tax_percentage", 18)))
-                item_tax_rate = item_tax_percentage / Decimal('100')
-                
-                # Calculate item's post-discount amount (this is inclusive of tax)
-                item_discounted_total = item["total"] * discount_ratio
-                
-                # Calculate taxable value (excluding tax) using the formula:
-                # taxable_value = total_price / (1 + tax_rate)
-                item_taxable_value = item_discounted_total / (Decimal('1') + item_tax_rate)
-                
-                # Calculate tax amount (difference between total and taxable value)
-                item_tax = item_discounted_total - item_taxable_value
-                
-                # Add to totals
-                tax_amount += item_tax
-                taxable_value += item_taxable_value
+        Prices include GST; CGST and SGST are split out of the discounted total.
+        Returns the CartCalculator totals dict, which checkout reuses.
+        """
+        totals = self.cart_totals.totals(self.discount_var.get(), self.discount_type_var.get())
         
         # Store CGST and SGST separately for invoice generation (split evenly)
-        self.cgst_amount = tax_amount / Decimal('2')
-        self.sgst_amount = tax_amount / Decimal('2')
+        self.cgst_amount = totals["cgst"]
+        self.sgst_amount = totals["sgst"]
         
         # Store the taxable value (excluding tax) for invoice generation
-        self.taxable_value = taxable_value
-        
-        # Calculate total
-        total = final_subtotal + tax_amount
-        
-        # Calculate rounded total (to nearest whole number)
-        total_rounded = round(total)
-        rounding_adjustment = total_rounded - total
+        self.taxable_value = totals["taxable"]
         
         # Store values for payment processing
-        self.original_total = total
-        self.rounded_total = total_rounded
-        self.rounding_adjustment = rounding_adjustment
+        self.original_total = totals["total"]
+        self.rounded_total = totals["rounded"]
+        self.rounding_adjustment = totals["rounding_adjustment"]
         
         # Update labels with improved tax breakdown
-        self.subtotal_label.config(text=format_currency(subtotal))
-        self.discount_amount_label.config(text=f"- {format_currency(discount_amount)}")
+        self.subtotal_label.config(text=format_currency(totals["subtotal"]))
+        self.discount_amount_label.config(text=f"- {format_currency(totals['discount'])}")
         
         # Update separate CGST and SGST labels
         self.cgst_label.config(text=format_currency(self.cgst_amount))
         self.sgst_label.config(text=format_currency(self.sgst_amount))
         
         # Keep the original tax_label updated for compatibility
-        self.tax_label.config(text=format_currency(tax_amount))
+        self.tax_label.config(text=format_currency(totals["tax"]))
         
         # Show both original and rounded totals when there's a difference
-        if abs(rounding_adjustment) > Decimal('0.01'):
-            self.total_label.config(text=f"{format_currency(total)}\nRounded: {format_currency(total_rounded)}")
+        if abs(self.rounding_adjustment) > Decimal('0.01'):
+            self.total_label.config(text=f"{format_currency(totals['total'])}\nRounded: {format_currency(totals['rounded'])}")
         else:
-            self.total_label.config(text=format_currency(total))
+            self.total_label.config(text=format_currency(totals["total"]))
+        return totals
     
     def edit_cart_item(self, event=None):
         """Edit selected cart item"""
@@ -1502,11 +1560,8 @@ class SalesFrame(tk.Frame):
             # Ask for confirmation
             if messagebox.askyesno("Remove Item", 
                                  f"Are you sure you want to remove {cart_item['name']} from the cart?"):
-                # Remove from cart
-                self.cart_items = [item for item in self.cart_items if item["id"] != cart_item_id]
-                
-                # Update cart display
-                self.update_cart()
+                # Remove from cart and its display
+                self.remove_cart_line(cart_item_id)
                 
                 # Close dialog
                 dialog.destroy()
@@ -1558,17 +1613,13 @@ class SalesFrame(tk.Frame):
                 discount_factor = Decimal('1') - (Decimal(str(discount)) / Decimal('100'))
                 total = Decimal(str(cart_item["price"])) * Decimal(str(quantity)) * discount_factor
                 
-                # Update cart item
-                for item in self.cart_items:
-                    if item["id"] == cart_item_id:
-                        item["quantity"] = quantity
-                        item["discount"] = discount
-                        item["total"] = total
-                        # Preserve HSN code and tax rate which were already set
-                        break
+                # Update cart item; HSN code and tax rate were already set
+                cart_item["quantity"] = quantity
+                cart_item["discount"] = discount
+                cart_item["total"] = total
                 
                 # Update cart display
-                self.update_cart()
+                self.update_cart_line(cart_item)
                 
                 # Close dialog
                 dialog.destroy()
@@ -1649,11 +1700,8 @@ class SalesFrame(tk.Frame):
                     
                 print(f"DEBUG: Released {quantity} units of product {product_id} from reservation")
             
-            # Remove from cart
-            self.cart_items = [item for item in self.cart_items if item["id"] != cart_item_id]
-            
-            # Update cart display
-            self.update_cart()
+            # Remove from cart and its display
+            self.remove_cart_line(cart_item_id)
             
             # Refresh product list to display updated stock
             self.load_products()
@@ -1959,12 +2007,8 @@ class SalesFrame(tk.Frame):
                 db = self.controller.db
                 
                 if search_term:
-                    customers = db.fetchall("""
-                        SELECT id, name, phone, village, address
-                        FROM customers
-                        WHERE name LIKE ? OR phone LIKE ? OR village LIKE ?
-                        ORDER BY name
-                    """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
+                    customers = search_customers(db, search_term, "id, name, phone, village, address",
+                                                 limit=500)
                 else:
                     customers = db.fetchall("""
                         SELECT id, name, phone, village, address
@@ -2002,7 +2046,7 @@ class SalesFrame(tk.Frame):
                 search_term = search_var.get().strip()
                 load_customers(search_term if search_term else None)
             
-            search_var.trace_add("write", on_search)
+            search_var.trace_add("write", Debouncer(dialog, on_search).schedule)
             
             # Buttons
             button_frame = tk.Frame(content_frame)
@@ -2581,62 +2625,8 @@ class SalesFrame(tk.Frame):
             messagebox.showinfo("Empty Cart", "No items in cart to process payment!")
             return
             
-        # Calculate totals
-        subtotal = sum(item["total"] for item in self.cart_items)
-        
-        # Convert to Decimal for consistent types and precision
-        subtotal = Decimal(str(subtotal))
-        
-        # Apply any additional discount
-        try:
-            discount_value = Decimal(str(self.discount_var.get()))
-            discount_type = self.discount_type_var.get()
-            
-            if discount_type == "amount":
-                # Fixed amount discount
-                discount_amount = discount_value
-            else:
-                # Percentage discount
-                discount_amount = subtotal * discount_value / Decimal('100')
-                
-            # Ensure discount doesn't exceed subtotal
-            discount_amount = min(discount_amount, subtotal)
-            
-            # Calculate final subtotal after discount
-            final_subtotal = subtotal - discount_amount
-            
-        except (ValueError, InvalidOperation):
-            # Invalid discount value, treat as zero
-            discount_amount = Decimal('0')
-            final_subtotal = subtotal
-        
-        # Calculate tax based on individual item tax rates
-        tax_amount = Decimal('0')
-        
-        # First calculate proportion of each item after cart-level discount
-        if final_subtotal > Decimal('0'):
-            discount_ratio = Decimal('1') - (discount_amount / subtotal) if subtotal > Decimal('0') else Decimal('1')
-            
-            # Calculate tax for each item based on its individual tax rate
-            for item in self.cart_items:
-                # Get item's tax rate (default to 5% if not specified)
-                item_tax_rate = Decimal(str(item.get("tax_percentage", 5))) / Decimal('100')
-                
-                # Calculate item's post-discount amount
-                item_discounted_total = item["total"] * discount_ratio
-                
-                # Calculate and add tax
-                item_tax = item_discounted_total * item_tax_rate
-                tax_amount += item_tax
-        
-        # Calculate total
-        total = final_subtotal + tax_amount
-        
-        # Use rounded total if available (from update_totals method)
-        if hasattr(self, 'rounded_total'):
-            original_total = total
-            total = self.rounded_total
-            print(f"Using rounded total for payment: {original_total} -> {total} (adjustment: {total - original_total})")
+        # Pay the rounded total, the same figure the cart shows
+        total = self.update_totals()["rounded"]
         
         # Check payment type and process accordingly
         if payment_type == "CASH":
@@ -2683,8 +2673,8 @@ class SalesFrame(tk.Frame):
                text="Subtotal:",
                font=FONTS["regular"]).grid(row=0, column=0, sticky="w", pady=2)
         
-        # Calculate subtotal by removing GST from total
-        subtotal = sum(item["total"] for item in self.cart_items)
+        # Subtotal of the cart lines, GST included
+        subtotal = self.cart_totals.subtotal
         tk.Label(breakdown_frame, 
                text=format_currency(subtotal),
                font=FONTS["regular"]).grid(row=0, column=1, sticky="e", pady=2)
@@ -2846,8 +2836,8 @@ class SalesFrame(tk.Frame):
                text="Subtotal:",
                font=FONTS["regular"]).grid(row=0, column=0, sticky="w", pady=2)
         
-        # Calculate subtotal by removing GST from total
-        subtotal = sum(item["total"] for item in self.cart_items)
+        # Subtotal of the cart lines, GST included
+        subtotal = self.cart_totals.subtotal
         tk.Label(breakdown_frame, 
                text=format_currency(subtotal),
                font=FONTS["regular"]).grid(row=0, column=1, sticky="e", pady=2)
@@ -3008,8 +2998,8 @@ class SalesFrame(tk.Frame):
                text="Subtotal:",
                font=FONTS["regular"]).grid(row=0, column=0, sticky="w", pady=2)
         
-        # Calculate subtotal by removing GST from total
-        subtotal = sum(item["total"] for item in self.cart_items)
+        # Subtotal of the cart lines, GST included
+        subtotal = self.cart_totals.subtotal
         tk.Label(breakdown_frame, 
                text=format_currency(subtotal),
                font=FONTS["regular"]).grid(row=0, column=1, sticky="e", pady=2)
@@ -3253,8 +3243,8 @@ class SalesFrame(tk.Frame):
                text="Subtotal:",
                font=FONTS["regular"]).grid(row=0, column=0, sticky="w", pady=2)
         
-        # Calculate subtotal by removing GST from total
-        subtotal = sum(item["total"] for item in self.cart_items)
+        # Subtotal of the cart lines, GST included
+        subtotal = self.cart_totals.subtotal
         tk.Label(breakdown_frame, 
                text=format_currency(subtotal),
                font=FONTS["regular"]).grid(row=0, column=1, sticky="e", pady=2)
@@ -3514,358 +3504,203 @@ class SalesFrame(tk.Frame):
         # Wait for dialog to close
         dialog.wait_window()
     
+    @profiled("checkout")
     def _complete_sale(self, payment_data):
         """Complete the sale and save to database"""
-        # Calculate totals
-        subtotal = sum(item["total"] for item in self.cart_items)
-        
-        # Convert to Decimal for consistent types and precision
-        subtotal = Decimal(str(subtotal))
-        
-        # Apply any additional discount
-        try:
-            discount_value = Decimal(str(self.discount_var.get()))
-            discount_type = self.discount_type_var.get()
-            
-            if discount_type == "amount":
-                # Fixed amount discount
-                discount_amount = discount_value
-            else:
-                # Percentage discount
-                discount_amount = subtotal * discount_value / Decimal('100')
-                
-            # Ensure discount doesn't exceed subtotal
-            discount_amount = min(discount_amount, subtotal)
-            
-        except (ValueError, InvalidOperation):
-            # Invalid discount value, treat as zero
-            discount_amount = Decimal('0')
-        
-        # Calculate final subtotal after discount
-        final_subtotal = subtotal - discount_amount
-        
-        # Round to nearest whole number (requested feature)
-        final_subtotal_rounded = round(final_subtotal)
-        
-        # Calculate the rounding adjustment
-        rounding_adjustment = final_subtotal_rounded - final_subtotal
+        # Same totals the cart and payment dialog showed
+        totals = self.update_totals()
+        subtotal = totals["subtotal"]
+        discount_amount = totals["discount"]
         
         # Store the original and rounded values for display
-        print(f"Original total: {final_subtotal}, Rounded total: {final_subtotal_rounded}, Adjustment: {rounding_adjustment}")
+        print(f"Original total: {totals['total']}, Rounded total: {totals['rounded']}, Adjustment: {totals['rounding_adjustment']}")
         
         # Store sale in database
         db = self.controller.db
         try:
-            # Begin transaction
-            db.begin()
-            
-            # Get financial year for invoice number prefix (Indian Financial Year starts in April)
-            today = datetime.datetime.now()
-            if today.month >= 4:  # After April 1
-                fy_start = today.year
-                fy_end = today.year + 1
-            else:
-                fy_start = today.year - 1
-                fy_end = today.year
-            
-            # Format as YY-YY (e.g., 24-25) exactly as requested by user 
-            # Extract last 2 digits of each year
-            fy_prefix = f"{str(fy_start)[-2:]}-{str(fy_end)[-2:]}"
-            
-            # Get store name for invoice number prefix
-            store_name = "AGT"  # Default prefix
-            store_info = db.fetchone("SELECT value FROM settings WHERE key = 'invoice_prefix'")
-            if store_info and store_info[0] and store_info[0].strip():
-                store_name = store_info[0].strip()
-            
-            # Debug output
-            print(f"Using store prefix: {store_name}, financial year: {fy_prefix}")
-            
-            # Get next invoice number - search both tables for the highest number
-            invoice_prefix = f"{fy_prefix}/{store_name}-"
-            
-            last_invoice_sales = db.fetchone("""
-                SELECT invoice_number FROM sales
-                WHERE invoice_number LIKE ?
-                ORDER BY id DESC LIMIT 1
-            """, (f"{fy_prefix}/%",))
-            
-            last_invoice_invoices = db.fetchone("""
-                SELECT invoice_number FROM invoices
-                WHERE invoice_number LIKE ?
-                ORDER BY id DESC LIMIT 1
-            """, (f"{fy_prefix}/%",))
-            
-            # Find the highest invoice number across both tables
-            last_num = 0
-            
-            if last_invoice_sales:
-                try:
-                    # Extract the numeric part
-                    last_part = last_invoice_sales[0].split('-')[-1]
-                    sales_num = int(last_part)
-                    last_num = max(last_num, sales_num)
-                except (ValueError, IndexError, TypeError) as e:
-                    print(f"Error parsing sales invoice number: {e}")
-            
-            if last_invoice_invoices:
-                try:
-                    # Extract the numeric part
-                    last_part = last_invoice_invoices[0].split('-')[-1]
-                    invoices_num = int(last_part)
-                    last_num = max(last_num, invoices_num)
-                except (ValueError, IndexError, TypeError) as e:
-                    print(f"Error parsing invoices invoice number: {e}")
-            
-            # Next invoice number
-            invoice_num = last_num + 1
-            
-            # Format invoice number with 3 digits (e.g., 24-25/AGT-001)
-            invoice_number = f"{fy_prefix}/{store_name}-{invoice_num:03d}"
-            
-            # Debug output
-            print(f"Generated invoice number: {invoice_number}")
-            
-            # Create sale record with better tax handling (split into CGST and SGST)
-            tax_amount = Decimal(str(final_subtotal)) * Decimal('0.18')  # 18% GST (9% CGST + 9% SGST)
-            
-            # Convert all Decimal values to float for SQLite compatibility
-            sale_id = db.insert("sales", {
-                "customer_id": self.current_customer["id"],
-                "invoice_number": invoice_number,
-                "subtotal": float(subtotal),
-                "discount": float(discount_amount),
-                "tax": float(tax_amount),  # Total GST (18%)
-                "cgst": float(tax_amount / Decimal('2')),  # 9% CGST
-                "sgst": float(tax_amount / Decimal('2')),  # 9% SGST
-                "total": float(payment_data["amount"]),
-                "payment_type": payment_data["payment_type"],
-                "payment_reference": payment_data.get("reference"),
-                "sale_date": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "user_id": 1  # Default user ID
-            })
-            
-            # Store split payment details if applicable
-            if payment_data["payment_type"] == "SPLIT":
-                # Check if payment_splits table has credit_amount column
-                try:
-                    cols = db.fetchall("PRAGMA table_info(payment_splits)")
-                    col_names = [col[1] for col in cols]
-                    
-                    if "credit_amount" not in col_names:
-                        db.execute("ALTER TABLE payment_splits ADD COLUMN credit_amount REAL DEFAULT 0")
-                except Exception as e:
-                    print(f"Warning: Could not check/add columns to payment_splits: {e}")
-                
-                db.insert("payment_splits", {
-                    "sale_id": sale_id,
-                    "cash_amount": float(payment_data.get("cash_amount", 0)),
-                    "upi_amount": float(payment_data.get("upi_amount", 0)),
-                    "credit_amount": float(payment_data.get("credit_amount", 0)),
-                    "upi_reference": payment_data.get("reference", "")
+            # All writes for this sale commit together, or not at all
+            with db.transaction():
+                # Get store name for invoice number prefix
+                store_name = "AGT"  # Default prefix
+                store_info = db.fetchone("SELECT value FROM settings WHERE key = 'invoice_prefix'")
+                if store_info and store_info[0] and store_info[0].strip():
+                    store_name = store_info[0].strip()
+            
+                # Reserve the next number for this financial year (e.g., 24-25/AGT-001);
+                # it is released again if the sale rolls back
+                invoice_number = next_invoice_number(db, store_name)
+            
+                # Debug output
+                print(f"Generated invoice number: {invoice_number}")
+            
+                # The invoice is the only record of the sale; the old sales, sale_items and
+                # payment_splits tables are now views over invoices and invoice_items
+                # Handle different payment types safely
+                cash_amount = 0
+                upi_amount = 0
+                upi_reference = ""
+                credit_amount = 0
+                credit_payment_method = ""
+                credit_reference = ""
+            
+                # Set appropriate values based on payment type
+                if payment_data["payment_type"] == "CASH":
+                    cash_amount = float(payment_data["received"])
+                elif payment_data["payment_type"] == "UPI":
+                    upi_amount = float(payment_data["received"])
+                    upi_reference = payment_data.get("reference", "")
+                elif payment_data["payment_type"] == "SPLIT":
+                    cash_amount = float(payment_data.get("cash_amount", 0))
+                    upi_amount = float(payment_data.get("upi_amount", 0))
+                    credit_amount = float(payment_data.get("credit_amount", 0))
+                    upi_reference = payment_data.get("reference", "")
+                elif payment_data["payment_type"] == "CREDIT":
+                    credit_amount = float(payment_data["amount"])
+                    # Store the payment method selected for this credit sale
+                    credit_payment_method = payment_data.get("credit_payment_method", "CREDIT")
+                    credit_reference = payment_data.get("reference", "")
+            
+                invoice_id = db.insert("invoices", {
+                    "invoice_number": invoice_number,
+                    "customer_id": self.current_customer["id"],
+                    "subtotal": float(subtotal),
+                    "discount_amount": float(discount_amount),
+                    "tax_amount": float(totals["tax"]),
+                    "total_amount": float(payment_data["amount"]),
+                    "payment_method": payment_data["payment_type"],
+                    "payment_status": "PAID" if payment_data["payment_type"] != "CREDIT" and 
+                                              not (payment_data["payment_type"] == "SPLIT" and credit_amount > 0) 
+                                       else "PARTIALLY_PAID" if payment_data["payment_type"] == "SPLIT" and credit_amount > 0 
+                                       else "UNPAID",
+                    "cash_amount": cash_amount,
+                    "upi_amount": upi_amount,
+                    "upi_reference": upi_reference,
+                    "credit_amount": credit_amount,
+                    "credit_payment_method": credit_payment_method,
+                    "credit_reference": credit_reference,
+                    "invoice_date": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 })
-                
-            # Also insert into invoices table for compatibility with sales_history view
-            # Handle different payment types safely
-            cash_amount = 0
-            upi_amount = 0
-            upi_reference = ""
-            credit_amount = 0
-            credit_payment_method = ""
-            credit_reference = ""
-            
-            # Set appropriate values based on payment type
-            if payment_data["payment_type"] == "CASH":
-                cash_amount = float(payment_data["received"])
-            elif payment_data["payment_type"] == "UPI":
-                upi_amount = float(payment_data["received"])
-                upi_reference = payment_data.get("reference", "")
-            elif payment_data["payment_type"] == "SPLIT":
-                cash_amount = float(payment_data.get("cash_amount", 0))
-                upi_amount = float(payment_data.get("upi_amount", 0))
-                credit_amount = float(payment_data.get("credit_amount", 0))
-                upi_reference = payment_data.get("reference", "")
-            elif payment_data["payment_type"] == "CREDIT":
-                credit_amount = float(payment_data["amount"])
-                # Store the payment method selected for this credit sale
-                credit_payment_method = payment_data.get("credit_payment_method", "CREDIT")
-                credit_reference = payment_data.get("reference", "")
-            
-            # Add necessary columns to invoices table if not present
-            # This ensures backward compatibility
-            try:
-                # Check if credit_payment_method column exists
-                cols = db.fetchall("PRAGMA table_info(invoices)")
-                col_names = [col[1] for col in cols]
-                
-                # Add column for credit payment method if not exists
-                if "credit_payment_method" not in col_names:
-                    db.execute("ALTER TABLE invoices ADD COLUMN credit_payment_method TEXT")
-                
-                # Add column for credit reference if not exists
-                if "credit_reference" not in col_names:
-                    db.execute("ALTER TABLE invoices ADD COLUMN credit_reference TEXT")
-            except Exception as e:
-                print(f"Warning: Could not check/add columns: {e}")
-            
-            invoice_id = db.insert("invoices", {
-                "invoice_number": invoice_number,
-                "customer_id": self.current_customer["id"],
-                "subtotal": float(subtotal),
-                "discount_amount": float(discount_amount),
-                "tax_amount": float(tax_amount),
-                "total_amount": float(payment_data["amount"]),
-                "payment_method": payment_data["payment_type"],
-                "payment_status": "PAID" if payment_data["payment_type"] != "CREDIT" and 
-                                          not (payment_data["payment_type"] == "SPLIT" and credit_amount > 0) 
-                                   else "PARTIALLY_PAID" if payment_data["payment_type"] == "SPLIT" and credit_amount > 0 
-                                   else "UNPAID",
-                "cash_amount": cash_amount,
-                "upi_amount": upi_amount,
-                "upi_reference": upi_reference,
-                "credit_amount": credit_amount,
-                "credit_payment_method": credit_payment_method,
-                "credit_reference": credit_reference,
-                "invoice_date": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
             
-            # Store sale items
-            for item in self.cart_items:
-                # Get product price from database to ensure data integrity
-                product_price = item["price"]
-                if item["product_id"]:
-                    product_info = db.fetchone("""
-                        SELECT selling_price FROM products WHERE id = ?
-                    """, (item["product_id"],))
-                    if product_info:
-                        product_price = product_info[0]
-                
-                # Calculate item tax with proper Decimal handling
-                tax_rate = item.get("tax_percentage", 18)  # Default 18% if not specified
-                price = Decimal(str(item["price"]))
-                quantity = Decimal(str(item["quantity"]))
-                discount = Decimal(str(item["discount"]))
-                tax_rate_decimal = Decimal(str(tax_rate))
+                # Store sale items in a fixed number of statements, however long the bill:
+                # load prices and FIFO batches for every product at once, allocate
+                # stock in memory, then write each table with one executemany
+                product_ids = list({item["product_id"] for item in self.cart_items if item["product_id"]})
+                product_info = {}
+                batches_by_product = {}
+                if product_ids:
+                    placeholders = ", ".join(["?"] * len(product_ids))
+                    for product_id, selling_price, product_tax in db.fetchall(f"""
+                        SELECT id, selling_price, tax_percentage FROM products WHERE id IN ({placeholders})
+                    """, product_ids):
+                        product_info[product_id] = (selling_price, product_tax)
+                
+                    # Unexpired batches, oldest expiry first and undated batches last
+                    for batch_id, product_id, batch_qty in db.fetchall(f"""
+                        SELECT id, product_id, quantity
+                        FROM batches
+                        WHERE product_id IN ({placeholders}) AND quantity > 0
+                        AND (expiry_date > date('now') OR expiry_date IS NULL)
+                        ORDER BY product_id, expiry_date IS NULL, expiry_date, id
+                    """, product_ids):
+                        batches_by_product.setdefault(product_id, []).append([batch_id, batch_qty])
+            
+                # Explicit ids let inventory movements point at their invoice item without
+                # a lastrowid round trip per row; safe because we hold the write lock
+                next_invoice_item_id = db.fetchone("SELECT COALESCE(MAX(id), 0) + 1 FROM invoice_items")[0]
+                
+                now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                invoice_item_rows = []
+                movement_rows = []
+                batch_updates = {}
                 
-                # Calculate discounted price
-                discounted_amount = price * quantity * (Decimal('1') - discount / Decimal('100'))
-                
-                # Calculate tax amount (split between CGST and SGST)
-                tax_amount = discounted_amount * (tax_rate_decimal / Decimal('100'))
-                
-                # Insert sale item - convert any Decimal values to float for SQLite
-                # Debug output to verify HSN code
-                hsn_code = item.get("hsn_code", "")
-                print(f"Item: {item['name']}, HSN code before insertion: '{hsn_code}'")
-                
-                sale_item_id = db.insert("sale_items", {
-                    "sale_id": sale_id,
-                    "product_id": item["product_id"],
-                    "product_name": item["name"],
-                    "hsn_code": hsn_code,
-                    "quantity": float(item["quantity"]),
-                    "price": float(product_price),
-                    "discount_percent": float(item["discount"]),
-                    "tax_percentage": float(tax_rate),
-                    "tax_amount": float(tax_amount),
-                    "total": float(item["total"])
-                })
+                for item in self.cart_items:
+                    # Use the catalogue price to ensure data integrity
+                    product_price = item["price"]
+                    selling_price, product_tax = product_info.get(item["product_id"], (None, None))
+                    if selling_price is not None:
+                        product_price = selling_price
+                
+                    # GST included in this line after its share of the cart discount
+                    tax_rate = item.get("tax_percentage", product_tax if product_tax is not None else 18)
+                    tax_amount = self.cart_totals.line_split(item["id"], totals)[2]
+                
+                    hsn_code = item.get("hsn_code", "")
+                    invoice_item_id = next_invoice_item_id
+                    next_invoice_item_id += 1
+                
+                    # Quick-add items have no product_id; their name and HSN code are stored here
+                    invoice_item_rows.append({
+                        "id": invoice_item_id,
+                        "invoice_id": invoice_id,
+                        "product_id": item["product_id"],
+                        "product_name": item["name"],
+                        "hsn_code": hsn_code,
+                        "batch_number": "",  # Batches are tracked in inventory_movements
+                        "quantity": float(item["quantity"]),
+                        "price_per_unit": float(product_price),
+                        "discount_percentage": float(item["discount"]),
+                        "tax_percentage": float(tax_rate),
+                        "tax_amount": float(tax_amount),
+                        "total_price": float(item["total"])
+                    })
                 
-                # Also add to invoice_items table for compatibility with sales_history view
-                # Make sure HSN code is included here too for proper invoice generation
-                db.insert("invoice_items", {
-                    "invoice_id": invoice_id,
-                    "product_id": item["product_id"] or 0,  # Use 0 if product_id is None
-                    "batch_number": "",  # We don't track batch in sale_items
-                    "quantity": float(item["quantity"]),
-                    "price_per_unit": float(product_price),
-                    "discount_percentage": float(item["discount"]),
-                    "tax_percentage": float(tax_rate),
-                    "hsn_code": hsn_code,  # Add HSN code to invoice_items as well
-                    "total_price": float(item["total"])
-                })
+                    if not item["product_id"]:
+                        continue
                 
-                # Update inventory for database products
-                if item["product_id"]:
-                    # Get batches for this product, starting with oldest expiry
-                    # Add error handling for missing expiry_date
-                    try:
-                        batches = db.fetchall("""
-                            SELECT id, quantity
-                            FROM batches
-                            WHERE product_id = ? AND quantity > 0 
-                            AND (expiry_date > date('now') OR expiry_date IS NULL)
-                            ORDER BY expiry_date ASC NULLS LAST
-                        """, (item["product_id"],))
-                    except Exception as e:
-                        # SQLite might not support NULLS LAST, try simpler query
-                        batches = db.fetchall("""
-                            SELECT id, quantity
-                            FROM batches
-                            WHERE product_id = ? AND quantity > 0
-                            ORDER BY CASE WHEN expiry_date IS NULL THEN 1 ELSE 0 END, expiry_date ASC
-                        """, (item["product_id"],))
-                    
-                    # Handle empty batch results
+                    # Deduct stock for database products, oldest batch first
+                    batches = batches_by_product.get(item["product_id"])
                     if not batches:
                         print(f"Warning: No batches found for product {item['product_id']} - {item['name']}")
                         continue
-                    
+                
                     remaining_qty = item["quantity"]
-                    for batch_row in batches:
-                        # Handle potential tuple index errors
-                        if len(batch_row) < 2:
-                            print(f"Warning: Invalid batch data for product {item['product_id']}: {batch_row}")
-                            continue
-                            
-                        batch_id, batch_qty = batch_row
+                    for batch in batches:
                         if remaining_qty <= 0:
                             break
-                        
-                        # How much to take from this batch
+                        batch_id, batch_qty = batch
+                        if batch_qty <= 0:
+                            continue
+                    
+                        # How much to take from this batch; later lines of the same
+                        # product see the reduced quantity
                         batch_deduction = min(remaining_qty, batch_qty)
-                        
-                        # Update batch quantity
-                        db.execute("""
-                            UPDATE batches
-                            SET quantity = quantity - ?
-                            WHERE id = ?
-                        """, (batch_deduction, batch_id))
-                        
-                        # Record inventory movement
-                        db.insert("inventory_movements", {
+                        batch[1] = batch_qty - batch_deduction
+                        batch_updates[batch_id] = batch[1]
+                    
+                        movement_rows.append({
                             "product_id": item["product_id"],
                             "batch_id": batch_id,
                             "quantity": -batch_deduction,
                             "movement_type": "SALE",
-                            "reference_id": sale_item_id,
-                            "movement_date": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                            "reference_id": invoice_item_id,
+                            "movement_date": now
                         })
-                        
+                    
                         remaining_qty -= batch_deduction
             
-            # If credit sale or split with credit, record the transaction
-            if payment_data["payment_type"] == "CREDIT" or (payment_data["payment_type"] == "SPLIT" and credit_amount > 0):
-                # Get the correct amount for the transaction
-                transaction_amount = payment_data["amount"] if payment_data["payment_type"] == "CREDIT" else credit_amount
-                
-                db.insert("customer_transactions", {
-                    "customer_id": self.current_customer["id"],
-                    "amount": float(transaction_amount),  # Convert Decimal to float for SQLite
-                    "transaction_type": "CREDIT_SALE",
-                    "reference_id": sale_id,
-                    "transaction_date": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    "notes": f"Credit sale - Invoice #{invoice_number}"
-                })
-            
-            db.commit()
-            
-            # Show success message
-            messagebox.showinfo("Sale Complete", 
-                              f"Sale completed successfully!\nInvoice #: {invoice_number}")
+                db.insert_many("invoice_items", invoice_item_rows)
+                # Batch quantities were read inside this transaction, so writing the
+                # remaining amount is equivalent to subtracting the deduction
+                db.update_many("batches", [{"id": batch_id, "quantity": qty}
+                                           for batch_id, qty in batch_updates.items()])
+                db.insert_many("inventory_movements", movement_rows)
+            
+                # If credit sale or split with credit, record the transaction
+                if payment_data["payment_type"] == "CREDIT" or (payment_data["payment_type"] == "SPLIT" and credit_amount > 0):
+                    # Get the correct amount for the transaction
+                    transaction_amount = payment_data["amount"] if payment_data["payment_type"] == "CREDIT" else credit_amount
+                
+                    db.insert("customer_transactions", {
+                        "customer_id": self.current_customer["id"],
+                        "amount": float(transaction_amount),  # Convert Decimal to float for SQLite
+                        "transaction_type": "CREDIT_SALE",
+                        "reference_id": invoice_id,
+                        "transaction_date": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        "notes": f"Credit sale - Invoice #{invoice_number}"
+                    })
             
-            # Generate and print invoice
-            self._generate_invoice(sale_id, invoice_number)
+            # Render the invoice in the background; the cart is free for the next bill
+            self._generate_invoice(invoice_id, invoice_number, payment_data["payment_type"])
             
             # Reset cart
             self.cart_items = []
@@ -3899,310 +3734,98 @@ class SalesFrame(tk.Frame):
             # Reset item ID counter
             self.next_item_id = 1
             
+            # Show success message
+            messagebox.showinfo("Sale Complete", 
+                              f"Sale completed successfully!\nInvoice #: {invoice_number}")
+            
         except Exception as e:
-            db.rollback()
+            # transaction() has already rolled back every row of this sale
             messagebox.showerror("Error", f"Failed to complete sale: {str(e)}")
             # Log the error for debugging
             print(f"Sale error: {str(e)}")
     
-    def _generate_invoice(self, sale_id, invoice_number):
-        """Generate invoice for completed sale"""
-        db = self.controller.db
-        
+    def _generate_invoice(self, invoice_id, invoice_number, payment_type="CASH"):
+        """Queue the invoice and/or receipt for a completed sale; they render in the background"""
+        self.invoice_status.config(text=f"Invoice {invoice_number}: preparing...", fg=COLORS["text_secondary"])
+        for template in invoice_outputs(self.controller.config, payment_type):
+            self.invoice_queue.submit(
+                invoice_id, template,
+                lambda invoice_id, path, error, template=template:
+                    self._invoice_ready(invoice_number, path, error, template))
+        if self._invoice_poll is None:
+            self._invoice_poll = self.after(INVOICE_POLL_MS, self._poll_invoices)
+    
+    def _poll_invoices(self):
+        """Pick up rendered invoices; keeps polling while any are in flight"""
+        self._invoice_poll = None
+        self.invoice_queue.poll()
+        if self.invoice_queue.pending:
+            self._invoice_poll = self.after(INVOICE_POLL_MS, self._poll_invoices)
+    
+    def _invoice_ready(self, invoice_number, path, error, template="pdf"):
+        """Show the outcome of a background render and offer to open the file"""
+        kind = "Receipt" if template == "receipt" else "Invoice"
+        if error is not None:
+            self.invoice_status.config(text=f"{kind} {invoice_number} failed: {error}", fg=COLORS["danger"])
+            return
+        self.last_invoice_path = path
+        self.invoice_status.config(text=f"{kind} {invoice_number} ready", fg=COLORS["success"])
+        self.open_invoice_btn.config(state=tk.NORMAL)
+    
+    def open_last_invoice(self, action="open"):
+        """Open (or print) the most recently rendered invoice without waiting for the viewer"""
+        if not self.last_invoice_path:
+            return
         try:
-            # Get sale details
-            sale = db.fetchone("""
-                SELECT s.*, c.name as customer_name, c.phone as customer_phone,
-                       c.address as customer_address, c.village as customer_village,
-                       c.gstin as customer_gstin
-                FROM sales s
-                JOIN customers c ON s.customer_id = c.id
-                WHERE s.id = ?
-            """, (sale_id,))
-            
-            if not sale:
-                messagebox.showerror("Error", "Could not find sale details for invoice generation!")
-                return
-            
-            # Get sale items with HSN code prioritizing direct HSN code stored in sale_items
-            # This ensures quick add items with manually entered HSN codes work properly
-            # Also get additional product fields for invoice display
-            items = db.fetchall("""
-                SELECT si.*, 
-                       CASE WHEN si.hsn_code IS NOT NULL AND si.hsn_code != '' 
-                            THEN si.hsn_code 
-                            ELSE p.hsn_code 
-                       END as resolved_hsn_code,
-                       p.manufacturer, 
-                       p.unit,
-                       p.batch_no,
-                       p.expiry_date,
-                       b.batch_number as batch_from_batch,
-                       b.company_name,
-                       b.expiry_date as batch_expiry
-                FROM sale_items si
-                LEFT JOIN products p ON si.product_id = p.id
-                LEFT JOIN (
-                    SELECT * FROM batches 
-                    WHERE quantity > 0
-                    ORDER BY expiry_date ASC
-                ) b ON si.product_id = b.product_id
-                WHERE si.sale_id = ?
-                GROUP BY si.id
-            """, (sale_id,))
-            
-            # Get store info
-            store_info = {}
-            settings = db.fetchall("SELECT key, value FROM settings WHERE key IN ('store_name', 'store_address', 'store_phone', 'store_gstin', 'store_email')")
-            for key, value in settings:
-                store_info[key] = value
-            
-            # Prepare invoice data - using correct index positions based on the sales table structure
-            # The order in the sales table: id(0), customer_id(1), invoice_number(2), subtotal(3), discount(4), 
-            # tax(5), total(6), payment_type(7), payment_reference(8), sale_date(9), user_id(10), cgst(11), sgst(12)
-            # Plus additional columns from the JOIN: customer_name(13), customer_phone(14), customer_address(15), 
-            # customer_village(16), customer_gstin(17)
-            
-            # Format the date properly - handle parsing errors gracefully
-            try:
-                sale_date = datetime.datetime.strptime(sale[9], '%Y-%m-%d %H:%M:%S')
-                formatted_date = sale_date.strftime('%d/%m/%Y')
-                formatted_time = sale_date.strftime('%I:%M %p')
-            except ValueError:
-                # Fallback to current time if there's a parsing error
-                current_datetime = datetime.datetime.now()
-                formatted_date = current_datetime.strftime('%d/%m/%Y')
-                formatted_time = current_datetime.strftime('%I:%M %p')
-            
-            invoice_data = {
-                "invoice_number": invoice_number,
-                "date": formatted_date,
-                "time": formatted_time,
-                "store_info": {
-                    "name": store_info.get("store_name", "Agritech Store"),
-                    "address": store_info.get("store_address", "Address Not Set"),
-                    "phone": store_info.get("store_phone", "Phone Not Set"),
-                    "gstin": store_info.get("store_gstin", "GSTIN Not Set"),
-                    "email": store_info.get("store_email", "Email Not Set")
-                },
-                "customer": {
-                    "name": sale[13],  # customer_name
-                    "phone": sale[14],  # customer_phone
-                    "address": sale[15],  # customer_address
-                    "village": sale[16],  # customer_village
-                    "gstin": sale[17]   # customer_gstin
-                },
-                "items": [],
-                "payment": {
-                    "subtotal": sale[3],  # subtotal
-                    "discount": sale[4],  # discount
-                    "cgst": sale[11],     # cgst
-                    "sgst": sale[12],     # sgst
-                    "total": sale[6],     # total
-                    "method": sale[7],    # payment_type
-                    "reference": sale[8]  # payment_reference
-                }
-            }
+            open_file(self.last_invoice_path, action)
         except Exception as e:
-            print(f"Error preparing invoice data: {str(e)}")
-            messagebox.showerror("Error", f"Failed to prepare invoice: {str(e)}")
-            return None
+            messagebox.showerror("Invoice Error", f"Could not open invoice: {str(e)}")
+    
+    def _render_invoice(self, db, invoice_id):
+        """Write the PDF for an invoice and return its path
         
-        # Add payment split details if applicable
-        if sale[7] == "SPLIT":  # Updated index for payment_type
-            try:
-                # First check if payment_splits table has credit_amount column
-                cols = db.fetchall("PRAGMA table_info(payment_splits)")
-                col_names = [col[1] for col in cols]
-                
-                # Build query based on available columns
-                query = "SELECT cash_amount, upi_amount, upi_reference"
-                if "credit_amount" in col_names:
-                    query += ", credit_amount"
-                query += " FROM payment_splits WHERE sale_id = ?"
-                
-                payment_split = db.fetchone(query, (sale_id,))
-                
-                if payment_split:
-                    split_data = {
-                        "cash_amount": payment_split[0],
-                        "upi_amount": payment_split[1],
-                        "upi_reference": payment_split[2]
-                    }
-                    
-                    # Add credit amount if available
-                    if "credit_amount" in col_names and len(payment_split) > 3:
-                        split_data["credit_amount"] = payment_split[3]
-                    
-                    invoice_data["payment"]["split"] = split_data
-            except Exception as e:
-                print(f"Error retrieving payment split details: {e}")
+        Runs on an invoice render worker (see utils.invoice_queue), so it only
+        uses db and raises on failure instead of showing dialogs. The invoice
+        data comes from database.invoice_assembler, as for sales history.
+        """
+        invoice_data = db.invoice_assembler.assemble(invoice_id)
+        invoice_number = invoice_data["invoice_number"]
         
-        # Add items with safer item processing
-        for item in items:
-            try:
-                # Create a safer dictionary mapping for item values
-                # The last column (12 or 13 depending on the query) is our resolved_hsn_code from the query
-                item_dict = {
-                    "id": item[0] if len(item) > 0 else None,
-                    "sale_id": item[1] if len(item) > 1 else None,
-                    "product_id": item[2] if len(item) > 2 else None,
-                    "product_name": item[3] if len(item) > 3 else "Unknown Product",
-                    "quantity": item[4] if len(item) > 4 else 0,
-                    "price": item[5] if len(item) > 5 else 0,
-                    "discount_percent": item[6] if len(item) > 6 else 0,
-                    "tax_percentage": item[7] if len(item) > 7 else 0,
-                    "tax_amount": item[8] if len(item) > 8 else 0,
-                    "total": item[9] if len(item) > 9 else 0,
-                }
-                
-                # Get the resolved HSN code from the last column (the one we get from our CASE WHEN query)
-                # For safety, get the last item in the tuple
-                hsn_code = item[-1] if len(item) > 10 and item[-1] not in [None, ""] else "-"
-                
-                # Debug output to verify HSN code handling
-                print(f"Processing invoice item '{item_dict['product_name']}', HSN from query: '{hsn_code}'")
-                
-                # Extract additional product details from item tuple
-                # The index positions should match the select statement above
-                # Original select had 10 columns (0-9), then we added resolved_hsn_code and more fields
-                manufacturer = item[12] if len(item) > 12 else ""  # p.manufacturer
-                unit = item[13] if len(item) > 13 else "pc"         # p.unit
-                batch_no = item[14] if len(item) > 14 else ""       # p.batch_no
-                expiry_date = item[15] if len(item) > 15 else ""    # p.expiry_date
-                
-                # Try to get batch details from batches table if available
-                batch_number = item[16] if len(item) > 16 else ""    # b.batch_number
-                company_name = item[17] if len(item) > 17 else ""    # b.company_name
-                batch_expiry = item[18] if len(item) > 18 else ""    # b.expiry_date
-                
-                # Prefer batch table data over product data if available
-                final_batch_no = batch_number if batch_number else batch_no
-                final_company = company_name if company_name else manufacturer
-                final_expiry = batch_expiry if batch_expiry else expiry_date
-                
-                # Debug to verify fields
-                print(f"Adding item with manufacturer: {final_company}, batch: {final_batch_no}, expiry: {final_expiry}, unit: {unit}")
-                
-                # Using the dictionary to avoid index errors
-                invoice_data["items"].append({
-                    "name": item_dict["product_name"],
-                    "hsn_code": hsn_code,
-                    "quantity": item_dict["quantity"],
-                    "price": item_dict["price"],
-                    "discount": item_dict["discount_percent"],
-                    "tax_percentage": item_dict["tax_percentage"],
-                    "tax_amount": item_dict["tax_amount"],
-                    "total": item_dict["total"],
-                    "manufacturer": final_company,
-                    "company_name": final_company,
-                    "batch_no": final_batch_no,
-                    "batch": final_batch_no,
-                    "expiry_date": final_expiry,
-                    "expiry": final_expiry,
-                    "unit": unit,
-                    "product_id": item_dict["product_id"]
-                })
-                
-                # Debug output to trace what's being added
-                print(f"Added invoice item: {item_dict['product_name']}, HSN: {hsn_code}")
-                
-            except Exception as e:
-                print(f"Error processing invoice item: {e}, item data: {item}")
-                # Continue with other items instead of failing completely
+        # Save path with consistent naming format - always PDF format to match template exactly
+        # Get invoice prefix from invoice number (it's in the format like "24-25/ABC-001")
+        invoice_parts = invoice_number.split('/')
         
-        try:
-            # Get invoice directory - use relative paths for better compatibility
-            # Store invoices in a subdirectory of the current app directory
-            invoices_dir = os.path.join(".", "invoices")
-            os.makedirs(invoices_dir, exist_ok=True)
-            
-            # Save path with consistent naming format - always PDF format to match template exactly
-            # Get invoice prefix from invoice number (it's in the format like "24-25/ABC-001")
-            invoice_parts = invoice_number.split('/')
-            
-            if len(invoice_parts) > 1:
-                # Extract prefix from the invoice number (e.g., "ABC" from "24-25/ABC-001")
-                prefix_part = invoice_parts[1].split('-')[0]
-            else:
-                # Fallback to using the invoice number itself
-                prefix_part = "INV"
-                
-            file_name = f"{prefix_part}_{invoice_number.replace('/', '-')}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-            save_path = os.path.join(invoices_dir, file_name)
-            
-            # Debug output
-            print(f"Creating invoice file at: {os.path.abspath(save_path)} in PDF format")
-            
-            # Get payment history if this is a credit or split payment with credit
-            payment_status = db.fetchone("SELECT payment_status FROM invoices WHERE invoice_number = ?", (invoice_number,))
-            if payment_status and payment_status[0] in ['UNPAID', 'PARTIALLY_PAID']:
-                # Get payment history data
-                query = """
-                    SELECT 
-                        amount, 
-                        payment_method, 
-                        payment_date, 
-                        reference_number,
-                        created_at
-                    FROM customer_payments 
-                    WHERE invoice_id = (SELECT id FROM invoices WHERE invoice_number = ?)
-                    ORDER BY payment_date, created_at 
-                """
-                payments = db.fetchall(query, (invoice_number,))
-                
-                if payments:
-                    # Convert payment info to proper format for the new invoice generator
-                    payment_list = []
-                    for payment in payments:
-                        amount = payment[0] if payment[0] is not None else 0
-                        method = payment[1] if payment[1] is not None else "Unknown"
-                        date = payment[2] if payment[2] is not None else "Unknown date"
-                        reference = payment[3] if payment[3] is not None else ""
-                        timestamp = payment[4] if len(payment) > 4 and payment[4] is not None else ""
-                        
-                        payment_list.append({
-                            'amount': amount,
-                            'method': method,
-                            'date': date,
-                            'reference': reference,
-                            'time': '',  # Will use default time if not provided
-                            'depositor': 'Customer'  # Default depositor
-                        })
-                    
-                    # Add payment history to invoice data
-                    invoice_data["payment"]["payments"] = payment_list
-            
-            # Generate invoice with exact PDF template matching
-            generate_invoice(invoice_data, save_path)
-            
-            # Update file_path in the invoices table
-            db.execute("""
-                UPDATE invoices
-                SET file_path = ?
-                WHERE invoice_number = ?
-            """, (save_path, invoice_number))
-            db.commit()
-            
-            # Ask if user wants to open the invoice
-            if messagebox.askyesno("Invoice Generated", 
-                                 f"Invoice generated successfully: {file_name}\n\nOpen invoice?"):
-                import platform
-                import subprocess
-                
-                # Open PDF with default viewer
-                if platform.system() == 'Windows':
-                    # Use subprocess instead of os.startfile for better cross-platform compatibility
-                    subprocess.call(['start', '', save_path], shell=True)
-                elif platform.system() == 'Darwin':  # macOS
-                    subprocess.call(['open', save_path])
-                else:  # Linux
-                    subprocess.call(['xdg-open', save_path])
-                
-        except Exception as e:
-            messagebox.showerror("Invoice Error", f"Failed to generate invoice: {str(e)}")
-            # Log the error for debugging
-            print(f"Invoice error: {str(e)}")
+        if len(invoice_parts) > 1:
+            # Extract prefix from the invoice number (e.g., "ABC" from "24-25/ABC-001")
+            prefix_part = invoice_parts[1].split('-')[0]
+        else:
+            # Fallback to using the invoice number itself
+            prefix_part = "INV"
+            
+        file_name = f"{prefix_part}_{invoice_number.replace('/', '-')}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+        # Invoices are kept in financial year/month folders (see utils.invoice_store)
+        save_path = invoice_store().path_for(file_name, invoice_data["date"])
+        
+        # Generate invoice with exact PDF template matching
+        if not generate_invoice(invoice_data, save_path):
+            raise RuntimeError("PDF invoice generation failed")
+        
+        # The render queue stores save_path in invoices.file_path
+        return save_path
+    
+    def _render_receipt(self, db, invoice_id):
+        """Write the receipt for an invoice to the receipt spool folder and return its path
+        
+        Runs on an invoice render worker like _render_invoice. The format
+        (plain text or ESC/POS), width and folder come from the invoice settings.
+        """
+        config = self.controller.config
+        invoice_data = db.invoice_assembler.assemble(invoice_id)
+        receipt_format = config.get("receipt_format", "text")
+        save_path = receipt_path(invoice_data["invoice_number"],
+                                 config.get("receipt_spool_dir") or RECEIPTS_DIR, receipt_format)
+        return write_receipt(invoice_data, save_path, receipt_format,
+                             int(config.get("receipt_width", RECEIPT_WIDTH)))
     
     def handle_key_event(self, event):
         """Handle keyboard events for navigation"""
@@ -4298,6 +3921,11 @@ class SalesFrame(tk.Frame):
             search_entry = self.winfo_children()[0].winfo_children()[0].winfo_children()[0]
             search_entry.focus_set()
     
+    def destroy(self):
+        """Finish queued invoices before the frame goes, e.g. when another module is opened"""
+        self.invoice_queue.stop()
+        super().destroy()
+    
     def on_show(self):
         """Called when frame is shown"""
         # Reset reserved inventory
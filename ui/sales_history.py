@@ -6,11 +6,16 @@ import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
+import queue
 import subprocess
+import threading
 
 # Import global styles and formatting utils
 from assets.styles import COLORS, FONTS
-from utils.helpers import format_currency, parse_date, format_date
+from database.profiler import profiled
+from utils.helpers import format_currency, parse_date, format_date, date_range_clause
+from utils.invoice_regen import regenerate_invoice, regenerate_missing, format_summary
+from utils.invoice_store import invoice_store
 
 class SalesHistoryFrame(tk.Frame):
     """Sales history frame for viewing and reprinting invoices"""
@@ -143,6 +148,20 @@ class SalesHistoryFrame(tk.Frame):
         )
         view_button.pack(side=tk.LEFT)
         
+        # Rebuild missing invoice files in bulk, e.g. after a restore
+        regenerate_button = tk.Button(
+            date_frame,
+            text="Regenerate Invoices",
+            font=FONTS["regular"],
+            bg=COLORS["secondary"],
+            fg=COLORS["text_white"],
+            padx=10,
+            pady=3,
+            cursor="hand2",
+            command=self.show_bulk_regeneration
+        )
+        regenerate_button.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Create content frame for main content area
         content_frame = tk.Frame(main_container, bg=COLORS["bg_primary"], padx=5, pady=0)
         content_frame.pack(fill=tk.BOTH, expand=True)
@@ -602,6 +621,7 @@ class SalesHistoryFrame(tk.Frame):
         self.selected_date = today
         self.load_sales()
     
+    @profiled("load_sales")
     def load_sales(self):
         """Load sales for the selected date"""
         # Clear existing data
@@ -611,21 +631,19 @@ class SalesHistoryFrame(tk.Frame):
         # Reset details
         self.clear_details()
         
-        # Format date for SQL query
-        date_str = self.selected_date.strftime("%Y-%m-%d")
-        
         # Query to get invoices for the selected date
-        query = """
+        date_clause, date_params = date_range_clause("i.invoice_date", self.selected_date)
+        query = f"""
             SELECT i.id, i.invoice_number, c.name as customer_name, 
                    i.total_amount, i.payment_method, i.payment_status,
                    i.invoice_date, i.file_path
             FROM invoices i
             LEFT JOIN customers c ON i.customer_id = c.id
-            WHERE DATE(i.invoice_date) = ?
+            WHERE {date_clause}
             ORDER BY i.invoice_date DESC
         """
         
-        invoices = self.controller.db.fetchall(query, (date_str,))
+        invoices = self.controller.db.fetchall(query, date_params)
         
         if not invoices:
             self.update_stats(0, 0)
@@ -657,6 +675,7 @@ class SalesHistoryFrame(tk.Frame):
                 tags=(str(invoice[0]),)  # Store invoice ID as tag for selection
             )
     
+    @profiled("search_invoices")
     def search_invoices(self, event=None):
         """Search invoices based on search term"""
         search_term = self.search_var.get().lower()
@@ -670,17 +689,15 @@ class SalesHistoryFrame(tk.Frame):
         for item in self.sales_tree.get_children():
             self.sales_tree.delete(item)
         
-        # Format date for SQL query
-        date_str = self.selected_date.strftime("%Y-%m-%d")
-        
         # Query to get invoices for the selected date matching search term
-        query = """
+        date_clause, date_params = date_range_clause("i.invoice_date", self.selected_date)
+        query = f"""
             SELECT i.id, i.invoice_number, c.name as customer_name, 
                    i.total_amount, i.payment_method, i.payment_status,
                    i.invoice_date, i.file_path
             FROM invoices i
             LEFT JOIN customers c ON i.customer_id = c.id
-            WHERE DATE(i.invoice_date) = ?
+            WHERE {date_clause}
               AND (i.invoice_number LIKE ? OR c.name LIKE ? OR i.payment_method LIKE ?)
             ORDER BY i.invoice_date DESC
         """
@@ -688,7 +705,7 @@ class SalesHistoryFrame(tk.Frame):
         search_pattern = f"%{search_term}%"
         invoices = self.controller.db.fetchall(
             query, 
-            (date_str, search_pattern, search_pattern, search_pattern)
+            [*date_params, search_pattern, search_pattern, search_pattern]
         )
         
         if not invoices:
@@ -775,65 +792,26 @@ class SalesHistoryFrame(tk.Frame):
             print(f"DEBUG: Processing selection for invoice ID: {invoice_id}")
             self.current_invoice_id = invoice_id
             
-            # Check if invoice exists in either invoices or sales table
-            check_query = """
+            query = """
                 SELECT 
-                    (SELECT COUNT(*) FROM invoices WHERE id = ?) as invoice_count,
-                    (SELECT COUNT(*) FROM sales WHERE id = ?) as sale_count
+                    i.id, i.invoice_number, i.customer_id, i.subtotal, 
+                    i.discount_amount, i.tax_amount, i.total_amount, 
+                    i.payment_method, i.payment_status, i.cash_amount, 
+                    i.upi_amount, i.upi_reference, i.credit_amount, 
+                    i.invoice_date, i.file_path,
+                    c.name, c.phone, c.address
+                FROM invoices i
+                LEFT JOIN customers c ON i.customer_id = c.id
+                WHERE i.id = ?
             """
-            check_result = self.controller.db.fetchone(check_query, (invoice_id, invoice_id))
-            
-            if not check_result:
-                print(f"DEBUG: Failed to check if invoice ID {invoice_id} exists")
-                self.clear_details()
-                return
-                
-            invoice_exists = check_result[0] > 0
-            sale_exists = check_result[1] > 0
-            
-            print(f"DEBUG: Invoice ID {invoice_id} exists in invoices: {invoice_exists}, in sales: {sale_exists}")
-            
-            # Determine which table to query based on existence
-            if invoice_exists:
-                # Query from invoices table
-                query = """
-                    SELECT 
-                        i.id, i.invoice_number, i.customer_id, i.subtotal, 
-                        i.discount_amount, i.tax_amount, i.total_amount, 
-                        i.payment_method, i.payment_status, i.cash_amount, 
-                        i.upi_amount, i.upi_reference, i.credit_amount, 
-                        i.invoice_date, i.file_path,
-                        c.name, c.phone, c.address
-                    FROM invoices i
-                    LEFT JOIN customers c ON i.customer_id = c.id
-                    WHERE i.id = ?
-                """
-            elif sale_exists:
-                # Query from sales table 
-                query = """
-                    SELECT 
-                        s.id, s.invoice_number, s.customer_id, s.subtotal, 
-                        s.discount_amount, s.tax_amount, s.total, 
-                        s.payment_method, s.status, s.cash_amount, 
-                        s.upi_amount, s.upi_reference, s.credit_amount, 
-                        s.created_at, NULL as file_path,
-                        c.name, c.phone, c.address
-                    FROM sales s
-                    LEFT JOIN customers c ON s.customer_id = c.id
-                    WHERE s.id = ?
-                """
-            else:
-                print(f"DEBUG: Invoice {invoice_id} not found in either table")
-                self.clear_details()
-                messagebox.showinfo("Not Found", f"Invoice #{invoice_id} could not be found in the database.")
-                return
             
             # Fetch the record
             invoice = self.controller.db.fetchone(query, (invoice_id,))
             
             if not invoice:
-                print(f"DEBUG: Query returned no results for ID: {invoice_id}")
+                print(f"DEBUG: Invoice {invoice_id} not found")
                 self.clear_details()
+                messagebox.showinfo("Not Found", f"Invoice #{invoice_id} could not be found in the database.")
                 return
             
             # Debug output to see what we're working with
@@ -967,9 +945,10 @@ class SalesHistoryFrame(tk.Frame):
                         self.payment_details_label.config(text=payment_details)
                 
                 # Handle buttons for view/print
-                if invoice_exists and len(invoice) > 14:
+                if len(invoice) > 14:
                     file_path = invoice[14]  # file_path is at index 14 from invoices table
-                    if file_path and os.path.exists(file_path):
+                    # Files of packed months count as present without being extracted
+                    if invoice_store().exists(file_path):
                         print(f"DEBUG: Invoice file exists at: {file_path}")
                         self.view_btn.config(state=tk.NORMAL)
                         self.print_btn.config(state=tk.NORMAL)
@@ -978,7 +957,7 @@ class SalesHistoryFrame(tk.Frame):
                         file_name = os.path.basename(file_path) if file_path else ""
                         rel_path = os.path.join(".", "invoices", file_name) if file_name else ""
                         
-                        if rel_path and os.path.exists(rel_path):
+                        if invoice_store().exists(rel_path):
                             print(f"DEBUG: Invoice file exists at relative path: {rel_path}")
                             self.view_btn.config(state=tk.NORMAL)
                             self.print_btn.config(state=tk.NORMAL)
@@ -987,7 +966,7 @@ class SalesHistoryFrame(tk.Frame):
                             self.view_btn.config(state=tk.DISABLED)
                             self.print_btn.config(state=tk.DISABLED)
                 else:
-                    # No file for sales or missing data
+                    # Missing data
                     self.view_btn.config(state=tk.DISABLED)
                     self.print_btn.config(state=tk.DISABLED)
                 
@@ -1005,6 +984,7 @@ class SalesHistoryFrame(tk.Frame):
             traceback.print_exc()
             self.clear_details()
     
+    @profiled("load_invoice_items")
     def load_invoice_items(self, invoice_id):
         """Load items for the selected invoice"""
         # Clear existing items
@@ -1013,233 +993,25 @@ class SalesHistoryFrame(tk.Frame):
         
         print(f"DEBUG: Loading items for invoice ID: {invoice_id}")
         
-        # First check if this is a valid invoice ID
-        query_check = "SELECT COUNT(*) FROM invoices WHERE id = ?"
-        result_check = self.controller.db.fetchone(query_check, (invoice_id,))
-        has_invoice = result_check and result_check[0] > 0
-        
-        # Check if there's a corresponding sale ID
-        query_check_sale = "SELECT COUNT(*) FROM sales WHERE id = ?"
-        result_check_sale = self.controller.db.fetchone(query_check_sale, (invoice_id,))
-        has_sale = result_check_sale and result_check_sale[0] > 0
-        
-        print(f"DEBUG: Invoice ID {invoice_id} exists in invoices table: {has_invoice}")
-        print(f"DEBUG: Invoice ID {invoice_id} exists in sales table: {has_sale}")
-        
-        # Get the table schema to understand what columns are available
-        try:
-            print("DEBUG: Checking table schema for invoice_items")
-            schema_query = "PRAGMA table_info(invoice_items)"
-            schema = self.controller.db.fetchall(schema_query)
-            print(f"DEBUG: invoice_items schema: {[col[1] for col in schema]}")
-        except Exception as e:
-            print(f"DEBUG: Error checking schema: {e}")
-        
-        # Search for invoice items with more rigorous error handling
-        items = []
-        
-        # Try the invoice_items table if we have an invoice record
-        if has_invoice:
-            try:
-                # Use a dynamic approach that checks column names first
-                schema_query = "PRAGMA table_info(invoice_items)"
-                schema = self.controller.db.fetchall(schema_query)
-                column_names = [col[1] for col in schema]
-                
-                # Determine price column
-                price_column = None
-                for price_name in ['unit_price', 'price_per_unit', 'price']:
-                    if price_name in column_names:
-                        price_column = price_name
-                        break
-                
-                # Default to 'unit_price' if we can't determine
-                if not price_column:
-                    price_column = 'unit_price'
-                    print(f"DEBUG: Could not determine price column, using {price_column}")
-                else:
-                    print(f"DEBUG: Using {price_column} for price")
-                
-                # Build a more resilient query based on available columns
-                # Check if hsn_code column exists in invoice_items
-                has_hsn_in_invoice_items = 'hsn_code' in column_names
-                
-                query = f"""
-                    SELECT 
-                        COALESCE(p.name, 'Item ' || ii.product_id) as product_name,
-                        {('COALESCE(ii.hsn_code, p.hsn_code, ' + "'-')" if has_hsn_in_invoice_items else 'COALESCE(p.hsn_code, ' + "'-')")} as hsn_code,
-                        COALESCE(ii.quantity, 0) as quantity,
-                        COALESCE(ii.{price_column}, 0) as price,
-                        COALESCE(ii.discount_percentage, 0) as discount,
-                        COALESCE(ii.total_price, 0) as total
-                    FROM invoice_items ii
-                    LEFT JOIN products p ON ii.product_id = p.id
-                    WHERE ii.invoice_id = ?
-                """
-                items = self.controller.db.fetchall(query, (invoice_id,))
-                if items:
-                    print(f"DEBUG: Found {len(items)} items in invoice_items table")
-                    # Print first item for debugging
-                    if len(items) > 0:
-                        print(f"DEBUG: First item data: {items[0]}")
-            except Exception as e:
-                print(f"DEBUG: Error querying invoice_items: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # If no items found or no invoice, try the sale_items table
-        if not items and has_sale:
-            try:
-                # Check schema of sale_items too
-                schema_query = "PRAGMA table_info(sale_items)"
-                schema = self.controller.db.fetchall(schema_query)
-                column_names = [col[1] for col in schema]
-                print(f"DEBUG: sale_items schema: {column_names}")
-                
-                # Determine discount column
-                discount_column = 'discount_percentage'
-                if 'discount_percentage' in column_names:
-                    discount_column = 'discount_percentage'
-                elif 'discount_percent' in column_names:
-                    discount_column = 'discount_percent'
-                
-                query = f"""
-                    SELECT 
-                        COALESCE(si.product_name, 'Item ' || si.product_id) as product_name,
-                        COALESCE(si.hsn_code, '-') as hsn_code,
-                        COALESCE(si.quantity, 0) as quantity,
-                        COALESCE(si.price, 0) as price,
-                        COALESCE(si.{discount_column}, 0) as discount,
-                        COALESCE(si.total, ROUND(COALESCE(si.quantity, 0) * COALESCE(si.price, 0) * (1 - COALESCE(si.{discount_column}, 0)/100), 2)) as total
-                    FROM sale_items si
-                    WHERE si.sale_id = ?
-                """
-                items = self.controller.db.fetchall(query, (invoice_id,))
-                if items:
-                    print(f"DEBUG: Found {len(items)} items in sale_items table")
-                    # Print first item for debugging
-                    if len(items) > 0:
-                        print(f"DEBUG: First sale item data: {items[0]}")
-            except Exception as e:
-                print(f"DEBUG: Error querying sale_items: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # Check relationship between invoices and sales to try alternative approach
-        if not items and has_invoice:
-            try:
-                print("DEBUG: Trying to find related sale for this invoice")
-                # Try to find associated sale ID via invoice number
-                query = """
-                    SELECT s.id 
-                    FROM sales s
-                    JOIN invoices i ON s.invoice_number = i.invoice_number
-                    WHERE i.id = ?
-                """
-                related_sale = self.controller.db.fetchone(query, (invoice_id,))
-                
-                if related_sale:
-                    sale_id = related_sale[0]
-                    print(f"DEBUG: Found related sale ID {sale_id} for invoice {invoice_id}")
-                    
-                    # Now query sale_items using this sale ID
-                    # First check the schema to use the correct column names
-                    schema_query = "PRAGMA table_info(sale_items)"
-                    schema = self.controller.db.fetchall(schema_query)
-                    column_names = [col[1] for col in schema]
-                    print(f"DEBUG: sale_items schema for related sale: {column_names}")
-                    
-                    # Determine discount column name
-                    discount_column = 'discount_percent'
-                    if 'discount_percentage' in column_names:
-                        discount_column = 'discount_percentage'
-                    elif 'discount_percent' in column_names:
-                        discount_column = 'discount_percent'
-                    
-                    print(f"DEBUG: Using discount column: {discount_column}")
-                    
-                    query = f"""
-                        SELECT 
-                            COALESCE(si.product_name, 'Item ' || si.product_id) as product_name,
-                            COALESCE(si.hsn_code, '-') as hsn_code,
-                            COALESCE(si.quantity, 0) as quantity,
-                            COALESCE(si.price, 0) as price,
-                            COALESCE(si.{discount_column}, 0) as discount,
-                            COALESCE(si.total, ROUND(COALESCE(si.quantity, 0) * COALESCE(si.price, 0) * (1 - COALESCE(si.{discount_column}, 0)/100), 2)) as total
-                        FROM sale_items si
-                        WHERE si.sale_id = ?
-                    """
-                    items = self.controller.db.fetchall(query, (sale_id,))
-                    if items:
-                        print(f"DEBUG: Found {len(items)} items in sale_items table via related sale")
-            except Exception as e:
-                print(f"DEBUG: Error finding related sale: {e}")
+        # invoice_items is the only item table; quick-add items carry their own name
+        query = """
+            SELECT 
+                COALESCE(ii.product_name, p.name, 'Item ' || ii.product_id) as product_name,
+                COALESCE(NULLIF(ii.hsn_code, ''), p.hsn_code, '-') as hsn_code,
+                COALESCE(ii.quantity, 0) as quantity,
+                COALESCE(ii.price_per_unit, 0) as price,
+                COALESCE(ii.discount_percentage, 0) as discount,
+                COALESCE(ii.total_price, 0) as total
+            FROM invoice_items ii
+            LEFT JOIN products p ON ii.product_id = p.id
+            WHERE ii.invoice_id = ?
+            ORDER BY ii.id
+        """
+        items = self.controller.db.fetchall(query, (invoice_id,))
+        print(f"DEBUG: Found {len(items)} items for invoice {invoice_id}")
         
-        # If still no items found, try a raw approach to get any data
         if not items:
-            print(f"DEBUG: No items found in either table for ID {invoice_id}")
-            try:
-                # Get a raw dump of any invoice_items for this invoice_id
-                raw_query = "SELECT * FROM invoice_items WHERE invoice_id = ?"
-                raw_items = self.controller.db.fetchall(raw_query, (invoice_id,))
-                
-                if raw_items and len(raw_items) > 0:
-                    print(f"DEBUG: Found {len(raw_items)} raw invoice_items")
-                    # Print the raw data to understand structure
-                    for i, raw_item in enumerate(raw_items):
-                        print(f"DEBUG: Raw item {i+1}: {raw_item}")
-                        
-                        # Try to create proper display values
-                        try:
-                            product_id = raw_item[2] if len(raw_item) > 2 and raw_item[2] is not None else "Unknown"
-                            # Try to get product name from products table
-                            product_query = "SELECT name FROM products WHERE id = ?"
-                            product_result = self.controller.db.fetchone(product_query, (product_id,))
-                            product_name = product_result[0] if product_result else f"Product #{product_id}"
-                            
-                            # Find quantity, price and total based on column position
-                            quantity = raw_item[4] if len(raw_item) > 4 and raw_item[4] is not None else 0
-                            price = 0
-                            for j in range(3, len(raw_item)):
-                                if isinstance(raw_item[j], (int, float)) and raw_item[j] > 0 and raw_item[j] < 10000:
-                                    # This is likely the price value
-                                    price = raw_item[j]
-                                    break
-                            
-                            # Total is likely one of the higher values
-                            total = 0
-                            for j in range(3, len(raw_item)):
-                                if isinstance(raw_item[j], (int, float)) and raw_item[j] > price:
-                                    # This is likely the total value
-                                    total = raw_item[j]
-                                    break
-                            
-                            # Create a display item
-                            self.items_tree.insert(
-                                "",
-                                "end",
-                                values=(
-                                    product_name,
-                                    "-",
-                                    quantity,
-                                    format_currency(price),
-                                    "0",
-                                    format_currency(total)
-                                )
-                            )
-                        except Exception as e:
-                            print(f"DEBUG: Error processing raw item: {e}")
-                    
-                    # If we processed items, return
-                    if self.items_tree.get_children():
-                        print("DEBUG: Successfully added items from raw data")
-                        return
-            except Exception as e:
-                print(f"DEBUG: Error in raw query: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # If still nothing, add a placeholder item for better user experience
+            # Add a placeholder item for better user experience
             self.items_tree.insert(
                 "",
                 "end",
@@ -1609,91 +1381,63 @@ class SalesHistoryFrame(tk.Frame):
             
             # Update invoice status
             try:
-                # Start a transaction
-                self.controller.db.begin()
-                
-                # Calculate remaining amount after this payment
-                remaining_amount = round(credit_amount - payment_amount, 2)
-                
-                # Determine new payment status based on remaining amount
-                new_status = "PAID"
-                if remaining_amount > 0:
-                    # Use the same status naming convention that was already in the system
-                    if payment_status.upper() == "PARTIAL":
-                        new_status = "PARTIAL"
-                    else:
-                        new_status = "PARTIALLY_PAID"
-                
-                # 1. Update invoice status and credit_amount
-                self.controller.db.execute(
-                    "UPDATE invoices SET payment_status = ?, credit_amount = ? WHERE id = ?",
-                    (new_status, remaining_amount, invoice_id)
-                )
+                # Status update, payment record and ledger entry commit as one unit
+                with self.controller.db.transaction():
+                    # Calculate remaining amount after this payment
+                    remaining_amount = round(credit_amount - payment_amount, 2)
+                
+                    # Determine new payment status based on remaining amount
+                    new_status = "PAID"
+                    if remaining_amount > 0:
+                        # Use the same status naming convention that was already in the system
+                        if payment_status.upper() == "PARTIAL":
+                            new_status = "PARTIAL"
+                        else:
+                            new_status = "PARTIALLY_PAID"
                 
-                # 2. Record the payment in the customer_payments table
-                # Check if customer_payments table exists
-                table_check = self.controller.db.fetchone(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name='customer_payments'"
-                )
+                    # 1. Update invoice status and credit_amount
+                    self.controller.db.execute(
+                        "UPDATE invoices SET payment_status = ?, credit_amount = ? WHERE id = ?",
+                        (new_status, remaining_amount, invoice_id)
+                    )
                 
-                if not table_check:
-                    # Create customer_payments table if it doesn't exist with depositor_name field
-                    self.controller.db.execute("""
-                        CREATE TABLE IF NOT EXISTS customer_payments (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            customer_id INTEGER,
-                            invoice_id INTEGER,
-                            amount REAL,
-                            payment_method TEXT,
-                            reference_number TEXT,
-                            depositor_name TEXT,
-                            payment_date TEXT,
-                            notes TEXT,
-                            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                            FOREIGN KEY (customer_id) REFERENCES customers (id),
-                            FOREIGN KEY (invoice_id) REFERENCES invoices (id)
+                    # 2. Record the payment in the customer_payments table
+                    # Insert payment record with depositor_name field
+                    self.controller.db.execute(
+                        """
+                        INSERT INTO customer_payments 
+                        (customer_id, invoice_id, amount, payment_method, reference_number, depositor_name, payment_date, notes) 
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            customer_id, 
+                            invoice_id, 
+                            payment_amount, 
+                            payment_method_var.get(), 
+                            reference_var.get(),
+                            depositor_name,
+                            payment_date.strftime("%Y-%m-%d"), 
+                            notes
                         )
-                    """)
-                
-                # Insert payment record with depositor_name field
-                self.controller.db.execute(
-                    """
-                    INSERT INTO customer_payments 
-                    (customer_id, invoice_id, amount, payment_method, reference_number, depositor_name, payment_date, notes) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        customer_id, 
-                        invoice_id, 
-                        payment_amount, 
-                        payment_method_var.get(), 
-                        reference_var.get(),
-                        depositor_name,
-                        payment_date.strftime("%Y-%m-%d"), 
-                        notes
                     )
-                )
                 
-                # 3. Add entry to customer_transactions table for accounting ledger
-                # Insert transaction entry
-                self.controller.db.execute(
-                    """
-                    INSERT INTO customer_transactions
-                    (customer_id, amount, transaction_type, reference_id, transaction_date, notes) 
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        customer_id,
-                        payment_amount,  # Amount of payment
-                        "CREDIT_PAYMENT",  # Transaction type
-                        invoice_id,  # Reference to invoice
-                        payment_date.strftime("%Y-%m-%d %H:%M:%S"),
-                        f"Payment for Invoice #{invoice_number} via {payment_method_var.get()} by {depositor_name}"
+                    # 3. Add entry to customer_transactions table for accounting ledger
+                    # Insert transaction entry
+                    self.controller.db.execute(
+                        """
+                        INSERT INTO customer_transactions
+                        (customer_id, amount, transaction_type, reference_id, transaction_date, notes) 
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            customer_id,
+                            payment_amount,  # Amount of payment
+                            "CREDIT_PAYMENT",  # Transaction type
+                            invoice_id,  # Reference to invoice
+                            payment_date.strftime("%Y-%m-%d %H:%M:%S"),
+                            f"Payment for Invoice #{invoice_number} via {payment_method_var.get()} by {depositor_name}"
+                        )
                     )
-                )
-                
-                # Commit transaction
-                self.controller.db.commit()
                 
                 # Generate success message based on payment type
                 if new_status == "PAID":
@@ -1710,8 +1454,7 @@ class SalesHistoryFrame(tk.Frame):
                 self.load_sales()
                 
             except Exception as e:
-                # Rollback transaction on error
-                self.controller.db.rollback()
+                # transaction() has already rolled back the partial payment
                 print(f"ERROR: Failed to process payment: {e}")
                 messagebox.showerror("Error", f"Failed to process payment: {e}")
         
@@ -1787,7 +1530,7 @@ class SalesHistoryFrame(tk.Frame):
         print(f"DEBUG: Original invoice file path: {file_path}")
         
         # Fix absolute paths to use relative paths
-        if file_path and (file_path.startswith('C:') or file_path.startswith('/')):
+        if file_path and (file_path.startswith('C:') or file_path.startswith('/')) and not invoice_store().exists(file_path):
             # Convert absolute path to relative path
             print(f"DEBUG: Converting absolute path to relative")
             file_name = os.path.basename(file_path)
@@ -1805,8 +1548,9 @@ class SalesHistoryFrame(tk.Frame):
         invoices_dir = os.path.join(".", "invoices")
         os.makedirs(invoices_dir, exist_ok=True)
         
-        # Check if file exists
-        if not os.path.isfile(file_path):
+        # Find the file, extracting it from its month's pack if the month is closed
+        readable_path = invoice_store().locate(file_path)
+        if not readable_path:
             print(f"DEBUG: Invoice file does not exist at path: {file_path}")
             
             # Always use PDF format for invoice regeneration to match template exactly
@@ -1832,16 +1576,17 @@ class SalesHistoryFrame(tk.Frame):
                 return
             
             # Check again if file exists after regeneration
-            if not os.path.isfile(file_path):
+            readable_path = invoice_store().locate(file_path)
+            if not readable_path:
                 messagebox.showerror("Error", 
                                   f"Invoice PDF file still not found after regeneration attempt:\n{file_path}")
                 return
         
         try:
-            print(f"DEBUG: Attempting to open file: {file_path}")
+            print(f"DEBUG: Attempting to open file: {readable_path}")
             # Use the viewer from pdf_invoice_generator
             from utils.pdf_invoice_generator import view_invoice
-            if view_invoice(file_path):
+            if view_invoice(readable_path):
                 print("DEBUG: Invoice opened successfully")
             else:
                 raise Exception("Failed to open invoice file with system viewer")
@@ -1850,7 +1595,7 @@ class SalesHistoryFrame(tk.Frame):
             print(f"DEBUG: Error opening invoice: {e}")
             messagebox.showinfo(
                 "File Location", 
-                f"The invoice has been saved to:\n{os.path.abspath(file_path)}\n\n"
+                f"The invoice has been saved to:\n{os.path.abspath(readable_path)}\n\n"
                 "Please open this file to view the invoice."
             )
             
@@ -1872,376 +1617,18 @@ class SalesHistoryFrame(tk.Frame):
         """
         print(f"DEBUG: Attempting to regenerate invoice {invoice_id} as {output_format}")
         try:
-            # First try to get invoice data from invoices table with detailed field selection
-            query = """
-                SELECT 
-                    i.invoice_number, 
-                    i.invoice_date, 
-                    i.total_amount,
-                    i.payment_method,
-                    c.name as customer_name,
-                    c.phone as customer_phone,
-                    c.address as customer_address,
-                    c.village as customer_village,
-                    c.gstin as customer_gstin
-                FROM 
-                    invoices i
-                LEFT JOIN 
-                    customers c ON i.customer_id = c.id
-                WHERE 
-                    i.id = ?
-            """
-            invoice_data = self.controller.db.fetchone(query, (invoice_id,))
-            
-            # If not found, try the sales table as a fallback
-            using_sales_table = False
-            if not invoice_data:
-                print(f"DEBUG: Invoice data not found in invoices table for ID: {invoice_id}")
-                print(f"DEBUG: Trying to find data in sales table instead")
-                
-                # More detailed query to get all needed sales data
-                sales_query = """
-                    SELECT 
-                        s.invoice_number, 
-                        s.sale_date, 
-                        s.total,
-                        s.payment_type,
-                        c.name as customer_name,
-                        c.phone as customer_phone,
-                        c.address as customer_address,
-                        c.village as customer_village,
-                        c.gstin as customer_gstin
-                    FROM 
-                        sales s
-                    LEFT JOIN 
-                        customers c ON s.customer_id = c.id
-                    WHERE 
-                        s.id = ?
-                """
-                invoice_data = self.controller.db.fetchone(sales_query, (invoice_id,))
-                using_sales_table = True
-                
-                if not invoice_data:
-                    print(f"DEBUG: Invoice data not found in sales table either for ID: {invoice_id}")
-                    return False
-            
-            # Check the schema of invoice_items and sale_items to build safe queries
-            print("DEBUG: Checking table schemas for invoice items retrieval")
-            ii_schema = self.controller.db.fetchall("PRAGMA table_info(invoice_items)")
-            si_schema = self.controller.db.fetchall("PRAGMA table_info(sale_items)")
-            
-            ii_columns = [col[1] for col in ii_schema]
-            si_columns = [col[1] for col in si_schema]
-            
-            print(f"DEBUG: invoice_items columns: {ii_columns}")
-            print(f"DEBUG: sale_items columns: {si_columns}")
-            
-            # Get the invoice items - first try invoice_items table with detailed product info
-            # Build query safely based on actual columns
-            tax_amount_calc = ""
-            if 'tax_amount' in ii_columns:
-                tax_amount_calc = "ii.tax_amount as tax_amount"
-            else:
-                # Calculate tax amount if column doesn't exist
-                tax_amount_calc = "(ii.total_price * ii.tax_percentage / 100) as tax_amount"
-            
-            items_query = f"""
-                SELECT 
-                    p.name as product_name,
-                    p.hsn_code,
-                    ii.quantity,
-                    ii.price_per_unit as price,
-                    ii.discount_percentage as discount,
-                    ii.total_price as total,
-                    ii.tax_percentage as tax_rate,
-                    {tax_amount_calc}
-                FROM 
-                    invoice_items ii
-                LEFT JOIN 
-                    products p ON ii.product_id = p.id
-                WHERE 
-                    ii.invoice_id = ?
-            """
-            
-            try:
-                items = self.controller.db.fetchall(items_query, (invoice_id,))
-                print(f"DEBUG: Found {len(items) if items else 0} items in invoice_items")
-            except Exception as e:
-                print(f"DEBUG: Error querying invoice_items: {e}")
-                items = []
-            
-            # If no items found, try sale_items table
-            if not items:
-                print(f"DEBUG: No items found in invoice_items for ID: {invoice_id}")
-                print(f"DEBUG: Trying sale_items table")
-                
-                # Determine correct discount column name
-                discount_col = 'discount_percent'
-                if 'discount_percentage' in si_columns:
-                    discount_col = 'discount_percentage'
-                
-                tax_amount_field = ""
-                if 'tax_amount' in si_columns:
-                    tax_amount_field = "tax_amount"
-                else:
-                    # Calculate tax amount if column doesn't exist
-                    tax_amount_field = "(price * tax_percentage / 100) as tax_amount"
-                
-                # Determine correct tax rate column
-                tax_rate_col = 'tax_percentage'
-                if tax_rate_col not in si_columns:
-                    tax_rate_col = 'tax_percent'
-                
-                sale_items_query = f"""
-                    SELECT 
-                        product_name,
-                        hsn_code,
-                        quantity,
-                        price,
-                        {discount_col} as discount,
-                        total,
-                        {tax_rate_col} as tax_rate,
-                        {tax_amount_field}
-                    FROM 
-                        sale_items
-                    WHERE 
-                        sale_id = ?
-                """
-                try:
-                    items = self.controller.db.fetchall(sale_items_query, (invoice_id,))
-                    print(f"DEBUG: Found {len(items) if items else 0} items in sale_items")
-                except Exception as e:
-                    print(f"DEBUG: Error querying sale_items: {e}")
-                    items = []
-            
-            if not items:
-                print(f"DEBUG: No items found for invoice ID: {invoice_id}")
-                return False
-                
-            # Initialize default values first
-            invoice_number = f"INV-{invoice_id}"
-            invoice_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            total_amount = 0.0
-            payment_method = "CASH"
-            customer = {
-                "name": "Walk-in Customer",
-                "phone": "",
-                "address": "",
-                "village": "",
-                "gstin": ""
-            }
-            
-            # Initialize payment status
-            payment_status = "PAID"  # Default if not found
-            
-            # Try to extract values from invoice_data
-            try:
-                if invoice_data and len(invoice_data) > 0:
-                    invoice_number = invoice_data[0] if invoice_data[0] else f"INV-{invoice_id}"
-                    
-                    if len(invoice_data) > 1:
-                        invoice_date = invoice_data[1] if invoice_data[1] else datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        
-                    if len(invoice_data) > 2 and invoice_data[2] is not None:
-                        total_amount = float(invoice_data[2])
-                        
-                    if len(invoice_data) > 3:
-                        payment_method = invoice_data[3] if invoice_data[3] else "CASH"
-                    
-                    # Get payment status if available
-                    if len(invoice_data) > 6 and invoice_data[6]:
-                        payment_status = invoice_data[6]
-                    
-                    # More detailed customer information
-                    if len(invoice_data) > 4:
-                        customer = {
-                            "name": invoice_data[4] or "Walk-in Customer",
-                            "phone": invoice_data[5] if len(invoice_data) > 5 and invoice_data[5] else "",
-                            "address": invoice_data[6] if len(invoice_data) > 6 and invoice_data[6] else "",
-                            "village": invoice_data[7] if len(invoice_data) > 7 and invoice_data[7] else "",
-                            "gstin": invoice_data[8] if len(invoice_data) > 8 and invoice_data[8] else ""
-                        }
-                
-                print(f"DEBUG: Extracted invoice data - Number: {invoice_number}, Date: {invoice_date}, Total: {total_amount}")
-                print(f"DEBUG: Customer: {customer['name']}, Phone: {customer['phone']}")
-            except (IndexError, TypeError, ValueError) as e:
-                print(f"DEBUG: Error extracting invoice details: {e}")
-                # We already set default values above, so no need to handle missing values here
-            
-            # Format the items with better error handling
-            formatted_items = []
-            subtotal = 0.0
-            tax_total = 0.0
-            
-            for item in items:
-                try:
-                    # Get values with default fallbacks
-                    name = item[0] if item[0] else "Unknown Product"
-                    hsn_code = item[1] if len(item) > 1 and item[1] else ""
-                    quantity = float(item[2]) if len(item) > 2 and item[2] is not None else 0
-                    price = float(item[3]) if len(item) > 3 and item[3] is not None else 0
-                    discount = float(item[4]) if len(item) > 4 and item[4] is not None else 0
-                    total = float(item[5]) if len(item) > 5 and item[5] is not None else 0
-                    tax_rate = float(item[6]) if len(item) > 6 and item[6] is not None else 0
-                    tax_amount = float(item[7]) if len(item) > 7 and item[7] is not None else 0
-                    
-                    # Build the item dictionary with all available information
-                    item_dict = {
-                        "name": name,
-                        "hsn_code": hsn_code,
-                        "quantity": quantity,
-                        "price": price,
-                        "discount": discount,
-                        "total": total,
-                        "tax_rate": tax_rate,
-                        "tax_amount": tax_amount
-                    }
-                    
-                    formatted_items.append(item_dict)
-                    subtotal += (price * quantity)
-                    tax_total += tax_amount
-                    
-                    print(f"DEBUG: Added invoice item: {name}, Qty: {quantity}, Price: {price}, Total: {total}")
-                except (IndexError, TypeError, ValueError) as e:
-                    print(f"DEBUG: Error processing invoice item: {e}, item data: {item}")
-                    # Continue with other items
-            
-            # Safety check - if no items were processed successfully, return false
-            if not formatted_items:
-                print("DEBUG: No items could be processed successfully")
-                return False
-                
-            # Import the specialized PDF invoice generator
-            from utils.pdf_invoice_generator import generate_invoice
-            
-            # Get shop information from settings
-            store_info = {}
-            try:
-                settings_query = "SELECT key, value FROM settings WHERE key IN ('store_name', 'store_address', 'store_phone', 'store_gstin', 'store_email', 'invoice_prefix')"
-                settings = self.controller.db.fetchall(settings_query)
-                
-                for key, value in settings:
-                    if key == 'invoice_prefix':
-                        # Store invoice prefix separately
-                        invoice_prefix = value
-                    else:
-                        # Convert settings key to store_info format (remove 'store_' prefix)
-                        clean_key = key.replace('store_', '')
-                        store_info[clean_key] = value
-                
-                print(f"DEBUG: Retrieved store info from settings: {store_info}")
-            except Exception as e:
-                print(f"DEBUG: Error retrieving store info from settings: {e}")
-                # Set defaults if settings retrieval fails
-                store_info = {
-                    'name': 'Agritech Products Shop',
-                    'address': 'Main Road, Maharashtra',
-                    'phone': '+91 1234567890',
-                    'gstin': '27AABCU9603R1ZX'
-                }
-            
-            # Format invoice data as expected by the generator
-            # Payment history is no longer shown on invoices per user request
-            invoice_data_dict = {
-                'invoice_number': invoice_number,
-                'date': invoice_date,
-                'customer_name': customer['name'],
-                'customer_phone': customer['phone'],
-                'customer_address': customer['address'],
-                'customer_village': customer.get('village', ''),
-                'customer_gstin': customer.get('gstin', ''),
-                'items': formatted_items,
-                'payment': {
-                    'method': payment_method,
-                    'subtotal': subtotal,
-                    'tax_total': tax_total,
-                    'total': total_amount,
-                    'status': payment_status,  # Use actual payment status
-                    'payment_history': None  # No payment history on invoices per user request
-                },
-                'store_info': store_info   # Add shop information
-            }
-            
-            # Create invoices directory if it doesn't exist - use relative path
-            invoices_dir = os.path.join('.', 'invoices')
-            if not os.path.exists(invoices_dir):
-                os.makedirs(invoices_dir)
-                
-            # Generate path for the new invoice file - using relative path
-            # Clean the invoice number to make a valid filename
-            safe_invoice_number = invoice_number.replace('/', '-').replace('\\', '-').replace(':', '-')
-            timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            
             # Always use PDF format for exact template matching
-            # Get invoice prefix from the number (format like "24-25/ABC-001")
-            original_invoice_parts = invoice_number.split('/')
-            if len(original_invoice_parts) > 1:
-                # Extract prefix from original invoice number (e.g., "ABC" from "24-25/ABC-001")
-                prefix_part = original_invoice_parts[1].split('-')[0]
-            else:
-                # Fallback to invoice prefix from settings
-                settings_row = self.controller.db.fetchone("SELECT value FROM settings WHERE key = 'invoice_prefix'")
-                prefix_part = settings_row[0] if settings_row and settings_row[0] else "INV"
-                
-            invoice_filename = f"{prefix_part}_{safe_invoice_number}_{timestamp}.pdf"
-            file_path = os.path.join(invoices_dir, invoice_filename)
-            
-            # Debug output
-            print(f"DEBUG: Creating regenerated invoice as {output_format} at: {os.path.abspath(file_path)}")
-            print(f"DEBUG: Invoice data: {invoice_data_dict}")
+            file_path = regenerate_invoice(self.controller.db, invoice_id)
+            if not file_path:
+                print(f"DEBUG: Invoice regeneration failed for invoice {invoice_id}")
+                return False
             
-            # Generate the new invoice file with exact template match
-            success = generate_invoice(invoice_data_dict, file_path)
+            print(f"DEBUG: Invoice file created successfully at: {file_path}")
             
-            if success and os.path.exists(file_path):
-                print(f"DEBUG: Invoice file created successfully at: {file_path}")
-                
-                # Check if this invoice exists in the invoices table
-                check_query = "SELECT id FROM invoices WHERE id = ?"
-                invoice_exists = self.controller.db.fetchone(check_query, (invoice_id,))
-                
-                if invoice_exists:
-                    # Update existing invoice record with the new file path
-                    update_query = "UPDATE invoices SET file_path = ? WHERE id = ?"
-                    self.controller.db.execute(update_query, (file_path, invoice_id))
-                    print(f"DEBUG: Updated existing invoice record with new file path")
-                elif using_sales_table:
-                    # This was a sales record that doesn't have a corresponding invoices record
-                    # Get the invoice details from the sales table
-                    sales_details = self.controller.db.fetchone("""
-                        SELECT invoice_number, customer_id, subtotal, discount, tax, total, payment_type
-                        FROM sales WHERE id = ?
-                    """, (invoice_id,))
-                    
-                    if sales_details:
-                        # Create a new entry in the invoices table
-                        try:
-                            self.controller.db.execute("""
-                                INSERT INTO invoices
-                                (id, invoice_number, customer_id, subtotal, tax_amount, total_amount, 
-                                 payment_method, payment_status, file_path, invoice_date)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, 'PAID', ?, CURRENT_TIMESTAMP)
-                            """, (
-                                invoice_id,  # Use the same ID as the sales record
-                                sales_details[0],  # invoice_number
-                                sales_details[1],  # customer_id
-                                sales_details[2],  # subtotal
-                                sales_details[4],  # tax
-                                sales_details[5],  # total
-                                sales_details[6],  # payment_type/method
-                                file_path
-                            ))
-                            print(f"DEBUG: Created new invoice record in invoices table from sales record")
-                        except Exception as e:
-                            print(f"DEBUG: Error creating invoice record: {e}")
-                            # Even if the database insert fails, we still generated the invoice file
-                
-                self.controller.db.commit()
-                print(f"DEBUG: Invoice regeneration process completed successfully")
-                return True
-            else:
-                print(f"DEBUG: Invoice regeneration failed - generate_invoice returned {success}")
-                return False
+            # Update the invoice record with the new file path
+            with self.controller.db.transaction():
+                self.controller.db.execute("UPDATE invoices SET file_path = ? WHERE id = ?", (file_path, invoice_id))
+            return True
                 
         except Exception as e:
             print(f"DEBUG: Error regenerating invoice: {e}")
@@ -2284,13 +1671,13 @@ class SalesHistoryFrame(tk.Frame):
         file_path = result[0]
         print(f"DEBUG: Invoice file path: {file_path}")
         
-        # Verify that invoice file exists, otherwise regenerate it
-        if not file_path or not os.path.isfile(file_path):
+        # Verify that invoice file exists (in its month's pack for closed months), otherwise regenerate it
+        if not invoice_store().exists(file_path):
             print(f"DEBUG: Invoice file not found, attempting to regenerate")
             if self.attempt_invoice_regeneration(invoice_id, "pdf"):
                 # If regeneration succeeded, get the new path
                 result = self.controller.db.fetchone(query, (invoice_id,))
-                if result and result[0] and os.path.isfile(result[0]):
+                if result and invoice_store().exists(result[0]):
                     file_path = result[0]
                 else:
                     messagebox.showinfo(
@@ -2305,21 +1692,22 @@ class SalesHistoryFrame(tk.Frame):
                     "Please try again or contact support."
                 )
         
-        # Check if file exists
-        if not os.path.isfile(file_path):
+        # Check if file exists, extracting it from its month's pack if needed
+        readable_path = invoice_store().locate(file_path)
+        if not readable_path:
             print(f"DEBUG: Invoice file does not exist at path: {file_path}")
             # Always regenerate as PDF for printing
             if self.attempt_invoice_regeneration(invoice_id, "pdf"):
                 # If regeneration succeeded, get the new path
                 result = self.controller.db.fetchone(query, (invoice_id,))
-                if result and result[0] and os.path.isfile(result[0]):
-                    file_path = result[0]
-                else:
+                readable_path = invoice_store().locate(result[0]) if result else None
+                if not readable_path:
                     messagebox.showerror("Error", "Invoice file could not be regenerated.")
                     return
             else:
                 messagebox.showerror("Error", "Invoice file not found and could not be regenerated.")
                 return
+        file_path = readable_path
         
         try:
             print(f"DEBUG: Attempting to print file: {file_path}")
@@ -2438,6 +1826,178 @@ class SalesHistoryFrame(tk.Frame):
                 "Please check the application logs for more details."
             )
     
+    def show_bulk_regeneration(self):
+        """Dialog to regenerate every missing invoice file in a date range"""
+        dialog = tk.Toplevel(self)
+        dialog.title("Regenerate Invoices")
+        dialog.geometry("460x380")
+        dialog.resizable(False, False)
+        dialog.configure(bg=COLORS["bg_primary"])
+        dialog.grab_set()  # Make window modal
+        
+        # Center the dialog
+        dialog.update_idletasks()
+        x = (dialog.winfo_screenwidth() // 2) - (dialog.winfo_width() // 2)
+        y = (dialog.winfo_screenheight() // 2) - (dialog.winfo_height() // 2)
+        dialog.geometry(f"+{x}+{y}")
+        
+        tk.Label(
+            dialog,
+            text="Regenerate Missing Invoices",
+            font=FONTS["heading"],
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_primary"]
+        ).pack(pady=15)
+        
+        form_frame = tk.Frame(dialog, bg=COLORS["bg_primary"], padx=20)
+        form_frame.pack(fill=tk.X)
+        
+        # Date range, defaulting to the date being viewed
+        all_var = tk.BooleanVar(value=False)
+        from_var = tk.StringVar(value=self.selected_date.strftime("%d-%m-%Y"))
+        to_var = tk.StringVar(value=self.selected_date.strftime("%d-%m-%Y"))
+        
+        tk.Label(form_frame, text="From (DD-MM-YYYY):", font=FONTS["regular"],
+                 bg=COLORS["bg_primary"], fg=COLORS["text_primary"]).grid(row=0, column=0, sticky="w", pady=5)
+        from_entry = tk.Entry(form_frame, textvariable=from_var, font=FONTS["regular"], width=14)
+        from_entry.grid(row=0, column=1, sticky="w", pady=5, padx=10)
+        
+        tk.Label(form_frame, text="To (DD-MM-YYYY):", font=FONTS["regular"],
+                 bg=COLORS["bg_primary"], fg=COLORS["text_primary"]).grid(row=1, column=0, sticky="w", pady=5)
+        to_entry = tk.Entry(form_frame, textvariable=to_var, font=FONTS["regular"], width=14)
+        to_entry.grid(row=1, column=1, sticky="w", pady=5, padx=10)
+        
+        def toggle_dates():
+            state = tk.DISABLED if all_var.get() else tk.NORMAL
+            from_entry.config(state=state)
+            to_entry.config(state=state)
+        
+        tk.Checkbutton(
+            form_frame,
+            text="All invoices with missing files",
+            variable=all_var,
+            command=toggle_dates,
+            font=FONTS["regular"],
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_primary"],
+            selectcolor=COLORS["bg_primary"]
+        ).grid(row=2, column=0, columnspan=2, sticky="w", pady=5)
+        
+        progress_bar = ttk.Progressbar(dialog, orient="horizontal", length=400, mode="determinate")
+        progress_bar.pack(pady=(15, 5))
+        
+        status_label = tk.Label(
+            dialog,
+            text="Invoices whose files are still present are skipped.",
+            font=FONTS["small"],
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_secondary"],
+            justify=tk.LEFT,
+            wraplength=420
+        )
+        status_label.pack(pady=5)
+        
+        button_frame = tk.Frame(dialog, bg=COLORS["bg_primary"], pady=15)
+        button_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=20)
+        
+        # The pool runs on a worker thread; its progress and summary come back
+        # through this queue and are shown by poll() on the Tk thread
+        updates = queue.Queue()
+        cancel = threading.Event()
+        
+        def run(start_date, end_date):
+            try:
+                summary = regenerate_missing(
+                    self.controller.db, start_date, end_date,
+                    progress=lambda done, total: updates.put(("progress", done, total)),
+                    cancel=cancel
+                )
+                updates.put(("done", summary))
+            except Exception as e:
+                print(f"Bulk invoice regeneration error: {e}")
+                updates.put(("error", e))
+            finally:
+                self.controller.db.release_connection()
+        
+        def poll():
+            if not dialog.winfo_exists():
+                return
+            finished = None
+            while True:
+                try:
+                    update = updates.get_nowait()
+                except queue.Empty:
+                    break
+                if update[0] == "progress":
+                    done, total = update[1:]
+                    progress_bar.config(maximum=max(total, 1), value=done)
+                    status_label.config(text=f"Regenerated {done} of {total} missing invoices...")
+                else:
+                    finished = update
+            
+            if finished is None:
+                dialog.after(200, poll)
+                return
+            
+            start_btn.config(state=tk.NORMAL)
+            cancel_btn.config(text="Close", command=dialog.destroy)
+            if finished[0] == "done":
+                status_label.config(text=format_summary(finished[1]))
+                self.load_sales()
+            else:
+                status_label.config(text=f"Regeneration failed: {finished[1]}")
+        
+        def start():
+            start_date = end_date = None
+            if not all_var.get():
+                start_date = parse_date(from_var.get().strip())
+                end_date = parse_date(to_var.get().strip())
+                if not start_date or not end_date or end_date < start_date:
+                    messagebox.showerror("Error", "Please enter a valid date range (DD-MM-YYYY).", parent=dialog)
+                    return
+            
+            cancel.clear()
+            start_btn.config(state=tk.DISABLED)
+            cancel_btn.config(text="Stop", command=cancel.set)
+            status_label.config(text="Looking for missing invoice files...")
+            threading.Thread(target=run, args=(start_date, end_date), name="invoice-regenerate",
+                             daemon=True).start()
+            dialog.after(200, poll)
+        
+        cancel_btn = tk.Button(
+            button_frame,
+            text="Close",
+            font=FONTS["regular"],
+            bg=COLORS["bg_secondary"],
+            fg=COLORS["text_primary"],
+            padx=20,
+            pady=5,
+            cursor="hand2",
+            command=dialog.destroy
+        )
+        cancel_btn.pack(side=tk.LEFT, padx=10)
+        
+        start_btn = tk.Button(
+            button_frame,
+            text="Start",
+            font=FONTS["regular_bold"],
+            bg=COLORS["primary"],
+            fg=COLORS["text_white"],
+            padx=20,
+            pady=5,
+            cursor="hand2",
+            command=start
+        )
+        start_btn.pack(side=tk.RIGHT, padx=10)
+        
+        # Closing the window stops a running regeneration after the current invoices
+        def close():
+            cancel.set()
+            dialog.destroy()
+        
+        dialog.protocol("WM_DELETE_WINDOW", close)
+    
+    @profiled("open_sales_history")
     def on_show(self):
         """Called when frame is shown"""
         # Load today's sales by default
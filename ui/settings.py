@@ -7,6 +7,7 @@ from tkinter import ttk, messagebox
 import datetime
 from assets.styles import COLORS, FONTS, STYLES, set_theme
 from utils.config import save_config
+from utils.receipt_renderer import OUTPUT_CHOICES, PAYMENT_TYPES
 
 class SettingsFrame(tk.Frame):
     """Settings frame for configuring application preferences"""
@@ -303,6 +304,72 @@ class SettingsFrame(tk.Frame):
                               selectcolor=COLORS["bg_primary"])
         excel_rb.pack(side=tk.LEFT, padx=10)
         
+        # What checkout prints for each payment type: A4 PDF, receipt or both
+        output_label = tk.Label(form_frame, 
+                             text="Checkout Prints:",
+                             font=FONTS["regular_bold"],
+                             bg=COLORS["bg_primary"],
+                             fg=COLORS["text_primary"])
+        output_label.grid(row=len(fields)+2, column=0, sticky="w", pady=10)
+        
+        output_frame = tk.Frame(form_frame, bg=COLORS["bg_primary"])
+        output_frame.grid(row=len(fields)+2, column=1, sticky="w", pady=10, padx=10)
+        
+        invoice_output = self.controller.config.get("invoice_output", {})
+        self.output_vars = {}
+        for payment_type in PAYMENT_TYPES:
+            tk.Label(output_frame,
+                    text=payment_type.capitalize(),
+                    font=FONTS["regular"],
+                    bg=COLORS["bg_primary"],
+                    fg=COLORS["text_primary"]).pack(side=tk.LEFT, padx=(10, 2))
+            var = tk.StringVar(value=invoice_output.get(payment_type, "pdf"))
+            self.output_vars[payment_type] = var
+            ttk.Combobox(output_frame,
+                        textvariable=var,
+                        values=OUTPUT_CHOICES,
+                        state="readonly",
+                        width=8).pack(side=tk.LEFT)
+        
+        # Receipt format: plain text, or ESC/POS for a thermal printer
+        receipt_label = tk.Label(form_frame, 
+                              text="Receipt Format:",
+                              font=FONTS["regular_bold"],
+                              bg=COLORS["bg_primary"],
+                              fg=COLORS["text_primary"])
+        receipt_label.grid(row=len(fields)+3, column=0, sticky="w", pady=10)
+        
+        self.receipt_format_var = tk.StringVar(value=self.controller.config.get("receipt_format", "text"))
+        
+        receipt_frame = tk.Frame(form_frame, bg=COLORS["bg_primary"])
+        receipt_frame.grid(row=len(fields)+3, column=1, sticky="w", pady=10, padx=10)
+        
+        for text, value in (("Plain Text", "text"), ("ESC/POS Printer", "escpos")):
+            rb = tk.Radiobutton(receipt_frame, 
+                              text=text,
+                              variable=self.receipt_format_var,
+                              value=value,
+                              font=FONTS["regular"],
+                              bg=COLORS["bg_primary"],
+                              fg=COLORS["text_primary"],
+                              selectcolor=COLORS["bg_primary"])
+            rb.pack(side=tk.LEFT, padx=10)
+        
+        # Folder receipts are written to, e.g. one a print spooler watches
+        spool_label = tk.Label(form_frame, 
+                            text="Receipt Folder:",
+                            font=FONTS["regular_bold"],
+                            bg=COLORS["bg_primary"],
+                            fg=COLORS["text_primary"])
+        spool_label.grid(row=len(fields)+4, column=0, sticky="w", pady=10)
+        
+        self.receipt_dir_var = tk.StringVar(value=self.controller.config.get("receipt_spool_dir", "receipts"))
+        spool_entry = tk.Entry(form_frame, 
+                             textvariable=self.receipt_dir_var,
+                             font=FONTS["regular"],
+                             width=30)
+        spool_entry.grid(row=len(fields)+4, column=1, sticky="w", pady=10, padx=10)
+        
         # Save button
         save_btn = tk.Button(form_frame,
                            text="Save Invoice Settings",
@@ -313,7 +380,7 @@ class SettingsFrame(tk.Frame):
                            pady=8,
                            cursor="hand2",
                            command=self.save_invoice_settings)
-        save_btn.grid(row=len(fields)+2, column=0, columnspan=2, pady=20)
+        save_btn.grid(row=len(fields)+5, column=0, columnspan=2, pady=20)
     
     def setup_system_tab(self):
         """Setup the system settings tab"""
@@ -457,40 +524,34 @@ class SettingsFrame(tk.Frame):
         else:
             messagebox.showerror("Settings Error", "Failed to save shop information.")
     
+    def _save_setting(self, key, value):
+        """Insert or update one row of the settings table"""
+        self.controller.db.execute("""
+            INSERT INTO settings (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """, (key, value))
+    
     def _save_to_database(self):
         """Save shop information to database settings table for invoice generation"""
         try:
-            import sqlite3
-            conn = sqlite3.connect('./pos_data.db')
-            cursor = conn.cursor()
-            
-            # Save all shop information fields to the settings table
-            for key, var in self.shop_info_vars.items():
-                value = var.get()
-                
-                # Skip empty values
-                if not value:
-                    continue
+            # Use the application's connection so the configured database and
+            # its lock handling apply; all settings are saved together
+            with self.controller.db.transaction():
+                # Save all shop information fields to the settings table
+                for key, var in self.shop_info_vars.items():
+                    value = var.get()
                     
-                # Check if setting already exists
-                cursor.execute("SELECT COUNT(*) FROM settings WHERE key = ?", (key,))
-                if cursor.fetchone()[0] > 0:
-                    # Update existing setting
-                    cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (value, key))
-                else:
-                    # Insert new setting
-                    cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (key, value))
-            
-            # Save terms and conditions
-            terms_content = self.terms_text.get("1.0", tk.END).strip()
-            cursor.execute("SELECT COUNT(*) FROM settings WHERE key = ?", ("terms_conditions",))
-            if cursor.fetchone()[0] > 0:
-                cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (terms_content, "terms_conditions"))
-            else:
-                cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", ("terms_conditions", terms_content))
+                    # Skip empty values
+                    if not value:
+                        continue
+                    
+                    self._save_setting(key, value)
                 
-            conn.commit()
-            conn.close()
+                # Save terms and conditions
+                terms_content = self.terms_text.get("1.0", tk.END).strip()
+                self._save_setting("terms_conditions", terms_content)
+            # Invoices printed from now on show the new details
+            self.controller.db.invoice_assembler.invalidate_settings()
             return True
         except Exception as e:
             print(f"Error saving settings to database: {e}")
@@ -508,6 +569,12 @@ class SettingsFrame(tk.Frame):
         # Save preferred format
         self.controller.config["invoice_format"] = self.format_var.get()
         
+        # Save checkout outputs and receipt options
+        self.controller.config["invoice_output"] = {payment_type: var.get()
+                                                    for payment_type, var in self.output_vars.items()}
+        self.controller.config["receipt_format"] = self.receipt_format_var.get()
+        self.controller.config["receipt_spool_dir"] = self.receipt_dir_var.get().strip() or "receipts"
+        
         # Save to file
         config_saved = save_config(self.controller.config)
         
@@ -522,45 +589,24 @@ class SettingsFrame(tk.Frame):
     def _save_invoice_settings_to_database(self):
         """Save invoice settings to database settings table"""
         try:
-            import sqlite3
-            conn = sqlite3.connect('./pos_data.db')
-            cursor = conn.cursor()
-            
-            # Save invoice prefix
-            for key, var in self.invoice_vars.items():
-                value = var.get()
-                
-                # Skip empty values
-                if not value:
-                    continue
+            with self.controller.db.transaction():
+                # Save invoice prefix
+                for key, var in self.invoice_vars.items():
+                    value = var.get()
                     
-                # Check if setting already exists
-                cursor.execute("SELECT COUNT(*) FROM settings WHERE key = ?", (key,))
-                if cursor.fetchone()[0] > 0:
-                    # Update existing setting
-                    cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (value, key))
-                else:
-                    # Insert new setting
-                    cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (key, value))
-            
-            # Save template
-            template = self.template_var.get()
-            cursor.execute("SELECT COUNT(*) FROM settings WHERE key = ?", ("invoice_template",))
-            if cursor.fetchone()[0] > 0:
-                cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (template, "invoice_template"))
-            else:
-                cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", ("invoice_template", template))
+                    # Skip empty values
+                    if not value:
+                        continue
+                    
+                    self._save_setting(key, value)
                 
-            # Save format
-            format_value = self.format_var.get()
-            cursor.execute("SELECT COUNT(*) FROM settings WHERE key = ?", ("invoice_format",))
-            if cursor.fetchone()[0] > 0:
-                cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (format_value, "invoice_format"))
-            else:
-                cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", ("invoice_format", format_value))
+                # Save template
+                self._save_setting("invoice_template", self.template_var.get())
                 
-            conn.commit()
-            conn.close()
+                # Save format
+                self._save_setting("invoice_format", self.format_var.get())
+            # Invoices printed from now on use the new settings
+            self.controller.db.invoice_assembler.invalidate_settings()
             return True
         except Exception as e:
             print(f"Error saving invoice settings to database: {e}")
@@ -597,28 +643,14 @@ class SettingsFrame(tk.Frame):
     def _save_system_settings_to_database(self):
         """Save system settings to database settings table"""
         try:
-            import sqlite3
-            conn = sqlite3.connect('./pos_data.db')
-            cursor = conn.cursor()
-            
-            # Save low stock threshold
-            threshold = int(self.system_vars["low_stock_threshold"].get())
-            cursor.execute("SELECT COUNT(*) FROM settings WHERE key = ?", ("low_stock_threshold",))
-            if cursor.fetchone()[0] > 0:
-                cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (str(threshold), "low_stock_threshold"))
-            else:
-                cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", ("low_stock_threshold", str(threshold)))
-            
-            # Save theme setting
-            theme = self.theme_var.get()
-            cursor.execute("SELECT COUNT(*) FROM settings WHERE key = ?", ("app_theme",))
-            if cursor.fetchone()[0] > 0:
-                cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (theme, "app_theme"))
-            else:
-                cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", ("app_theme", theme))
+            with self.controller.db.transaction():
+                # Save low stock threshold
+                threshold = int(self.system_vars["low_stock_threshold"].get())
+                self._save_setting("low_stock_threshold", str(threshold))
                 
-            conn.commit()
-            conn.close()
+                # Save theme setting
+                self._save_setting("app_theme", self.theme_var.get())
+            self.controller.db.invoice_assembler.invalidate_settings()
             return True
         except Exception as e:
             print(f"Error saving system settings to database: {e}")
@@ -788,6 +820,11 @@ class SettingsFrame(tk.Frame):
             
         self.template_var.set(self.controller.config.get("invoice_template", "default"))
         self.format_var.set(self.controller.config.get("invoice_format", "pdf"))
+        invoice_output = self.controller.config.get("invoice_output", {})
+        for payment_type, var in self.output_vars.items():
+            var.set(invoice_output.get(payment_type, "pdf"))
+        self.receipt_format_var.set(self.controller.config.get("receipt_format", "text"))
+        self.receipt_dir_var.set(self.controller.config.get("receipt_spool_dir", "receipts"))
         
         # System settings
         for key, var in self.system_vars.items():
@@ -0,0 +1,162 @@
+"""
+Cart totals for POS system
+Running GST-inclusive totals for a bill, grouped by tax rate
+"""
+
+from decimal import Decimal, InvalidOperation
+
+DEFAULT_TAX_RATE = 18
+
+ZERO = Decimal('0')
+HUNDRED = Decimal('100')
+
+def to_decimal(value, default=ZERO):
+    """Convert a price, quantity or typed amount to Decimal; default if it is not a number"""
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(str(value).strip() or '0')
+    except (InvalidOperation, ValueError):
+        return default
+
+def split_inclusive(amount, tax_rate):
+    """Split a tax-inclusive amount into (taxable value, tax) at tax_rate percent"""
+    taxable = amount / (Decimal('1') + to_decimal(tax_rate) / HUNDRED)
+    return taxable, amount - taxable
+
+def tax_breakdown(totals):
+    """
+    GST figures from CartCalculator.totals() in the shape of an invoice's payment data
+
+    Returns:
+        dict: taxable_value, cgst, sgst and tax_rates (one dict per rate, as
+        floats); cgst_rate and sgst_rate too when the whole bill has one rate
+    """
+    breakdown = {
+        "taxable_value": float(totals["taxable"]),
+        "cgst": float(totals["cgst"]),
+        "sgst": float(totals["sgst"]),
+        "tax_rates": [{key: float(value) for key, value in group.items()}
+                      for group in totals["by_rate"]],
+    }
+    if len(totals["by_rate"]) == 1:
+        breakdown["cgst_rate"] = breakdown["sgst_rate"] = float(totals["by_rate"][0]["rate"] / 2)
+    return breakdown
+
+class CartCalculator:
+    """Totals for a cart whose line totals include GST
+
+    Lines are kept as (total, tax rate) and summed per tax rate as they are
+    added, edited or removed, so each change costs O(1). totals() then splits
+    each rate group once instead of every line, which keeps a bill of
+    hundreds of lines cheap to re-total on every keystroke in the discount
+    field. A cart-level discount is shared across lines in proportion to their
+    totals, so discounting a rate group is the same as discounting its lines.
+    """
+
+    def __init__(self, default_tax_rate=DEFAULT_TAX_RATE):
+        self.default_tax_rate = to_decimal(default_tax_rate)
+        self.lines = {}
+        self.groups = {}
+        self.subtotal = ZERO
+
+    def reset(self, lines=()):
+        """Replace every line with (line id, total, tax rate) tuples"""
+        self.lines = {}
+        self.groups = {}
+        self.subtotal = ZERO
+        for line_id, total, tax_rate in lines:
+            self.set_line(line_id, total, tax_rate)
+
+    def set_line(self, line_id, total, tax_rate=None):
+        """Add a line, or replace the total and tax rate of an existing one"""
+        self.remove_line(line_id)
+        total = to_decimal(total)
+        tax_rate = self.default_tax_rate if tax_rate in (None, "") else to_decimal(tax_rate, self.default_tax_rate)
+        self.lines[line_id] = (total, tax_rate)
+        amount, count = self.groups.get(tax_rate, (ZERO, 0))
+        self.groups[tax_rate] = (amount + total, count + 1)
+        self.subtotal += total
+
+    def remove_line(self, line_id):
+        """Drop a line; unknown ids are ignored"""
+        line = self.lines.pop(line_id, None)
+        if line is None:
+            return
+        total, tax_rate = line
+        amount, count = self.groups[tax_rate]
+        if count == 1:
+            del self.groups[tax_rate]
+        else:
+            self.groups[tax_rate] = (amount - total, count - 1)
+        self.subtotal -= total
+
+    def __len__(self):
+        return len(self.lines)
+
+    def discount_amount(self, discount, discount_type="amount"):
+        """Cart discount in rupees for a typed value, capped at the subtotal
+
+        discount_type is "amount" or "percentage"; anything that is not a
+        number counts as no discount.
+        """
+        value = to_decimal(discount)
+        if discount_type != "amount":
+            value = self.subtotal * value / HUNDRED
+        return max(ZERO, min(value, self.subtotal))
+
+    def totals(self, discount=0, discount_type="amount"):
+        """
+        Work out the bill totals after a cart-level discount
+
+        Args:
+            discount: Discount typed by the user (number or text)
+            discount_type: "amount" or "percentage"
+
+        Returns:
+            dict: subtotal, discount, discount_ratio, taxable, tax, cgst, sgst,
+            total, rounded, rounding_adjustment, and by_rate, a list of dicts
+            (rate, amount, taxable, tax, cgst, sgst) in rate order
+        """
+        subtotal = self.subtotal
+        discount_amount = self.discount_amount(discount, discount_type)
+        ratio = Decimal('1') - discount_amount / subtotal if subtotal > ZERO else Decimal('1')
+
+        taxable = tax = ZERO
+        by_rate = []
+        for rate in sorted(self.groups):
+            amount = self.groups[rate][0] * ratio
+            rate_taxable, rate_tax = split_inclusive(amount, rate)
+            taxable += rate_taxable
+            tax += rate_tax
+            by_rate.append({
+                "rate": rate,
+                "amount": amount,
+                "taxable": rate_taxable,
+                "tax": rate_tax,
+                "cgst": rate_tax / 2,
+                "sgst": rate_tax / 2,
+            })
+
+        # Prices include GST, so the tax is part of the total, not added to it
+        total = subtotal - discount_amount
+        rounded = total.quantize(Decimal('1'))
+        return {
+            "subtotal": subtotal,
+            "discount": discount_amount,
+            "discount_ratio": ratio,
+            "taxable": taxable,
+            "tax": tax,
+            "cgst": tax / 2,
+            "sgst": tax / 2,
+            "total": total,
+            "rounded": rounded,
+            "rounding_adjustment": rounded - total,
+            "by_rate": by_rate,
+        }
+
+    def line_split(self, line_id, totals):
+        """(amount after the cart discount, taxable value, tax) for one line"""
+        total, tax_rate = self.lines[line_id]
+        amount = total * totals["discount_ratio"]
+        return (amount,) + split_inclusive(amount, tax_rate)
@@ -40,6 +40,19 @@ def get_default_config():
         "shop_gst": "27AABCU9603R1ZX",
         "invoice_prefix": "AGT",
         "invoice_template": "default",
+        "invoice_output": {"CASH": "pdf", "UPI": "pdf", "CREDIT": "pdf", "SPLIT": "pdf"},
+        "receipt_format": "text",
+        "receipt_width": 48,
+        "receipt_spool_dir": "receipts",
+        "invoice_pack_closed_months": True,
+        "invoice_pack_keep_months": 1,
+        "invoice_cache_mb": 100,
         "low_stock_threshold": 10,
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "db_pragmas": {},
+        "db_checkpoint_interval": 60,
+        "db_checkpoint_idle_after": 30,
+        "db_profiling": False,
+        "db_slow_query_ms": 50,
+        "db_profile_path": "query_profile.json"
     }
\ No newline at end of file
@@ -297,6 +297,74 @@ def get_quarter_dates(year=None, quarter=None):
     
     return quarters[quarter]
 
+def date_range_clause(column, start_date, end_date=None):
+    """
+    Build an index-friendly half-open date range predicate for SQL queries
+
+    DATE(column) BETWEEN ? AND ? wraps the column in a function, so SQLite
+    has to scan every row. Comparing the bare column against
+    [start_date, end_date + 1 day) selects the same rows and can use an index.
+    Works for DATE and 'YYYY-MM-DD HH:MM:SS' TIMESTAMP text columns.
+
+    Args:
+        column: Column name, optionally qualified (e.g. "i.invoice_date")
+        start_date: First day to include (date, datetime or 'YYYY-MM-DD' string)
+        end_date: Last day to include (default: same as start_date)
+
+    Returns:
+        Tuple of (sql_fragment, params)
+    """
+    start = parse_date(start_date, "%Y-%m-%d")
+    end = parse_date(end_date, "%Y-%m-%d") if end_date is not None else start
+    if isinstance(start, datetime.datetime):
+        start = start.date()
+    if isinstance(end, datetime.datetime):
+        end = end.date()
+
+    end_exclusive = end + datetime.timedelta(days=1)
+    clause = f"{column} >= ? AND {column} < ?"
+    return clause, [start.strftime("%Y-%m-%d"), end_exclusive.strftime("%Y-%m-%d")]
+
+def financial_year(date=None):
+    """
+    Get the Indian financial year (April to March) label for a date
+    e.g. 2024-05-10 -> "24-25", 2025-02-01 -> "24-25"
+    
+    Args:
+        date: Date or datetime (default: today)
+        
+    Returns:
+        Financial year string in YY-YY format
+    """
+    date = date or datetime.date.today()
+    start_year = date.year if date.month >= 4 else date.year - 1
+    return f"{str(start_year)[-2:]}-{str(start_year + 1)[-2:]}"
+
+def next_invoice_number(db, store_prefix, date=None):
+    """
+    Reserve the next invoice number for the financial year
+    
+    The counter row is incremented and read back in one statement, so two
+    checkouts can never receive the same number. Call this inside the sale's
+    db.transaction() so a failed sale does not use up a number.
+    
+    Args:
+        db: DBHandler instance
+        store_prefix: Store prefix from settings (e.g. AGT)
+        date: Sale date (default: today)
+        
+    Returns:
+        Invoice number string (e.g. 24-25/AGT-001)
+    """
+    fy = financial_year(date)
+    cursor = db.execute("""
+        INSERT INTO invoice_sequences (fy, prefix, last_number) VALUES (?, ?, 1)
+        ON CONFLICT (fy, prefix) DO UPDATE SET last_number = last_number + 1
+        RETURNING last_number
+    """, (fy, store_prefix))
+    number = cursor.fetchone()[0]
+    return f"{fy}/{store_prefix}-{number:03d}"
+
 def generate_invoice_number(prefix="INV", last_number=0):
     """
     Generate an invoice number
@@ -425,4 +493,43 @@ def make_button_keyboard_navigable(button, command=None):
     button.bind("<Return>", on_enter)
     button.bind("<space>", on_enter)
     
-    return button  # Return the button for method chaining
\ No newline at end of file
+    return button  # Return the button for method chaining
+
+class Debouncer:
+    """
+    Run a callback once input has been quiet for a short delay
+    
+    Every schedule() cancels the run still pending, so typing "ramesh" runs one
+    search instead of six. The callback should read the input's current value
+    when it runs; a result is then never computed for text that has already
+    been replaced.
+    
+    Args:
+        widget: Any Tkinter widget, used for after() scheduling
+        callback: Function to call with the arguments of the last schedule()
+        delay_ms: Quiet period before the callback runs
+    """
+    
+    def __init__(self, widget, callback, delay_ms=150):
+        self.widget = widget
+        self.callback = callback
+        self.delay_ms = delay_ms
+        self._after_id = None
+    
+    def schedule(self, *args):
+        """(Re)start the delay; the callback runs once it expires"""
+        self.cancel()
+        self._after_id = self.widget.after(self.delay_ms, self._run, *args)
+    
+    def cancel(self):
+        """Drop the pending run, if any"""
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass  # Widget already destroyed
+            self._after_id = None
+    
+    def _run(self, *args):
+        self._after_id = None
+        self.callback(*args)
@@ -0,0 +1,158 @@
+"""
+Invoice output cache for POS system
+Keeps rendered invoice files under a hash of their invoice data, so an
+unchanged invoice is copied rather than rendered again
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join('.', 'invoice_cache')
+CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+def payload_key(invoice_data, template, version):
+    """
+    Hash of an invoice payload and the template that renders it
+
+    The payload is serialised as sorted-key JSON, so the same data always
+    gives the same key whatever order it was built in. Any change to the
+    invoice, to the shop settings it carries or to the template version
+    gives a new key.
+    """
+    normalized = json.dumps({"template": template, "version": version, "invoice": invoice_data},
+                            sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class InvoiceOutputCache:
+    """Rendered invoice files keyed by payload hash, evicted least recently used first
+
+    Files live at <directory>/<first two hex digits>/<key><ext>. The index
+    of entries and their sizes is read from disk on first use and then kept
+    in memory; a hit marks the file as used by touching it, so the order
+    survives a restart. Once the cache is over max_bytes, the least recently
+    used files are deleted. Several processes may share a directory; each
+    only evicts what it knows about, so the cap can be exceeded briefly.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = None  # path -> size, least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f"{key}{extension}")
+
+    def _load(self):
+        """Read the index from disk, oldest use first; call with the lock held"""
+        if self._entries is not None:
+            return
+        entries = []
+        if os.path.isdir(self.directory):
+            for folder in os.listdir(self.directory):
+                folder_path = os.path.join(self.directory, folder)
+                if not os.path.isdir(folder_path):
+                    continue
+                for name in os.listdir(folder_path):
+                    if name.endswith(".part"):
+                        continue
+                    stat = os.stat(os.path.join(folder_path, name))
+                    entries.append((stat.st_mtime, os.path.join(folder_path, name), stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict((path, size) for _, path, size in entries)
+        self._size = sum(self._entries.values())
+
+    def fetch(self, key, save_path, extension=".pdf"):
+        """
+        Copy the cached output for key to save_path
+
+        Returns:
+            bool: True on a hit; False if the key is not cached
+        """
+        path = self._path(key, extension)
+        with self._lock:
+            self._load()
+            if path not in self._entries and not os.path.isfile(path):
+                self.misses += 1
+                return False
+        try:
+            shutil.copyfile(path, save_path)
+            os.utime(path)
+            size = os.path.getsize(path)
+        except OSError:
+            # Evicted by another process in the meantime
+            with self._lock:
+                if path in self._entries:
+                    self._size -= self._entries.pop(path)
+                self.misses += 1
+            return False
+        with self._lock:
+            self._size += size - self._entries.get(path, 0)
+            self._entries[path] = size
+            self._entries.move_to_end(path)
+            self.hits += 1
+        return True
+
+    def store(self, key, source_path, extension=".pdf"):
+        """Add a rendered file to the cache under key, then evict down to max_bytes"""
+        path = self._path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._load()
+            self._size += size - self._entries.get(path, 0)
+            self._entries[path] = size
+            self._entries.move_to_end(path)
+            evicted = []
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    @property
+    def size(self):
+        """Bytes of cached output this process knows about"""
+        with self._lock:
+            self._load()
+            return self._size
+
+    def clear(self):
+        """Delete every cached file"""
+        with self._lock:
+            self._entries = None
+            self._size = 0
+            if os.path.isdir(self.directory):
+                shutil.rmtree(self.directory, ignore_errors=True)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def output_cache():
+    """The shared invoice output cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = InvoiceOutputCache()
+        return _cache or None
+
+def configure_output_cache(directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Replace the shared cache, e.g. with the size set in pos_config.json; max_bytes 0 turns it off"""
+    global _cache
+    with _cache_lock:
+        _cache = InvoiceOutputCache(directory, max_bytes) if max_bytes else False
+        return _cache or None
@@ -7,8 +7,11 @@ with placeholders in {brackets} for data matching the Excel format
 import os
 import datetime
 import io
+import pickle
 from decimal import Decimal
+import threading
 from utils.helpers import format_currency, num_to_words_indian
+from utils.invoice_templates import compiled_template
 
 # Try to import reportlab modules
 try:
@@ -108,6 +111,34 @@ def generate_invoice(invoice_data, save_path=None, output_format="pdf"):
         traceback.print_exc()
         return False
             
+def resolve_shop_info(invoice_data):
+    """Shop details for an invoice, from its store_info or from the invoice data itself"""
+    # Extract shop info from store_info structure or direct invoice_data
+    # First try getting from store_info structure (standardized format)
+    store_info = invoice_data.get('store_info', {})
+    
+    # If store_info is empty or missing fields, look in root of invoice_data
+    # This ensures we can work with both nested and flat data structures
+    return {
+        'name': store_info.get('name', invoice_data.get('name', 'Agritech Products Shop')),
+        'address': store_info.get('address', invoice_data.get('address', 'Main Road, Maharashtra')),
+        'phone': store_info.get('phone', invoice_data.get('phone', '+91 1234567890')),
+        'gstin': store_info.get('gstin', invoice_data.get('gstin', '27AABCU9603R1ZX')),
+        'email': store_info.get('email', invoice_data.get('email', '')),
+        
+        # Special license fields - look in both places
+        'laid_no': store_info.get('laid_no', invoice_data.get('laid_no', invoice_data.get('shop_laid_no', ''))),
+        'lcsd_no': store_info.get('lcsd_no', invoice_data.get('lcsd_no', invoice_data.get('shop_lcsd_no', ''))),
+        'lfrd_no': store_info.get('lfrd_no', invoice_data.get('lfrd_no', invoice_data.get('shop_lfrd_no', ''))),
+        
+        # State info
+        'state_name': store_info.get('state_name', invoice_data.get('state_name', 'Maharashtra')),
+        'state_code': store_info.get('state_code', invoice_data.get('state_code', '27')),
+        
+        # Terms & conditions text
+        'terms_conditions': store_info.get('terms_conditions', invoice_data.get('terms_conditions', 'Goods once sold cannot be returned. Payment due within 30 days.')),
+    }
+
 def generate_shop_bill_template(invoice_data, pdf_buffer):
     """
     Generate a PDF invoice based on the shop_bill.pdf template
@@ -122,19 +153,48 @@ def generate_shop_bill_template(invoice_data, pdf_buffer):
         bytes: PDF data if pdf_buffer is a BytesIO object
     """
     try:
-        # Determine if this is a file path or BytesIO object
-        save_path = None
-        if isinstance(pdf_buffer, str):
-            save_path = pdf_buffer
-        # Create the PDF document in landscape orientation
-        doc = SimpleDocTemplate(
-            pdf_buffer,
-            pagesize=landscape(A4),  # Use landscape orientation
-            rightMargin=1.0*cm,
-            leftMargin=1.0*cm,
-            topMargin=1.0*cm,
-            bottomMargin=1.0*cm
-        )
+        shop_info = resolve_shop_info(invoice_data)
+        
+        # Styles and the shop's static tables are compiled once per settings version
+        template = compiled_template("invoice_generator.shop_bill", shop_info, ShopBillTemplate)
+        template.render(invoice_data, pdf_buffer)
+        
+        # If using BytesIO, get the data
+        if isinstance(pdf_buffer, io.BytesIO):
+            pdf_data = pdf_buffer.getvalue()
+            pdf_buffer.close()
+            return pdf_data
+        
+        return True
+    
+    except Exception as e:
+        print(f"Error generating invoice: {e}")
+        import traceback
+        traceback.print_exc()
+        
+        # If using BytesIO, make sure to close it
+        if isinstance(pdf_buffer, io.BytesIO):
+            try:
+                pdf_buffer.close()
+            except:
+                pass
+            
+        return False
+        
+class ShopBillTemplate:
+    """The shop_bill layout compiled for one set of shop details
+
+    Paragraph styles, column widths and the tables that depend only on the
+    shop (header, item column headings, signature and payment record
+    headings) are built once here; render() fills in the customer, items,
+    tax and payment rows. Flowables are shared between renders, so renders
+    of one template are serialised.
+    """
+
+    def __init__(self, shop_info):
+        self.margin = 1.0*cm
+        self.pagesize = landscape(A4)  # Use landscape orientation
+        self.width = width = self.pagesize[0] - 2*self.margin
         
         # Get styles
         styles = getSampleStyleSheet()
@@ -223,29 +283,214 @@ def generate_shop_bill_template(invoice_data, pdf_buffer):
             fontName='Helvetica-Bold'
         ))
         
-        # Create elements list to build PDF
-        elements = []
+        self.styles = styles
         
-        # Extract shop info from store_info structure or direct invoice_data
-        # First try getting from store_info structure (standardized format)
-        store_info = invoice_data.get('store_info', {})
+        shop_name = shop_info['name']
         
-        # If store_info is empty or missing fields, look in root of invoice_data
-        # This ensures we can work with both nested and flat data structures
-        shop_name = store_info.get('name', invoice_data.get('name', 'Agritech Products Shop'))
-        shop_address = store_info.get('address', invoice_data.get('address', 'Main Road, Maharashtra'))
-        shop_phone = store_info.get('phone', invoice_data.get('phone', '+91 1234567890'))
-        shop_gst = store_info.get('gstin', invoice_data.get('gstin', '27AABCU9603R1ZX'))
-        shop_email = store_info.get('email', invoice_data.get('email', ''))
+        # Top Row 1: Shop Name
+        self.shop_name_para = Paragraph(f"{shop_name}", styles['ShopName'])
         
-        # Special license fields - look in both places
-        shop_laid_no = store_info.get('laid_no', invoice_data.get('laid_no', invoice_data.get('shop_laid_no', '')))
-        shop_lcsd_no = store_info.get('lcsd_no', invoice_data.get('lcsd_no', invoice_data.get('shop_lcsd_no', '')))
-        shop_lfrd_no = store_info.get('lfrd_no', invoice_data.get('lfrd_no', invoice_data.get('shop_lfrd_no', '')))
+        # Top Row 2: Shop address, Original For Recipient, GST
+        shop_header_data = [
+            [
+                Paragraph(f"{shop_info['address']}", styles['ShopInfo']),
+                Paragraph("(Original For Recipeint)", styles['OriginalCopy']),
+                Paragraph(f"GSTIN -        {shop_info['gstin']}", styles['RightAligned'])
+            ]
+        ]
         
-        # State info
-        state_name = store_info.get('state_name', invoice_data.get('state_name', 'Maharashtra'))
-        state_code = store_info.get('state_code', invoice_data.get('state_code', '27'))
+        shop_header_table = Table(shop_header_data, colWidths=[width*0.4, width*0.3, width*0.3])
+        shop_header_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+        ]))
+        
+        # Top Row 3: State Name & Code, Licensing info
+        state_license_data = [
+            [
+                Paragraph(f"State Name: {shop_info['state_name']}, Code : {shop_info['state_code']}", styles['StateName']),
+                Paragraph("", styles['StateName']),
+                Paragraph(f"LAID           {shop_info['laid_no']}", styles['RightAligned'])
+            ],
+            [
+                Paragraph(f"Contact : {shop_info['phone']}", styles['StateName']),
+                Paragraph("", styles['StateName']),
+                Paragraph(f"LCSD           {shop_info['lcsd_no']}", styles['RightAligned'])
+            ],
+            [
+                Paragraph(f"E-mail: {shop_info['email']}", styles['StateName']),
+                Paragraph("", styles['StateName']),
+                Paragraph(f"LFRD           {shop_info['lfrd_no']}", styles['RightAligned'])
+            ]
+        ]
+        
+        state_license_table = Table(state_license_data, colWidths=[width*0.4, width*0.3, width*0.3])
+        state_license_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+        ]))
+        
+        self.shop_header_table = shop_header_table
+        self.state_license_table = state_license_table
+        
+        # Items table header with company column in center
+        company_header = [
+            ["", "Company", ""],
+            ["No", "Description of Good", "name", "HSN", "Batch NO", "Expiry Date", "Qty", "Unit", "Rate", "Disc", "Amount"]
+        ]
+        
+        # Calculate column widths for items table
+        col_widths = [
+            0.6*cm,   # No
+            4.5*cm,   # Description
+            2.3*cm,   # Company name
+            1.0*cm,   # HSN
+            1.5*cm,   # Batch
+            1.7*cm,   # Expiry
+            0.8*cm,   # Qty
+            1.0*cm,   # Unit
+            1.0*cm,   # Rate
+            1.0*cm,   # Disc
+            1.5*cm    # Amount
+        ]
+        
+        # Create items header table
+        items_header = Table(company_header, colWidths=col_widths)
+        items_header.setStyle(TableStyle([
+            # Borders
+            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+            ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
+            
+            # Merging "company" and "name" in row 0
+            ('SPAN', (1, 0), (2, 0)),
+            
+            # Text styling
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            
+            # Alignment
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            
+            # Padding
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ]))
+        
+        self.col_widths = col_widths
+        self.items_header = items_header
+        
+        # Calculate column widths for tax table exactly matching the PDF template
+        tax_col_widths = [2.5*cm, 2.5*cm, 2.0*cm, 1.5*cm, 2.0*cm, 1.5*cm, 2.0*cm, 2.0*cm]
+        
+        # Style for the tax table, whose values change on every invoice
+        tax_table_style = TableStyle([
+            # Borders
+            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+            ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
+            
+            # Headers spanning
+            ('SPAN', (0, 0), (1, 0)),  # Empty space above "Payment Breakdown"
+            ('SPAN', (2, 0), (2, 1)),  # "Taxable Value" spans 2 rows
+            ('SPAN', (3, 0), (4, 0)),  # "Central Tax (CGST)" spans 2 columns
+            ('SPAN', (5, 0), (6, 0)),  # "State Tax (SGST)" spans 2 columns
+            ('SPAN', (7, 0), (7, 1)),  # "Total Tax Amount" spans 2 rows
+            ('SPAN', (0, 1), (1, 1)),  # "Payment Breakdown" spans 2 columns
+            
+            # Formatting
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            
+            # Special alignment for specific cells
+            ('ALIGN', (0, 2), (0, 4), 'LEFT'),   # Left align first column
+            ('ALIGN', (1, 4), (1, 4), 'RIGHT'),  # Right align outstanding amount
+            ('ALIGN', (2, 2), (2, 4), 'RIGHT'),  # Right align taxable value
+            ('ALIGN', (4, 2), (4, 4), 'RIGHT'),  # Right align CGST amount
+            ('ALIGN', (6, 2), (6, 4), 'RIGHT'),  # Right align SGST amount
+            ('ALIGN', (7, 2), (7, 4), 'RIGHT'),  # Right align Total Tax amount
+            
+            # Bold the Outstanding Amount text
+            ('FONTNAME', (0, 4), (0, 4), 'Helvetica-Bold'),
+        ])
+        
+        self.tax_col_widths = tax_col_widths
+        self.tax_table_style = tax_table_style
+        
+        # Signature section - formatted exactly as in the PDF template
+        terms_text = shop_info['terms_conditions']
+        
+        
+        signature_data = [
+            ["Customer Signature", terms_text, "For                 " + shop_name],
+            ["", "", "Authorised signatory"]
+        ]
+        
+        signature_table = Table(signature_data, colWidths=[width*0.25, width*0.5, width*0.25])
+        signature_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),    # Only align header right
+            ('ALIGN', (2, 1), (2, -1), 'CENTER'),  # Center the "Authorised signatory" text
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ]))
+        
+        self.signature_table = signature_table
+        
+        # Subject to jurisdiction
+        self.subject_para = Paragraph("SUBJECT TO JURIDICTION", styles['Subject'])
+        
+        # Payment records header
+        self.payment_records_para = Paragraph("Invoice payment Records", styles['PaymentRecordsHeader'])
+        
+        # Payment records table
+        payment_records_header = [
+            ["Sr.no", "Invoice No", "Amount", "Depositor Name", "Date", "time", "Mode of Pay", "Remaining Amount", "Note", "Invoice Status"]
+        ]
+        
+        # Column widths exactly matching the PDF template
+        payment_records_col_widths = [0.8*cm, 2.0*cm, 1.5*cm, 2.5*cm, 1.5*cm, 1.2*cm, 1.8*cm, 2.2*cm, 1.5*cm, 1.5*cm]
+        
+        # Create table with headers
+        payment_records_table = Table(payment_records_header, colWidths=payment_records_col_widths)
+        payment_records_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+            ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        
+        self.payment_records_col_widths = payment_records_col_widths
+        self.payment_records_table = payment_records_table
+        self._lock = threading.Lock()
+
+    def render(self, invoice_data, pdf_buffer):
+        """Write one invoice to pdf_buffer (a path or file object); raises if ReportLab fails"""
+        with self._lock:
+            self._render(invoice_data, pdf_buffer)
+
+    def _render(self, invoice_data, pdf_buffer):
+        # Create the PDF document in landscape orientation
+        doc = SimpleDocTemplate(
+            pdf_buffer,
+            pagesize=self.pagesize,
+            rightMargin=self.margin,
+            leftMargin=self.margin,
+            topMargin=self.margin,
+            bottomMargin=self.margin
+        )
+        styles = self.styles
+        col_widths = self.col_widths
+        
+        # Create elements list to build PDF
+        elements = []
         
         # Extract customer data
         customer_data = invoice_data.get('customer', {})
@@ -301,8 +546,12 @@ def generate_shop_bill_template(invoice_data, pdf_buffer):
         except (ValueError, TypeError):
             total = 0.0
         
-        # Calculate taxable value (subtotal - discount)
-        taxable_value = subtotal - discount
+        # Taxable value from the cart's GST split (see utils.cart_calculator);
+        # older callers only pass subtotal and discount
+        try:
+            taxable_value = float(payment_data['taxable_value'])
+        except (KeyError, ValueError, TypeError):
+            taxable_value = subtotal - discount
         
         # Calculate outstanding amount based on payment method
         outstanding_amount = 0
@@ -330,55 +579,10 @@ def generate_shop_bill_template(invoice_data, pdf_buffer):
         # Following the merged cells and exact format from the Excel template
         # -------------------------------------------------------------
         
-        # Top Row 1: Shop Name
-        elements.append(Paragraph(f"{shop_name}", styles['ShopName']))
-        
-        # Top Row 2: Shop address, Original For Recipient, GST
-        shop_header_data = [
-            [
-                Paragraph(f"{shop_address}", styles['ShopInfo']),
-                Paragraph("(Original For Recipeint)", styles['OriginalCopy']),
-                Paragraph(f"GSTIN -        {shop_gst}", styles['RightAligned'])
-            ]
-        ]
-        
-        shop_header_table = Table(shop_header_data, colWidths=[doc.width*0.4, doc.width*0.3, doc.width*0.3])
-        shop_header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
-        ]))
-        
-        elements.append(shop_header_table)
-        
-        # Top Row 3: State Name & Code, Licensing info
-        state_license_data = [
-            [
-                Paragraph(f"State Name: {state_name}, Code : {state_code}", styles['StateName']),
-                Paragraph("", styles['StateName']),
-                Paragraph(f"LAID           {shop_laid_no}", styles['RightAligned'])
-            ],
-            [
-                Paragraph(f"Contact : {shop_phone}", styles['StateName']),
-                Paragraph("", styles['StateName']),
-                Paragraph(f"LCSD           {shop_lcsd_no}", styles['RightAligned'])
-            ],
-            [
-                Paragraph(f"E-mail: {shop_email}", styles['StateName']),
-                Paragraph("", styles['StateName']),
-                Paragraph(f"LFRD           {shop_lfrd_no}", styles['RightAligned'])
-            ]
-        ]
-        
-        state_license_table = Table(state_license_data, colWidths=[doc.width*0.4, doc.width*0.3, doc.width*0.3])
-        state_license_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-        ]))
-        
-        elements.append(state_license_table)
+        # Top Rows 1-3: Shop name, address, GST, state and licensing info
+        elements.append(self.shop_name_para)
+        elements.append(self.shop_header_table)
+        elements.append(self.state_license_table)
         elements.append(Spacer(1, 0.5*cm))
         
         # Customer info section 
@@ -424,51 +628,7 @@ def generate_shop_bill_template(invoice_data, pdf_buffer):
         elements.append(customer_info_table)
         elements.append(Spacer(1, 0.5*cm))
         
-        # Items table header with company column in center
-        company_header = [
-            ["", "Company", ""],
-            ["No", "Description of Good", "name", "HSN", "Batch NO", "Expiry Date", "Qty", "Unit", "Rate", "Disc", "Amount"]
-        ]
-        
-        # Calculate column widths for items table
-        col_widths = [
-            0.6*cm,   # No
-            4.5*cm,   # Description
-            2.3*cm,   # Company name
-            1.0*cm,   # HSN
-            1.5*cm,   # Batch
-            1.7*cm,   # Expiry
-            0.8*cm,   # Qty
-            1.0*cm,   # Unit
-            1.0*cm,   # Rate
-            1.0*cm,   # Disc
-            1.5*cm    # Amount
-        ]
-        
-        # Create items header table
-        items_header = Table(company_header, colWidths=col_widths)
-        items_header.setStyle(TableStyle([
-            # Borders
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-            ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
-            
-            # Merging "company" and "name" in row 0
-            ('SPAN', (1, 0), (2, 0)),
-            
-            # Text styling
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            
-            # Alignment
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Padding
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        
-        elements.append(items_header)
+        elements.append(self.items_header)
         
         # Add items
         items = invoice_data.get('items', [])
@@ -619,92 +779,24 @@ def generate_shop_bill_template(invoice_data, pdf_buffer):
             ["Outstanding Amnt.", format_currency(outstanding_amount, symbol='Rs.'), "", "", "", "", "", ""]
         ]
         
-        # Calculate column widths for tax table exactly matching the PDF template
-        tax_col_widths = [2.5*cm, 2.5*cm, 2.0*cm, 1.5*cm, 2.0*cm, 1.5*cm, 2.0*cm, 2.0*cm]
-        
-        tax_table = Table(tax_table_data, colWidths=tax_col_widths)
-        tax_table.setStyle(TableStyle([
-            # Borders
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-            ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
-            
-            # Headers spanning
-            ('SPAN', (0, 0), (1, 0)),  # Empty space above "Payment Breakdown"
-            ('SPAN', (2, 0), (2, 1)),  # "Taxable Value" spans 2 rows
-            ('SPAN', (3, 0), (4, 0)),  # "Central Tax (CGST)" spans 2 columns
-            ('SPAN', (5, 0), (6, 0)),  # "State Tax (SGST)" spans 2 columns
-            ('SPAN', (7, 0), (7, 1)),  # "Total Tax Amount" spans 2 rows
-            ('SPAN', (0, 1), (1, 1)),  # "Payment Breakdown" spans 2 columns
-            
-            # Formatting
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Special alignment for specific cells
-            ('ALIGN', (0, 2), (0, 4), 'LEFT'),   # Left align first column
-            ('ALIGN', (1, 4), (1, 4), 'RIGHT'),  # Right align outstanding amount
-            ('ALIGN', (2, 2), (2, 4), 'RIGHT'),  # Right align taxable value
-            ('ALIGN', (4, 2), (4, 4), 'RIGHT'),  # Right align CGST amount
-            ('ALIGN', (6, 2), (6, 4), 'RIGHT'),  # Right align SGST amount
-            ('ALIGN', (7, 2), (7, 4), 'RIGHT'),  # Right align Total Tax amount
-            
-            # Bold the Outstanding Amount text
-            ('FONTNAME', (0, 4), (0, 4), 'Helvetica-Bold'),
-        ]))
+        tax_table = Table(tax_table_data, colWidths=self.tax_col_widths)
+        tax_table.setStyle(self.tax_table_style)
         
         elements.append(tax_table)
         
         # Signature section - formatted exactly as in the PDF template
-        # Get terms & conditions text
-        terms_text = store_info.get('terms_conditions', invoice_data.get('terms_conditions', 'Goods once sold cannot be returned. Payment due within 30 days.'))
-        
-        signature_data = [
-            ["Customer Signature", terms_text, "For                 " + shop_name],
-            ["", "", "Authorised signatory"]
-        ]
-        
-        signature_table = Table(signature_data, colWidths=[doc.width*0.25, doc.width*0.5, doc.width*0.25])
-        signature_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),    # Only align header right
-            ('ALIGN', (2, 1), (2, -1), 'CENTER'),  # Center the "Authorised signatory" text
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ]))
-        
-        elements.append(signature_table)
+        elements.append(self.signature_table)
         elements.append(Spacer(1, 0.5*cm))
         
         # Subject to jurisdiction
-        elements.append(Paragraph("SUBJECT TO JURIDICTION", styles['Subject']))
+        elements.append(self.subject_para)
         elements.append(Spacer(1, 0.5*cm))
         
         # Payment records header
-        elements.append(Paragraph("Invoice payment Records", styles['PaymentRecordsHeader']))
-        
-        # Payment records table
-        payment_records_header = [
-            ["Sr.no", "Invoice No", "Amount", "Depositor Name", "Date", "time", "Mode of Pay", "Remaining Amount", "Note", "Invoice Status"]
-        ]
-        
-        # Column widths exactly matching the PDF template
-        payment_records_col_widths = [0.8*cm, 2.0*cm, 1.5*cm, 2.5*cm, 1.5*cm, 1.2*cm, 1.8*cm, 2.2*cm, 1.5*cm, 1.5*cm]
-        
-        # Create table with headers
-        payment_records_table = Table(payment_records_header, colWidths=payment_records_col_widths)
-        payment_records_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-            ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        elements.append(self.payment_records_para)
+        elements.append(self.payment_records_table)
+        payment_records_col_widths = self.payment_records_col_widths
         
-        elements.append(payment_records_table)
         
         # Extract payment history
         payment_history = payment_data.get('payments', [])
@@ -773,77 +865,67 @@ def generate_shop_bill_template(invoice_data, pdf_buffer):
         
         # Build PDF
         doc.build(elements)
-        
-        # If using BytesIO, get the data
-        if isinstance(pdf_buffer, io.BytesIO):
-            pdf_data = pdf_buffer.getvalue()
-            pdf_buffer.close()
-            return pdf_data
-        
-        return True
-    
-    except Exception as e:
-        print(f"Error generating invoice: {e}")
-        import traceback
-        traceback.print_exc()
-        
-        # If using BytesIO, make sure to close it
-        if isinstance(pdf_buffer, io.BytesIO):
-            try:
-                pdf_buffer.close()
-            except:
-                pass
-            
-        return False
-        
-def generate_excel_invoice(invoice_data, save_path=None):
-    """
-    Generate an Excel invoice based on the shop_bill.xlsx template
-    
-    Args:
-        invoice_data: Dictionary containing invoice details
-        save_path: Path to save the Excel file
-        
-    Returns:
-        bool: True if successful, False otherwise
-        or
-        bytes: Excel data if save_path is None
+
+EXCEL_TEMPLATE_PATH = "attached_assets/shop_bill.xlsx"
+
+# Template cells whose placeholders are replaced with text, by section
+EXCEL_PLACEHOLDER_RANGES = {
+    "shop": "A1:L8",
+    "customer": "A9:L15",
+    "words": "A18:F18",
+    "signature": "A24:L25",
+}
+
+def excel_template(template_path=EXCEL_TEMPLATE_PATH):
+    """The parsed Excel invoice template; it is parsed again only when the file changes"""
+    source = {"template_path": template_path, "modified": os.path.getmtime(template_path)}
+    return compiled_template("invoice_generator.excel", source, ExcelInvoiceTemplate)
+
+class ExcelInvoiceTemplate:
+    """The shop_bill.xlsx template, parsed once and cloned for every invoice
+
+    The parsed workbook is kept pickled, which clones it in a fraction of
+    the time load_workbook() takes to parse the file again. The cells with
+    {placeholders} and the merged cells that must not be written are found
+    once, so fill() goes straight to the cells it changes.
     """
-    try:
-        # Check if openpyxl is available
+
+    def __init__(self, source):
         import openpyxl
-        from io import BytesIO
-        import os
-        
-        # Create a copy of the template
-        template_path = "attached_assets/shop_bill.xlsx"
-        if not os.path.exists(template_path):
-            print(f"Error: Template file {template_path} not found")
-            return False
-            
-        # Load the template
-        wb = openpyxl.load_workbook(template_path)
-        sheet = wb.active
-        
+        from openpyxl.cell.cell import MergedCell
+
+        workbook = openpyxl.load_workbook(source["template_path"])
+        sheet = workbook.active
+        self.placeholders = {
+            section: [cell.coordinate for row in sheet[cell_range] for cell in row
+                      if isinstance(cell.value, str) and "{" in cell.value]
+            for section, cell_range in EXCEL_PLACEHOLDER_RANGES.items()
+        }
+        self.merged = {(cell.row, cell.column) for row in sheet.iter_rows() for cell in row
+                       if isinstance(cell, MergedCell)}
+        self._prototype = pickle.dumps(workbook, pickle.HIGHEST_PROTOCOL)
+
+    def new_workbook(self):
+        """A fresh copy of the template workbook"""
+        return pickle.loads(self._prototype)
+
+    def _put(self, sheet, row, column, value):
+        """Write a cell unless it is covered by a merged cell"""
+        if (row, column) not in self.merged:
+            sheet.cell(row=row, column=column).value = value
+
+    def _replace(self, sheet, section, replacements):
+        """Replace placeholders in one section's template cells"""
+        for coordinate in self.placeholders[section]:
+            cell = sheet[coordinate]
+            if cell.value and isinstance(cell.value, str):
+                for placeholder, value in replacements:
+                    cell.value = cell.value.replace(placeholder, value)
+
+    def fill(self, sheet, invoice_data):
+        """Fill a copy of the template sheet with one invoice"""
         # Extract data from invoice_data
-        # Extract shop info from store_info structure or direct invoice_data
-        store_info = invoice_data.get('store_info', {})
-        
-        # Shop information
-        shop_name = store_info.get('name', invoice_data.get('name', 'Agritech Products Shop'))
-        shop_address = store_info.get('address', invoice_data.get('address', 'Main Road, Maharashtra'))
-        shop_phone = store_info.get('phone', invoice_data.get('phone', '+91 1234567890'))
-        shop_gst = store_info.get('gstin', invoice_data.get('gstin', '27AABCU9603R1ZX'))
-        shop_email = store_info.get('email', invoice_data.get('email', ''))
-        
-        # Special license fields
-        shop_laid_no = store_info.get('laid_no', invoice_data.get('laid_no', invoice_data.get('shop_laid_no', '')))
-        shop_lcsd_no = store_info.get('lcsd_no', invoice_data.get('lcsd_no', invoice_data.get('shop_lcsd_no', '')))
-        shop_lfrd_no = store_info.get('lfrd_no', invoice_data.get('lfrd_no', invoice_data.get('shop_lfrd_no', '')))
-        
-        # State info
-        state_name = store_info.get('state_name', invoice_data.get('state_name', 'Maharashtra'))
-        state_code = store_info.get('state_code', invoice_data.get('state_code', '27'))
+        shop_info = resolve_shop_info(invoice_data)
         
         # Extract customer data
         customer_data = invoice_data.get('customer', {})
@@ -852,7 +934,11 @@ def generate_excel_invoice(invoice_data, save_path=None):
         try:
             if 'date' in invoice_data:
                 if isinstance(invoice_data['date'], str):
-                    date_obj = datetime.datetime.strptime(invoice_data['date'], '%d-%m-%Y')
+                    # Saved invoices (database.invoice_assembler) are dated DD/MM/YYYY
+                    try:
+                        date_obj = datetime.datetime.strptime(invoice_data['date'], '%d-%m-%Y')
+                    except ValueError:
+                        date_obj = datetime.datetime.strptime(invoice_data['date'], '%d/%m/%Y')
         except:
             pass
             
@@ -899,8 +985,12 @@ def generate_excel_invoice(invoice_data, save_path=None):
         except (ValueError, TypeError):
             total = 0.0
         
-        # Calculate taxable value (subtotal - discount)
-        taxable_value = subtotal - discount
+        # Taxable value from the cart's GST split (see utils.cart_calculator);
+        # older callers only pass subtotal and discount
+        try:
+            taxable_value = float(payment_data['taxable_value'])
+        except (KeyError, ValueError, TypeError):
+            taxable_value = subtotal - discount
         
         # Calculate outstanding amount based on payment method
         outstanding_amount = 0
@@ -925,43 +1015,37 @@ def generate_excel_invoice(invoice_data, save_path=None):
         
         # Replace placeholders in the Excel template
         # Shop info section
-        for cell in sheet["A1:L8"]:
-            for c in cell:
-                if c.value and isinstance(c.value, str):
-                    # Shop name and address
-                    c.value = c.value.replace("{Shop_Name}", shop_name)
-                    c.value = c.value.replace("{Shop_address}", shop_address)
-                    c.value = c.value.replace("{Shop_number}", shop_phone)
-                    c.value = c.value.replace("{Shop_emailid}", shop_email)
-                    
-                    # State info
-                    c.value = c.value.replace("{state_name}", state_name)
-                    c.value = c.value.replace("{state_code}", state_code)
-                    
-                    # GST and license info
-                    c.value = c.value.replace("{Shop_GSTNO}", shop_gst)
-                    c.value = c.value.replace("{Shop_LAID_no}", shop_laid_no)
-                    c.value = c.value.replace("{Shop_LCSD_no}", shop_lcsd_no)
-                    c.value = c.value.replace("{Shop_LFRD_no}", shop_lfrd_no)
+        self._replace(sheet, "shop", [
+            # Shop name and address
+            ("{Shop_Name}", shop_info['name']),
+            ("{Shop_address}", shop_info['address']),
+            ("{Shop_number}", shop_info['phone']),
+            ("{Shop_emailid}", shop_info['email']),
+            # State info
+            ("{state_name}", shop_info['state_name']),
+            ("{state_code}", shop_info['state_code']),
+            # GST and license info
+            ("{Shop_GSTNO}", shop_info['gstin']),
+            ("{Shop_LAID_no}", shop_info['laid_no']),
+            ("{Shop_LCSD_no}", shop_info['lcsd_no']),
+            ("{Shop_LFRD_no}", shop_info['lfrd_no']),
+        ])
         
         # Customer info section
-        for cell in sheet["A9:L15"]:
-            for c in cell:
-                if c.value and isinstance(c.value, str):
-                    # Customer details
-                    c.value = c.value.replace("{Customer_name}", customer_name)
-                    c.value = c.value.replace("{Customer_Mobile}", customer_phone)
-                    c.value = c.value.replace("{Customer_Address}", customer_address)
-                    c.value = c.value.replace("{Customer_Emailid}", customer_email)
-                    
-                    # Invoice details
-                    c.value = c.value.replace("{Date}{Time}", f"{invoice_date}{invoice_time}")
-                    c.value = c.value.replace("{Invoice_Number}", invoice_number)
-                    c.value = c.value.replace("{mode_of_pay}", payment_method)
-                    
-                    # Amount placeholders
-                    c.value = c.value.replace("{amount}", format_currency(total, symbol='Rs.'))
-                    c.value = c.value.replace("{Total_amount}", format_currency(total, symbol='Rs.'))
+        self._replace(sheet, "customer", [
+            # Customer details
+            ("{Customer_name}", customer_name),
+            ("{Customer_Mobile}", customer_phone),
+            ("{Customer_Address}", customer_address),
+            ("{Customer_Emailid}", customer_email),
+            # Invoice details
+            ("{Date}{Time}", f"{invoice_date}{invoice_time}"),
+            ("{Invoice_Number}", invoice_number),
+            ("{mode_of_pay}", payment_method),
+            # Amount placeholders
+            ("{amount}", format_currency(total, symbol='Rs.')),
+            ("{Total_amount}", format_currency(total, symbol='Rs.')),
+        ])
         
         # Items section - starting at row 16
         items = invoice_data.get('items', [])
@@ -1003,59 +1087,19 @@ def generate_excel_invoice(invoice_data, save_path=None):
             if discount > 0:
                 discount_str += "%"
                 
-            # Item details
-            item_name = item.get('name', '')
-            hsn_code = item.get('hsn_code', '')
-            company_name = item.get('manufacturer', '')
-            batch_no = item.get('batch_no', '')
-            expiry_date = item.get('expiry_date', '')
-            unit = item.get('unit', '')
-            
-            # Update cells - safely handling merged cells
+            # Update cells - merged cells are skipped
             try:
-                cell = sheet.cell(row=row, column=1)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = str(i)  # {sr_no}
-                
-                cell = sheet.cell(row=row, column=2)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = item_name  # {Item_name}
-                    
-                cell = sheet.cell(row=row, column=3)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = company_name  # {manufacturer}
-                    
-                cell = sheet.cell(row=row, column=4)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = hsn_code  # {hsn}
-                    
-                cell = sheet.cell(row=row, column=5)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = batch_no  # {batch_no}
-                    
-                cell = sheet.cell(row=row, column=6)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = expiry_date  # {expiry_date}
-                    
-                cell = sheet.cell(row=row, column=7)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = qty_str  # {qty}
-                    
-                cell = sheet.cell(row=row, column=8)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = unit  # {unit}
-                    
-                cell = sheet.cell(row=row, column=9)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = format_currency(price, symbol='Rs.')  # {rate}
-                    
-                cell = sheet.cell(row=row, column=10)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = discount_str  # {disc}
-                    
-                cell = sheet.cell(row=row, column=11)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = format_currency(item_total, symbol='Rs.')  # {amount}
+                self._put(sheet, row, 1, str(i))                                        # {sr_no}
+                self._put(sheet, row, 2, item.get('name', ''))                          # {Item_name}
+                self._put(sheet, row, 3, item.get('manufacturer', ''))                  # {manufacturer}
+                self._put(sheet, row, 4, item.get('hsn_code', ''))                      # {hsn}
+                self._put(sheet, row, 5, item.get('batch_no', ''))                      # {batch_no}
+                self._put(sheet, row, 6, item.get('expiry_date', ''))                   # {expiry_date}
+                self._put(sheet, row, 7, qty_str)                                       # {qty}
+                self._put(sheet, row, 8, item.get('unit', ''))                          # {unit}
+                self._put(sheet, row, 9, format_currency(price, symbol='Rs.'))          # {rate}
+                self._put(sheet, row, 10, discount_str)                                 # {disc}
+                self._put(sheet, row, 11, format_currency(item_total, symbol='Rs.'))    # {amount}
             except Exception as e:
                 print(f"Error updating row {row}: {e}")
             
@@ -1064,14 +1108,8 @@ def generate_excel_invoice(invoice_data, save_path=None):
         qty_display = str(int(total_qty)) if total_qty == int(total_qty) else str(total_qty)
         
         try:
-            # Safely handle potentially merged cells
-            cell = sheet.cell(row=total_row, column=7)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = qty_display  # {total_qty}
-                
-            cell = sheet.cell(row=total_row, column=11)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(total, symbol='Rs.')  # {Total_amount}
+            self._put(sheet, total_row, 7, qty_display)                                 # {total_qty}
+            self._put(sheet, total_row, 11, format_currency(total, symbol='Rs.'))       # {Total_amount}
         except Exception as e:
             print(f"Error updating total row: {e}")
         
@@ -1082,70 +1120,39 @@ def generate_excel_invoice(invoice_data, save_path=None):
         except (ValueError, TypeError):
             amount_in_words = "Zero Rupees Only"
             
-        # Find the INR IN WORDS cell and replace
-        for cell in sheet["A18:F18"]:
-            for c in cell:
-                if c.value and isinstance(c.value, str) and "{INR IN WORDS}" in c.value:
-                    c.value = amount_in_words
+        # Find the INR IN WORDS cell and replace; long bills may have written item rows over it
+        for coordinate in self.placeholders["words"]:
+            cell = sheet[coordinate]
+            if cell.value and isinstance(cell.value, str) and "{INR IN WORDS}" in cell.value:
+                cell.value = amount_in_words
         
         # Tax section
         cgst_rate_display = str(int(cgst_rate)) if cgst_rate == int(cgst_rate) else str(cgst_rate)
         sgst_rate_display = str(int(sgst_rate)) if sgst_rate == int(sgst_rate) else str(sgst_rate)
         
-        # Update tax cells - safely handling merged cells
+        # Update tax cells - merged cells are skipped
         try:
             # Tax row 1
-            cell = sheet.cell(row=21, column=7)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(taxable_value, symbol='Rs.')  # {taxable_invoice_value}
-                
-            cell = sheet.cell(row=21, column=8)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = f"{cgst_rate_display}%"  # {CGST_rate}
-                
-            cell = sheet.cell(row=21, column=9)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(cgst, symbol='Rs.')  # {CGST_amount}
-                
-            cell = sheet.cell(row=21, column=10)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = f"{sgst_rate_display}%"  # {SGST_rate}
-                
-            cell = sheet.cell(row=21, column=11)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(sgst, symbol='Rs.')  # {SGST_amount}
-                
-            cell = sheet.cell(row=21, column=12)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(cgst + sgst, symbol='Rs.')  # {total_tax_amount}
-                
+            self._put(sheet, 21, 7, format_currency(taxable_value, symbol='Rs.'))       # {taxable_invoice_value}
+            self._put(sheet, 21, 8, f"{cgst_rate_display}%")                            # {CGST_rate}
+            self._put(sheet, 21, 9, format_currency(cgst, symbol='Rs.'))                # {CGST_amount}
+            self._put(sheet, 21, 10, f"{sgst_rate_display}%")                           # {SGST_rate}
+            self._put(sheet, 21, 11, format_currency(sgst, symbol='Rs.'))               # {SGST_amount}
+            self._put(sheet, 21, 12, format_currency(cgst + sgst, symbol='Rs.'))        # {total_tax_amount}
+            
             # Tax row 2
-            cell = sheet.cell(row=22, column=4)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(outstanding_amount, symbol='Rs.')  # {Total_outstanding}
-                
-            cell = sheet.cell(row=22, column=9)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(cgst, symbol='Rs.')  # {CGST_amount}
-                
-            cell = sheet.cell(row=22, column=11)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(sgst, symbol='Rs.')  # {SGST_amount}
-                
-            cell = sheet.cell(row=22, column=12)
-            if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                cell.value = format_currency(cgst + sgst, symbol='Rs.')  # {total_tax_amount}
+            self._put(sheet, 22, 4, format_currency(outstanding_amount, symbol='Rs.'))  # {Total_outstanding}
+            self._put(sheet, 22, 9, format_currency(cgst, symbol='Rs.'))                # {CGST_amount}
+            self._put(sheet, 22, 11, format_currency(sgst, symbol='Rs.'))               # {SGST_amount}
+            self._put(sheet, 22, 12, format_currency(cgst + sgst, symbol='Rs.'))        # {total_tax_amount}
         except Exception as e:
             print(f"Error updating tax section: {e}")
         
-        # Signature section
-        for cell in sheet["A24:L25"]:
-            for c in cell:
-                if c.value and isinstance(c.value, str):
-                    # Terms and shop name
-                    terms_text = store_info.get('terms_conditions', invoice_data.get('terms_conditions', 'Goods once sold cannot be returned. Payment due within 30 days.'))
-                    c.value = c.value.replace("{Shop_name}", shop_name)
-                    c.value = c.value.replace("{Terms and Condition}", terms_text)
+        # Signature section - terms and shop name
+        self._replace(sheet, "signature", [
+            ("{Shop_name}", shop_info['name']),
+            ("{Terms and Condition}", shop_info['terms_conditions']),
+        ])
         
         # Payment history section 
         payment_history = payment_data.get('payments', [])
@@ -1153,102 +1160,59 @@ def generate_excel_invoice(invoice_data, save_path=None):
         
         try:
             if not payment_history:
-                # Add initial payment record if none exist - safely handling merged cells
-                cell = sheet.cell(row=payment_row_start, column=1)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = "1"  # {sr,no}
-                    
-                cell = sheet.cell(row=payment_row_start, column=2)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = invoice_number  # {invoice_no}
-                    
-                cell = sheet.cell(row=payment_row_start, column=3)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = format_currency(total, symbol='Rs.')  # {amount}
-                    
-                cell = sheet.cell(row=payment_row_start, column=4)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = "Initial Sale"  # {depositor_name}
-                    
-                cell = sheet.cell(row=payment_row_start, column=5)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = invoice_date  # {date}
-                    
-                cell = sheet.cell(row=payment_row_start, column=6)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = invoice_time  # {time}
-                    
-                cell = sheet.cell(row=payment_row_start, column=7)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = payment_method  # {mode_of_pay}
-                    
-                cell = sheet.cell(row=payment_row_start, column=8)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = format_currency(outstanding_amount, symbol='Rs.')  # {remaining_amount}
-                    
-                cell = sheet.cell(row=payment_row_start, column=10)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = ""  # {note}
-                    
-                cell = sheet.cell(row=payment_row_start, column=11)
-                if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                    cell.value = payment_status  # {invoice_status}
+                # Add initial payment record if none exist - merged cells are skipped
+                row = payment_row_start
+                self._put(sheet, row, 1, "1")                                           # {sr,no}
+                self._put(sheet, row, 2, invoice_number)                                # {invoice_no}
+                self._put(sheet, row, 3, format_currency(total, symbol='Rs.'))          # {amount}
+                self._put(sheet, row, 4, "Initial Sale")                                # {depositor_name}
+                self._put(sheet, row, 5, invoice_date)                                  # {date}
+                self._put(sheet, row, 6, invoice_time)                                  # {time}
+                self._put(sheet, row, 7, payment_method)                                # {mode_of_pay}
+                self._put(sheet, row, 8, format_currency(outstanding_amount, symbol='Rs.'))  # {remaining_amount}
+                self._put(sheet, row, 10, "")                                           # {note}
+                self._put(sheet, row, 11, payment_status)                               # {invoice_status}
             else:
-                # Add payment history records - safely handling merged cells
+                # Add payment history records - merged cells are skipped
                 for i, payment in enumerate(payment_history, 1):
                     row = payment_row_start + i - 1
-                    
-                    payment_amount = payment.get('amount', 0)
-                    payment_date = payment.get('date', '')
-                    payment_time = payment.get('time', '')
-                    payment_mode = payment.get('method', '')
-                    depositor_name = payment.get('depositor_name', '')
-                    note = payment.get('note', '')
-                    remaining = payment.get('remaining', '')
-                    payment_status = payment.get('status', '')
-                    
-                    # Update cells safely
-                    cell = sheet.cell(row=row, column=1)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = str(i)  # {sr,no}
-                        
-                    cell = sheet.cell(row=row, column=2)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = invoice_number  # {invoice_no}
-                        
-                    cell = sheet.cell(row=row, column=3)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = format_currency(payment_amount, symbol='Rs.')  # {amount}
-                        
-                    cell = sheet.cell(row=row, column=4)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = depositor_name  # {depositor_name}
-                        
-                    cell = sheet.cell(row=row, column=5)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = payment_date  # {date}
-                        
-                    cell = sheet.cell(row=row, column=6)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = payment_time  # {time}
-                        
-                    cell = sheet.cell(row=row, column=7)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = payment_mode  # {mode_of_pay}
-                        
-                    cell = sheet.cell(row=row, column=8)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = format_currency(remaining, symbol='Rs.')  # {remaining_amount}
-                        
-                    cell = sheet.cell(row=row, column=10)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = note  # {note}
-                        
-                    cell = sheet.cell(row=row, column=11)
-                    if not isinstance(cell, openpyxl.cell.cell.MergedCell):
-                        cell.value = payment_status  # {invoice_status}
+                    self._put(sheet, row, 1, str(i))                                    # {sr,no}
+                    self._put(sheet, row, 2, invoice_number)                            # {invoice_no}
+                    self._put(sheet, row, 3, format_currency(payment.get('amount', 0), symbol='Rs.'))  # {amount}
+                    self._put(sheet, row, 4, payment.get('depositor_name', ''))         # {depositor_name}
+                    self._put(sheet, row, 5, payment.get('date', ''))                   # {date}
+                    self._put(sheet, row, 6, payment.get('time', ''))                   # {time}
+                    self._put(sheet, row, 7, payment.get('method', ''))                 # {mode_of_pay}
+                    self._put(sheet, row, 8, format_currency(payment.get('remaining', ''), symbol='Rs.'))  # {remaining_amount}
+                    self._put(sheet, row, 10, payment.get('note', ''))                  # {note}
+                    self._put(sheet, row, 11, payment.get('status', ''))                # {invoice_status}
         except Exception as e:
             print(f"Error updating payment history: {e}")
+
+def generate_excel_invoice(invoice_data, save_path=None):
+    """
+    Generate an Excel invoice based on the shop_bill.xlsx template
+    
+    Args:
+        invoice_data: Dictionary containing invoice details
+        save_path: Path to save the Excel file
+        
+    Returns:
+        bool: True if successful, False otherwise
+        or
+        bytes: Excel data if save_path is None
+    """
+    try:
+        # excel_template() raises ImportError if openpyxl is not installed
+        template_path = EXCEL_TEMPLATE_PATH
+        if not os.path.exists(template_path):
+            print(f"Error: Template file {template_path} not found")
+            return False
+            
+        # Clone the parsed template and fill it in
+        template = excel_template(template_path)
+        wb = template.new_workbook()
+        template.fill(wb.active, invoice_data)
         
         # Save the workbook
         if save_path:
@@ -1256,7 +1220,7 @@ def generate_excel_invoice(invoice_data, save_path=None):
             return True
         else:
             # Return the Excel as bytes
-            excel_buffer = BytesIO()
+            excel_buffer = io.BytesIO()
             wb.save(excel_buffer)
             excel_data = excel_buffer.getvalue()
             excel_buffer.close()
@@ -1268,6 +1232,74 @@ def generate_excel_invoice(invoice_data, save_path=None):
         traceback.print_exc()
         return False
 
+def excel_sheet_title(invoice_number, used):
+    """A unique worksheet title for an invoice; Excel allows 31 characters and no []:*?/\\"""
+    title = str(invoice_number or "Invoice")
+    for char in '[]:*?/\\':
+        title = title.replace(char, '-')
+    title = title[:31]
+    candidate, n = title, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate, n = title[:31 - len(suffix)] + suffix, n + 1
+    used.add(candidate.lower())
+    return candidate
+
+def generate_excel_invoices(invoices, save_path, one_workbook=True):
+    """
+    Write many Excel invoices from a single parse of the template
+    
+    Args:
+        invoices: Iterable of invoice data dictionaries
+        save_path: Workbook file when one_workbook is set, otherwise the
+            directory for one file per invoice
+        one_workbook: One sheet per invoice in a single workbook, named after
+            the invoice number, instead of separate files
+        
+    Returns:
+        list: Paths of the files written; empty if nothing could be written
+    """
+    try:
+        # excel_template() raises ImportError if openpyxl is not installed
+        template_path = EXCEL_TEMPLATE_PATH
+        if not os.path.exists(template_path):
+            print(f"Error: Template file {template_path} not found")
+            return []
+        template = excel_template(template_path)
+        
+        if one_workbook:
+            wb = template.new_workbook()
+            prototype = wb.active
+            titles = set()
+            for invoice_data in invoices:
+                sheet = wb.copy_worksheet(prototype)
+                sheet.title = excel_sheet_title(invoice_data.get('invoice_number'), titles)
+                template.fill(sheet, invoice_data)
+            if not titles:
+                return []
+            wb.remove(prototype)
+            os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+            wb.save(save_path)
+            return [save_path]
+        
+        os.makedirs(save_path, exist_ok=True)
+        paths = []
+        names = set()
+        for invoice_data in invoices:
+            file_name = excel_sheet_title(invoice_data.get('invoice_number'), names)
+            path = os.path.join(save_path, f"{file_name}.xlsx")
+            wb = template.new_workbook()
+            template.fill(wb.active, invoice_data)
+            wb.save(path)
+            paths.append(path)
+        return paths
+        
+    except Exception as e:
+        print(f"Error generating Excel invoices: {e}")
+        import traceback
+        traceback.print_exc()
+        return []
+
 def generate_default_template(invoice_data, pdf_buffer):
     """
     Generate a PDF invoice based on the default template
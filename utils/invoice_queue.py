@@ -0,0 +1,124 @@
+"""
+Invoice render queue for POS system
+Renders invoice files on worker threads so checkout never waits for a PDF
+"""
+
+import os
+import platform
+import queue
+import subprocess
+import threading
+
+def open_file(path, action="open"):
+    """
+    Open or print a file with the system's default application, without waiting for it
+
+    Args:
+        path: File to open
+        action: "open" or "print"
+    """
+    system = platform.system()
+    if system == 'Windows':
+        os.startfile(path, "print" if action == "print" else "open")
+    elif action == "print":
+        subprocess.Popen(['lpr', path])
+    elif system == 'Darwin':  # macOS
+        subprocess.Popen(['open', path])
+    else:  # Linux
+        subprocess.Popen(['xdg-open', path])
+
+class InvoiceRenderQueue:
+    """Renders (invoice_id, template) jobs on background threads
+
+    Each template name maps to a renderer, a callable taking (db, invoice_id)
+    that writes the invoice file and returns its path; it runs on a worker
+    thread, so it must not touch Tk widgets. Once a file is written its path
+    is stored in invoices.file_path, for the templates named in store (all of
+    them by default), so a receipt does not replace the PDF the sales
+    history opens. Results are handed back through poll(),
+    which the UI calls from an after() loop, so callbacks run on the Tk thread.
+    Workers use their own pooled database connections.
+    """
+
+    def __init__(self, db, renderers, workers=1, store=None):
+        self.db = db
+        self.renderers = dict(renderers)
+        self.store = set(self.renderers if store is None else store)
+        self.workers = workers
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._threads = []
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Jobs submitted whose result has not been picked up by poll() yet"""
+        with self._lock:
+            return self._pending
+
+    def submit(self, invoice_id, template="pdf", on_done=None):
+        """
+        Queue an invoice for rendering and return immediately
+
+        Args:
+            invoice_id: Invoice to render
+            template: Name of a registered renderer
+            on_done: Called from poll() as on_done(invoice_id, path, error);
+                path is None and error is the exception if rendering failed
+        """
+        if template not in self.renderers:
+            raise ValueError(f"Unknown invoice template: {template}")
+        with self._lock:
+            self._pending += 1
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"invoice-render-{len(self._threads) + 1}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        self._jobs.put((invoice_id, template, on_done))
+
+    def poll(self):
+        """Run the callbacks of finished jobs on the calling thread; returns how many finished"""
+        finished = 0
+        while True:
+            try:
+                invoice_id, path, error, on_done = self._results.get_nowait()
+            except queue.Empty:
+                return finished
+            with self._lock:
+                self._pending -= 1
+            finished += 1
+            if on_done:
+                on_done(invoice_id, path, error)
+
+    def stop(self, timeout=10):
+        """Finish queued jobs, then stop the workers"""
+        with self._lock:
+            threads = list(self._threads)
+            self._threads = []
+        for _ in threads:
+            self._jobs.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _work(self):
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                invoice_id, template, on_done = job
+                path = error = None
+                try:
+                    path = self.renderers[template](self.db, invoice_id)
+                    if template in self.store:
+                        with self.db.transaction():
+                            self.db.execute("UPDATE invoices SET file_path = ? WHERE id = ?", (path, invoice_id))
+                except Exception as e:
+                    print(f"Invoice render error for invoice {invoice_id}: {e}")
+                    path, error = None, e
+                self._results.put((invoice_id, path, error, on_done))
+        finally:
+            self.db.release_connection()
@@ -0,0 +1,287 @@
+"""
+Invoice regeneration for POS system
+Rebuilds missing invoice PDFs, one at a time or in bulk on a process pool,
+and exports invoices for a date range to one PDF or to Excel
+"""
+
+import contextlib
+import datetime
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.helpers import date_range_clause
+from utils.invoice_cache import configure_output_cache, output_cache
+from utils.invoice_store import INVOICES_DIR, invoice_store
+
+# Regenerated paths are written back to invoices.file_path in batches of this size
+STORE_BATCH = 200
+
+def invoice_file_path(db, invoice_number, invoices_dir=INVOICES_DIR, timestamp=True, invoice_date=None):
+    """
+    Path for a regenerated invoice PDF
+
+    Args:
+        db: Database handler, for the invoice prefix setting
+        invoice_number: Invoice number, e.g. "24-25/ABC-001"
+        invoices_dir: Invoice store the PDF goes in
+        timestamp: Add the current time to the name; bulk regeneration leaves
+            it off so a re-run finds the files an interrupted run wrote
+        invoice_date: Invoice date, for the store's month folder
+    """
+    # Clean the invoice number to make a valid filename
+    safe_invoice_number = invoice_number.replace('/', '-').replace('\\', '-').replace(':', '-')
+
+    # Get invoice prefix from the number (format like "24-25/ABC-001")
+    original_invoice_parts = invoice_number.split('/')
+    if len(original_invoice_parts) > 1:
+        # Extract prefix from original invoice number (e.g., "ABC" from "24-25/ABC-001")
+        prefix_part = original_invoice_parts[1].split('-')[0]
+    else:
+        # Fallback to invoice prefix from settings
+        settings_row = db.fetchone("SELECT value FROM settings WHERE key = 'invoice_prefix'")
+        prefix_part = settings_row[0] if settings_row and settings_row[0] else "INV"
+
+    if timestamp:
+        invoice_filename = f"{prefix_part}_{safe_invoice_number}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+    else:
+        invoice_filename = f"{prefix_part}_{safe_invoice_number}.pdf"
+    return invoice_store(invoices_dir).path_for(invoice_filename, invoice_date)
+
+def regenerate_invoice(db, invoice_id, invoices_dir=INVOICES_DIR, timestamp=True):
+    """
+    Rebuild one invoice PDF from the database
+
+    The caller stores the returned path in invoices.file_path. Without a
+    timestamp, an existing file of the same name is reused, even from a
+    packed month, and a new one is written under a temporary name first so
+    an interrupted run never leaves a half-written PDF behind.
+
+    Returns:
+        str: Path of the PDF, or None if it could not be generated
+
+    Raises:
+        LookupError: If the invoice does not exist or has no items
+    """
+    # Import the specialized PDF invoice generator
+    from utils.pdf_invoice_generator import generate_invoice
+
+    invoice_data = db.invoice_assembler.assemble(invoice_id)
+
+    file_path = invoice_file_path(db, invoice_data['invoice_number'], invoices_dir, timestamp,
+                                  invoice_data.get('date'))
+    if not timestamp and invoice_store(invoices_dir).exists(file_path):
+        return file_path
+
+    temp_path = f"{file_path}.{os.getpid()}.part"
+    if not generate_invoice(invoice_data, temp_path) or not os.path.exists(temp_path):
+        print(f"Invoice regeneration failed for invoice {invoice_id}")
+        return None
+    os.replace(temp_path, file_path)
+    return file_path
+
+def select_invoices(db, start_date=None, end_date=None):
+    """
+    (id, invoice_number, file_path) of invoices dated start_date to end_date, oldest first
+
+    Without a start_date every invoice is selected; end_date defaults to start_date.
+    """
+    query = "SELECT id, invoice_number, file_path FROM invoices"
+    params = []
+    if start_date:
+        date_clause, params = date_range_clause("invoice_date", start_date, end_date)
+        query += f" WHERE {date_clause}"
+    return db.fetchall(query + " ORDER BY invoice_date, id", params)
+
+def file_missing(file_path, invoices_dir=INVOICES_DIR):
+    """True if an invoice has no file, or its file is gone from disk and from its month's pack"""
+    return not invoice_store(invoices_dir).exists(file_path)
+
+# Process pool workers open their own database handler once, in _init_worker
+_worker = {}
+
+def _init_worker(db_path, invoices_dir, cache_dir, cache_max_bytes):
+    from database.db_handler import DBHandler
+    _worker["db"] = DBHandler(db_path)
+    _worker["invoices_dir"] = invoices_dir
+    # Same output cache as the parent process, or none if it is turned off
+    configure_output_cache(cache_dir, cache_max_bytes)
+
+def _regenerate_in_worker(invoice_id):
+    # The generators print diagnostics for every invoice; keep them out of the console
+    with contextlib.redirect_stdout(io.StringIO()):
+        return regenerate_invoice(_worker["db"], invoice_id, _worker["invoices_dir"], timestamp=False)
+
+def regenerate_missing(db, start_date=None, end_date=None, workers=None, invoices_dir=INVOICES_DIR,
+                       progress=None, cancel=None):
+    """
+    Regenerate every missing invoice PDF in a date range on a pool of processes
+
+    Invoices whose file is still on disk are skipped, and each regenerated
+    path is stored as soon as its batch completes, so an interrupted run can
+    simply be started again.
+
+    Args:
+        db: Database handler; only this process writes to the database
+        start_date, end_date: Date range as for select_invoices(); None for all invoices
+        workers: Number of processes (default: one per CPU core)
+        invoices_dir: Directory for the regenerated PDFs
+        progress: Called as progress(done, total) after each invoice
+        cancel: Optional threading.Event; once set, queued invoices are dropped
+
+    Returns:
+        dict: selected, skipped, regenerated, failed (list of (invoice_id,
+        invoice_number, error)), cancelled and elapsed seconds
+    """
+    start = time.perf_counter()
+    rows = select_invoices(db, start_date, end_date)
+    missing = {invoice_id: invoice_number for invoice_id, invoice_number, file_path in rows
+               if file_missing(file_path, invoices_dir)}
+    summary = {
+        "selected": len(rows),
+        "skipped": len(rows) - len(missing),
+        "regenerated": 0,
+        "failed": [],
+        "cancelled": False,
+        "elapsed": 0.0,
+    }
+    if progress:
+        progress(0, len(missing))
+
+    if missing:
+        done = 0
+        paths = []
+        cache = output_cache()
+        cache_args = (cache.directory, cache.max_bytes) if cache else (None, 0)
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(missing)),
+                                 initializer=_init_worker,
+                                 initargs=(db.db_path, invoices_dir) + cache_args) as pool:
+            futures = {pool.submit(_regenerate_in_worker, invoice_id): invoice_id for invoice_id in missing}
+            for future in as_completed(futures):
+                invoice_id = futures[future]
+                try:
+                    file_path = future.result()
+                    error = None if file_path else "Invoice data could not be rendered"
+                except Exception as e:
+                    file_path, error = None, str(e)
+
+                if file_path:
+                    paths.append({"id": invoice_id, "file_path": file_path})
+                    summary["regenerated"] += 1
+                else:
+                    summary["failed"].append((invoice_id, missing[invoice_id], error))
+                if len(paths) >= STORE_BATCH:
+                    db.update_many("invoices", paths)
+                    paths = []
+
+                done += 1
+                if progress:
+                    progress(done, len(missing))
+                if cancel is not None and cancel.is_set():
+                    summary["cancelled"] = True
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    break
+        db.update_many("invoices", paths)
+
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+def format_summary(summary):
+    """One line per figure of a regenerate_missing() summary, for dialogs and the console"""
+    lines = [
+        f"Invoices in range: {summary['selected']}",
+        f"Already present: {summary['skipped']}",
+        f"Regenerated: {summary['regenerated']}",
+        f"Failed: {len(summary['failed'])}",
+        f"Time taken: {summary['elapsed']:.1f} s",
+    ]
+    if summary["cancelled"]:
+        lines.append("Stopped before finishing - run again to continue")
+    for invoice_id, invoice_number, error in summary["failed"][:10]:
+        lines.append(f"  {invoice_number or invoice_id}: {error}")
+    if len(summary["failed"]) > 10:
+        lines.append(f"  ... and {len(summary['failed']) - 10} more")
+    return "\n".join(lines)
+
+def export_excel(db, start_date=None, end_date=None, save_path="invoices.xlsx", one_workbook=True):
+    """
+    Export the invoices dated start_date to end_date to Excel
+
+    The template is parsed once for the whole export (see
+    utils.invoice_generator.generate_excel_invoices). Invoices that cannot be
+    assembled, such as ones without items, are left out.
+
+    Args:
+        db: Database handler
+        start_date, end_date: Date range as for select_invoices(); None for all invoices
+        save_path: Workbook with one sheet per invoice, or with one_workbook
+            unset, the directory for one file per invoice
+        one_workbook: Write a single workbook rather than a file per invoice
+
+    Returns:
+        dict: selected, exported, paths (files written) and failed (list of
+        (invoice_id, invoice_number, error) for invoices left out)
+    """
+    from utils.invoice_generator import generate_excel_invoices
+
+    rows = select_invoices(db, start_date, end_date)
+    invoices = []
+    failed = []
+    for invoice_id, invoice_number, _ in rows:
+        try:
+            invoices.append(db.invoice_assembler.assemble(invoice_id))
+        except LookupError as e:
+            failed.append((invoice_id, invoice_number, str(e)))
+    paths = generate_excel_invoices(invoices, save_path, one_workbook) if invoices else []
+    return {
+        "selected": len(rows),
+        "exported": len(invoices) if paths else 0,
+        "paths": paths,
+        "failed": failed,
+    }
+
+def export_pdf(db, start_date=None, end_date=None, save_path="invoices.pdf", split_pages=None):
+    """
+    Export the invoices dated start_date to end_date to a single PDF
+
+    Invoices are read and laid out one at a time (see
+    utils.pdf_invoice_generator.generate_merged_invoices), but the finished
+    pages of a file are held until it is closed, so memory grows with the
+    pages per file; pass split_pages to keep it bounded for long ranges.
+    Invoices that cannot be assembled, such as ones without items, are left
+    out.
+
+    Args:
+        db: Database handler
+        start_date, end_date: Date range as for select_invoices(); None for all invoices
+        save_path: PDF to write
+        split_pages: Start a new file once one has this many pages
+
+    Returns:
+        dict: selected, exported, paths (files written) and failed (list of
+        (invoice_id, invoice_number, error) for invoices left out)
+    """
+    from utils.pdf_invoice_generator import generate_merged_invoices
+
+    rows = select_invoices(db, start_date, end_date)
+    failed = []
+    exported = [0]
+
+    def invoices():
+        for invoice_id, invoice_number, _ in rows:
+            try:
+                invoice_data = db.invoice_assembler.assemble(invoice_id)
+            except LookupError as e:
+                failed.append((invoice_id, invoice_number, str(e)))
+                continue
+            exported[0] += 1
+            yield invoice_data
+
+    paths = generate_merged_invoices(invoices(), save_path, split_pages)
+    return {
+        "selected": len(rows),
+        "exported": exported[0] if paths else 0,
+        "paths": paths,
+        "failed": failed,
+    }
@@ -0,0 +1,308 @@
+"""
+Invoice file store for POS system
+Keeps invoice files in financial year/month folders and packs closed months
+into zip archives, extracting from them on demand
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import threading
+import zipfile
+
+from utils.helpers import financial_year
+
+INVOICES_DIR = os.path.join('.', 'invoices')
+
+# Packed invoices are extracted here when they are opened or printed
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'pos_invoice_cache')
+
+# Member of every pack listing the invoices in it
+PACK_INDEX = "index.json"
+
+# Legacy flat files are moved into month folders in batches of this size
+MOVE_BATCH = 200
+
+def invoice_month(invoice_date=None):
+    """
+    Financial year and month folder names for an invoice date,
+    e.g. 2025-02-10 -> ("24-25", "2025-02")
+
+    Args:
+        invoice_date: date/datetime, "YYYY-MM-DD[ HH:MM:SS]" as stored in
+            invoices.invoice_date, or "DD/MM/YYYY" / "DD-MM-YYYY" as printed;
+            today if missing or unreadable
+    """
+    when = invoice_date
+    if isinstance(when, str):
+        for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+            try:
+                when = datetime.datetime.strptime(invoice_date.strip()[:10], fmt)
+                break
+            except ValueError:
+                continue
+    if not isinstance(when, datetime.date):
+        when = datetime.date.today()
+    return financial_year(when), f"{when.year:04d}-{when.month:02d}"
+
+class InvoiceStore:
+    """Invoice files sharded by financial year and month
+
+    Files live at <root>/<FY>/<YYYY-MM>/<name>, e.g.
+    invoices/24-25/2025-02/AGT_24-25-AGT-101.pdf, and that path is what
+    invoices.file_path holds. pack_closed_months() moves each finished month
+    into <root>/<FY>/<YYYY-MM>.zip with an index of its invoices; the stored
+    paths do not change. locate() returns a readable file for a stored path,
+    extracting it from its month's pack into a cache folder if it has been
+    packed, so callers never need to know whether a month is packed.
+
+    Pack indexes are read once and kept in memory, so checking whether an
+    invoice exists never lists a directory or opens an archive twice.
+    """
+
+    def __init__(self, root=INVOICES_DIR, cache_dir=CACHE_DIR):
+        self.root = root
+        self.cache_dir = cache_dir
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def month_dir(self, invoice_date=None):
+        """Folder for invoices dated invoice_date"""
+        return os.path.join(self.root, *invoice_month(invoice_date))
+
+    def path_for(self, file_name, invoice_date=None):
+        """Path to write a new invoice file to; its month folder is created"""
+        month_dir = self.month_dir(invoice_date)
+        os.makedirs(month_dir, exist_ok=True)
+        return os.path.join(month_dir, file_name)
+
+    def _shard(self, file_path):
+        """(FY, month, name) of a path inside the store, or None"""
+        try:
+            relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.root))
+        except ValueError:  # another drive on Windows
+            return None
+        parts = relative.split(os.sep)
+        if len(parts) != 3 or parts[0] == os.pardir:
+            return None
+        return tuple(parts)
+
+    def pack_path(self, fy, month):
+        return os.path.join(self.root, fy, f"{month}.zip")
+
+    def pack_index(self, pack_path):
+        """{name: size} of the invoices in a pack; empty if there is no pack"""
+        try:
+            stat = os.stat(pack_path)
+        except OSError:
+            return {}
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._indexes.get(pack_path)
+            if cached and cached[0] == version:
+                return cached[1]
+        with zipfile.ZipFile(pack_path) as pack:
+            try:
+                index = json.loads(pack.read(PACK_INDEX))
+            except KeyError:
+                index = {info.filename: info.file_size for info in pack.infolist()}
+        with self._lock:
+            self._indexes[pack_path] = (version, index)
+        return index
+
+    def exists(self, file_path):
+        """True if the file is on disk or in its month's pack; nothing is extracted"""
+        if not file_path:
+            return False
+        if os.path.isfile(file_path):
+            return True
+        shard = self._shard(file_path)
+        return bool(shard) and shard[2] in self.pack_index(self.pack_path(shard[0], shard[1]))
+
+    def locate(self, file_path):
+        """
+        A readable path for a stored invoice file
+
+        Returns the file itself if it is on disk, otherwise its copy in the
+        cache folder, extracted from the month's pack if needed.
+
+        Returns:
+            str: Path to open or print, or None if the invoice has no file
+        """
+        if not file_path:
+            return None
+        if os.path.isfile(file_path):
+            return file_path
+        shard = self._shard(file_path)
+        if not shard:
+            return None
+        fy, month, name = shard
+        pack_path = self.pack_path(fy, month)
+        index = self.pack_index(pack_path)
+        if name not in index:
+            return None
+
+        cached = os.path.join(self.cache_dir, fy, month, name)
+        if os.path.isfile(cached) and os.path.getsize(cached) == index[name]:
+            return cached
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temp_path = f"{cached}.{os.getpid()}.{threading.get_ident()}.part"
+        with zipfile.ZipFile(pack_path) as pack, pack.open(name) as source, open(temp_path, "wb") as target:
+            while True:
+                chunk = source.read(1 << 16)
+                if not chunk:
+                    break
+                target.write(chunk)
+        os.replace(temp_path, cached)
+        return cached
+
+    def open_months(self):
+        """(FY, month) of every month folder, oldest first"""
+        months = []
+        if not os.path.isdir(self.root):
+            return months
+        for fy in os.listdir(self.root):
+            fy_dir = os.path.join(self.root, fy)
+            if not os.path.isdir(fy_dir):
+                continue
+            for month in os.listdir(fy_dir):
+                if os.path.isdir(os.path.join(fy_dir, month)):
+                    months.append((fy, month))
+        return sorted(months, key=lambda shard: shard[1])
+
+    def pack_month(self, fy, month):
+        """
+        Pack a month folder into its zip archive and remove the packed files
+
+        Files are added to an existing pack for the month, such as invoices
+        regenerated after it was packed. The archive is written under a
+        temporary name and renamed before any file is removed, so an
+        interrupted run loses nothing. A file is only removed if it is
+        unchanged since it was read into the pack; one rewritten meanwhile,
+        e.g. by a bulk regeneration, stays in the folder for the next run.
+
+        Returns:
+            int: Number of files packed
+        """
+        month_dir = os.path.join(self.root, fy, month)
+        names = sorted(name for name in os.listdir(month_dir)
+                       if not name.endswith(".part") and os.path.isfile(os.path.join(month_dir, name)))
+        if not names:
+            self._remove_empty(month_dir)
+            return 0
+
+        pack_path = self.pack_path(fy, month)
+        temp_path = f"{pack_path}.part"
+        index = {}
+        packed = {}
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as pack:
+            if os.path.isfile(pack_path):
+                with zipfile.ZipFile(pack_path) as old_pack:
+                    for info in old_pack.infolist():
+                        if info.filename != PACK_INDEX and info.filename not in names:
+                            with old_pack.open(info) as source:
+                                pack.writestr(info, source.read())
+                            index[info.filename] = info.file_size
+            for name in names:
+                path = os.path.join(month_dir, name)
+                # Stat before reading, so a write that lands while the file is read is noticed
+                packed[name] = self._version(path)
+                with open(path, "rb") as source:
+                    data = source.read()
+                pack.writestr(zipfile.ZipInfo.from_file(path, name), data, zipfile.ZIP_DEFLATED)
+                index[name] = len(data)
+            pack.writestr(PACK_INDEX, json.dumps(index, indent=1, sort_keys=True))
+        os.replace(temp_path, pack_path)
+
+        for name, version in packed.items():
+            path = os.path.join(month_dir, name)
+            if self._version(path) == version:
+                os.remove(path)
+        self._remove_empty(month_dir)
+        return len(names)
+
+    @staticmethod
+    def _version(path):
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def pack_closed_months(self, today=None, keep_months=1):
+        """
+        Pack every month folder older than the last keep_months months
+
+        Args:
+            today: Date to count from (default: today)
+            keep_months: Months left as folders, counting the current one
+
+        Returns:
+            dict: months (packed, as "FY/YYYY-MM") and files
+        """
+        today = today or datetime.date.today()
+        index = today.year * 12 + today.month - 1 - (keep_months - 1)
+        first_open = f"{index // 12:04d}-{index % 12 + 1:02d}"
+        summary = {"months": [], "files": 0}
+        for fy, month in self.open_months():
+            if month < first_open:
+                summary["files"] += self.pack_month(fy, month)
+                summary["months"].append(f"{fy}/{month}")
+        return summary
+
+    def shard_existing(self, db):
+        """
+        Move invoice files from the top of the store into their month folders
+
+        Files written before the store was sharded sit directly in the
+        invoices folder; each is moved by its invoice date and
+        invoices.file_path updated to match. Rows are written in batches,
+        so a run stopped part-way can leave rows pointing at files that
+        were already moved; the next run finds those in their month folder
+        (or its pack) and repairs the rows.
+
+        Returns:
+            int: Number of files moved or rows repaired
+        """
+        root = os.path.abspath(self.root)
+        moved = []
+        count = 0
+        for invoice_id, file_path, invoice_date in db.fetchall(
+                "SELECT id, file_path, invoice_date FROM invoices WHERE file_path IS NOT NULL AND file_path != ''"):
+            if os.path.dirname(os.path.abspath(file_path)) != root:
+                continue
+            name = os.path.basename(file_path)
+            if os.path.isfile(file_path):
+                new_path = self.path_for(name, invoice_date)
+                os.replace(file_path, new_path)
+            else:
+                new_path = os.path.join(self.month_dir(invoice_date), name)
+                if not self.exists(new_path):
+                    continue
+            moved.append({"id": invoice_id, "file_path": new_path})
+            count += 1
+            if len(moved) >= MOVE_BATCH:
+                db.update_many("invoices", moved)
+                moved = []
+        db.update_many("invoices", moved)
+        return count
+
+    @staticmethod
+    def _remove_empty(month_dir):
+        try:
+            os.rmdir(month_dir)
+        except OSError:
+            pass  # files written after packing started stay for the next run
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def invoice_store(root=INVOICES_DIR):
+    """The shared store for an invoices folder"""
+    key = os.path.abspath(root)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = InvoiceStore(root)
+        return _stores[key]
+
+def locate_invoice(file_path):
+    """A readable path for a stored invoice file, see InvoiceStore.locate()"""
+    return invoice_store().locate(file_path)
@@ -0,0 +1,41 @@
+"""
+Compiled invoice templates for POS system
+Keeps one compiled template per (template name, shop settings version)
+"""
+
+import threading
+
+_templates = {}
+_lock = threading.Lock()
+
+def settings_version(store_info):
+    """A hashable version of the shop settings a template was compiled from"""
+    return tuple(sorted((str(key), str(value)) for key, value in (store_info or {}).items()))
+
+def compiled_template(name, store_info, compile):
+    """
+    Get the template compiled for the current shop settings, compiling it on first use
+
+    Args:
+        name: Template name, unique across generators
+        store_info: Shop settings the template depends on
+        compile: Called as compile(store_info) to build the template
+
+    Returns:
+        The compiled template; it is rebuilt whenever store_info changes
+    """
+    version = settings_version(store_info)
+    with _lock:
+        cached = _templates.get(name)
+        if cached and cached[0] == version:
+            return cached[1]
+    # Compile outside the lock; if two threads race, the last one wins
+    template = compile(dict(store_info or {}))
+    with _lock:
+        _templates[name] = (version, template)
+    return template
+
+def clear_template_cache():
+    """Forget every compiled template, e.g. after fonts or images are replaced"""
+    with _lock:
+        _templates.clear()
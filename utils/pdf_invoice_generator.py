@@ -3,6 +3,7 @@ PDF Invoice Generator for POS system
 Generates invoices matching exactly the shop_bill.pdf template
 """
 
+import threading
 import os
 import datetime
 import io
@@ -10,12 +11,14 @@ import platform
 import subprocess
 from decimal import Decimal
 from utils.helpers import format_currency, num_to_words_indian
+from utils.invoice_cache import output_cache, payload_key
+from utils.invoice_templates import compiled_template
 
 # Import ReportLab for PDF generation
 try:
     from reportlab.lib.pagesizes import A4, landscape
     from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, Frame, PageTemplate
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, Frame, PageTemplate, PageBreak, NextPageTemplate
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import inch, cm, mm
     from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
@@ -24,6 +27,37 @@ except ImportError:
     print("ReportLab not available - PDF invoice generation will not work")
     REPORTLAB_AVAILABLE = False
 
+# Bump when the shop_bill layout changes, so cached invoices are rendered again
+SHOP_BILL_VERSION = 1
+
+DEFAULT_TERMS = "1. Goods once sold will not be taken back or exchanged.\n2. All disputes are subject to local jurisdiction only."
+
+def read_shop_settings(invoice_data):
+    """Every row of the settings table as a dict, or the invoice's store_info if it cannot be read"""
+    try:
+        import sqlite3
+        conn = sqlite3.connect('./pos_data.db')
+        conn.row_factory = sqlite3.Row  # Set row factory to access by column name
+        cursor = conn.cursor()
+        
+        # Query the settings table for shop information using the correct column names (key, value)
+        cursor.execute("SELECT key, value FROM settings")
+        
+        # Create a dictionary from all settings
+        store_info = {}
+        for row in cursor.fetchall():
+            store_info[row['key']] = row['value']
+        
+        # Close the database connection
+        conn.close()
+            
+    except Exception as e:
+        print(f"Error fetching shop info from database: {e}")
+        # Fall back to the provided store_info
+        store_info = invoice_data.get('store_info', {})
+        print("Using fallback store_info from invoice_data due to error")
+    return store_info
+
 def generate_invoice(invoice_data, save_path):
     """
     Generate a PDF invoice that exactly matches the shop_bill.pdf template
@@ -43,15 +77,188 @@ def generate_invoice(invoice_data, save_path):
         # Ensure the directory exists
         os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
         
-        # Create the PDF document in landscape orientation
-        doc = SimpleDocTemplate(
-            save_path,
-            pagesize=landscape(A4),  # Use landscape orientation
-            rightMargin=0.5*cm,
-            leftMargin=0.5*cm,
-            topMargin=0.5*cm,
-            bottomMargin=0.5*cm
-        )
+        # Invoice data from database.invoice_assembler carries everything the
+        # layout prints, shop settings included, so its hash identifies the
+        # output and an unchanged invoice is copied from the output cache
+        cache = output_cache() if 'settings' in invoice_data else None
+        if cache is not None:
+            key = payload_key(invoice_data, "pdf_invoice_generator.shop_bill", SHOP_BILL_VERSION)
+            if cache.fetch(key, save_path):
+                return True
+        
+        if 'settings' in invoice_data:
+            # Settings snapshot from database.invoice_assembler
+            store_info = invoice_data['settings']
+        else:
+            store_info = read_shop_settings(invoice_data)
+        
+        # Styles and the shop's static tables are compiled once per settings version
+        template = compiled_template("pdf_invoice_generator.shop_bill", store_info, ShopBillTemplate)
+        template.render(invoice_data, save_path)
+        
+        if cache is not None:
+            try:
+                cache.store(key, save_path)
+            except OSError as e:
+                print(f"Error caching invoice: {e}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"Error generating invoice: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def merged_part_path(save_path, part):
+    """File name of one part of a split merged export, e.g. april-002.pdf"""
+    root, ext = os.path.splitext(save_path)
+    return f"{root}-{part:03d}{ext or '.pdf'}"
+
+def generate_merged_invoices(invoices, save_path, split_pages=None):
+    """
+    Write many invoices into one PDF in the shop_bill layout, page by page
+    
+    Invoice data and flowables are streamed one invoice at a time, and
+    invoices may be a generator. Finished pages are not: ReportLab keeps
+    every page of a file until the file is closed, so memory grows with the
+    pages in one output file. split_pages is how to bound it: a file is
+    closed once it has that many pages and the next invoice starts a new
+    one (save_path-001.pdf, save_path-002.pdf, ...). Each invoice starts on
+    a new page and is never split across files.
+    
+    Args:
+        invoices: Iterable of invoice data dictionaries
+        save_path: PDF to write
+        split_pages: Pages per file, or None for a single file
+        
+    Returns:
+        list: Paths of the files written; empty if there were no invoices
+        or the export failed, in which case no files are left behind
+    """
+    if not REPORTLAB_AVAILABLE:
+        print("Error: ReportLab library is not available. PDF invoice generation not possible.")
+        return []
+    
+    paths = []
+    writer = None
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+        for invoice_data in invoices:
+            if writer is None:
+                store_info = invoice_data['settings'] if 'settings' in invoice_data else read_shop_settings(invoice_data)
+                template = compiled_template("pdf_invoice_generator.shop_bill", store_info, ShopBillTemplate)
+                writer = MergedInvoiceWriter(template)
+            elif split_pages and writer.pages >= split_pages:
+                paths.append(writer.close())
+            if not writer.is_open:
+                writer.open(merged_part_path(save_path, len(paths) + 1) if split_pages else save_path)
+            writer.add(invoice_data)
+        if writer is not None and writer.is_open:
+            paths.append(writer.close())
+        if len(paths) == 1 and split_pages:
+            # Everything fitted in one part; keep the name asked for
+            os.replace(paths[0], save_path)
+            paths = [save_path]
+        return paths
+        
+    except Exception as e:
+        print(f"Error generating merged invoices: {e}")
+        import traceback
+        traceback.print_exc()
+        if writer is not None:
+            writer.abort()
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return []
+
+class MergedInvoiceWriter:
+    """One output file of a merged export, built an invoice at a time
+
+    This drives ReportLab's document build step by step (what
+    SimpleDocTemplate.build does for a single list of flowables), feeding
+    each invoice's flowables as it comes. The file is written under a
+    temporary name and renamed by close(). The template is locked while a
+    file is open, since its shared flowables are being drawn.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.doc = None
+        self.save_path = None
+
+    @property
+    def is_open(self):
+        return self.doc is not None
+
+    @property
+    def pages(self):
+        """Pages started in the open file"""
+        return self.doc.page if self.doc is not None else 0
+
+    def open(self, save_path):
+        self.template._lock.acquire()
+        try:
+            self.save_path = save_path
+            doc = self.template._document(f"{save_path}.part")
+            # The templates SimpleDocTemplate.build() adds: an invoice's
+            # continuation pages use "Later", without the border
+            frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+            doc.addPageTemplates([PageTemplate(id='First', frames=frame, pagesize=doc.pagesize),
+                                  PageTemplate(id='Later', frames=frame, pagesize=doc.pagesize)])
+            doc._startBuild()
+            doc.canv._doctemplate = doc
+            self.doc = doc
+        except Exception:
+            self.doc = None
+            self.template._lock.release()
+            raise
+
+    def add(self, invoice_data):
+        doc = self.doc
+        flowables = self.template._story(invoice_data, doc)
+        if doc.page:
+            # Each invoice starts on a new page with the bordered template
+            flowables[0:0] = [NextPageTemplate(0), PageBreak()]
+        while flowables:
+            doc.clean_hanging()
+            doc.handle_flowable(flowables)
+
+    def close(self):
+        """Finish the file and return its path"""
+        try:
+            del self.doc.canv._doctemplate
+            self.doc._endBuild()
+            os.replace(f"{self.save_path}.part", self.save_path)
+            return self.save_path
+        finally:
+            self.doc = None
+            self.template._lock.release()
+
+    def abort(self):
+        """Drop the open file, if any"""
+        if self.doc is None:
+            return
+        self.doc = None
+        self.template._lock.release()
+        if os.path.exists(f"{self.save_path}.part"):
+            os.remove(f"{self.save_path}.part")
+
+class ShopBillTemplate:
+    """The shop_bill.pdf layout compiled for one set of shop settings
+
+    Paragraph styles, column widths and every table that depends only on the
+    shop (header, item column headings, tax headings, signature, subject and
+    payment record headings) are built once here; render() fills in the
+    customer, items and totals. Flowables are shared between renders, so
+    renders of one template are serialised.
+    """
+
+    def __init__(self, store_info):
+        self.margin = 0.5*cm
+        self.pagesize = landscape(A4)  # Use landscape orientation
+        self.width = width = self.pagesize[0] - 2*self.margin
         
         # Get styles
         styles = getSampleStyleSheet()
@@ -182,48 +389,15 @@ def generate_invoice(invoice_data, save_path):
             spaceBefore=0
         ))
         
-        # Create elements list to build PDF
-        elements = []
+        # Create right-aligned style for invoice info
+        styles.add(ParagraphStyle(name='InvoiceInfoRight',
+                                 parent=styles['Normal'],
+                                 fontName='Helvetica',
+                                 fontSize=8,
+                                 leading=10,
+                                 alignment=2))  # Right alignment (TA_RIGHT)
         
-        # First try to get shop info from the settings table in the database
-        try:
-            import sqlite3
-            conn = sqlite3.connect('./pos_data.db')
-            conn.row_factory = sqlite3.Row  # Set row factory to access by column name
-            cursor = conn.cursor()
-            
-            # Print all settings first for debugging
-            cursor.execute("SELECT * FROM settings")
-            all_settings = cursor.fetchall()
-            print("All settings in database:")
-            for row in all_settings:
-                print(f"  ID: {row['id']}, Key: {row['key']}, Value: {row['value']}")
-            
-            # Query the settings table for shop information using the correct column names (key, value)
-            cursor.execute("SELECT key, value FROM settings")
-            all_db_settings = cursor.fetchall()
-            print("All retrieved settings:")
-            for row in all_db_settings:
-                print(f"  Key: {row['key']}, Value: {row['value']}")
-            
-            # Create a dictionary from all settings
-            store_info = {}
-            for row in all_db_settings:
-                store_info[row['key']] = row['value']
-            
-            # Close the database connection
-            conn.close()
-            
-            # Print the store info we're using
-            print("Store info being used for invoice:")
-            for key, value in store_info.items():
-                print(f"  {key}: {value}")
-                
-        except Exception as e:
-            print(f"Error fetching shop info from database: {e}")
-            # Fall back to the provided store_info
-            store_info = invoice_data.get('store_info', {})
-            print("Using fallback store_info from invoice_data due to error")
+        self.styles = styles
         
         # Shop information fields - match exactly to the keys in the settings table
         shop_name = store_info.get('shop_name', 'Agritech Products Shop')
@@ -241,6 +415,277 @@ def generate_invoice(invoice_data, save_path):
         state_name = store_info.get('state_name', 'Maharashtra')
         state_code = store_info.get('state_code', '27')
         
+        # ------ HEADER SECTION ------
+        # Shop Name in its own bordered cell
+        shop_name_table = Table(
+            [[Paragraph(f"{shop_name}", styles['ShopName'])]],
+            colWidths=[width],
+            rowHeights=[20]
+        )
+        shop_name_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        
+        # Shop info row
+        shop_info_data = [
+            [
+                Paragraph(f"{shop_address}", styles['ShopInfo']),
+                Paragraph("(Original For Recipeint)", styles['OriginalCopy']),
+                Paragraph(f"GSTIN -        {shop_gst}", styles['RightAligned'])
+            ],
+            [
+                Paragraph(f"State Name: {state_name}, Code : {state_code}", styles['StateName']),
+                Paragraph("", styles['StateName']),
+                Paragraph(f"LAID           {shop_laid_no}", styles['RightAligned'])
+            ],
+            [
+                Paragraph(f"Contact : {shop_phone}", styles['StateName']),
+                Paragraph("", styles['StateName']),
+                Paragraph(f"LCSD           {shop_lcsd_no}", styles['RightAligned'])
+            ],
+            [
+                Paragraph(f"E-mail: {shop_email}", styles['StateName']),
+                Paragraph("", styles['StateName']),
+                Paragraph(f"LFRD           {shop_lfrd_no}", styles['RightAligned'])
+            ]
+        ]
+        
+        shop_info_table = Table(shop_info_data, colWidths=[width*0.4, width*0.3, width*0.3])
+        shop_info_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+            ('SPAN', (0, 0), (0, 0)), # Shop address spans
+        ]))
+        
+        self.shop_name_table = shop_name_table
+        self.shop_info_table = shop_info_table
+        
+        # ------ ITEMS TABLE ------
+        # Prepare column headers
+        items_header_data = [
+            [Paragraph("No", styles['TableHeader']), 
+             Paragraph("Description of Good", styles['TableHeader']), 
+             Paragraph("Company\nname", styles['TableHeader']),
+             Paragraph("HSN", styles['TableHeader']),
+             Paragraph("Batch NO", styles['TableHeader']),
+             Paragraph("Expiry Date", styles['TableHeader']),
+             Paragraph("Qty", styles['TableHeader']),
+             Paragraph("Unit", styles['TableHeader']),
+             Paragraph("Rate", styles['TableHeader']),
+             Paragraph("Disc", styles['TableHeader']),
+             Paragraph("Amount", styles['TableHeader'])]
+        ]
+        
+        # Calculate column widths for items table based on A4 landscape
+        col_widths = [
+            width*0.03,   # No
+            width*0.17,   # Description
+            width*0.13,   # Company name
+            width*0.07,   # HSN
+            width*0.08,   # Batch
+            width*0.1,    # Expiry
+            width*0.06,   # Qty
+            width*0.07,   # Unit
+            width*0.09,   # Rate
+            width*0.08,   # Disc
+            width*0.12    # Amount
+        ]
+        
+        # Create items header table
+        items_header_table = Table(items_header_data, colWidths=col_widths)
+        items_header_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('INNERGRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ]))
+        
+        self.col_widths = col_widths
+        self.items_header_table = items_header_table
+        
+        # ------ TAX AND PAYMENT DETAILS SECTION ------
+        # Create tax table that exactly matches the format shown in the reference image
+        # This table has: Taxable Value | Central Tax (CGST) [Rate|Amount] | State Tax (SGST) [Rate|Amount] | Total Tax Amount
+        
+        # Define paragraphs with explicit style to ensure proper formatting and consistent labels
+        taxable_para = Paragraph("Taxable\nValue", styles['TableHeader'])
+        cgst_para = Paragraph("Central Tax (CGST)", styles['TableHeader'])
+        sgst_para = Paragraph("State Tax (SGST)", styles['TableHeader'])  # Explicitly labeled as State Tax per requirement
+        total_tax_para = Paragraph("Total\nTax Amount", styles['TableHeader'])
+        
+        rate_para = Paragraph("Rate", styles['TableHeader'])
+        amount_para = Paragraph("Amount", styles['TableHeader'])
+        
+        # Create the tax table header as paragraphs with explicit styling
+        tax_table_header = [
+            [taxable_para, cgst_para, sgst_para, total_tax_para],
+            ["", rate_para, amount_para, rate_para, amount_para, ""]
+        ]
+        
+        # Define column widths to match the template exactly
+        tax_col_widths = [
+            width*0.25,      # Taxable value
+            width*0.10,      # CGST rate
+            width*0.15,      # CGST amount
+            width*0.10,      # SGST rate
+            width*0.15,      # SGST amount
+            width*0.25       # Total tax
+        ]
+        
+        # Style for the tax table, whose values change on every invoice
+        tax_table_style = TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('INNERGRID', (0, 0), (-1, -1), 1, colors.black),
+            ('SPAN', (0, 0), (0, 1)),    # Taxable Value header spans 2 rows
+            ('SPAN', (1, 0), (2, 0)),    # Central Tax header spans 2 columns
+            ('SPAN', (3, 0), (4, 0)),    # State Tax header spans 2 columns
+            ('SPAN', (5, 0), (5, 1)),    # Total Tax Amount header spans 2 rows
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),  # Headers centered
+            ('ALIGN', (0, 2), (0, 3), 'RIGHT'),    # Taxable value right aligned
+            ('ALIGN', (1, 2), (1, 3), 'CENTER'),   # CGST rate centered
+            ('ALIGN', (2, 2), (2, 3), 'RIGHT'),    # CGST amount right aligned
+            ('ALIGN', (3, 2), (3, 3), 'CENTER'),   # SGST rate centered
+            ('ALIGN', (4, 2), (4, 3), 'RIGHT'),    # SGST amount right aligned
+            ('ALIGN', (5, 2), (5, 3), 'RIGHT'),    # Total tax right aligned
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),  # Headers in bold
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ])
+        
+        self.tax_table_header = tax_table_header
+        self.tax_col_widths = tax_col_widths
+        self.tax_table_style = tax_table_style
+        
+        # ------ SIGNATURE SECTION ------
+        self.shop_name = shop_name
+        self.signature_table = self._signature_table(DEFAULT_TERMS)
+        
+        # Subject line
+        subject_data = [
+            [Paragraph("SUBJECT TO JURIDICTION", styles['Subject'])]
+        ]
+        
+        subject_table = Table(subject_data, colWidths=[width])
+        subject_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
+        ]))
+        
+        self.subject_table = subject_table
+        
+        # ------ PAYMENT HISTORY SECTION ------
+        payment_history_header = [
+            [Paragraph("Invoice payment Records", styles['PaymentRecordsHeader'])]
+        ]
+        
+        payment_header_table = Table(payment_history_header, colWidths=[width])
+        payment_header_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
+        ]))
+        
+        # Payment records column headers
+        payment_record_headers = [
+            ["Sr.no", "Invoice No", "Amount", "Depositor Name", "Date", "time", "Mode of Pay", "Remaining Amount", "Note", "Invoice Status"]
+        ]
+        
+        payment_col_widths = [
+            width*0.05,   # Sr.no
+            width*0.1,    # Invoice No
+            width*0.1,    # Amount
+            width*0.15,   # Depositor Name
+            width*0.1,    # Date
+            width*0.07,   # time
+            width*0.1,    # Mode of Pay
+            width*0.13,   # Remaining Amount
+            width*0.1,    # Note
+            width*0.1     # Invoice Status
+        ]
+        
+        payment_headers_table = Table(payment_record_headers, colWidths=payment_col_widths)
+        payment_headers_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('INNERGRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ]))
+        
+        self.payment_header_table = payment_header_table
+        self.payment_headers_table = payment_headers_table
+        self.payment_col_widths = payment_col_widths
+        self._lock = threading.Lock()
+
+    def _signature_table(self, terms):
+        """Terms and signature section"""
+        styles = self.styles
+        width = self.width
+        shop_name = self.shop_name
+        
+        signature_data = [
+            [Paragraph("Customer Signature", styles['CustomerInfo']), 
+             Paragraph(terms, styles['Terms']), 
+             Paragraph(f"For                 {shop_name}", styles['RightAligned'])],
+            ["", "", Paragraph("Authorised signatory", styles['RightAligned'])]
+        ]
+        
+        signature_table = Table(signature_data, colWidths=[width*0.25, width*0.5, width*0.25])
+        signature_table.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('SPAN', (1, 0), (1, 1)),  # Terms spans both rows
+        ]))
+        
+        return signature_table
+
+    def render(self, invoice_data, save_path):
+        """Write one invoice to save_path; raises if ReportLab fails"""
+        with self._lock:
+            doc = self._document(save_path)
+            doc.build(self._story(invoice_data, doc))
+
+    def _document(self, save_path):
+        """Landscape A4 document whose single frame draws the invoice border"""
+        doc = SimpleDocTemplate(
+            save_path,
+            pagesize=self.pagesize,
+            rightMargin=self.margin,
+            leftMargin=self.margin,
+            topMargin=self.margin,
+            bottomMargin=self.margin
+        )
+        
+        # Create a single FlowFrame that will contain all the invoice elements
+        invoice_frame = Frame(
+            doc.leftMargin, 
+            doc.bottomMargin, 
+            doc.width, 
+            doc.height - 10,
+            leftPadding=5, 
+            rightPadding=5, 
+            topPadding=5, 
+            bottomPadding=5,
+            showBoundary=1  # This gives us the main border around everything
+        )
+        doc.addPageTemplates([PageTemplate(frames=[invoice_frame])])
+        return doc
+
+    def _story(self, invoice_data, doc):
+        """Flowables for one invoice, laid out for doc"""
+        styles = self.styles
+        col_widths = self.col_widths
+        
         # Extract customer data
         customer_data = invoice_data.get('customer', {})
         invoice_number = invoice_data.get('invoice_number', '')
@@ -322,8 +767,12 @@ def generate_invoice(invoice_data, save_path):
         except (ValueError, TypeError):
             total = 0.0
         
-        # Calculate taxable value (subtotal - discount)
-        taxable_value = subtotal - discount
+        # Taxable value from the cart's GST split (see utils.cart_calculator);
+        # older callers only pass subtotal and discount
+        try:
+            taxable_value = float(payment_data['taxable_value'])
+        except (KeyError, ValueError, TypeError):
+            taxable_value = subtotal - discount
         
         # Calculate outstanding amount based on payment method
         outstanding_amount = 0
@@ -350,61 +799,7 @@ def generate_invoice(invoice_data, save_path):
         # Create the EXACT shop_bill.pdf layout with proper tables and borders
         # -------------------------------------------------------------
         
-        # ------ HEADER SECTION ------
-        # Shop Name in its own bordered cell
-        shop_name_table = Table(
-            [[Paragraph(f"{shop_name}", styles['ShopName'])]],
-            colWidths=[doc.width],
-            rowHeights=[20]
-        )
-        shop_name_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        # Shop info row
-        shop_info_data = [
-            [
-                Paragraph(f"{shop_address}", styles['ShopInfo']),
-                Paragraph("(Original For Recipeint)", styles['OriginalCopy']),
-                Paragraph(f"GSTIN -        {shop_gst}", styles['RightAligned'])
-            ],
-            [
-                Paragraph(f"State Name: {state_name}, Code : {state_code}", styles['StateName']),
-                Paragraph("", styles['StateName']),
-                Paragraph(f"LAID           {shop_laid_no}", styles['RightAligned'])
-            ],
-            [
-                Paragraph(f"Contact : {shop_phone}", styles['StateName']),
-                Paragraph("", styles['StateName']),
-                Paragraph(f"LCSD           {shop_lcsd_no}", styles['RightAligned'])
-            ],
-            [
-                Paragraph(f"E-mail: {shop_email}", styles['StateName']),
-                Paragraph("", styles['StateName']),
-                Paragraph(f"LFRD           {shop_lfrd_no}", styles['RightAligned'])
-            ]
-        ]
-        
-        shop_info_table = Table(shop_info_data, colWidths=[doc.width*0.4, doc.width*0.3, doc.width*0.3])
-        shop_info_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-            ('SPAN', (0, 0), (0, 0)), # Shop address spans
-        ]))
-        
         # ------ CUSTOMER SECTION ------
-        # Create right-aligned style for invoice info
-        styles.add(ParagraphStyle(name='InvoiceInfoRight',
-                                 parent=styles['Normal'],
-                                 fontName='Helvetica',
-                                 fontSize=8,
-                                 leading=10,
-                                 alignment=2))  # Right alignment (TA_RIGHT)
-        
         # Match the sample bill layout exactly as shown in the image
         customer_info_data = [
             [
@@ -437,49 +832,6 @@ def generate_invoice(invoice_data, save_path):
             ('ALIGN', (3, 0), (3, -1), 'RIGHT'),  # Right align all invoice values
         ]))
         
-        # ------ ITEMS TABLE ------
-        # Prepare column headers        
-        items_header_data = [
-            [Paragraph("No", styles['TableHeader']), 
-             Paragraph("Description of Good", styles['TableHeader']), 
-             Paragraph("Company\nname", styles['TableHeader']),
-             Paragraph("HSN", styles['TableHeader']),
-             Paragraph("Batch NO", styles['TableHeader']),
-             Paragraph("Expiry Date", styles['TableHeader']),
-             Paragraph("Qty", styles['TableHeader']),
-             Paragraph("Unit", styles['TableHeader']),
-             Paragraph("Rate", styles['TableHeader']),
-             Paragraph("Disc", styles['TableHeader']),
-             Paragraph("Amount", styles['TableHeader'])]
-        ]
-        
-        # Calculate column widths for items table based on A4 landscape
-        col_widths = [
-            doc.width*0.03,   # No
-            doc.width*0.17,   # Description
-            doc.width*0.13,   # Company name
-            doc.width*0.07,   # HSN
-            doc.width*0.08,   # Batch
-            doc.width*0.1,    # Expiry
-            doc.width*0.06,   # Qty
-            doc.width*0.07,   # Unit
-            doc.width*0.09,   # Rate
-            doc.width*0.08,   # Disc
-            doc.width*0.12    # Amount
-        ]
-        
-        # Create items header table
-        items_header_table = Table(items_header_data, colWidths=col_widths)
-        items_header_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('INNERGRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ]))
-        
         # Add items
         items = invoice_data.get('items', [])
         total_qty = 0
@@ -490,14 +842,11 @@ def generate_invoice(invoice_data, save_path):
         product_ids = []
         
         try:
-            import sqlite3
-            conn = sqlite3.connect('./pos_data.db')
-            cursor = conn.cursor()
-            
-            # Create a list of product_ids to query
+            # Create a list of product_ids to query; items from
+            # database.invoice_assembler already carry their batch
             for item in items:
                 product_id = item.get('product_id', None)
-                if product_id:
+                if product_id and 'batch_no' not in item:
                     product_ids.append(product_id)
                 
                 # If the item already has batch_id, store it for lookup later
@@ -507,6 +856,10 @@ def generate_invoice(invoice_data, save_path):
                     
             # Query batches for these products
             if product_ids:
+                import sqlite3
+                conn = sqlite3.connect('./pos_data.db')
+                cursor = conn.cursor()
+                
                 # Get batch information by product_id for all products in order
                 unique_product_ids = list(set(product_ids))  # Remove duplicates
                 if unique_product_ids:
@@ -534,8 +887,8 @@ def generate_invoice(invoice_data, save_path):
                             'expiry_date': expiry,
                             'unit': unit
                         })
-            
-            conn.close()
+                
+                conn.close()
         except Exception as e:
             print(f"Error fetching batch data from database: {e}")
         
@@ -709,20 +1062,7 @@ def generate_invoice(invoice_data, save_path):
         # Create tax table that exactly matches the format shown in the reference image
         # This table has: Taxable Value | Central Tax (CGST) [Rate|Amount] | State Tax (SGST) [Rate|Amount] | Total Tax Amount
         
-        # Define paragraphs with explicit style to ensure proper formatting and consistent labels
-        taxable_para = Paragraph("Taxable\nValue", styles['TableHeader'])
-        cgst_para = Paragraph("Central Tax (CGST)", styles['TableHeader'])
-        sgst_para = Paragraph("State Tax (SGST)", styles['TableHeader'])  # Explicitly labeled as State Tax per requirement
-        total_tax_para = Paragraph("Total\nTax Amount", styles['TableHeader'])
-        
-        rate_para = Paragraph("Rate", styles['TableHeader'])
-        amount_para = Paragraph("Amount", styles['TableHeader'])
-        
-        # Create the tax table header as paragraphs with explicit styling
-        tax_table_header = [
-            [taxable_para, cgst_para, sgst_para, total_tax_para],
-            ["", rate_para, amount_para, rate_para, amount_para, ""]
-        ]
+        tax_table_header = self.tax_table_header
         
         # Calculate SGST (same as CGST for simplicity)
         sgst_rate = cgst_rate
@@ -739,38 +1079,14 @@ def generate_invoice(invoice_data, save_path):
         ]
         
         # Define column widths to match the template exactly
-        tax_col_widths = [
-            doc.width*0.25,      # Taxable value
-            doc.width*0.10,      # CGST rate
-            doc.width*0.15,      # CGST amount
-            doc.width*0.10,      # SGST rate
-            doc.width*0.15,      # SGST amount
-            doc.width*0.25       # Total tax
-        ]
+        tax_col_widths = self.tax_col_widths
         
         # Combine header and data
         tax_table_content = tax_table_header + tax_table_data
         
         # Create tax table with style exactly matching the sample image
         tax_table = Table(tax_table_content, colWidths=tax_col_widths)
-        tax_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('INNERGRID', (0, 0), (-1, -1), 1, colors.black),
-            ('SPAN', (0, 0), (0, 1)),    # Taxable Value header spans 2 rows
-            ('SPAN', (1, 0), (2, 0)),    # Central Tax header spans 2 columns
-            ('SPAN', (3, 0), (4, 0)),    # State Tax header spans 2 columns
-            ('SPAN', (5, 0), (5, 1)),    # Total Tax Amount header spans 2 rows
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),  # Headers centered
-            ('ALIGN', (0, 2), (0, 3), 'RIGHT'),    # Taxable value right aligned
-            ('ALIGN', (1, 2), (1, 3), 'CENTER'),   # CGST rate centered
-            ('ALIGN', (2, 2), (2, 3), 'RIGHT'),    # CGST amount right aligned
-            ('ALIGN', (3, 2), (3, 3), 'CENTER'),   # SGST rate centered
-            ('ALIGN', (4, 2), (4, 3), 'RIGHT'),    # SGST amount right aligned
-            ('ALIGN', (5, 2), (5, 3), 'RIGHT'),    # Total tax right aligned
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),  # Headers in bold
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ]))
+        tax_table.setStyle(self.tax_table_style)
         
         # Create the payment breakdown section (left side)
         payment_section_data = [
@@ -799,89 +1115,27 @@ def generate_invoice(invoice_data, save_path):
         ]))
         
         # ------ SIGNATURE SECTION ------
-        # Create terms and signature section
-        terms = invoice_data.get('terms', "1. Goods once sold will not be taken back or exchanged.\n2. All disputes are subject to local jurisdiction only.")
-        
-        signature_data = [
-            [Paragraph("Customer Signature", styles['CustomerInfo']), 
-             Paragraph(terms, styles['Terms']), 
-             Paragraph(f"For                 {shop_name}", styles['RightAligned'])],
-            ["", "", Paragraph("Authorised signatory", styles['RightAligned'])]
-        ]
-        
-        signature_table = Table(signature_data, colWidths=[doc.width*0.25, doc.width*0.5, doc.width*0.25])
-        signature_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('SPAN', (1, 0), (1, 1)),  # Terms spans both rows
-        ]))
-        
-        # Subject line
-        subject_data = [
-            [Paragraph("SUBJECT TO JURIDICTION", styles['Subject'])]
-        ]
-        
-        subject_table = Table(subject_data, colWidths=[doc.width])
-        subject_table.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-        ]))
+        # Invoices with their own terms get their own signature section
+        if 'terms' in invoice_data:
+            signature_table = self._signature_table(invoice_data['terms'])
+        else:
+            signature_table = self.signature_table
+        subject_table = self.subject_table
         
         # ------ PAYMENT HISTORY SECTION ------
         # Add payment history section if available
         payment_history_tables = []
         
-        if 'payment_history' in payment_data or 'payments' in payment_data:
-            payment_history_header = [
-                [Paragraph("Invoice payment Records", styles['PaymentRecordsHeader'])]
-            ]
-            
-            payment_header_table = Table(payment_history_header, colWidths=[doc.width])
-            payment_header_table.setStyle(TableStyle([
-                ('BOX', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-                ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-            ]))
-            
-            payment_history_tables.append(payment_header_table)
-            
-            # Payment records column headers
-            payment_record_headers = [
-                ["Sr.no", "Invoice No", "Amount", "Depositor Name", "Date", "time", "Mode of Pay", "Remaining Amount", "Note", "Invoice Status"]
-            ]
-            
-            payment_col_widths = [
-                doc.width*0.05,   # Sr.no
-                doc.width*0.1,    # Invoice No
-                doc.width*0.1,    # Amount
-                doc.width*0.15,   # Depositor Name
-                doc.width*0.1,    # Date
-                doc.width*0.07,   # time
-                doc.width*0.1,    # Mode of Pay
-                doc.width*0.13,   # Remaining Amount
-                doc.width*0.1,    # Note
-                doc.width*0.1     # Invoice Status
-            ]
-            
-            payment_headers_table = Table(payment_record_headers, colWidths=payment_col_widths)
-            payment_headers_table.setStyle(TableStyle([
-                ('BOX', (0, 0), (-1, -1), 1, colors.black),
-                ('INNERGRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ]))
-            
-            payment_history_tables.append(payment_headers_table)
+        if payment_data.get('payment_history') or 'payments' in payment_data:
+            payment_col_widths = self.payment_col_widths
+            payment_history_tables.append(self.payment_header_table)
+            payment_history_tables.append(self.payment_headers_table)
             
             # Extract payments data
             payments = payment_data.get('payments', [])
             
             # If no payments list but has payment_history string, try to parse it
-            if not payments and 'payment_history' in payment_data:
+            if not payments and payment_data.get('payment_history'):
                 # This is a simplified parser assuming format: "1. date: amount via method"
                 history_text = payment_data['payment_history']
                 history_lines = [line.strip() for line in history_text.split('\n') if line.strip()]
@@ -1001,10 +1255,10 @@ def generate_invoice(invoice_data, save_path):
         # ------ COMBINE ALL SECTIONS INTO FINAL DOCUMENT ------
         # Create contents for the main invoice (without payment history)
         invoice_content = []
-        invoice_content.append(shop_name_table)
-        invoice_content.append(shop_info_table)
+        invoice_content.append(self.shop_name_table)
+        invoice_content.append(self.shop_info_table)
         invoice_content.append(customer_info_table)
-        invoice_content.append(items_header_table)
+        invoice_content.append(self.items_header_table)
         invoice_content.append(items_table)
         invoice_content.append(total_row_table)
         invoice_content.append(amount_words_table)
@@ -1012,19 +1266,6 @@ def generate_invoice(invoice_data, save_path):
         invoice_content.append(signature_table)
         invoice_content.append(subject_table)
         
-        # Create a single FlowFrame that will contain all the invoice elements
-        invoice_frame = Frame(
-            doc.leftMargin, 
-            doc.bottomMargin, 
-            doc.width, 
-            doc.height - 10,
-            leftPadding=5, 
-            rightPadding=5, 
-            topPadding=5, 
-            bottomPadding=5,
-            showBoundary=1  # This gives us the main border around everything
-        )
-        
         # Create a final elements list
         elements = []
         
@@ -1036,17 +1277,7 @@ def generate_invoice(invoice_data, save_path):
         for table in payment_history_tables:
             elements.append(table)
         
-        # Build the document with the frame that adds the main border
-        doc.addPageTemplates([PageTemplate(frames=[invoice_frame])])
-        doc.build(elements)
-        
-        return True
-        
-    except Exception as e:
-        print(f"Error generating invoice: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        return elements
 
 def view_invoice(file_path):
     """Open an invoice file with the appropriate application"""
@@ -0,0 +1,216 @@
+"""
+Receipt renderer for POS system
+Prints a sale as a plain text or ESC/POS slip instead of an A4 PDF
+"""
+
+import os
+import textwrap
+
+from utils.helpers import format_currency, num_to_words_indian
+
+# Characters per line on an 80 mm thermal printer (Font A); 58 mm printers take 32
+RECEIPT_WIDTH = 48
+RECEIPTS_DIR = os.path.join('.', 'receipts')
+
+# What checkout produces for each payment type, set in the invoice settings
+OUTPUT_CHOICES = ("pdf", "receipt", "both")
+PAYMENT_TYPES = ("CASH", "UPI", "CREDIT", "SPLIT")
+
+# ESC/POS commands
+ESC_INIT = b"\x1b@"
+ESC_CENTER, ESC_LEFT = b"\x1ba\x01", b"\x1ba\x00"
+ESC_BOLD_ON, ESC_BOLD_OFF = b"\x1bE\x01", b"\x1bE\x00"
+ESC_DOUBLE_ON, ESC_DOUBLE_OFF = b"\x1d!\x11", b"\x1d!\x00"
+ESC_FEED_CUT = b"\x1bd\x04\x1dVB\x00"  # feed four lines, then a partial cut
+
+def invoice_outputs(config, payment_type):
+    """
+    Renderers checkout should queue for a sale, from the "invoice_output" setting
+
+    Returns:
+        list: "pdf", "receipt" or both; PDF for payment types without a setting
+    """
+    choice = (config.get("invoice_output") or {}).get(payment_type, "pdf")
+    if choice == "both":
+        return ["pdf", "receipt"]
+    return ["receipt"] if choice == "receipt" else ["pdf"]
+
+def money(value):
+    """Amount in Indian grouping without a currency symbol, e.g. 1,23,456.50"""
+    try:
+        return format_currency(float(value or 0), symbol="")
+    except (TypeError, ValueError):
+        return "0.00"
+
+def quantity(value):
+    """Quantity without a trailing .0 for whole numbers"""
+    try:
+        value = float(value or 0)
+    except (TypeError, ValueError):
+        return "0"
+    return str(int(value)) if value == int(value) else f"{value:g}"
+
+def rate(value):
+    """Tax rate as printed, e.g. 18% or 2.5%"""
+    return f"{quantity(value)}%"
+
+def receipt_lines(invoice_data, width=RECEIPT_WIDTH):
+    """
+    The receipt for an invoice as (style, text) lines
+
+    invoice_data is the payload of utils.pdf_invoice_generator, as built by
+    database.invoice_assembler. style is None, "center", "bold" or "title"
+    (centred, double size on ESC/POS printers, so half as many characters).
+    """
+    store_info = invoice_data.get('store_info') or {}
+    customer = invoice_data.get('customer') or {}
+    payment = invoice_data.get('payment') or {}
+    rule = (None, "-" * width)
+    lines = []
+
+    def pair(left, right, style=None):
+        if len(left) + len(right) >= width:
+            lines.append((style, left))
+            left = ""
+        lines.append((style, f"{left}{right:>{width - len(left)}}"))
+
+    def wrap(text, style=None, wrap_width=width):
+        for line in textwrap.wrap(str(text), wrap_width) or [""]:
+            lines.append((style, line))
+
+    # Shop
+    wrap(store_info.get('name', 'Agritech Products Shop'), "title", width // 2)
+    if store_info.get('address'):
+        wrap(store_info['address'], "center")
+    if store_info.get('phone'):
+        lines.append(("center", f"Ph: {store_info['phone']}"))
+    if store_info.get('gstin'):
+        lines.append(("center", f"GSTIN: {store_info['gstin']}"))
+    lines.append(rule)
+
+    # Invoice and customer
+    pair(f"Bill: {invoice_data.get('invoice_number', '')}",
+         f"{invoice_data.get('date', '')} {invoice_data.get('time', '')}".strip())
+    customer_line = customer.get('name') or 'Walk-in Customer'
+    if customer.get('phone'):
+        customer_line += f" ({customer['phone']})"
+    wrap(f"Customer: {customer_line}")
+    if customer.get('gstin'):
+        lines.append((None, f"GSTIN: {customer['gstin']}"))
+    lines.append(rule)
+
+    # Items: name, then quantity, rate and amount in fixed columns
+    amount_width = 10 if width >= 40 else 9
+    name_width = width - 5 - 2 * amount_width
+    lines.append(("bold", f"{'Item':<{name_width}}{'Qty':>5}{'Rate':>{amount_width}}{'Amount':>{amount_width}}"))
+    for item in invoice_data.get('items', []):
+        names = textwrap.wrap(str(item.get('name', '')), name_width) or [""]
+        lines.append((None, f"{names[0]:<{name_width}}{quantity(item.get('quantity')):>5}"
+                            f"{money(item.get('price')):>{amount_width}}{money(item.get('total')):>{amount_width}}"))
+        lines.extend((None, name) for name in names[1:])
+        details = []
+        if item.get('hsn_code') and item['hsn_code'] != '-':
+            details.append(f"HSN {item['hsn_code']}")
+        if item.get('batch_no'):
+            details.append(f"Batch {item['batch_no']}")
+        if item.get('discount'):
+            details.append(f"Disc {rate(item['discount'])}")
+        if details:
+            wrap("  " + "  ".join(details))
+    lines.append(rule)
+
+    # Totals and GST
+    pair("Subtotal", money(payment.get('subtotal')))
+    if payment.get('discount'):
+        pair("Discount", f"-{money(payment['discount'])}")
+    if 'taxable_value' in payment:
+        pair("Taxable value", money(payment['taxable_value']))
+    pair("CGST", money(payment.get('cgst')))
+    pair("SGST", money(payment.get('sgst')))
+    pair("TOTAL", f"Rs. {money(payment.get('total'))}", "bold")
+    try:
+        wrap(num_to_words_indian(float(payment.get('total') or 0)))
+    except (TypeError, ValueError):
+        pass
+
+    tax_rates = payment.get('tax_rates') or []
+    if tax_rates:
+        lines.append(rule)
+        column = (width - 6) // 3
+        rate_width = width - 3 * column
+        lines.append(("bold", f"{'GST':<{rate_width}}{'Taxable':>{column}}{'CGST':>{column}}{'SGST':>{column}}"))
+        for group in tax_rates:
+            lines.append((None, f"{rate(group.get('rate')):<{rate_width}}{money(group.get('taxable')):>{column}}"
+                                f"{money(group.get('cgst')):>{column}}{money(group.get('sgst')):>{column}}"))
+    lines.append(rule)
+
+    # Payment
+    lines.append((None, f"Paid by: {payment.get('method', 'CASH')}"))
+    split = payment.get('split') or {}
+    if payment.get('method') == "SPLIT" and split:
+        for label, key in (("Cash", 'cash_amount'), ("UPI", 'upi_amount'), ("Credit", 'credit_amount')):
+            if split.get(key):
+                pair(f"  {label}", money(split[key]))
+        if split.get('upi_reference'):
+            lines.append((None, f"  UPI ref: {split['upi_reference']}"))
+    elif payment.get('reference'):
+        lines.append((None, f"Ref: {payment['reference']}"))
+    if payment.get('status', 'PAID') != 'PAID':
+        lines.append((None, f"Status: {payment['status'].replace('_', ' ').title()}"))
+    lines.append(("center", "Thank you, visit again!"))
+    return lines
+
+def render_text(invoice_data, width=RECEIPT_WIDTH):
+    """The receipt as plain text, one line per printed line"""
+    out = []
+    for style, text in receipt_lines(invoice_data, width):
+        out.append(text.center(width).rstrip() if style in ("center", "title") else text)
+    return "\n".join(out) + "\n"
+
+def render_escpos(invoice_data, width=RECEIPT_WIDTH):
+    """The receipt as an ESC/POS byte stream, ending with a paper cut"""
+    out = [ESC_INIT]
+    for style, text in receipt_lines(invoice_data, width):
+        line = text.encode("ascii", "replace") + b"\n"
+        if style == "title":
+            out.append(ESC_CENTER + ESC_DOUBLE_ON + line + ESC_DOUBLE_OFF + ESC_LEFT)
+        elif style == "center":
+            out.append(ESC_CENTER + line + ESC_LEFT)
+        elif style == "bold":
+            out.append(ESC_BOLD_ON + line + ESC_BOLD_OFF)
+        else:
+            out.append(line)
+    out.append(ESC_FEED_CUT)
+    return b"".join(out)
+
+def receipt_path(invoice_number, directory=RECEIPTS_DIR, receipt_format="text"):
+    """Where the receipt for an invoice is written: .txt for text, .bin for ESC/POS"""
+    safe_number = str(invoice_number).replace('/', '-').replace('\\', '-').replace(':', '-')
+    return os.path.join(directory, f"{safe_number}.{'bin' if receipt_format == 'escpos' else 'txt'}")
+
+def write_receipt(invoice_data, save_path, receipt_format="text", width=RECEIPT_WIDTH):
+    """
+    Write the receipt for an invoice
+
+    The file is written under a temporary name and then renamed, so a print
+    spooler watching the directory never picks up half a receipt.
+
+    Args:
+        invoice_data: Invoice payload, as for utils.pdf_invoice_generator
+        save_path: File to write, see receipt_path()
+        receipt_format: "text", or "escpos" for a thermal printer
+        width: Characters per line
+
+    Returns:
+        str: save_path
+    """
+    if receipt_format == "escpos":
+        data = render_escpos(invoice_data, width)
+    else:
+        data = render_text(invoice_data, width).encode("utf-8")
+    os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+    temp_path = f"{save_path}.part"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, save_path)
+    return save_path